@@ -9,14 +9,12 @@ class NudenetDetectBenchmark(BaseBenchmark):
         BaseBenchmark.__init__(self)
 
     def load(self):
-        from imgutils.detect.nudenet import _open_nudenet_yolo, _open_nudenet_nms
+        from imgutils.detect.nudenet import _open_nudenet_yolo
         _ = _open_nudenet_yolo()
-        _ = _open_nudenet_nms()
 
     def unload(self):
-        from imgutils.detect.nudenet import _open_nudenet_yolo, _open_nudenet_nms
+        from imgutils.detect.nudenet import _open_nudenet_yolo
         _open_nudenet_yolo.cache_clear()
-        _open_nudenet_nms.cache_clear()
 
     def run(self):
         image_file = random.choice(self.all_images)
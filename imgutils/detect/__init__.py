@@ -10,13 +10,16 @@ Overview:
 """
 from .booru_yolo import detect_with_booru_yolo
 from .censor import detect_censors
+from .detections import Detections
+from .evaluate import DetectionEvaluator, evaluate_detections
 from .eye import detect_eyes
 from .face import detect_faces
 from .halfbody import detect_halfbody
 from .hand import detect_hands
 from .head import detect_heads
-from .nudenet import detect_with_nudenet
+from .nudenet import detect_with_nudenet, detect_with_nudenet_batch
 from .person import detect_person
-from .similarity import calculate_iou, bboxes_similarity, detection_similarity
+from .similarity import calculate_iou, bboxes_iou_matrix, bboxes_similarity, detection_similarity
 from .text import detect_text
+from .tracking import DetectionTracker, track_detections
 from .visual import detection_visualize
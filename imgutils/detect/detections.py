@@ -0,0 +1,448 @@
+"""
+Overview:
+    Columnar container of detection results.
+
+    The detection functions in :mod:`imgutils.detect` return lists like
+    ``[((x0, y0, x1, y1), label, score), ...]``, which cost many small Python objects for each image.
+    :class:`Detections` stores the same information in arrays:
+
+    - ``boxes``: ``float32`` array with shape ``(N, 4)``, in ``(x0, y0, x1, y1)`` format
+    - ``label_ids``: ``int16`` array with shape ``(N,)``, indices of the label table
+    - ``scores``: ``float32`` array with shape ``(N,)``
+    - ``image_ids``: ``int64`` array with shape ``(N,)``, which image each detection belongs to
+    - ``labels``: the label table, a tuple of strings
+
+    Detections of many images can be concatenated cheaply with :meth:`Detections.concat`, and stored with
+    :meth:`Detections.save_npz` or :meth:`Detections.save_parquet`.
+    :func:`imgutils.detect.visual.detection_visualize`, :func:`imgutils.detect.similarity.detection_similarity`
+    and :func:`imgutils.operate.censor_areas` accept :class:`Detections` directly.
+
+    .. note::
+        Parquet support requires ``pyarrow``, please install it with the following command
+
+        .. code:: shell
+
+            pip install dghs-imgutils[parquet]
+"""
+import json
+import os
+from typing import List, Optional, Sequence, Tuple, Union, Iterator
+
+import numpy as np
+
+from .base import BBoxWithScoreAndLabel
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except (ImportError, ModuleNotFoundError):  # pragma: no cover
+    pyarrow = None
+
+
+def _check_pyarrow_env():
+    """
+    Check if ``pyarrow`` is installed, which is required for parquet files.
+
+    :raises EnvironmentError: If pyarrow is not installed.
+    """
+    if pyarrow is None:
+        raise EnvironmentError(
+            'Pyarrow not installed. Please use "pip install dghs-imgutils[parquet]".')  # pragma: no cover
+
+
+class Detections:
+    """
+    Array-backed detection results of one or many images.
+
+    :param boxes: Boxes with shape ``(N, 4)``, in ``(x0, y0, x1, y1)`` format.
+    :type boxes: np.ndarray
+    :param label_ids: Label ids with shape ``(N,)``, indices of ``labels``.
+    :type label_ids: np.ndarray
+    :param scores: Confidence scores with shape ``(N,)``.
+    :type scores: np.ndarray
+    :param labels: The label table.
+    :type labels: Sequence[str]
+    :param image_ids: Image ids with shape ``(N,)``. All zeros will be used when not given.
+    :type image_ids: Optional[np.ndarray]
+
+    :raises ValueError: If the shapes of arrays do not match, or a label id is out of the label table.
+
+    Examples::
+        >>> from imgutils.detect import detect_faces, Detections
+        >>>
+        >>> d1 = Detections.from_list(detect_faces('genshin_post.jpg'))
+        >>> d1
+        Detections(4 detections, 1 images, labels=('face',))
+        >>> d1.boxes
+        array([[ 967.,  143., 1084.,  261.],
+               [ 246.,  208.,  331.,  287.],
+               [ 662.,  466.,  705.,  514.],
+               [ 479.,  283.,  523.,  326.]], dtype=float32)
+        >>> d2 = Detections.from_list(detect_faces('mostima_post.jpg'))
+        >>> d = Detections.concat([d1, d2])
+        >>> d
+        Detections(7 detections, 2 images, labels=('face',))
+        >>> d.save_npz('faces.npz')
+        >>> Detections.load_npz('faces.npz').select_image(1).to_list()
+        [((29, 441, 204, 584), 'face', 0.7874319553375244),
+         ((346, 59, 529, 275), 'face', 0.7510495185852051),
+         ((606, 51, 895, 336), 'face', 0.6986488103866577)]
+    """
+
+    __slots__ = ['boxes', 'label_ids', 'scores', 'labels', 'image_ids']
+
+    def __init__(self, boxes: np.ndarray, label_ids: np.ndarray, scores: np.ndarray,
+                 labels: Sequence[str], image_ids: Optional[np.ndarray] = None):
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.label_ids = np.asarray(label_ids, dtype=np.int16).reshape(-1)
+        self.scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+        self.labels = tuple(labels)
+        if image_ids is None:
+            self.image_ids = np.zeros((self.boxes.shape[0],), dtype=np.int64)
+        else:
+            self.image_ids = np.asarray(image_ids, dtype=np.int64).reshape(-1)
+
+        n = self.boxes.shape[0]
+        if self.label_ids.shape[0] != n or self.scores.shape[0] != n or self.image_ids.shape[0] != n:
+            raise ValueError(f'Length of arrays not match - boxes: {n!r}, label_ids: {self.label_ids.shape[0]!r}, '
+                             f'scores: {self.scores.shape[0]!r}, image_ids: {self.image_ids.shape[0]!r}.')
+        if n and (self.label_ids.min() < 0 or self.label_ids.max() >= len(self.labels)):
+            raise ValueError(f'Label ids should be in [0, {len(self.labels)!r}), '
+                             f'but [{self.label_ids.min()!r}, {self.label_ids.max()!r}] found.')
+
+    @classmethod
+    def empty(cls, labels: Sequence[str] = ()) -> 'Detections':
+        """
+        Create an empty detection result.
+
+        :param labels: The label table. Empty by default.
+        :type labels: Sequence[str]
+        :return: Empty detections.
+        :rtype: Detections
+        """
+        return cls(
+            boxes=np.zeros((0, 4), dtype=np.float32),
+            label_ids=np.zeros((0,), dtype=np.int16),
+            scores=np.zeros((0,), dtype=np.float32),
+            labels=labels,
+        )
+
+    @classmethod
+    def from_list(cls, detection: List[BBoxWithScoreAndLabel], labels: Optional[Sequence[str]] = None,
+                  image_id: int = 0) -> 'Detections':
+        """
+        Create detections from the list format returned by the detection functions.
+
+        :param detection: List of ``((x0, y0, x1, y1), label, score)``.
+        :type detection: List[BBoxWithScoreAndLabel]
+        :param labels: The label table. If not given, the sorted labels appeared in ``detection`` will be used.
+            Keep it fixed (e.g. the labels of the model) when the results of many images are to be concatenated.
+        :type labels: Optional[Sequence[str]]
+        :param image_id: Image id of these detections. Default is ``0``.
+        :type image_id: int
+        :return: Columnar detections.
+        :rtype: Detections
+        :raises ValueError: If a label is not in the given label table.
+        """
+        if labels is None:
+            labels = sorted({label for _, label, _ in detection})
+        label_map = {label: i for i, label in enumerate(labels)}
+        try:
+            label_ids = [label_map[label] for _, label, _ in detection]
+        except KeyError as err:
+            raise ValueError(f'Unknown label {err.args[0]!r}, not in label table {tuple(labels)!r}.')
+
+        return cls(
+            boxes=np.array([bbox for bbox, _, _ in detection], dtype=np.float32).reshape(-1, 4),
+            label_ids=np.array(label_ids, dtype=np.int16),
+            scores=np.array([score for _, _, score in detection], dtype=np.float32),
+            labels=labels,
+            image_ids=np.full((len(detection),), fill_value=image_id, dtype=np.int64),
+        )
+
+    def to_list(self, int_boxes: bool = False) -> List[BBoxWithScoreAndLabel]:
+        """
+        Convert to the list format returned by the detection functions.
+
+        :param int_boxes: Round the box coordinates to integers. Default is ``False``.
+        :type int_boxes: bool
+        :return: List of ``((x0, y0, x1, y1), label, score)``.
+        :rtype: List[BBoxWithScoreAndLabel]
+        """
+        boxes = self.boxes.round().astype(np.int64) if int_boxes else self.boxes
+        return [
+            (tuple(box), self.labels[label_id], score)
+            for box, label_id, score in zip(boxes.tolist(), self.label_ids.tolist(), self.scores.tolist())
+        ]
+
+    @property
+    def label_names(self) -> np.ndarray:
+        """
+        Label name of each detection.
+
+        :return: Object array of strings with shape ``(N,)``.
+        :rtype: np.ndarray
+        """
+        return np.array(self.labels, dtype=object)[self.label_ids]
+
+    @property
+    def image_count(self) -> int:
+        """
+        Number of distinct images in these detections.
+
+        :return: Number of images.
+        :rtype: int
+        """
+        return int(np.unique(self.image_ids).shape[0])
+
+    def __len__(self):
+        return self.boxes.shape[0]
+
+    def __iter__(self) -> Iterator[BBoxWithScoreAndLabel]:
+        yield from self.to_list()
+
+    def __getitem__(self, item) -> Union['Detections', BBoxWithScoreAndLabel]:
+        if isinstance(item, (int, np.integer)):
+            return (
+                tuple(self.boxes[item].tolist()),
+                self.labels[int(self.label_ids[item])],
+                float(self.scores[item]),
+            )
+        else:
+            return Detections(
+                boxes=self.boxes[item],
+                label_ids=self.label_ids[item],
+                scores=self.scores[item],
+                labels=self.labels,
+                image_ids=self.image_ids[item],
+            )
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({len(self)!r} detections, ' \
+               f'{self.image_count!r} images, labels={self.labels!r})'
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        elif isinstance(other, Detections):
+            return self.labels == other.labels and \
+                np.array_equal(self.boxes, other.boxes) and \
+                np.array_equal(self.label_ids, other.label_ids) and \
+                np.array_equal(self.scores, other.scores) and \
+                np.array_equal(self.image_ids, other.image_ids)
+        else:
+            return False
+
+    __hash__ = None
+
+    def select_image(self, image_id: int) -> 'Detections':
+        """
+        Select the detections of the given image.
+
+        :param image_id: Image id.
+        :type image_id: int
+        :return: Detections of this image.
+        :rtype: Detections
+        """
+        return self[self.image_ids == image_id]
+
+    def filter(self, min_score: Optional[float] = None, labels: Optional[Sequence[str]] = None) -> 'Detections':
+        """
+        Filter the detections by score and labels.
+
+        :param min_score: Minimum score to keep. Not filtered by score when not given.
+        :type min_score: Optional[float]
+        :param labels: Labels to keep. Not filtered by label when not given.
+        :type labels: Optional[Sequence[str]]
+        :return: Filtered detections.
+        :rtype: Detections
+        """
+        mask = np.ones((len(self),), dtype=bool)
+        if min_score is not None:
+            mask &= self.scores >= min_score
+        if labels is not None:
+            keep_ids = [i for i, label in enumerate(self.labels) if label in set(labels)]
+            mask &= np.isin(self.label_ids, keep_ids)
+        return self[mask]
+
+    def remap_labels(self, labels: Sequence[str]) -> 'Detections':
+        """
+        Remap the label ids to another label table.
+
+        :param labels: The new label table, which must contain all the labels used in these detections.
+        :type labels: Sequence[str]
+        :return: Detections with the new label table.
+        :rtype: Detections
+        :raises ValueError: If some used labels are not in the new label table.
+        """
+        labels = tuple(labels)
+        if labels == self.labels:
+            return self
+
+        label_map = {label: i for i, label in enumerate(labels)}
+        used = np.unique(self.label_ids)
+        missing = [self.labels[i] for i in used.tolist() if self.labels[i] not in label_map]
+        if missing:
+            raise ValueError(f'Labels {missing!r} not in the new label table {labels!r}.')
+        mapping = np.array([label_map.get(label, -1) for label in self.labels], dtype=np.int16)
+        return Detections(
+            boxes=self.boxes,
+            label_ids=mapping[self.label_ids] if len(self) else self.label_ids,
+            scores=self.scores,
+            labels=labels,
+            image_ids=self.image_ids,
+        )
+
+    @classmethod
+    def concat(cls, items: Sequence['Detections'], image_ids: Optional[Sequence[int]] = None) -> 'Detections':
+        """
+        Concatenate the detections of many images.
+
+        :param items: Detections to concatenate.
+        :type items: Sequence[Detections]
+        :param image_ids: Image id for each item. If given, the image ids of the items will be overwritten.
+            When not given, if the image ids of all the items are ``0`` (e.g. the detections of single images),
+            the items are numbered by their positions, otherwise the original image ids are kept.
+        :type image_ids: Optional[Sequence[int]]
+        :return: Concatenated detections. When the items have different label tables, the merged
+            and sorted label table will be used.
+        :rtype: Detections
+        :raises ValueError: If the length of ``image_ids`` does not match the items, or the original image ids
+            of different items overlap when ``image_ids`` is not given.
+        """
+        items = list(items)
+        if image_ids is not None and len(image_ids) != len(items):
+            raise ValueError(f'Length of image ids not match, {len(items)!r} expected '
+                             f'but {len(image_ids)!r} found.')
+        if not items:
+            return cls.empty()
+
+        if all(item.labels == items[0].labels for item in items):
+            labels = items[0].labels
+        else:
+            labels = tuple(sorted({label for item in items for label in item.labels}))
+        items = [item.remap_labels(labels) for item in items]
+
+        if image_ids is None and not any(np.any(item.image_ids) for item in items):
+            image_ids = list(range(len(items)))
+        if image_ids is not None:
+            all_image_ids = [np.full((len(item),), fill_value=image_ids[i], dtype=np.int64)
+                             for i, item in enumerate(items)]
+        else:
+            all_image_ids = [item.image_ids for item in items]
+            unique_ids = [np.unique(ids) for ids in all_image_ids]
+            if sum(ids.shape[0] for ids in unique_ids) != np.unique(np.concatenate(unique_ids)).shape[0]:
+                raise ValueError('Image ids of different items overlap, image_ids should be given.')
+
+        return cls(
+            boxes=np.concatenate([item.boxes for item in items]),
+            label_ids=np.concatenate([item.label_ids for item in items]),
+            scores=np.concatenate([item.scores for item in items]),
+            labels=labels,
+            image_ids=np.concatenate(all_image_ids),
+        )
+
+    def save_npz(self, file: Union[str, os.PathLike], compressed: bool = True):
+        """
+        Save the detections to a npz file.
+
+        :param file: Path of the npz file.
+        :type file: Union[str, os.PathLike]
+        :param compressed: Use compressed npz format. Default is ``True``.
+        :type compressed: bool
+        """
+        fn = np.savez_compressed if compressed else np.savez
+        fn(
+            file,
+            boxes=self.boxes,
+            label_ids=self.label_ids,
+            scores=self.scores,
+            image_ids=self.image_ids,
+            labels=np.array(json.dumps(list(self.labels))),
+        )
+
+    @classmethod
+    def load_npz(cls, file: Union[str, os.PathLike]) -> 'Detections':
+        """
+        Load detections from a npz file saved by :meth:`save_npz`.
+
+        :param file: Path of the npz file.
+        :type file: Union[str, os.PathLike]
+        :return: Loaded detections.
+        :rtype: Detections
+        """
+        with np.load(file, allow_pickle=False) as data:
+            return cls(
+                boxes=data['boxes'],
+                label_ids=data['label_ids'],
+                scores=data['scores'],
+                labels=json.loads(str(data['labels'])),
+                image_ids=data['image_ids'],
+            )
+
+    def save_parquet(self, file: Union[str, os.PathLike], **kwargs):
+        """
+        Save the detections to a parquet file.
+
+        The columns are ``image_id``, ``x0``, ``y0``, ``x1``, ``y1``, ``label_id`` and ``score``,
+        and the label table is stored in the schema metadata.
+
+        :param file: Path of the parquet file.
+        :type file: Union[str, os.PathLike]
+        :param kwargs: Other arguments for :func:`pyarrow.parquet.write_table`.
+        :raises EnvironmentError: If pyarrow is not installed.
+        """
+        _check_pyarrow_env()
+        table = pyarrow.table({
+            'image_id': self.image_ids,
+            'x0': self.boxes[:, 0],
+            'y0': self.boxes[:, 1],
+            'x1': self.boxes[:, 2],
+            'y1': self.boxes[:, 3],
+            'label_id': self.label_ids,
+            'score': self.scores,
+        }).replace_schema_metadata({'labels': json.dumps(list(self.labels))})
+        pyarrow.parquet.write_table(table, file, **kwargs)
+
+    @classmethod
+    def load_parquet(cls, file: Union[str, os.PathLike]) -> 'Detections':
+        """
+        Load detections from a parquet file saved by :meth:`save_parquet`.
+
+        :param file: Path of the parquet file.
+        :type file: Union[str, os.PathLike]
+        :return: Loaded detections.
+        :rtype: Detections
+        :raises EnvironmentError: If pyarrow is not installed.
+        """
+        _check_pyarrow_env()
+        table = pyarrow.parquet.read_table(file)
+        labels = json.loads(table.schema.metadata[b'labels'].decode())
+        columns = {name: table.column(name).to_numpy() for name in table.column_names}
+        return cls(
+            boxes=np.stack([columns['x0'], columns['y0'], columns['x1'], columns['y1']], axis=-1),
+            label_ids=columns['label_id'],
+            scores=columns['score'],
+            labels=labels,
+            image_ids=columns['image_id'],
+        )
+
+
+DetectionsTyping = Union[Detections, List[BBoxWithScoreAndLabel]]
+
+
+def _detection_columns(detection: DetectionsTyping) -> Tuple[np.ndarray, List[str], np.ndarray]:
+    """
+    Get the boxes, label names and scores of the detection results in either format.
+
+    :param detection: Detections or list of ``((x0, y0, x1, y1), label, score)``.
+    :return: Tuple of boxes array ``(N, 4)``, list of label names and scores array ``(N,)``.
+    """
+    if isinstance(detection, Detections):
+        return detection.boxes, detection.label_names.tolist(), detection.scores
+    else:
+        return (
+            np.array([bbox for bbox, _, _ in detection], dtype=np.float64).reshape(-1, 4),
+            [label for _, label, _ in detection],
+            np.array([score for _, _, score in detection], dtype=np.float64),
+        )
@@ -0,0 +1,290 @@
+"""
+Overview:
+    Dataset-scale evaluation of object detection results.
+
+    :class:`DetectionEvaluator` consumes the predictions and ground truths image by image, so it can be used on large
+    validation sets (e.g. comparing model versions from the ``deepghs/*_detection`` repositories on 100k images)
+    without holding all the boxes in memory. Only the scores and matching flags of the predictions are kept.
+    Precision, recall and average precision (AP) are calculated for each label under multiple IoU thresholds,
+    in the same way as COCO evaluation.
+
+    Both the list format ``[((x0, y0, x1, y1), label, score), ...]`` and
+    :class:`imgutils.detect.detections.Detections` are supported.
+"""
+from typing import Dict, Iterable, List, Literal, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .detections import DetectionsTyping, _detection_columns
+from .similarity import bboxes_iou_matrix
+
+_DEFAULT_IOU_THRESHOLDS = tuple(np.round(np.linspace(0.5, 0.95, 10), 2).tolist())
+
+
+def _match_predictions(pred_boxes: np.ndarray, pred_scores: np.ndarray, gt_boxes: np.ndarray,
+                       iou_thresholds: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Greedily match the predictions of one label on one image to the ground truths.
+
+    Predictions are visited in descending order of score, and each of them is matched to the unmatched
+    ground truth box with the highest IoU, as long as the IoU reaches the threshold.
+
+    :param pred_boxes: Predicted boxes with shape ``(N, 4)``.
+    :param pred_scores: Predicted scores with shape ``(N,)``.
+    :param gt_boxes: Ground truth boxes with shape ``(M, 4)``.
+    :param iou_thresholds: IoU thresholds with shape ``(T,)``.
+    :return: Tuple of sorted scores ``(N,)`` and true positive flags ``(T, N)``.
+    """
+    order = np.argsort(-pred_scores, kind='stable')
+    pred_boxes, pred_scores = pred_boxes[order], pred_scores[order]
+    tp = np.zeros((iou_thresholds.shape[0], pred_boxes.shape[0]), dtype=bool)
+    if not pred_boxes.shape[0] or not gt_boxes.shape[0]:
+        return pred_scores, tp
+
+    ious = bboxes_iou_matrix(pred_boxes, gt_boxes)
+    for ti, threshold in enumerate(iou_thresholds):
+        gt_matched = np.zeros((gt_boxes.shape[0],), dtype=bool)
+        for pi in range(pred_boxes.shape[0]):
+            candidates = np.where(gt_matched, -1.0, ious[pi])
+            gi = int(np.argmax(candidates))
+            if candidates[gi] >= threshold:
+                gt_matched[gi] = True
+                tp[ti, pi] = True
+
+    return pred_scores, tp
+
+
+def _average_precision(recall: np.ndarray, precision: np.ndarray,
+                       interpolation: Literal['coco', 'continuous'] = 'coco') -> float:
+    """
+    Calculate the average precision from the precision-recall curve.
+
+    :param recall: Recall values, in ascending order.
+    :param precision: Precision values.
+    :param interpolation: ``coco`` for 101-point interpolation, ``continuous`` for the area under the
+        interpolated curve.
+    :return: Average precision.
+    """
+    if interpolation == 'coco':
+        mpre = np.flip(np.maximum.accumulate(np.flip(precision)))
+        idx = np.searchsorted(recall, np.linspace(0, 1, 101), side='left')
+        values = np.zeros((101,), dtype=np.float64)
+        valid = idx < recall.shape[0]
+        values[valid] = mpre[idx[valid]]
+        return float(values.mean())
+    elif interpolation == 'continuous':
+        mrec = np.concatenate([[0.0], recall, [1.0]])
+        mpre = np.concatenate([[1.0], precision, [0.0]])
+        mpre = np.flip(np.maximum.accumulate(np.flip(mpre)))
+        i = np.where(mrec[1:] != mrec[:-1])[0]
+        return float(np.sum((mrec[i + 1] - mrec[i]) * mpre[i + 1]))
+    else:
+        raise ValueError(f'Unknown interpolation method - {interpolation!r}.')
+
+
+class DetectionEvaluator:
+    """
+    Streaming evaluator of object detection results.
+
+    :param iou_thresholds: IoU thresholds to evaluate on. Default is ``0.50:0.05:0.95``, the same as COCO.
+    :type iou_thresholds: Sequence[float]
+    :param labels: Labels to evaluate. If not given, all the labels which appeared in the ground truths or
+        predictions will be evaluated.
+    :type labels: Optional[Sequence[str]]
+
+    Examples::
+        >>> from imgutils.detect import detect_faces
+        >>> from imgutils.detect.evaluate import DetectionEvaluator
+        >>>
+        >>> evaluator = DetectionEvaluator()
+        >>> for image_file, gt in dataset:  # gt is a list of ((x0, y0, x1, y1), label, score)
+        ...     evaluator.add(detect_faces(image_file, conf_threshold=0.05), gt)
+        >>> result = evaluator.compute()
+        >>> result['mAP50'], result['mAP50-95']
+        (0.9213454941236, 0.6153624513431)
+        >>> result['labels']['face']['recall'][0.5]
+        0.9423076923076923
+    """
+
+    def __init__(self, iou_thresholds: Sequence[float] = _DEFAULT_IOU_THRESHOLDS,
+                 labels: Optional[Sequence[str]] = None):
+        self.iou_thresholds = np.asarray(list(iou_thresholds), dtype=np.float64)
+        if not self.iou_thresholds.shape[0]:
+            raise ValueError('At least one IoU threshold should be given.')
+        self.labels = list(labels) if labels is not None else None
+        self._scores: Dict[str, List[np.ndarray]] = {}
+        self._tps: Dict[str, List[np.ndarray]] = {}
+        self._gt_counts: Dict[str, int] = {}
+        self.image_count = 0
+
+    def reset(self):
+        """
+        Reset the evaluator, all the accumulated results will be dropped.
+        """
+        self._scores.clear()
+        self._tps.clear()
+        self._gt_counts.clear()
+        self.image_count = 0
+
+    def add(self, predictions: DetectionsTyping, ground_truths: DetectionsTyping):
+        """
+        Add the predictions and ground truths of one image.
+
+        :param predictions: Predicted detections of this image.
+        :type predictions: Union[Detections, List[BBoxWithScoreAndLabel]]
+        :param ground_truths: Ground truth detections of this image, the scores are ignored.
+        :type ground_truths: Union[Detections, List[BBoxWithScoreAndLabel]]
+        """
+        pred_boxes, pred_labels, pred_scores = _detection_columns(predictions)
+        gt_boxes, gt_labels, _ = _detection_columns(ground_truths)
+        pred_labels, gt_labels = np.array(pred_labels, dtype=object), np.array(gt_labels, dtype=object)
+
+        labels = self.labels if self.labels is not None else {*pred_labels.tolist(), *gt_labels.tolist()}
+        for label in labels:
+            pmask, gmask = pred_labels == label, gt_labels == label
+            scores, tp = _match_predictions(
+                pred_boxes=np.asarray(pred_boxes[pmask], dtype=np.float64),
+                pred_scores=np.asarray(pred_scores[pmask], dtype=np.float64),
+                gt_boxes=np.asarray(gt_boxes[gmask], dtype=np.float64),
+                iou_thresholds=self.iou_thresholds,
+            )
+            self._scores.setdefault(label, []).append(scores.astype(np.float32))
+            self._tps.setdefault(label, []).append(tp)
+            self._gt_counts[label] = self._gt_counts.get(label, 0) + int(gmask.sum())
+
+        self.image_count += 1
+
+    def _label_metrics(self, label: str, score_threshold: Optional[float],
+                       interpolation: Literal['coco', 'continuous']) -> dict:
+        gt_count = self._gt_counts.get(label, 0)
+        if label in self._scores:
+            scores = np.concatenate(self._scores[label])
+            tps = np.concatenate(self._tps[label], axis=1)
+        else:
+            scores = np.zeros((0,), dtype=np.float32)
+            tps = np.zeros((self.iou_thresholds.shape[0], 0), dtype=bool)
+
+        order = np.argsort(-scores, kind='stable')
+        scores, tps = scores[order], tps[:, order]
+        tp_cum = np.cumsum(tps, axis=1)
+        fp_cum = np.cumsum(~tps, axis=1)
+        if score_threshold is not None:
+            n = int((scores >= score_threshold).sum())
+        else:
+            n = scores.shape[0]
+
+        aps, precisions, recalls = {}, {}, {}
+        for ti, threshold in enumerate(self.iou_thresholds.tolist()):
+            precision_curve = tp_cum[ti] / np.maximum(tp_cum[ti] + fp_cum[ti], 1)
+            recall_curve = tp_cum[ti] / gt_count if gt_count else np.zeros_like(precision_curve, dtype=np.float64)
+            if gt_count:
+                aps[threshold] = _average_precision(recall_curve, precision_curve, interpolation)
+            else:
+                aps[threshold] = None
+            precisions[threshold] = float(precision_curve[n - 1]) if n else 0.0
+            recalls[threshold] = float(recall_curve[n - 1]) if n else 0.0
+
+        return {
+            'ap': aps,
+            'precision': precisions,
+            'recall': recalls,
+            'gt_count': gt_count,
+            'pred_count': int(scores.shape[0]),
+        }
+
+    def compute(self, score_threshold: Optional[float] = None,
+                interpolation: Literal['coco', 'continuous'] = 'coco') -> dict:
+        """
+        Calculate the metrics from all the added images.
+
+        :param score_threshold: Score threshold for precision and recall. If not given, all the predictions are
+            counted, i.e. the threshold used to produce the predictions. AP is always calculated with all
+            the predictions.
+        :type score_threshold: Optional[float]
+        :param interpolation: Interpolation method of average precision. ``coco`` means 101-point interpolation
+            used by COCO, and ``continuous`` means the area under the monotonic precision-recall curve.
+            Default is ``coco``.
+        :type interpolation: Literal['coco', 'continuous']
+        :return: A dict of metrics, which contains
+
+            - ``labels``: metrics of each label, including ``ap``, ``precision`` and ``recall`` (dicts which map
+              IoU thresholds to values), ``gt_count`` and ``pred_count``. AP is ``None`` for the labels without
+              any ground truth.
+            - ``mAP``: mean AP over the IoU thresholds and the labels with ground truths.
+            - ``mAP@<threshold>`` for each IoU threshold, and ``mAP50`` / ``mAP50-95`` when
+              the corresponding thresholds are evaluated.
+            - ``iou_thresholds`` and ``image_count``.
+
+        :rtype: dict
+        """
+        labels = self.labels if self.labels is not None else sorted({*self._gt_counts.keys(), *self._scores.keys()})
+        label_metrics = {label: self._label_metrics(label, score_threshold, interpolation) for label in labels}
+
+        thresholds = self.iou_thresholds.tolist()
+        maps = {}
+        for threshold in thresholds:
+            values = [m['ap'][threshold] for m in label_metrics.values() if m['ap'][threshold] is not None]
+            maps[threshold] = float(np.mean(values)) if values else 0.0
+
+        retval = {
+            'labels': label_metrics,
+            'mAP': float(np.mean(list(maps.values()))),
+            **{f'mAP@{threshold:.2f}': value for threshold, value in maps.items()},
+            'iou_thresholds': thresholds,
+            'image_count': self.image_count,
+        }
+        if 0.5 in maps:
+            retval['mAP50'] = maps[0.5]
+        if set(_DEFAULT_IOU_THRESHOLDS).issubset(maps):
+            retval['mAP50-95'] = float(np.mean([maps[t] for t in _DEFAULT_IOU_THRESHOLDS]))
+        return retval
+
+
+def evaluate_detections(predictions: Iterable[DetectionsTyping], ground_truths: Iterable[DetectionsTyping],
+                        iou_thresholds: Sequence[float] = _DEFAULT_IOU_THRESHOLDS,
+                        labels: Optional[Sequence[str]] = None, score_threshold: Optional[float] = None,
+                        interpolation: Literal['coco', 'continuous'] = 'coco') -> dict:
+    """
+    Evaluate the detection results over a dataset.
+
+    The predictions and ground truths are consumed lazily and in pairs, so generators can be used
+    for large datasets.
+
+    :param predictions: Predicted detections of each image.
+    :type predictions: Iterable[Union[Detections, List[BBoxWithScoreAndLabel]]]
+    :param ground_truths: Ground truth detections of each image.
+    :type ground_truths: Iterable[Union[Detections, List[BBoxWithScoreAndLabel]]]
+    :param iou_thresholds: IoU thresholds to evaluate on. Default is ``0.50:0.05:0.95``, the same as COCO.
+    :type iou_thresholds: Sequence[float]
+    :param labels: Labels to evaluate. All the appeared labels will be evaluated when not given.
+    :type labels: Optional[Sequence[str]]
+    :param score_threshold: Score threshold for precision and recall, see :meth:`DetectionEvaluator.compute`.
+    :type score_threshold: Optional[float]
+    :param interpolation: Interpolation method of average precision, see :meth:`DetectionEvaluator.compute`.
+    :type interpolation: Literal['coco', 'continuous']
+    :return: A dict of metrics, see :meth:`DetectionEvaluator.compute`.
+    :rtype: dict
+    :raises ValueError: If the numbers of predictions and ground truths do not match.
+
+    Examples::
+        >>> from imgutils.detect import evaluate_detections
+        >>>
+        >>> predictions = [[((0, 0, 10, 10), 'face', 0.9), ((20, 20, 30, 30), 'face', 0.6)]]
+        >>> ground_truths = [[((1, 1, 10, 10), 'face', 1.0)]]
+        >>> result = evaluate_detections(predictions, ground_truths, iou_thresholds=[0.5])
+        >>> result['mAP50'], result['labels']['face']['precision'][0.5]
+        (1.0, 0.5)
+    """
+    evaluator = DetectionEvaluator(iou_thresholds=iou_thresholds, labels=labels)
+    _sentinel = object()
+    pred_iter, gt_iter = iter(predictions), iter(ground_truths)
+    while True:
+        pred, gt = next(pred_iter, _sentinel), next(gt_iter, _sentinel)
+        if pred is _sentinel and gt is _sentinel:
+            break
+        elif pred is _sentinel or gt is _sentinel:
+            raise ValueError(f'Numbers of predictions and ground truths not match, '
+                             f'stopped at image #{evaluator.image_count!r}.')
+        evaluator.add(pred, gt)
+
+    return evaluator.compute(score_threshold=score_threshold, interpolation=interpolation)
@@ -15,6 +15,7 @@ Overview:
     
     The main function :func:`detect_with_nudenet` can be used to perform nudity detection on
     given images, returning a list of bounding boxes, labels, and confidence scores.
+    For images in bursts, :func:`detect_with_nudenet_batch` runs them through the model in batches.
     
     This is an overall benchmark of all the nudenet models:
 
@@ -118,20 +119,6 @@ def _open_nudenet_yolo():
     ))
 
 
-@lru_cache()
-def _open_nudenet_nms():
-    """
-    Open and cache the NudeNet NMS ONNX model.
-
-    :return: The loaded ONNX model for NMS.
-    """
-    return open_onnx_model(hf_hub_download(
-        repo_id=_REPO_ID,
-        repo_type='model',
-        filename='nms-yolov8.onnx',
-    ))
-
-
 def _nn_preprocessing(image: ImageTyping, model_size: int = 320) -> Tuple[np.ndarray, float]:
     """
     Preprocess the input image for the NudeNet model.
@@ -151,48 +138,97 @@ def _nn_preprocessing(image: ImageTyping, model_size: int = 320) -> Tuple[np.nda
     img_resized = Image.fromarray(mat_pad, mode='RGB').resize((model_size, model_size), resample=Image.BILINEAR)
 
     input_data = np.array(img_resized).transpose(2, 0, 1).astype(np.float32) / 255.0
-    input_data = np.expand_dims(input_data, axis=0)
     return input_data, max_size / model_size
 
 
-def _make_np_config(topk: int = 100, iou_threshold: float = 0.45, score_threshold: float = 0.25) -> np.ndarray:
+def _nn_batch_run(input_: np.ndarray) -> np.ndarray:
+    """
+    Run the NudeNet YOLO model on a batch of preprocessed images.
+
+    When the batch dimension of the model is fixed, the batch will be split (and zero-padded)
+    to fit that size.
+
+    :param input_: Preprocessed images with shape ``(B, 3, H, W)``.
+    :return: Raw model output with shape ``(B, 4 + classes, boxes)``.
+    """
+    model = _open_nudenet_yolo()
+    fixed_batch = model.get_inputs()[0].shape[0]
+    if not isinstance(fixed_batch, int) or fixed_batch <= 0:
+        output0, = model.run(['output0'], {'images': input_})
+        return output0
+
+    outputs = []
+    for i in range(0, input_.shape[0], fixed_batch):
+        chunk = input_[i:i + fixed_batch]
+        n = chunk.shape[0]
+        if n < fixed_batch:
+            chunk = np.concatenate([chunk, np.zeros((fixed_batch - n, *chunk.shape[1:]), dtype=chunk.dtype)])
+        output0, = model.run(['output0'], {'images': chunk})
+        outputs.append(output0[:n])
+    return np.concatenate(outputs)
+
+
+def _nn_nms(output: np.ndarray, topk: int = 100, iou_threshold: float = 0.45,
+            score_threshold: float = 0.25) -> np.ndarray:
     """
-    Create a configuration array for the NMS model.
+    Class-agnostic non-maximum suppression on the raw output of one image.
 
+    This has the same behaviour as the ``NonMaxSuppression`` operator (with ``center_point_box=1``) used by the
+    original NudeNet NMS model: boxes are ranked by their max class score, and only the boxes with score
+    above ``score_threshold`` are kept, a box is suppressed when its IoU with a selected box is over
+    ``iou_threshold``, and at most ``topk`` boxes are selected.
+
+    :param output: Raw output of one image with shape ``(4 + classes, boxes)``.
     :param topk: The maximum number of detections to keep (default: 100).
     :param iou_threshold: The IoU threshold for NMS (default: 0.45).
     :param score_threshold: The score threshold for detections (default: 0.25).
-    :return: A numpy array containing the configuration parameters.
+    :return: Selected rows with shape ``(K, 4 + classes)``, in descending order of score.
     """
-    return np.array([topk, iou_threshold, score_threshold]).astype(np.float32)
+    rows = output.transpose(1, 0)
+    scores = rows[:, 4:].max(axis=1)
+    candidates = np.where(scores > score_threshold)[0]
+    candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+
+    cx, cy, w, h = rows[candidates, 0], rows[candidates, 1], rows[candidates, 2], rows[candidates, 3]
+    x0, y0, x1, y1 = cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2
+    areas = (x1 - x0) * (y1 - y0)
+
+    keep = []
+    order = np.arange(candidates.shape[0])
+    while order.size > 0 and len(keep) < topk:
+        i = order[0]
+        keep.append(i)
+        others = order[1:]
+        inter = np.maximum(0.0, np.minimum(x1[i], x1[others]) - np.maximum(x0[i], x0[others])) * \
+            np.maximum(0.0, np.minimum(y1[i], y1[others]) - np.maximum(y0[i], y0[others]))
+        union = areas[i] + areas[others] - inter
+        iou = np.where(union > 0, inter / np.where(union > 0, union, 1.0), 0.0)
+        order = others[iou <= iou_threshold]
+
+    return rows[candidates[keep]]
 
 
 def _nn_postprocess(selected, global_ratio: float):
     """
     Postprocess the model output to generate bounding boxes and labels.
 
-    :param selected: The output from the NMS model.
+    :param selected: The rows selected by NMS, with shape ``(K, 4 + classes)``.
     :param global_ratio: The scaling ratio to apply to the bounding boxes.
     :return: A list of tuples, each containing a bounding box, label, and confidence score.
     """
-    bboxes = []
-    num_boxes = selected.shape[0]
-    for idx in range(num_boxes):
-        data = selected[idx, :]
-
-        scores = data[4:]
-        score = np.max(scores)
-        label = np.argmax(scores)
+    scores = selected[:, 4:]
+    labels = scores.argmax(axis=1)
+    max_scores = scores.max(axis=1)
 
-        box = data[:4] * global_ratio
-        x = (box[0] - 0.5 * box[2]).item()
-        y = (box[1] - 0.5 * box[3]).item()
-        w = box[2].item()
-        h = box[3].item()
+    boxes = selected[:, :4] * global_ratio
+    xy = (boxes[:, :2] - 0.5 * boxes[:, 2:4]).astype(np.float64)
+    wh = boxes[:, 2:4].astype(np.float64)
+    xyxy = np.concatenate([xy, xy + wh], axis=1)
 
-        bboxes.append(((x, y, x + w, y + h), _LABELS[label], score.item()))
-
-    return bboxes
+    return [
+        (tuple(box), _LABELS[label], score)
+        for box, label, score in zip(xyxy.tolist(), labels.tolist(), max_scores.tolist())
+    ]
 
 
 _LABELS = [
@@ -217,6 +253,49 @@ _LABELS = [
 ]
 
 
+def detect_with_nudenet_batch(images: List[ImageTyping], topk: int = 100,
+                              iou_threshold: float = 0.45, score_threshold: float = 0.25, batch_size: int = 16) \
+        -> List[List[Tuple[Tuple[int, int, int, int], str, float]]]:
+    """
+    Detect nudity in a batch of images using the NudeNet model.
+
+    The images are padded and resized into one tensor, and run through the YOLO model in batches.
+    Non-maximum suppression and postprocessing are done with numpy array operations.
+
+    :param images: The input images to analyze.
+    :param topk: The maximum number of detections to keep for each image (default: 100).
+    :param iou_threshold: The IoU threshold for NMS (default: 0.45).
+    :param score_threshold: The score threshold for detections (default: 0.25).
+    :param batch_size: Number of images in one model run (default: 16).
+    :return: A list of detection results, one for each image in the same order as ``images``,
+        see :func:`detect_with_nudenet` for the format.
+
+    Examples::
+        >>> from imgutils.detect import detect_with_nudenet_batch
+        >>>
+        >>> results = detect_with_nudenet_batch(['nude_girl.png', 'genshin_post.jpg'])
+        >>> len(results)
+        2
+        >>> [(label, round(score, 4)) for _, label, score in results[0][:2]]
+        [('FEMALE_BREAST_EXPOSED', 0.8328), ('FEMALE_BREAST_EXPOSED', 0.8058)]
+    """
+    _check_compatibility()
+    results = []
+    for i in range(0, len(images), batch_size):
+        inputs, ratios = [], []
+        for image in images[i:i + batch_size]:
+            input_, global_ratio = _nn_preprocessing(image, model_size=320)
+            inputs.append(input_)
+            ratios.append(global_ratio)
+
+        output0 = _nn_batch_run(np.stack(inputs))
+        for output, global_ratio in zip(output0, ratios):
+            selected = _nn_nms(output, topk=topk, iou_threshold=iou_threshold, score_threshold=score_threshold)
+            results.append(_nn_postprocess(selected, global_ratio=global_ratio))
+
+    return results
+
+
 def detect_with_nudenet(image: ImageTyping, topk: int = 100,
                         iou_threshold: float = 0.45, score_threshold: float = 0.25) \
         -> List[Tuple[Tuple[int, int, int, int], str, float]]:
@@ -232,10 +311,13 @@ def detect_with_nudenet(image: ImageTyping, topk: int = 100,
              - A bounding box as (x1, y1, x2, y2)
              - A label string
              - A confidence score
+
+    .. note::
+        To detect many images at once, use :func:`detect_with_nudenet_batch` for better throughput.
     """
-    _check_compatibility()
-    input_, global_ratio = _nn_preprocessing(image, model_size=320)
-    config = _make_np_config(topk, iou_threshold, score_threshold)
-    output0, = _open_nudenet_yolo().run(['output0'], {'images': input_})
-    selected, = _open_nudenet_nms().run(['selected'], {'detection': output0, 'config': config})
-    return _nn_postprocess(selected[0], global_ratio=global_ratio)
+    return detect_with_nudenet_batch(
+        images=[image],
+        topk=topk,
+        iou_threshold=iou_threshold,
+        score_threshold=score_threshold,
+    )[0]
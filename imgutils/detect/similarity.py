@@ -9,6 +9,7 @@ offers different modes for aggregating similarity scores.
 Key components:
 
 - calculate_iou: Computes IoU between two bounding boxes
+- bboxes_iou_matrix: Computes pairwise IoU between two lists of bounding boxes in a vectorized way
 - bboxes_similarity: Calculates similarities between two lists of bounding boxes
 - detection_similarity: Compares two lists of detections, considering both bounding boxes and labels
 
@@ -20,7 +21,8 @@ from typing import List, Literal, Union
 
 import numpy as np
 
-from .base import BBoxTyping, BBoxWithScoreAndLabel
+from .base import BBoxTyping
+from .detections import DetectionsTyping, _detection_columns
 
 
 def calculate_iou(box1: BBoxTyping, box2: BBoxTyping) -> float:
@@ -57,6 +59,43 @@ def calculate_iou(box1: BBoxTyping, box2: BBoxTyping) -> float:
     return float(iou)
 
 
+def bboxes_iou_matrix(bboxes1: Union[List[BBoxTyping], np.ndarray],
+                      bboxes2: Union[List[BBoxTyping], np.ndarray]) -> np.ndarray:
+    """
+    Calculate the pairwise Intersection over Union (IoU) between two lists of bounding boxes.
+
+    :param bboxes1: First list of bounding boxes, or an array with shape ``(N, 4)``.
+    :type bboxes1: Union[List[BBoxTyping], np.ndarray]
+    :param bboxes2: Second list of bounding boxes, or an array with shape ``(M, 4)``.
+    :type bboxes2: Union[List[BBoxTyping], np.ndarray]
+    :return: IoU matrix with shape ``(N, M)``, the value at ``[i, j]`` is the IoU between
+        ``bboxes1[i]`` and ``bboxes2[j]``.
+    :rtype: np.ndarray
+
+    This function gives the same values as :func:`calculate_iou`, but all the pairs are calculated
+    at once with numpy broadcasting, so it can be used on large amounts of boxes.
+
+    Example::
+        >>> bboxes1 = [(0, 0, 2, 2), (3, 3, 5, 5)]
+        >>> bboxes2 = [(1, 1, 3, 3), (4, 4, 6, 6), (0, 0, 2, 2)]
+        >>> bboxes_iou_matrix(bboxes1, bboxes2)
+        array([[0.14285712, 0.        , 0.99999975],
+               [0.        , 0.14285712, 0.        ]])
+    """
+    bboxes1 = np.asarray(bboxes1, dtype=np.float64).reshape(-1, 4)
+    bboxes2 = np.asarray(bboxes2, dtype=np.float64).reshape(-1, 4)
+    x1 = np.maximum(bboxes1[:, None, 0], bboxes2[None, :, 0])
+    y1 = np.maximum(bboxes1[:, None, 1], bboxes2[None, :, 1])
+    x2 = np.minimum(bboxes1[:, None, 2], bboxes2[None, :, 2])
+    y2 = np.minimum(bboxes1[:, None, 3], bboxes2[None, :, 3])
+
+    intersection = np.maximum(x2 - x1, 0.0) * np.maximum(y2 - y1, 0.0)
+    area1 = (bboxes1[:, 2] - bboxes1[:, 0]) * (bboxes1[:, 3] - bboxes1[:, 1])
+    area2 = (bboxes2[:, 2] - bboxes2[:, 0]) * (bboxes2[:, 3] - bboxes2[:, 1])
+
+    return intersection / (area1[:, None] + area2[None, :] - intersection + 1e-6)
+
+
 def bboxes_similarity(bboxes1: List[BBoxTyping], bboxes2: List[BBoxTyping],
                       mode: Literal['max', 'mean', 'raw'] = 'mean') -> Union[float, List[float]]:
     """
@@ -89,11 +128,7 @@ def bboxes_similarity(bboxes1: List[BBoxTyping], bboxes2: List[BBoxTyping],
     if len(bboxes1) != len(bboxes2):
         raise ValueError(f'Length of bboxes lists not match - {len(bboxes1)} vs {len(bboxes2)}.')
 
-    n = len(bboxes1)
-    iou_matrix = np.zeros((n, n))
-    for i in range(n):
-        for j in range(n):
-            iou_matrix[i, j] = calculate_iou(bboxes1[i], bboxes2[j])
+    iou_matrix = bboxes_iou_matrix(bboxes1, bboxes2)
 
     # import here for faster launching speed
     from scipy.optimize import linear_sum_assignment
@@ -109,15 +144,17 @@ def bboxes_similarity(bboxes1: List[BBoxTyping], bboxes2: List[BBoxTyping],
         raise ValueError(f'Unknown similarity mode for bboxes - {mode!r}.')
 
 
-def detection_similarity(detect1: List[BBoxWithScoreAndLabel], detect2: List[BBoxWithScoreAndLabel],
+def detection_similarity(detect1: DetectionsTyping, detect2: DetectionsTyping,
                          mode: Literal['max', 'mean', 'raw'] = 'mean') -> Union[float, List[float]]:
     """
     Calculate the similarity between two lists of detections, considering both bounding boxes and labels.
 
     :param detect1: First list of detections, each containing a bounding box, label, and score.
-    :type detect1: List[BBoxWithScoreAndLabel]
+        :class:`imgutils.detect.detections.Detections` object is also supported.
+    :type detect1: Union[Detections, List[BBoxWithScoreAndLabel]]
     :param detect2: Second list of detections, each containing a bounding box, label, and score.
-    :type detect2: List[BBoxWithScoreAndLabel]
+        :class:`imgutils.detect.detections.Detections` object is also supported.
+    :type detect2: Union[Detections, List[BBoxWithScoreAndLabel]]
     :param mode: The mode for calculating similarity. Options are 'max', 'mean', or 'raw'. Defaults to 'mean'.
     :type mode: Literal['max', 'mean', 'raw']
     :return: The similarity score or list of scores, depending on the mode.
@@ -140,11 +177,14 @@ def detection_similarity(detect1: List[BBoxWithScoreAndLabel], detect2: List[BBo
         >>> print(f"Mean detection similarity: {similarity:.4f}")
         Mean detection similarity: 0.1429
     """
-    labels = sorted({*(l for _, l, _ in detect1), *(l for _, l, _ in detect2)})
+    boxes1, labels1, _ = _detection_columns(detect1)
+    boxes2, labels2, _ = _detection_columns(detect2)
+    labels1, labels2 = np.array(labels1, dtype=object), np.array(labels2, dtype=object)
+    labels = sorted({*labels1.tolist(), *labels2.tolist()})
     sims = []
     for current_label in labels:
-        bboxes1 = [bbox for bbox, label, _ in detect1 if label == current_label]
-        bboxes2 = [bbox for bbox, label, _ in detect2 if label == current_label]
+        bboxes1 = boxes1[labels1 == current_label]
+        bboxes2 = boxes2[labels2 == current_label]
 
         if len(bboxes1) != len(bboxes2):
             raise ValueError(f'Length of bboxes not match on label {current_label!r}'
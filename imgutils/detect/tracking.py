@@ -0,0 +1,385 @@
+"""
+Overview:
+    Temporal tracking of detections over video frames and other frame sequences.
+
+    Running a detector such as :func:`imgutils.detect.face.detect_faces` on every frame of an anime video is
+    wasteful, because the boxes barely move between adjacent frames. :class:`DetectionTracker` only runs the full
+    detection on keyframes, and propagates the boxes on the frames in between with a lightweight
+    constant-velocity Kalman filter. Full detection is triggered again when
+
+    - the keyframe interval is reached,
+    - a scene change is found (cheap color histogram and PSNR difference between thumbnails of adjacent frames),
+    - a track is lost (its predicted box leaves the frame, or the content inside it changes too much).
+
+    Each tracked detection carries a stable track id, so downstream processing (e.g. CCIP on character crops)
+    can be done per track instead of per frame.
+
+    .. note::
+        Any callable which maps an image to a list of ``((x0, y0, x1, y1), label, score)`` can be used as detector,
+        e.g. :func:`imgutils.detect.face.detect_faces`, :func:`imgutils.detect.person.detect_person`,
+        or a :class:`imgutils.generic.yolo.YOLOModel` bound with :func:`functools.partial`.
+"""
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .base import BBoxWithScoreAndLabel
+from .similarity import bboxes_iou_matrix
+from ..data import ImageTyping, load_image
+
+TrackedDetection = Tuple[int, Tuple[int, int, int, int], str, float]
+DetectorTyping = Callable[[Image.Image], List[BBoxWithScoreAndLabel]]
+
+
+def _frame_thumbnail(image: Image.Image, size: int = 64) -> np.ndarray:
+    """
+    Create a small RGB thumbnail of the frame, used for cheap scene change detection.
+
+    :param image: Frame image in RGB mode.
+    :param size: Size of the thumbnail. Default is ``64``.
+    :return: Thumbnail array with shape ``(size, size, 3)`` and dtype ``float32`` in range ``[0, 1]``.
+    """
+    return np.asarray(image.resize((size, size), resample=Image.BILINEAR), dtype=np.float32) / 255.0
+
+
+def _histogram_difference(thumb1: np.ndarray, thumb2: np.ndarray, bins: int = 16) -> float:
+    """
+    Difference of per-channel color histograms of two thumbnails.
+
+    :param thumb1: First thumbnail.
+    :param thumb2: Second thumbnail.
+    :param bins: Number of bins for each channel. Default is ``16``.
+    :return: Half of the L1 distance between the normalized histograms, in range ``[0, 1]``.
+    """
+    diffs = []
+    for c in range(thumb1.shape[-1]):
+        h1, _ = np.histogram(thumb1[..., c], bins=bins, range=(0.0, 1.0))
+        h2, _ = np.histogram(thumb2[..., c], bins=bins, range=(0.0, 1.0))
+        diffs.append(np.abs(h1 / h1.sum() - h2 / h2.sum()).sum() / 2.0)
+    return float(np.mean(diffs))
+
+
+def _thumbnail_psnr(thumb1: np.ndarray, thumb2: np.ndarray) -> float:
+    """
+    PSNR between two thumbnails, see :func:`imgutils.metrics.psnr`.
+
+    :param thumb1: First thumbnail.
+    :param thumb2: Second thumbnail.
+    :return: PSNR value, ``inf`` when the thumbnails are identical.
+    """
+    mse = float(np.mean((thumb1 - thumb2) ** 2))
+    if mse <= 0.0:
+        return float('inf')
+    return float(10 * np.log10(1. / mse))
+
+
+def _crop_patch(gray: np.ndarray, bbox, size: int = 16) -> Optional[np.ndarray]:
+    """
+    Crop the region of the box from a grayscale frame and resize it into a small patch.
+
+    :param gray: Grayscale frame array with shape ``(H, W)``, dtype ``uint8``.
+    :param bbox: Box in ``(x0, y0, x1, y1)`` format.
+    :param size: Size of the patch. Default is ``16``.
+    :return: Patch array in range ``[0, 1]``, or ``None`` when the box has no visible area.
+    """
+    height, width = gray.shape
+    x0, y0, x1, y1 = bbox
+    x0, x1 = int(np.clip(round(x0), 0, width)), int(np.clip(round(x1), 0, width))
+    y0, y1 = int(np.clip(round(y0), 0, height)), int(np.clip(round(y1), 0, height))
+    if x1 - x0 < 2 or y1 - y0 < 2:
+        return None
+    patch = Image.fromarray(gray[y0:y1, x0:x1]).resize((size, size), resample=Image.BILINEAR)
+    return np.asarray(patch, dtype=np.float32) / 255.0
+
+
+class _KalmanBoxTrack:
+    """
+    A single track with a constant-velocity Kalman filter over the box center and size.
+
+    The state is ``(cx, cy, w, h, vcx, vcy, vw, vh)`` and the measurement is ``(cx, cy, w, h)``.
+    """
+
+    _F = np.eye(8) + np.eye(8, k=4)
+    _H = np.eye(4, 8)
+
+    def __init__(self, track_id: int, bbox, label: str, score: float,
+                 pos_noise: float = 0.05, vel_noise: float = 0.00625):
+        self.track_id = track_id
+        self.label = label
+        self.score = score
+        self.hits = 1
+        self.age = 0
+        self.template = None
+
+        cx, cy, w, h = self._to_cxcywh(bbox)
+        self.x = np.array([cx, cy, w, h, 0.0, 0.0, 0.0, 0.0], dtype=np.float64)
+        self._pos_noise = pos_noise
+        self._vel_noise = vel_noise
+        scale = max(w, h)
+        self.P = np.diag(np.square([
+            2 * pos_noise * scale, 2 * pos_noise * scale, 2 * pos_noise * scale, 2 * pos_noise * scale,
+            10 * vel_noise * scale, 10 * vel_noise * scale, 10 * vel_noise * scale, 10 * vel_noise * scale,
+        ]))
+
+    @staticmethod
+    def _to_cxcywh(bbox):
+        x0, y0, x1, y1 = bbox
+        return (x0 + x1) / 2.0, (y0 + y1) / 2.0, x1 - x0, y1 - y0
+
+    @property
+    def bbox(self) -> Tuple[float, float, float, float]:
+        cx, cy, w, h = self.x[:4]
+        w, h = max(w, 0.0), max(h, 0.0)
+        return cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2
+
+    def predict(self):
+        scale = max(self.x[2], self.x[3], 1.0)
+        q = np.square([
+            self._pos_noise * scale, self._pos_noise * scale, self._pos_noise * scale, self._pos_noise * scale,
+            self._vel_noise * scale, self._vel_noise * scale, self._vel_noise * scale, self._vel_noise * scale,
+        ])
+        self.x = self._F @ self.x
+        self.P = self._F @ self.P @ self._F.T + np.diag(q)
+        self.age += 1
+
+    def update(self, bbox, score: float):
+        scale = max(self.x[2], self.x[3], 1.0)
+        r = np.diag(np.square([self._pos_noise * scale] * 4))
+        z = np.array(self._to_cxcywh(bbox), dtype=np.float64)
+        y = z - self._H @ self.x
+        s = self._H @ self.P @ self._H.T + r
+        k = self.P @ self._H.T @ np.linalg.inv(s)
+        self.x = self.x + k @ y
+        self.P = (np.eye(8) - k @ self._H) @ self.P
+        self.score = score
+        self.hits += 1
+        self.age = 0
+
+
+class DetectionTracker:
+    """
+    Track detections over a sequence of frames, running the full detector only when necessary.
+
+    :param detector: Detection function, which maps an image to a list of ``((x0, y0, x1, y1), label, score)``.
+    :type detector: Callable[[Image.Image], List[BBoxWithScoreAndLabel]]
+    :param keyframe_interval: Maximum number of frames between two full detections. Default is ``8``.
+        Set it to ``1`` to detect on every frame (tracking ids are still assigned).
+    :type keyframe_interval: int
+    :param match_iou_threshold: Minimum IoU to associate a detection with an existing track. Default is ``0.3``.
+    :type match_iou_threshold: float
+    :param max_missed: Number of keyframes a track may stay unmatched before it is removed. Default is ``1``.
+    :type max_missed: int
+    :param scene_hist_threshold: Color histogram difference (in ``[0, 1]``) between adjacent frames
+        above which a scene change is assumed. Default is ``0.3``.
+    :type scene_hist_threshold: float
+    :param scene_psnr_threshold: PSNR between adjacent frame thumbnails below which a scene change is assumed.
+        Default is ``15.0``.
+    :type scene_psnr_threshold: float
+    :param appearance_threshold: Mean absolute difference (in ``[0, 1]``) between the content of a track's box on
+        the current frame and on its last keyframe above which the track is considered lost. Default is ``0.12``.
+    :type appearance_threshold: float
+    :param min_visible_ratio: Minimum ratio of a predicted box which must stay inside the frame, otherwise the
+        track is considered lost. Default is ``0.5``.
+    :type min_visible_ratio: float
+
+    Examples::
+        >>> from imgutils.detect import detect_faces
+        >>> from imgutils.detect.tracking import DetectionTracker
+        >>>
+        >>> tracker = DetectionTracker(detect_faces, keyframe_interval=10)
+        >>> for frame in frames:  # PIL images or paths of the video frames
+        ...     for track_id, bbox, label, score in tracker.update(frame):
+        ...         print(track_id, bbox, label, score)
+        >>> tracker.detect_count  # number of full detections performed
+        7
+    """
+
+    def __init__(self, detector: DetectorTyping, keyframe_interval: int = 8,
+                 match_iou_threshold: float = 0.3, max_missed: int = 1,
+                 scene_hist_threshold: float = 0.3, scene_psnr_threshold: float = 15.0,
+                 appearance_threshold: float = 0.12, min_visible_ratio: float = 0.5):
+        if keyframe_interval < 1:
+            raise ValueError(f'Keyframe interval should be no less than 1, but {keyframe_interval!r} found.')
+        self.detector = detector
+        self.keyframe_interval = keyframe_interval
+        self.match_iou_threshold = match_iou_threshold
+        self.max_missed = max_missed
+        self.scene_hist_threshold = scene_hist_threshold
+        self.scene_psnr_threshold = scene_psnr_threshold
+        self.appearance_threshold = appearance_threshold
+        self.min_visible_ratio = min_visible_ratio
+
+        self._tracks: List[_KalmanBoxTrack] = []
+        self._missed = {}
+        self._next_id = 0
+        self._last_thumbnail = None
+        self._since_keyframe = 0
+        self.frame_count = 0
+        self.detect_count = 0
+        self.last_is_keyframe = False
+
+    def reset(self):
+        """
+        Reset the tracker, all the tracks will be dropped and the track ids will start from ``0`` again.
+        """
+        self._tracks.clear()
+        self._missed.clear()
+        self._next_id = 0
+        self._last_thumbnail = None
+        self._since_keyframe = 0
+        self.frame_count = 0
+        self.detect_count = 0
+        self.last_is_keyframe = False
+
+    def _is_scene_changed(self, thumbnail: np.ndarray) -> bool:
+        if self._last_thumbnail is None:
+            return True
+        if _histogram_difference(self._last_thumbnail, thumbnail) > self.scene_hist_threshold:
+            return True
+        return _thumbnail_psnr(self._last_thumbnail, thumbnail) < self.scene_psnr_threshold
+
+    def _is_track_lost(self, track: _KalmanBoxTrack, gray: np.ndarray) -> bool:
+        height, width = gray.shape
+        x0, y0, x1, y1 = track.bbox
+        area = max(x1 - x0, 0.0) * max(y1 - y0, 0.0)
+        visible = max(min(x1, width) - max(x0, 0), 0.0) * max(min(y1, height) - max(y0, 0), 0.0)
+        if area <= 0.0 or visible / area < self.min_visible_ratio:
+            return True
+
+        if track.template is not None:
+            patch = _crop_patch(gray, track.bbox)
+            if patch is None or float(np.abs(patch - track.template).mean()) > self.appearance_threshold:
+                return True
+        return False
+
+    def _associate(self, detections: List[BBoxWithScoreAndLabel]):
+        if not self._tracks or not detections:
+            return [], list(range(len(self._tracks))), list(range(len(detections)))
+
+        track_boxes = np.array([track.bbox for track in self._tracks], dtype=np.float64)
+        det_boxes = np.array([bbox for bbox, _, _ in detections], dtype=np.float64)
+        iou = bboxes_iou_matrix(track_boxes, det_boxes)
+        label_mismatch = np.array([[track.label != label for _, label, _ in detections] for track in self._tracks])
+        iou[label_mismatch] = 0.0
+
+        # import here for faster launching speed
+        from scipy.optimize import linear_sum_assignment
+        rows, cols = linear_sum_assignment(-iou)
+        matches = [(r, c) for r, c in zip(rows, cols) if iou[r, c] >= self.match_iou_threshold]
+        matched_tracks = {r for r, _ in matches}
+        matched_dets = {c for _, c in matches}
+        unmatched_tracks = [i for i in range(len(self._tracks)) if i not in matched_tracks]
+        unmatched_dets = [j for j in range(len(detections)) if j not in matched_dets]
+        return matches, unmatched_tracks, unmatched_dets
+
+    def _detect(self, image: Image.Image, gray: np.ndarray, scene_changed: bool):
+        detections = self.detector(image)
+        self.detect_count += 1
+        if scene_changed:
+            self._tracks.clear()
+            self._missed.clear()
+
+        matches, unmatched_tracks, unmatched_dets = self._associate(detections)
+        for ti, di in matches:
+            bbox, _, score = detections[di]
+            self._tracks[ti].update(bbox, score)
+            self._missed[self._tracks[ti].track_id] = 0
+
+        alive = []
+        for ti, track in enumerate(self._tracks):
+            if ti in unmatched_tracks:
+                self._missed[track.track_id] = self._missed.get(track.track_id, 0) + 1
+                if self._missed[track.track_id] > self.max_missed:
+                    del self._missed[track.track_id]
+                    continue
+            alive.append(track)
+
+        for di in unmatched_dets:
+            bbox, label, score = detections[di]
+            track = _KalmanBoxTrack(self._next_id, bbox, label, score)
+            self._missed[track.track_id] = 0
+            self._next_id += 1
+            alive.append(track)
+
+        for track in alive:
+            track.template = _crop_patch(gray, track.bbox)
+        self._tracks = alive
+
+    def _current(self, width: int, height: int) -> List[TrackedDetection]:
+        retval = []
+        for track in self._tracks:
+            if self._missed.get(track.track_id, 0) > 0:
+                continue
+            x0, y0, x1, y1 = track.bbox
+            x0, x1 = int(np.clip(round(x0), 0, width)), int(np.clip(round(x1), 0, width))
+            y0, y1 = int(np.clip(round(y0), 0, height)), int(np.clip(round(y1), 0, height))
+            retval.append((track.track_id, (x0, y0, x1, y1), track.label, float(track.score)))
+        return retval
+
+    def update(self, image: ImageTyping) -> List[TrackedDetection]:
+        """
+        Feed the next frame into the tracker.
+
+        :param image: The next frame.
+        :type image: ImageTyping
+        :return: Tracked detections on this frame, each is ``(track_id, (x0, y0, x1, y1), label, score)``.
+            The score is the one of the latest full detection of this track.
+        :rtype: List[Tuple[int, Tuple[int, int, int, int], str, float]]
+
+        .. note::
+            Whether this frame has been fully detected is recorded in :attr:`last_is_keyframe`.
+        """
+        image = load_image(image, mode='RGB', force_background='white')
+        thumbnail = _frame_thumbnail(image)
+        gray = np.asarray(image.convert('L'))
+        scene_changed = self._is_scene_changed(thumbnail)
+        self._last_thumbnail = thumbnail
+
+        for track in self._tracks:
+            track.predict()
+        need_detect = scene_changed or self._since_keyframe + 1 >= self.keyframe_interval or \
+            any(self._is_track_lost(track, gray) for track in self._tracks if not self._missed.get(track.track_id))
+
+        self.frame_count += 1
+        if need_detect:
+            self._detect(image, gray, scene_changed)
+            self._since_keyframe = 0
+        else:
+            self._since_keyframe += 1
+        self.last_is_keyframe = need_detect
+        return self._current(image.width, image.height)
+
+
+def track_detections(frames: Iterable[ImageTyping], detector: DetectorTyping, **kwargs) \
+        -> Iterator[List[TrackedDetection]]:
+    """
+    Track detections over a sequence of frames.
+
+    This is a generator wrapper of :class:`DetectionTracker`, frames are processed lazily, so it can be used on
+    long videos without loading all the frames into memory.
+
+    :param frames: Iterable of frames.
+    :type frames: Iterable[ImageTyping]
+    :param detector: Detection function, which maps an image to a list of ``((x0, y0, x1, y1), label, score)``.
+    :type detector: Callable[[Image.Image], List[BBoxWithScoreAndLabel]]
+    :param kwargs: Other arguments of :class:`DetectionTracker`.
+    :return: Iterator of tracked detections of each frame,
+        each detection is ``(track_id, (x0, y0, x1, y1), label, score)``.
+    :rtype: Iterator[List[Tuple[int, Tuple[int, int, int, int], str, float]]]
+
+    Examples::
+        >>> from functools import partial
+        >>> from imgutils.detect import detect_person
+        >>> from imgutils.detect.tracking import track_detections
+        >>>
+        >>> detector = partial(detect_person, level='n')
+        >>> for i, tracked in enumerate(track_detections(frames, detector, keyframe_interval=12)):
+        ...     print(i, tracked)
+        0 [(0, (120, 35, 480, 700), 'person', 0.91)]
+        1 [(0, (122, 35, 482, 700), 'person', 0.91)]
+        ...
+    """
+    tracker = DetectionTracker(detector, **kwargs)
+    for frame in frames:
+        yield tracker.update(frame)
@@ -4,12 +4,13 @@ Overview:
 
     See :func:`imgutils.detect.head.detect_heads` and :func:`imgutils.detect.person.detect_person` for examples.
 """
-from typing import List, Tuple, Optional
+from typing import List, Optional
 
 from PIL import ImageFont, ImageDraw
 from hbutils.color import rnd_colors, Color
 
 from imgutils.data import ImageTyping, load_image
+from .detections import Detections, DetectionsTyping, _detection_columns
 
 
 def _try_get_font_from_matplotlib(fp=None, fontsize: int = 12):
@@ -25,7 +26,7 @@ def _try_get_font_from_matplotlib(fp=None, fontsize: int = 12):
         return ImageFont.truetype(font, fontsize)
 
 
-def detection_visualize(image: ImageTyping, detection: List[Tuple[Tuple[float, float, float, float], str, float]],
+def detection_visualize(image: ImageTyping, detection: DetectionsTyping,
                         labels: Optional[List[str]] = None, text_padding: int = 6, fontsize: int = 12,
                         fp=None, no_label: bool = False):
     """
@@ -35,8 +36,10 @@ def detection_visualize(image: ImageTyping, detection: List[Tuple[Tuple[float, f
     :param image: Image be detected.
     :param detection: The detection results list, each item includes the detected area `(x0, y0, x1, y1)`,
         the target type (always `head`) and the target confidence score.
+        :class:`imgutils.detect.detections.Detections` object is also supported.
     :param labels: An array of known labels. If not provided, the labels will be automatically detected
-        from the given ``detection``.
+        from the given ``detection`` (the label table will be used for
+        :class:`imgutils.detect.detections.Detections`).
     :param text_padding: Text padding of the labels. Default is ``6``.
     :param fontsize: Font size of the labels. At runtime, an attempt will be made to retrieve the font used
         for rendering from `matplotlib`. Therefore, if `matplotlib` is not installed, only the default pixel font
@@ -53,10 +56,15 @@ def detection_visualize(image: ImageTyping, detection: List[Tuple[Tuple[float, f
     draw = ImageDraw.Draw(visual_image, mode='RGBA')
     font = _try_get_font_from_matplotlib(fp, fontsize) or ImageFont.load_default()
 
-    labels = sorted(labels or {label for _, label, _ in detection})
+    boxes, box_labels, scores = _detection_columns(detection)
+    if isinstance(detection, Detections):
+        labels = sorted(labels or detection.labels)
+    else:
+        labels = sorted(labels or set(box_labels))
     _colors = list(map(str, rnd_colors(len(labels))))
     _color_map = dict(zip(labels, _colors))
-    for _, ((xmin, ymin, xmax, ymax), label, score) in sorted(enumerate(detection), key=lambda x: (x[1][2], x[0])):
+    for i in sorted(range(len(box_labels)), key=lambda x: (scores[x], x)):
+        (xmin, ymin, xmax, ymax), label, score = boxes[i].tolist(), box_labels[i], float(scores[i])
         box_color = _color_map[label]
         draw.rectangle((xmin, ymin, xmax, ymax), outline=box_color, width=2)
 
@@ -40,6 +40,8 @@ __all__ = [
     'ClassifyModel',
     'classify_predict_score',
     'classify_predict',
+    'classify_predict_score_batch',
+    'classify_predict_batch',
 ]
 
 
@@ -197,7 +199,7 @@ class ClassifyModel:
                 self.repo_id,
                 f'{model_name}/model.onnx',
                 token=self._get_hf_token(),
-            ))
+            ), batchable=True)
         return self._models[model_name]
 
     def _open_label(self, model_name: str) -> List[str]:
@@ -224,6 +226,46 @@ class ClassifyModel:
                 self._labels[model_name] = json.load(f)['labels']
         return self._labels[model_name]
 
+    def _get_input_size(self, model_name: str) -> Tuple[int, int]:
+        """
+        Get the input size of the specified model.
+
+        :param model_name: The name of the model.
+        :type model_name: str
+
+        :return: The input size as ``(width, height)``, ``(384, 384)`` for models with dynamic input size.
+        :rtype: Tuple[int, int]
+
+        :raises RuntimeError: If the model's input is not a 3-channel image.
+        """
+        model = self._open_model(model_name)
+        batch, channels, height, width = model.get_inputs()[0].shape
+        if channels != 3:
+            raise RuntimeError(f'Model {model_name!r} required {[batch, channels, height, width]!r}, '
+                               f'channels not 3.')  # pragma: no cover
+
+        if isinstance(height, int) and isinstance(width, int):
+            return width, height
+        else:
+            return 384, 384
+
+    def _preprocess(self, image: ImageTyping, model_name: str) -> np.ndarray:
+        """
+        Load and encode the image to the input size of the specified model.
+
+        :param image: The input image to classify.
+        :type image: ImageTyping
+        :param model_name: The name of the model to use for prediction.
+        :type model_name: str
+
+        :return: The encoded image in CHW format, without batch dimension.
+        :rtype: np.ndarray
+
+        :raises RuntimeError: If the model's input shape is incompatible with the image.
+        """
+        image = load_image(image, force_background='white', mode='RGB')
+        return _img_encode(image, size=self._get_input_size(model_name))
+
     def _raw_predict(self, image: ImageTyping, model_name: str):
         """
         Make a raw prediction on the specified image using the specified model.
@@ -240,20 +282,75 @@ class ClassifyModel:
 
         :raises RuntimeError: If the model's input shape is incompatible with the image.
         """
-        image = load_image(image, force_background='white', mode='RGB')
-        model = self._open_model(model_name)
-        batch, channels, height, width = model.get_inputs()[0].shape
-        if channels != 3:
-            raise RuntimeError(f'Model {model_name!r} required {[batch, channels, height, width]!r}, '
-                               f'channels not 3.')  # pragma: no cover
-
-        if isinstance(height, int) and isinstance(width, int):
-            input_ = _img_encode(image, size=(width, height))[None, ...]
-        else:
-            input_ = _img_encode(image)[None, ...]
+        input_ = self._preprocess(image, model_name)[None, ...]
         output, = self._open_model(model_name).run(['output'], {'input': input_})
         return output
 
+    def _raw_predict_batch(self, images: List[ImageTyping], model_name: str, batch_size: int = 16) -> np.ndarray:
+        """
+        Make raw predictions on a list of images, chunked into batches.
+
+        When the batch dimension of the model is fixed (e.g. exported with batch size 1), that size
+        is used instead of ``batch_size``, and the last chunk is zero-padded.
+
+        :param images: The input images to classify.
+        :type images: List[ImageTyping]
+        :param model_name: The name of the model to use for prediction.
+        :type model_name: str
+        :param batch_size: Maximum number of images in one model run.
+        :type batch_size: int
+
+        :return: The raw prediction output with shape ``(N, classes)``.
+        :rtype: np.ndarray
+        """
+        if batch_size < 1:
+            raise ValueError(f'Batch size should be no less than 1, but {batch_size!r} found.')
+
+        images = list(images)
+        fixed_batch = self._open_model(model_name).get_inputs()[0].shape[0]
+        if isinstance(fixed_batch, int) and fixed_batch > 0:
+            batch_size = fixed_batch
+
+        outputs = []
+        for i in range(0, len(images), batch_size):
+            input_ = np.stack([self._preprocess(image, model_name) for image in images[i:i + batch_size]])
+            outputs.append(self._run_batch(input_, model_name))
+
+        if outputs:
+            return np.concatenate(outputs)
+        else:
+            return np.zeros((0, len(self._open_label(model_name))), dtype=np.float32)
+
+    def _run_batch(self, input_: np.ndarray, model_name: str) -> np.ndarray:
+        """
+        Run the model on a batch of encoded images.
+
+        When the batch dimension of the model is fixed, the batch is split (and zero-padded) to fit that size.
+
+        :param input_: Encoded images with shape ``(B, 3, H, W)``.
+        :type input_: np.ndarray
+        :param model_name: The name of the model to use for prediction.
+        :type model_name: str
+
+        :return: The raw prediction output with shape ``(B, classes)``.
+        :rtype: np.ndarray
+        """
+        model = self._open_model(model_name)
+        fixed_batch = model.get_inputs()[0].shape[0]
+        if not isinstance(fixed_batch, int) or fixed_batch <= 0:
+            output, = model.run(['output'], {'input': input_})
+            return output.astype(np.float32)
+
+        outputs = []
+        for i in range(0, input_.shape[0], fixed_batch):
+            chunk = input_[i:i + fixed_batch]
+            n = chunk.shape[0]
+            if n < fixed_batch:
+                chunk = np.concatenate([chunk, np.zeros((fixed_batch - n, *chunk.shape[1:]), dtype=chunk.dtype)])
+            output, = model.run(['output'], {'input': chunk})
+            outputs.append(output[:n])
+        return np.concatenate(outputs).astype(np.float32)
+
     def predict_score(self, image: ImageTyping, model_name: str) -> Dict[str, float]:
         """
         Predict the scores for each class using the specified model.
@@ -296,6 +393,56 @@ class ClassifyModel:
         max_id = np.argmax(output)
         return self._open_label(model_name)[max_id], output[max_id].item()
 
+    def predict_score_batch(self, images: List[ImageTyping], model_name: str,
+                            batch_size: int = 16) -> Tuple[np.ndarray, List[str]]:
+        """
+        Predict the class scores of a list of images in batches.
+
+        :param images: The input images to classify.
+        :type images: List[ImageTyping]
+        :param model_name: The name of the model to use for prediction.
+        :type model_name: str
+        :param batch_size: Maximum number of images in one model run, default is ``16``.
+        :type batch_size: int
+
+        :return: A tuple of the float32 score matrix with shape ``(N, classes)``, and the list of class labels
+            corresponding to its columns.
+        :rtype: Tuple[np.ndarray, List[str]]
+
+        :raises ValueError: If the model name is invalid.
+        :raises RuntimeError: If there's an error during prediction.
+
+        Examples::
+            >>> model = ClassifyModel("username/repo_name")
+            >>> scores, labels = model.predict_score_batch(["1.jpg", "2.jpg", "3.jpg"], "model_name")
+            >>> scores.shape
+            (3, 4)
+        """
+        return self._raw_predict_batch(images, model_name, batch_size), list(self._open_label(model_name))
+
+    def predict_batch(self, images: List[ImageTyping], model_name: str,
+                      batch_size: int = 16) -> List[Tuple[str, float]]:
+        """
+        Predict the classes with the highest scores for a list of images in batches.
+
+        :param images: The input images to classify.
+        :type images: List[ImageTyping]
+        :param model_name: The name of the model to use for prediction.
+        :type model_name: str
+        :param batch_size: Maximum number of images in one model run, default is ``16``.
+        :type batch_size: int
+
+        :return: A list of tuples containing the predicted class label and its score, one for each image.
+        :rtype: List[Tuple[str, float]]
+
+        :raises ValueError: If the model name is invalid.
+        :raises RuntimeError: If there's an error during prediction.
+        """
+        scores, labels = self.predict_score_batch(images, model_name, batch_size)
+        max_ids = np.argmax(scores, axis=-1)
+        return [(labels[max_id], score.item()) for max_id, score in
+                zip(max_ids.tolist(), scores[np.arange(len(max_ids)), max_ids])]
+
     def clear(self):
         """
         Clear the cached models and labels.
@@ -467,3 +614,60 @@ def classify_predict(image: ImageTyping, repo_id: str, model_name: str,
     :raises RuntimeError: If there's an error during prediction.
     """
     return _open_models_for_repo_id(repo_id, hf_token=hf_token).predict(image, model_name)
+
+
+def classify_predict_score_batch(images: List[ImageTyping], repo_id: str, model_name: str,
+                                 hf_token: Optional[str] = None, batch_size: int = 16) \
+        -> Tuple[np.ndarray, List[str]]:
+    """
+    Predict the class scores of a list of images in batches using the specified model and repository.
+
+    This function is a convenience wrapper around ClassifyModel's predict_score_batch method.
+
+    :param images: The input images to classify.
+    :type images: List[ImageTyping]
+    :param repo_id: The repository ID containing the models.
+    :type repo_id: str
+    :param model_name: The name of the model to use for prediction.
+    :type model_name: str
+    :param hf_token: Optional Hugging Face authentication token.
+    :type hf_token: Optional[str]
+    :param batch_size: Maximum number of images in one model run, default is ``16``.
+    :type batch_size: int
+
+    :return: A tuple of the float32 score matrix with shape ``(N, classes)``, and the list of class labels.
+    :rtype: Tuple[np.ndarray, List[str]]
+
+    :raises ValueError: If the model name or repository ID is invalid.
+    :raises RuntimeError: If there's an error during prediction.
+    """
+    return _open_models_for_repo_id(repo_id, hf_token=hf_token) \
+        .predict_score_batch(images, model_name, batch_size=batch_size)
+
+
+def classify_predict_batch(images: List[ImageTyping], repo_id: str, model_name: str,
+                           hf_token: Optional[str] = None, batch_size: int = 16) -> List[Tuple[str, float]]:
+    """
+    Predict the classes with the highest scores for a list of images using the specified model and repository.
+
+    This function is a convenience wrapper around ClassifyModel's predict_batch method.
+
+    :param images: The input images to classify.
+    :type images: List[ImageTyping]
+    :param repo_id: The repository ID containing the models.
+    :type repo_id: str
+    :param model_name: The name of the model to use for prediction.
+    :type model_name: str
+    :param hf_token: Optional Hugging Face authentication token.
+    :type hf_token: Optional[str]
+    :param batch_size: Maximum number of images in one model run, default is ``16``.
+    :type batch_size: int
+
+    :return: A list of tuples containing the predicted class label and its score, one for each image.
+    :rtype: List[Tuple[str, float]]
+
+    :raises ValueError: If the model name or repository ID is invalid.
+    :raises RuntimeError: If there's an error during prediction.
+    """
+    return _open_models_for_repo_id(repo_id, hf_token=hf_token) \
+        .predict_batch(images, model_name, batch_size=batch_size)
@@ -532,7 +532,7 @@ class YOLOModel:
                 self.repo_id,
                 f'{model_name}/model.onnx',
                 token=self._get_hf_token(),
-            ))
+            ), batchable=True)
             model_metadata = model.get_modelmeta()
             if 'imgsz' in model_metadata.custom_metadata_map:
                 max_infer_size = max(json.loads(model_metadata.custom_metadata_map['imgsz']))
@@ -4,7 +4,10 @@ Overview:
 """
 from .aesthetic import *
 from .ccip import *
+from .ccip_gallery import *
+from .ccip_incremental import *
 from .dbaesthetic import *
+from .dedup import *
 from .laplacian import *
 from .lpips import *
 from .psnr_ import *
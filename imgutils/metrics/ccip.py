@@ -25,27 +25,32 @@ Overview:
         before performing any manual operations.
 """
 import json
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
 from typing import Literal, Union, List, Optional, Tuple
 
 import numpy as np
 from PIL import Image
 from huggingface_hub import hf_hub_download
+from scipy import sparse
 from sklearn.cluster import DBSCAN, OPTICS
 from tqdm.auto import tqdm
 
-from ..data import MultiImagesTyping, load_images, ImageTyping
+from ..data import MultiImagesTyping, load_images, ImageTyping, load_image
 from ..utils import open_onnx_model
 
 __all__ = [
     'ccip_extract_feature',
     'ccip_batch_extract_features',
+    'ccip_stream_extract_features',
 
     'ccip_default_threshold',
     'ccip_difference',
     'ccip_same',
     'ccip_batch_differences',
     'ccip_batch_same',
+    'ccip_cross_differences',
+    'ccip_cross_topk',
 
     'ccip_default_clustering_params',
     'ccip_clustering',
@@ -73,7 +78,7 @@ def _open_feat_model(model):
     return open_onnx_model(hf_hub_download(
         f'deepghs/ccip_onnx',
         f'{model}/model_feat.onnx',
-    ))
+    ), batchable=True)
 
 
 @lru_cache()
@@ -163,14 +168,143 @@ def ccip_batch_extract_features(images: MultiImagesTyping, size: int = 384, mode
     return output
 
 
+def ccip_stream_extract_features(images: MultiImagesTyping, size: int = 384, model: str = _DEFAULT_MODEL_NAMES,
+                                 batch_size: int = 32, workers: int = 4,
+                                 output: Union[None, str, np.ndarray] = None, silent: bool = False) -> np.ndarray:
+    """
+    Extracts the feature vectors of a large number of images, with bounded memory.
+
+    Unlike :func:`ccip_batch_extract_features`, which loads all the images and runs them in one batch,
+    the images are loaded and preprocessed by a thread pool in chunks of ``batch_size``, the next chunk is
+    prepared while the current one is running on the model, and the features are written into a preallocated
+    ``float32`` output. So only about two chunks of images are in memory at any time.
+
+    The output can be passed to :func:`ccip_clustering`, :func:`ccip_merge`, :func:`ccip_batch_differences`
+    and :func:`ccip_cross_differences` directly.
+
+    :param images: The input images from which to extract the feature vectors.
+    :type images: MultiImagesTyping
+
+    :param size: The size of the input image to be used for feature extraction. (default: ``384``)
+    :type size: int
+
+    :param model: The name of the model to use for feature extraction. (default: ``ccip-caformer-24-randaug-pruned``)
+                  The available model names are: ``ccip-caformer-24-randaug-pruned``,
+                  ``ccip-caformer-6-randaug-pruned_fp32``, ``ccip-caformer-5_fp32``.
+    :type model: str
+
+    :param batch_size: Number of images in each chunk. (default: ``32``)
+    :type batch_size: int
+
+    :param workers: Number of threads loading and preprocessing the images, ``0`` means loading them
+                    in the current thread. (default: ``4``)
+    :type workers: int
+
+    :param output: Where to write the features. ``None`` means a new array in memory, a ``str`` is the path of
+                   a new ``.npy`` file which is memory-mapped (can be opened with ``np.load(path, mmap_mode='r')``
+                   later), or a preallocated ``float32`` array with shape ``(N, dim)``. (default: ``None``)
+    :type output: Union[None, str, np.ndarray]
+
+    :param silent: Do not show the progress bar. (default: ``False``)
+    :type silent: bool
+
+    :return: The feature vectors of the input images, with shape ``(N, dim)``.
+    :rtype: numpy.ndarray
+
+    Examples::
+        >>> import glob
+        >>> import numpy as np
+        >>> from imgutils.metrics import ccip_stream_extract_features, ccip_clustering
+        >>>
+        >>> files = sorted(glob.glob('crops/*.jpg'))
+        >>> feats = ccip_stream_extract_features(files, batch_size=64, output='crops_feats.npy')
+        >>> feats.shape, feats.dtype
+        ((5000, 768), dtype('float32'))
+        >>>
+        >>> # load them later without extraction
+        >>> feats = np.load('crops_feats.npy', mmap_mode='r')
+        >>> labels = ccip_clustering(feats)
+    """
+    if batch_size < 1:
+        raise ValueError(f'Batch size should be no less than 1, but {batch_size!r} found.')
+    if not isinstance(images, (list, tuple)):
+        images = [images]
+
+    def _prepare(image):
+        return _preprocess_image(load_image(image, mode='RGB'), size=size)
+
+    def _submit(start):
+        chunk = images[start:start + batch_size]
+        if pool is None:
+            return [_prepare(image) for image in chunk]
+        else:
+            return [pool.submit(_prepare, image) for image in chunk]
+
+    def _collect(items):
+        if pool is None:
+            return np.stack(items).astype(np.float32)
+        else:
+            return np.stack([item.result() for item in items]).astype(np.float32)
+
+    retval = output if isinstance(output, np.ndarray) else None
+    pool = ThreadPoolExecutor(max_workers=workers) if workers > 0 else None
+    next_items = None
+    try:
+        with tqdm(total=len(images), desc='Extract features', disable=silent) as pbar:
+            starts = list(range(0, len(images), batch_size))
+            next_items = _submit(starts[0]) if starts else None
+            for i, start in enumerate(starts):
+                data = _collect(next_items)
+                # prepare the next chunk while running the model
+                next_items = _submit(starts[i + 1]) if i + 1 < len(starts) else None
+                feats, = _open_feat_model(model).run(['output'], {'input': data})
+
+                if retval is None:
+                    shape = (len(images), feats.shape[1])
+                    if isinstance(output, str):
+                        retval = np.lib.format.open_memmap(output, mode='w+', dtype=np.float32, shape=shape)
+                    else:
+                        retval = np.empty(shape, dtype=np.float32)
+                elif start == 0 and retval.shape != (len(images), feats.shape[1]):
+                    raise ValueError(f'Output with shape {(len(images), feats.shape[1])!r} expected, '
+                                     f'but {retval.shape!r} found.')
+                retval[start:start + feats.shape[0]] = feats
+                pbar.update(feats.shape[0])
+    finally:
+        if pool is not None:
+            for item in next_items or []:  # pending chunk when interrupted
+                item.cancel()
+            pool.shutdown()
+
+    if retval is None:  # no images
+        retval = np.zeros((0, 0), dtype=np.float32)
+    if isinstance(retval, np.memmap):
+        retval.flush()
+    return retval
+
+
 _FeatureOrImage = Union[ImageTyping, np.ndarray]
 
 
-def _p_feature(x: _FeatureOrImage, size: int = 384, model: str = _DEFAULT_MODEL_NAMES):
-    if isinstance(x, np.ndarray):  # if feature
-        return x
-    else:  # is image or path
-        return ccip_extract_feature(x, size, model)
+def _p_features(images: Union[List[_FeatureOrImage], np.ndarray], size: int = 384,
+                model: str = _DEFAULT_MODEL_NAMES, batch_size: int = 32, silent: bool = True) -> np.ndarray:
+    """
+    Get the features of images or features as a float32 matrix, the images are extracted in batches.
+    """
+    if isinstance(images, np.ndarray):  # already a feature matrix, maybe memory-mapped
+        return np.asarray(images, dtype=np.float32)
+    if batch_size < 1:
+        raise ValueError(f'Batch size should be no less than 1, but {batch_size!r} found.')
+
+    features: List[Optional[np.ndarray]] = [x if isinstance(x, np.ndarray) else None for x in images]
+    pending = [i for i, x in enumerate(images) if not isinstance(x, np.ndarray)]
+    if pending:
+        pending_features = ccip_stream_extract_features(
+            [images[i] for i in pending], size, model, batch_size=batch_size, silent=silent)
+        for i, feat in zip(pending, pending_features):
+            features[i] = feat
+
+    return np.stack(features).astype(np.float32)
 
 
 def ccip_default_threshold(model: str = _DEFAULT_MODEL_NAMES) -> float:
@@ -290,13 +424,13 @@ def ccip_same(x: _FeatureOrImage, y: _FeatureOrImage, threshold: Optional[float]
     return diff <= threshold
 
 
-def ccip_batch_differences(images: List[_FeatureOrImage],
+def ccip_batch_differences(images: Union[List[_FeatureOrImage], np.ndarray],
                            size: int = 384, model: str = _DEFAULT_MODEL_NAMES) -> np.ndarray:
     """
     Calculates the pairwise differences between a given list of images or feature vectors representing anime characters.
 
-    :param images: The list of images or feature vectors representing anime characters.
-    :type images: List[Union[ImageTyping, np.ndarray]]
+    :param images: The list of images or feature vectors representing anime characters, or a feature matrix.
+    :type images: Union[List[Union[ImageTyping, np.ndarray]], np.ndarray]
 
     :param size: The size of the input image to be used for feature extraction. (default: ``384``)
     :type size: int
@@ -319,19 +453,224 @@ def ccip_batch_differences(images: List[_FeatureOrImage],
                [4.0375218e-01, 4.0748104e-01, 3.9229470e-01, 6.5350548e-08]],
               dtype=float32)
     """
-    input_ = np.stack([_p_feature(img, size, model) for img in images]).astype(np.float32)
+    input_ = _p_features(images, size, model)
     output, = _open_metric_model(model).run(['output'], {'input': input_})
     return output
 
 
-def ccip_batch_same(images: List[_FeatureOrImage], threshold: Optional[float] = None,
-                    size: int = 384, model: str = _DEFAULT_MODEL_NAMES) -> np.ndarray:
+def _ccip_block_differences(x: np.ndarray, y: np.ndarray, model: str = _DEFAULT_MODEL_NAMES) -> np.ndarray:
+    """
+    Differences between the features ``x`` and ``y``, with shape ``(len(x), len(y))``.
+    """
+    if x is y:
+        output, = _open_metric_model(model).run(['output'], {'input': x})
+        return output
+    else:
+        output, = _open_metric_model(model).run(['output'], {'input': np.concatenate([x, y])})
+        return output[:len(x), len(x):]
+
+
+def _merge_smallest(diffs: np.ndarray, indices: np.ndarray, block_diffs: np.ndarray, block_start: int, k: int) \
+        -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Merge the differences of a column block (starts from ``block_start``) into the kept ``k`` smallest
+    differences and their indices of each row. The merged ones are not sorted.
+    """
+    all_diffs = np.concatenate([diffs, block_diffs], axis=1)
+    all_indices = np.concatenate([
+        indices,
+        np.broadcast_to(np.arange(block_start, block_start + block_diffs.shape[1]), block_diffs.shape),
+    ], axis=1)
+    selected = np.argpartition(all_diffs, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(all_diffs, selected, axis=1), np.take_along_axis(all_indices, selected, axis=1)
+
+
+def _iter_cross_blocks(queries: Union[List[_FeatureOrImage], np.ndarray],
+                       gallery: Union[List[_FeatureOrImage], np.ndarray],
+                       size: int = 384, model: str = _DEFAULT_MODEL_NAMES, chunk_size: int = 1024):
+    """
+    Iterate the ``(query_start, gallery_start, block_differences)`` blocks of the differences between
+    queries and gallery. The feature matrix of gallery (e.g. a memory-mapped one) is only read chunk by chunk.
+    """
+    if chunk_size < 1:
+        raise ValueError(f'Chunk size should be no less than 1, but {chunk_size!r} found.')
+    query_feats = _p_features(queries, size, model)
+    gallery_feats = gallery if isinstance(gallery, np.ndarray) else _p_features(gallery, size, model)
+
+    is_self = query_feats is gallery_feats
+    for g_start in range(0, gallery_feats.shape[0], chunk_size):
+        y = np.asarray(gallery_feats[g_start:g_start + chunk_size], dtype=np.float32)
+        for q_start in range(0, query_feats.shape[0], chunk_size):
+            # diagonal blocks of self differences only need one run on the chunk
+            x = y if is_self and q_start == g_start else query_feats[q_start:q_start + chunk_size]
+            yield q_start, g_start, _ccip_block_differences(x, y, model)
+
+
+def ccip_cross_differences(queries: Union[List[_FeatureOrImage], np.ndarray],
+                           gallery: Union[List[_FeatureOrImage], np.ndarray],
+                           size: int = 384, model: str = _DEFAULT_MODEL_NAMES, chunk_size: int = 1024) -> np.ndarray:
+    """
+    Calculates the differences between each of the queries and each of the gallery items.
+
+    Unlike :func:`ccip_batch_differences`, the differences among the gallery items are not calculated.
+    The gallery is processed in chunks of ``chunk_size``, so each run of the metric model only takes
+    no more than ``2 * chunk_size`` features.
+
+    :param queries: The images or feature vectors of the queries, or a feature matrix.
+    :type queries: Union[List[Union[ImageTyping, np.ndarray]], np.ndarray]
+
+    :param gallery: The images or feature vectors of the gallery, or a feature matrix
+                    (e.g. a memory-mapped one, which is read chunk by chunk).
+    :type gallery: Union[List[Union[ImageTyping, np.ndarray]], np.ndarray]
+
+    :param size: The size of the input image to be used for feature extraction. (default: ``384``)
+    :type size: int
+
+    :param model: The name of the model to use for feature extraction. (default: ``ccip-caformer-24-randaug-pruned``)
+                  The available model names are: ``ccip-caformer-24-randaug-pruned``,
+                  ``ccip-caformer-6-randaug-pruned_fp32``, ``ccip-caformer-5_fp32``.
+    :type model: str
+
+    :param chunk_size: Number of queries and gallery items in each chunk. (default: ``1024``)
+    :type chunk_size: int
+
+    :return: The matrix of differences, with shape ``(Q, G)``.
+    :rtype: np.ndarray
+
+    Examples::
+        >>> from imgutils.metrics import ccip_cross_differences
+        >>>
+        >>> ccip_cross_differences(['ccip/1.jpg', 'ccip/6.jpg'], ['ccip/2.jpg', 'ccip/7.jpg', 'ccip/6.jpg'])
+        array([[1.6583106e-01, 4.0375218e-01, 4.2947042e-01],
+               [4.3715334e-01, 3.9229470e-01, 3.2675274e-08]], dtype=float32)
+    """
+    query_count = len(queries)
+    gallery_count = len(gallery)
+    result = np.zeros((query_count, gallery_count), dtype=np.float32)
+    for q_start, g_start, diffs in _iter_cross_blocks(queries, gallery, size, model, chunk_size):
+        result[q_start:q_start + diffs.shape[0], g_start:g_start + diffs.shape[1]] = diffs
+    return result
+
+
+def ccip_cross_topk(queries: Union[List[_FeatureOrImage], np.ndarray],
+                    gallery: Union[List[_FeatureOrImage], np.ndarray], top_k: int = 10,
+                    size: int = 384, model: str = _DEFAULT_MODEL_NAMES, chunk_size: int = 1024) \
+        -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find the ``top_k`` gallery items with the smallest differences of each query.
+
+    The same as sorting the rows of :func:`ccip_cross_differences`, but only the ``top_k`` smallest differences
+    of each query are kept while processing the gallery chunk by chunk, so the full matrix is never held.
+
+    :param queries: The images or feature vectors of the queries, or a feature matrix.
+    :type queries: Union[List[Union[ImageTyping, np.ndarray]], np.ndarray]
+
+    :param gallery: The images or feature vectors of the gallery, or a feature matrix
+                    (e.g. a memory-mapped one, which is read chunk by chunk).
+    :type gallery: Union[List[Union[ImageTyping, np.ndarray]], np.ndarray]
+
+    :param top_k: Number of the nearest gallery items of each query. (default: ``10``)
+                  When the gallery is smaller, all the gallery items are returned.
+    :type top_k: int
+
+    :param size: The size of the input image to be used for feature extraction. (default: ``384``)
+    :type size: int
+
+    :param model: The name of the model to use for feature extraction. (default: ``ccip-caformer-24-randaug-pruned``)
+                  The available model names are: ``ccip-caformer-24-randaug-pruned``,
+                  ``ccip-caformer-6-randaug-pruned_fp32``, ``ccip-caformer-5_fp32``.
+    :type model: str
+
+    :param chunk_size: Number of queries and gallery items in each chunk. (default: ``1024``)
+    :type chunk_size: int
+
+    :return: The differences and the gallery indices of the nearest items, both with shape ``(Q, K)``,
+             in ascending order of differences.
+    :rtype: Tuple[np.ndarray, np.ndarray]
+
+    Examples::
+        >>> from imgutils.metrics import ccip_cross_topk
+        >>>
+        >>> diffs, indices = ccip_cross_topk(['ccip/1.jpg', 'ccip/6.jpg'],
+        ...                                  ['ccip/2.jpg', 'ccip/7.jpg', 'ccip/6.jpg'], top_k=2)
+        >>> diffs
+        array([[1.6583106e-01, 4.0375218e-01],
+               [3.2675274e-08, 3.9229470e-01]], dtype=float32)
+        >>> indices
+        array([[0, 1],
+               [2, 1]])
+    """
+    if top_k < 1:
+        raise ValueError(f'Top-k should be no less than 1, but {top_k!r} found.')
+    k = min(top_k, len(gallery))
+    diffs = np.full((len(queries), k), np.inf, dtype=np.float32)
+    indices = np.zeros((len(queries), k), dtype=np.int64)
+    for q_start, g_start, block_diffs in _iter_cross_blocks(queries, gallery, size, model, chunk_size):
+        q_end = q_start + block_diffs.shape[0]
+        diffs[q_start:q_end], indices[q_start:q_end] = _merge_smallest(
+            diffs[q_start:q_end], indices[q_start:q_end], block_diffs, g_start, k)
+
+    order = np.lexsort((indices, diffs), axis=-1)
+    return np.take_along_axis(diffs, order, axis=-1), np.take_along_axis(indices, order, axis=-1)
+
+
+def _ccip_neighbors_graph(features: np.ndarray, max_diff: float, min_neighbors: int = 1,
+                          block_size: int = 1024, model: str = _DEFAULT_MODEL_NAMES,
+                          silent: bool = True) -> sparse.csr_matrix:
+    """
+    Sparse difference matrix of the features, which is computed block by block.
+
+    For each sample, the differences within ``max_diff`` and the ``min_neighbors`` nearest differences
+    (required by the core distances of OPTICS) are kept, so the full matrix is never materialized.
+    """
+    n = features.shape[0]
+    k = min(min_neighbors, n)
+    knn_diffs = np.full((n, k), np.inf, dtype=np.float32)
+    knn_indices = np.zeros((n, k), dtype=np.int64)
+    rows, cols, values = [], [], []
+
+    def _update_knn(row_start, diffs, col_start):
+        row_end = row_start + diffs.shape[0]
+        knn_diffs[row_start:row_end], knn_indices[row_start:row_end] = _merge_smallest(
+            knn_diffs[row_start:row_end], knn_indices[row_start:row_end], diffs, col_start, k)
+
+    starts = list(range(0, n, block_size))
+    with tqdm(total=len(starts) * (len(starts) + 1) // 2, desc='Difference blocks', disable=silent) as pbar:
+        for i, i_start in enumerate(starts):
+            x = features[i_start:i_start + block_size]
+            for j_start in starts[i:]:
+                y = x if j_start == i_start else features[j_start:j_start + block_size]
+                diffs = np.maximum(_ccip_block_differences(x, y, model), 0.0)
+                r, c = np.nonzero(diffs <= max_diff)
+                rows.append(r + i_start)
+                cols.append(c + j_start)
+                values.append(diffs[r, c])
+                _update_knn(i_start, diffs, j_start)
+                if j_start != i_start:  # the matrix is symmetric, fill the lower block
+                    rows.append(c + j_start)
+                    cols.append(r + i_start)
+                    values.append(diffs[r, c])
+                    _update_knn(j_start, diffs.T, i_start)
+                pbar.update()
+
+    rows.append(np.repeat(np.arange(n), k))
+    cols.append(knn_indices.reshape(-1))
+    values.append(knn_diffs.reshape(-1))
+    rows, cols, values = np.concatenate(rows), np.concatenate(cols), np.concatenate(values)
+    # entries can be both within max_diff and nearest, drop the duplicated ones instead of summing them
+    _, unique_indices = np.unique(rows * n + cols, return_index=True)
+    rows, cols, values = rows[unique_indices], cols[unique_indices], values[unique_indices]
+    return sparse.csr_matrix((values, (rows, cols)), shape=(n, n))
+
+
+def ccip_batch_same(images: Union[List[_FeatureOrImage], np.ndarray], threshold: Optional[float] = None,
+                    size: int = 384, model: str = _DEFAULT_MODEL_NAMES, chunk_size: int = 1024) -> np.ndarray:
     """
     Calculates whether the given list of images or feature vectors representing anime characters are
     the same characters, based on the pairwise differences matrix and a given threshold.
 
-    :param images: The list of images or feature vectors representing anime characters.
-    :type images: List[Union[ImageTyping, np.ndarray]]
+    :param images: The list of images or feature vectors representing anime characters, or a feature matrix.
+    :type images: Union[List[Union[ImageTyping, np.ndarray]], np.ndarray]
 
     :param threshold: The threshold value for determining similarity.
                       If not provided, the default threshold for the model from :func:`ccip_default_threshold` is used.
@@ -345,6 +684,9 @@ def ccip_batch_same(images: List[_FeatureOrImage], threshold: Optional[float] =
                   ``ccip-caformer-6-randaug-pruned_fp32``, ``ccip-caformer-5_fp32``.
     :type model: str
 
+    :param chunk_size: Number of images in each chunk of :func:`ccip_cross_differences`. (default: ``1024``)
+    :type chunk_size: int
+
     :return: A boolean matrix of shape (N, N), where N is the length of the `images` list. The value at position (i, j)
              indicates whether the i-th and j-th characters are considered the same.
     :rtype: np.ndarray
@@ -358,7 +700,8 @@ def ccip_batch_same(images: List[_FeatureOrImage], threshold: Optional[float] =
                [False, False,  True, False],
                [False, False, False,  True]])
     """
-    batch_diff = ccip_batch_differences(images, size, model)
+    features = _p_features(images, size, model)
+    batch_diff = ccip_cross_differences(features, features, size, model, chunk_size=chunk_size)
     threshold = threshold if threshold is not None else ccip_default_threshold(model)
     return batch_diff <= threshold
 
@@ -417,9 +760,10 @@ def ccip_default_clustering_params(model: str = _DEFAULT_MODEL_NAMES,
         return _info['eps'], _info['min_samples']
 
 
-def ccip_clustering(images: List[_FeatureOrImage], method: CCIPClusterMethodTyping = 'optics',
+def ccip_clustering(images: Union[List[_FeatureOrImage], np.ndarray], method: CCIPClusterMethodTyping = 'optics',
                     eps: Optional[float] = None, min_samples: Optional[int] = None,
-                    size: int = 384, model: str = _DEFAULT_MODEL_NAMES) -> np.ndarray:
+                    size: int = 384, model: str = _DEFAULT_MODEL_NAMES,
+                    batch_size: int = 32, block_size: int = 2048) -> np.ndarray:
     """
     Performs clustering on the given list of images or feature vectors.
 
@@ -431,16 +775,19 @@ def ccip_clustering(images: List[_FeatureOrImage], method: CCIPClusterMethodTypi
     :func:`ccip_default_clustering_params` based on the selected ``method`` and ``model``.
     If no values are provided for ``eps`` and ``min_samples``, the default values will be used.
 
-    The images or feature vectors are preprocessed and converted to feature representations using
-    the specified ``size`` and ``model`` parameters. The pairwise differences between the feature vectors
-    are calculated using :func:`ccip_batch_differences` to define the distance metric for clustering.
+    The images are converted to feature representations in batches of ``batch_size``, using
+    the specified ``size`` and ``model`` parameters. When there are no more than ``block_size`` samples, the pairwise
+    differences are calculated using :func:`ccip_batch_differences` as a precomputed distance matrix. Otherwise,
+    the differences are calculated block by block, and only the differences within ``eps`` (and the nearest
+    ``min_samples`` ones of each sample) are kept in a sparse precomputed matrix, so the full matrix of the
+    large dataset is never materialized.
 
     The clustering is performed using either the DBSCAN algorithm or the OPTICS algorithm
     based on the selected ``method``.
     The clustering labels are returned as a NumPy array.
 
-    :param images: A list of images or feature vectors to be clustered.
-    :type images: List[_FeatureOrImage]
+    :param images: A list of images or feature vectors to be clustered, or a feature matrix.
+    :type images: Union[List[_FeatureOrImage], np.ndarray]
 
     :param method: The clustering method for which the default parameters are retrieved.
                    (default: ``optics``)
@@ -464,6 +811,13 @@ def ccip_clustering(images: List[_FeatureOrImage], method: CCIPClusterMethodTypi
                   ``ccip-caformer-6-randaug-pruned_fp32``, ``ccip-caformer-5_fp32``.
     :type model: str
 
+    :param batch_size: Number of images in each batch of feature extraction. (default: ``32``)
+    :type batch_size: int
+
+    :param block_size: Size of the blocks of difference calculation, and the max number of samples
+                       clustered with the full difference matrix. (default: ``2048``)
+    :type block_size: int
+
     :return: An array of clustering labels indicating the cluster assignments for each image or feature vector.
     :rtype: np.ndarray
 
@@ -504,17 +858,20 @@ def ccip_clustering(images: List[_FeatureOrImage], method: CCIPClusterMethodTypi
     eps = eps or _default_eps
     min_samples = min_samples or _default_min_samples
 
-    images = [_p_feature(img, size, model) for img in tqdm(images, desc='Extract features')]
-    batch_diff = ccip_batch_differences(images, size, model)
+    if block_size < 1:
+        raise ValueError(f'Block size should be no less than 1, but {block_size!r} found.')
 
-    def _metric(x, y):
-        return batch_diff[int(x), int(y)].item()
+    features = _p_features(images, size, model, batch_size=batch_size, silent=False)
+    if features.shape[0] <= block_size:
+        # tiny negative differences are not accepted by precomputed metric
+        distances = np.maximum(ccip_batch_differences(features, size, model), 0.0)
+    else:
+        distances = _ccip_neighbors_graph(features, eps, min_samples, block_size, model, silent=False)
 
-    samples = np.arange(len(images)).reshape(-1, 1)
     if 'dbscan' in method:
-        clustering = DBSCAN(eps=eps, min_samples=min_samples, metric=_metric).fit(samples)
+        clustering = DBSCAN(eps=eps, min_samples=min_samples, metric='precomputed').fit(distances)
     elif 'optics' in method:
-        clustering = OPTICS(max_eps=eps, min_samples=min_samples, metric=_metric).fit(samples)
+        clustering = OPTICS(max_eps=eps, min_samples=min_samples, metric='precomputed').fit(distances)
     else:
         assert False, f'Unknown mode for CCIP clustering - {method!r}.'  # pragma: no cover
 
@@ -550,7 +907,7 @@ def ccip_merge(images: Union[List[_FeatureOrImage], np.ndarray],
         >>> diffs.mean()
         0.05131693
     """
-    embs = np.stack([_p_feature(img, size, model) for img in images]).astype(np.float32)
+    embs = _p_features(images, size, model)
     lengths = np.linalg.norm(embs, axis=-1)
     embs = embs / lengths.reshape(-1, 1)
     ret_embedding = embs.mean(axis=0)
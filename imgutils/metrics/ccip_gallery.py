@@ -0,0 +1,348 @@
+"""
+Overview:
+    Persistent character gallery for identifying anime characters with CCIP.
+
+    :class:`CCIPGallery` stores the CCIP features of the reference images of each character in an append-only
+    memory-mapped file, and keeps a merged prototype (see :func:`imgutils.metrics.ccip_merge`) for each character.
+    Opening a gallery only maps the stored files, the features are never extracted again, and
+    adding or removing a character only updates the prototype of that character.
+"""
+import json
+import os
+from typing import List, Optional, Union, Tuple, Dict
+
+import numpy as np
+
+from .ccip import _DEFAULT_MODEL_NAMES, _FeatureOrImage, _p_features, _iter_cross_blocks, ccip_merge, \
+    ccip_default_threshold, ccip_cross_topk
+from ..utils.storage import save_json_atomic, append_truncated
+
+__all__ = [
+    'CCIPGallery',
+]
+
+_GALLERY_VERSION = 1
+_META_FILE = 'meta.json'
+_FILES = {'features': 'features.bin', 'labels': 'labels.bin', 'prototypes': 'prototypes.npy'}
+
+
+class CCIPGallery:
+    """
+    Character gallery stored in a directory, with the CCIP features of the reference images of each character.
+
+    Each character occupies a slot, the features are stored as ``float32`` rows in a memory-mapped file with
+    the slot of each row. Removing a character only frees its slot, the rows are dropped by :meth:`compact`.
+    The rewritten files (e.g. the prototypes) are saved under new names, and only used after the meta file
+    referring to them is committed, so an interrupted writing leaves the last committed gallery.
+
+    :param directory: Directory of the gallery. An existing gallery is opened, otherwise a new one is created.
+    :type directory: str
+    :param model: The name of the CCIP model. (default: ``ccip-caformer-24-randaug-pruned``)
+    :type model: str
+    :param size: The size of the input image to be used for feature extraction. (default: ``384``)
+    :type size: int
+
+    :raises ValueError: If the model is not consistent with the existing gallery.
+
+    Examples::
+        >>> from imgutils.metrics import CCIPGallery
+        >>>
+        >>> gallery = CCIPGallery('my_gallery')
+        >>> gallery.add('amiya', ['ccip/1.jpg', 'ccip/2.jpg', 'ccip/3.jpg'])
+        >>> gallery.add('texas', ['ccip/6.jpg'])
+        >>> gallery.characters
+        ['amiya', 'texas']
+        >>> gallery.identify('ccip/4.jpg')  # list of (character, difference) within the threshold
+        [('amiya', 0.07...)]
+        >>>
+        >>> gallery.remove('texas')
+        >>> gallery.compact()  # drop the features of the removed characters from the files
+    """
+
+    def __init__(self, directory: str, model: str = _DEFAULT_MODEL_NAMES, size: int = 384):
+        self.directory = directory
+        self.size = size
+        meta_file = os.path.join(directory, _META_FILE)
+        if os.path.exists(meta_file):
+            with open(meta_file, 'r') as f:
+                meta = json.load(f)
+            if meta['model'] != model:
+                raise ValueError(f'Model {meta["model"]!r} of existing gallery {directory!r} '
+                                 f'is not consistent with {model!r}.')
+            self._meta = meta
+        else:
+            os.makedirs(directory, exist_ok=True)
+            self._meta = {'version': _GALLERY_VERSION, 'model': model, 'dim': None, 'count': 0, 'slots': []}
+            self._save_meta()
+
+        self._slot_of = {name: i for i, name in enumerate(self._meta['slots']) if name is not None}
+        self._labels = np.fromfile(self._file('labels'), dtype=np.int32, count=self._meta['count']) \
+            if self._meta['count'] else np.zeros((0,), dtype=np.int32)
+        if self._meta['slots']:
+            self._prototypes = np.load(self._file('prototypes'))
+        else:
+            self._prototypes = None
+        self._features_mm = None
+
+    def __len__(self):
+        return len(self._slot_of)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._slot_of
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} directory: {self.directory!r}, characters: {len(self)!r}, ' \
+               f'features: {int(self._alive_rows().sum())!r}, model: {self.model!r}>'
+
+    @property
+    def model(self) -> str:
+        """
+        Name of the CCIP model of the gallery.
+        """
+        return self._meta['model']
+
+    @property
+    def characters(self) -> List[str]:
+        """
+        Names of the characters, in the order of adding.
+        """
+        return [name for name in self._meta['slots'] if name is not None]
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+    def _file(self, key: str) -> str:
+        return self._path(self._meta.get('files', _FILES)[key])
+
+    def _new_filename(self, key: str) -> str:
+        stem, ext = os.path.splitext(_FILES[key])
+        return f'{stem}-{self._meta.get("generation", 0) + 1}{ext}'
+
+    def _save_meta(self):
+        save_json_atomic(self._path(_META_FILE), self._meta)
+
+    def _commit(self, new_files: Dict[str, str]):
+        """
+        Commit the meta file with the rewritten files, then remove the replaced ones.
+        """
+        old_files = dict(self._meta.get('files', _FILES))
+        if new_files:
+            self._meta['files'] = {**old_files, **new_files}
+            self._meta['generation'] = self._meta.get('generation', 0) + 1
+        self._save_meta()
+        for key in new_files:
+            if os.path.exists(self._path(old_files[key])):
+                os.remove(self._path(old_files[key]))
+
+    @property
+    def _features(self) -> np.ndarray:
+        count, dim = self._meta['count'], self._meta['dim']
+        if count == 0:
+            return np.zeros((0, dim or 0), dtype=np.float32)
+        if self._features_mm is None or self._features_mm.shape[0] != count:
+            self._features_mm = np.memmap(self._file('features'), dtype=np.float32, mode='r', shape=(count, dim))
+        return self._features_mm
+
+    def _alive_rows(self) -> np.ndarray:
+        alive_slots = np.asarray([name is not None for name in self._meta['slots']], dtype=bool)
+        return alive_slots[self._labels] if self._labels.shape[0] else np.zeros((0,), dtype=bool)
+
+    def features(self, name: str) -> np.ndarray:
+        """
+        Get the stored features of a character.
+
+        :param name: Name of the character.
+        :type name: str
+        :return: Feature matrix with shape ``(N, dim)``.
+        :rtype: np.ndarray
+        :raises KeyError: If the character is not found.
+        """
+        slot = self._slot_of[name]
+        return np.asarray(self._features[self._labels == slot], dtype=np.float32)
+
+    def prototype(self, name: str) -> np.ndarray:
+        """
+        Get the merged prototype feature of a character, see :func:`imgutils.metrics.ccip_merge`.
+
+        :param name: Name of the character.
+        :type name: str
+        :return: The prototype feature.
+        :rtype: np.ndarray
+        :raises KeyError: If the character is not found.
+        """
+        return self._prototypes[self._slot_of[name]].copy()
+
+    def add(self, name: str, images: Union[List[_FeatureOrImage], np.ndarray], batch_size: int = 32):
+        """
+        Add the reference images of a character. The features are appended to the character if it
+        already exists, and only the prototype of this character is merged again.
+
+        :param name: Name of the character.
+        :type name: str
+        :param images: Images or feature vectors of the character, or a feature matrix.
+        :type images: Union[List[Union[ImageTyping, np.ndarray]], np.ndarray]
+        :param batch_size: Number of images in each batch of feature extraction. (default: ``32``)
+        :type batch_size: int
+        :raises ValueError: If the dimension of features is not consistent with the gallery.
+        """
+        if len(images) == 0:
+            return
+        feats = _p_features(images, self.size, self.model, batch_size=batch_size)
+        dim = self._meta['dim']
+        if dim is not None and feats.shape[1] != dim:
+            raise ValueError(f'Features with dimension {dim!r} expected, but {feats.shape[1]!r} found.')
+
+        count = self._meta['count']
+        slots = self._meta['slots']
+        if name in self._slot_of:
+            slot = self._slot_of[name]
+        else:
+            slot = len(slots)
+        labels = np.full((feats.shape[0],), slot, dtype=np.int32)
+        append_truncated(self._file('features'), count * feats.shape[1] * 4, feats.tobytes())
+        append_truncated(self._file('labels'), count * 4, labels.tobytes())
+        new_labels = np.concatenate([self._labels, labels])
+
+        # merge the prototype with all the features of this character
+        all_feats = np.concatenate([self.features(name), feats]) if name in self._slot_of else feats
+        prototype = ccip_merge(all_feats, self.size, self.model).astype(np.float32)
+        if self._prototypes is None:
+            prototypes = prototype[None, :]
+        elif slot < self._prototypes.shape[0]:
+            prototypes = self._prototypes.copy()
+            prototypes[slot] = prototype
+        else:
+            prototypes = np.concatenate([self._prototypes, prototype[None, :]])
+        prototypes_file = self._new_filename('prototypes')
+        np.save(self._path(prototypes_file), prototypes)
+
+        # the meta file is the commit point
+        self._meta['dim'] = int(feats.shape[1])
+        self._meta['count'] = count + feats.shape[0]
+        if slot == len(slots):
+            slots.append(name)
+        self._commit({'prototypes': prototypes_file})
+        self._slot_of[name] = slot
+        self._labels = new_labels
+        self._prototypes = prototypes
+
+    def remove(self, name: str):
+        """
+        Remove a character from the gallery. Its features stay in the files until :meth:`compact`.
+
+        :param name: Name of the character.
+        :type name: str
+        :raises KeyError: If the character is not found.
+        """
+        slot = self._slot_of[name]
+        self._meta['slots'][slot] = None
+        self._save_meta()
+        del self._slot_of[name]
+
+    def compact(self):
+        """
+        Rewrite the gallery files without the features of the removed characters.
+        """
+        slots = self._meta['slots']
+        alive_slots = [i for i, name in enumerate(slots) if name is not None]
+        if len(alive_slots) == len(slots):
+            return
+
+        slot_mapping = np.full((len(slots),), -1, dtype=np.int32)
+        slot_mapping[alive_slots] = np.arange(len(alive_slots), dtype=np.int32)
+        alive_rows = self._alive_rows()
+        feats = np.asarray(self._features[alive_rows], dtype=np.float32)
+        labels = slot_mapping[self._labels[alive_rows]]
+        self._features_mm = None
+
+        new_files = {}
+        for key, data in [('features', feats), ('labels', labels)]:
+            new_files[key] = self._new_filename(key)
+            data.tofile(self._path(new_files[key]))
+        prototypes = self._prototypes[alive_slots] if alive_slots else None
+        if prototypes is not None:
+            new_files['prototypes'] = self._new_filename('prototypes')
+            np.save(self._path(new_files['prototypes']), prototypes)
+
+        self._meta['count'] = int(feats.shape[0])
+        self._meta['slots'] = [slots[i] for i in alive_slots]
+        self._commit(new_files)
+        self._slot_of = {name: i for i, name in enumerate(self._meta['slots'])}
+        self._labels = labels
+        self._prototypes = prototypes
+
+    def identify_batch(self, images: Union[List[_FeatureOrImage], np.ndarray], top_k: int = 5,
+                       threshold: Optional[float] = None, use_prototypes: bool = True,
+                       chunk_size: int = 1024) -> List[List[Tuple[str, float]]]:
+        """
+        Identify the characters of multiple images, see :meth:`identify`.
+
+        :param images: Images or feature vectors to identify, or a feature matrix.
+        :type images: Union[List[Union[ImageTyping, np.ndarray]], np.ndarray]
+        :param top_k: Max number of characters for each image. (default: ``5``)
+        :type top_k: int
+        :param threshold: Max difference of the characters. If not provided, the default threshold of the model
+            from :func:`imgutils.metrics.ccip_default_threshold` is used.
+        :type threshold: Optional[float]
+        :param use_prototypes: Compare with the merged prototypes of characters, otherwise compare with all the
+            stored features and use the smallest difference of each character. (default: ``True``)
+        :type use_prototypes: bool
+        :param chunk_size: Number of gallery features in each chunk. (default: ``1024``)
+        :type chunk_size: int
+        :return: Lists of ``(character, difference)`` of each image, in ascending order of differences.
+        :rtype: List[List[Tuple[str, float]]]
+        """
+        threshold = threshold if threshold is not None else ccip_default_threshold(self.model)
+        feats = _p_features(images, self.size, self.model)
+        slots = self._meta['slots']
+        alive_slots = np.asarray([i for i, name in enumerate(slots) if name is not None], dtype=np.int64)
+        if alive_slots.shape[0] == 0:
+            return [[] for _ in range(feats.shape[0])]
+
+        if use_prototypes:
+            diffs, indices = ccip_cross_topk(feats, self._prototypes[alive_slots], top_k=top_k,
+                                             size=self.size, model=self.model, chunk_size=chunk_size)
+            indices = alive_slots[indices]
+        else:
+            slot_diffs = np.full((feats.shape[0], len(slots)), np.inf, dtype=np.float32)
+            for q_start, g_start, block_diffs in _iter_cross_blocks(
+                    feats, self._features, self.size, self.model, chunk_size):
+                block_labels = self._labels[g_start:g_start + block_diffs.shape[1]]
+                # smallest difference of each character, updated in place
+                block_slot_diffs = slot_diffs[q_start:q_start + block_diffs.shape[0]]
+                np.minimum.at(block_slot_diffs.T, block_labels, block_diffs.T)
+            slot_diffs = slot_diffs[:, alive_slots]
+            k = min(top_k, alive_slots.shape[0])
+            indices = np.argsort(slot_diffs, axis=-1, kind='stable')[:, :k]
+            diffs = np.take_along_axis(slot_diffs, indices, axis=-1)
+            indices = alive_slots[indices]
+
+        retval = []
+        for row_diffs, row_indices in zip(diffs.tolist(), indices.tolist()):
+            retval.append([(slots[slot], diff) for diff, slot in zip(row_diffs, row_indices) if diff <= threshold])
+        return retval
+
+    def identify(self, image: _FeatureOrImage, top_k: int = 5, threshold: Optional[float] = None,
+                 use_prototypes: bool = True, chunk_size: int = 1024) -> List[Tuple[str, float]]:
+        """
+        Identify the character of an image with the gallery.
+
+        The image is compared with the characters in the gallery with :func:`imgutils.metrics.ccip_cross_topk`,
+        in chunks of the gallery.
+
+        :param image: Image or feature vector to identify.
+        :type image: Union[ImageTyping, np.ndarray]
+        :param top_k: Max number of characters. (default: ``5``)
+        :type top_k: int
+        :param threshold: Max difference of the characters. If not provided, the default threshold of the model
+            from :func:`imgutils.metrics.ccip_default_threshold` is used.
+        :type threshold: Optional[float]
+        :param use_prototypes: Compare with the merged prototypes of characters, otherwise compare with all the
+            stored features and use the smallest difference of each character. (default: ``True``)
+        :type use_prototypes: bool
+        :param chunk_size: Number of gallery features in each chunk. (default: ``1024``)
+        :type chunk_size: int
+        :return: List of ``(character, difference)`` within the threshold, in ascending order of differences.
+        :rtype: List[Tuple[str, float]]
+        """
+        return self.identify_batch([image], top_k, threshold, use_prototypes, chunk_size)[0]
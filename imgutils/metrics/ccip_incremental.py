@@ -0,0 +1,307 @@
+"""
+Overview:
+    Incremental clustering of CCIP features, for streaming ingestion of character images.
+
+    :func:`imgutils.metrics.ccip_clustering` has no notion of existing clusters, so all the history has to be
+    clustered again for each new batch. :class:`CCIPIncrementalClusterer` keeps the clusters with their
+    merged prototypes, assigns the new features to the nearest existing cluster within the threshold, and
+    only clusters the pool of outliers again when enough new outliers are buffered. The state can be
+    saved to and loaded from a checkpoint file.
+"""
+import json
+import os
+from typing import List, Optional, Union, Any, Iterable, Dict
+
+import numpy as np
+
+from .ccip import _DEFAULT_MODEL_NAMES, _FeatureOrImage, _p_features, CCIPClusterMethodTyping, ccip_clustering, \
+    ccip_cross_topk, ccip_default_threshold, ccip_default_clustering_params
+
+__all__ = [
+    'CCIPIncrementalClusterer',
+]
+
+_CHECKPOINT_VERSION = 1
+
+
+class CCIPIncrementalClusterer:
+    """
+    Incremental clusterer of CCIP features.
+
+    The added features are compared with the prototypes (see :func:`imgutils.metrics.ccip_merge`) of the
+    existing clusters, and assigned to the nearest cluster whose difference is within ``threshold``. The other
+    features are buffered in the outlier pool, labeled ``-1``. After ``recluster_every`` new outliers are buffered,
+    the outlier pool (only) is clustered with :func:`imgutils.metrics.ccip_clustering`, and the found clusters
+    are added as new clusters.
+
+    :param method: The clustering method of the outlier pool. (default: ``optics``)
+                   The available options are: ``dbscan``, ``dbscan_2``, ``dbscan_free``, ``optics``, ``optics_best``.
+    :type method: CCIPClusterMethodTyping
+    :param eps: The ``eps`` of clustering. If not provided, the default value is obtained from
+                :func:`imgutils.metrics.ccip_default_clustering_params`.
+    :type eps: Optional[float]
+    :param min_samples: The ``min_samples`` of clustering. If not provided, the default value is obtained from
+                        :func:`imgutils.metrics.ccip_default_clustering_params`.
+    :type min_samples: Optional[int]
+    :param threshold: Max difference for assigning features to existing clusters. If not provided,
+                      :func:`imgutils.metrics.ccip_default_threshold` is used.
+    :type threshold: Optional[float]
+    :param recluster_every: Number of new outliers which triggers the clustering of outlier pool. (default: ``256``)
+    :type recluster_every: int
+    :param size: The size of the input image to be used for feature extraction. (default: ``384``)
+    :type size: int
+    :param model: The name of the CCIP model. (default: ``ccip-caformer-24-randaug-pruned``)
+    :type model: str
+
+    Examples::
+        >>> from imgutils.metrics import CCIPIncrementalClusterer
+        >>>
+        >>> clusterer = CCIPIncrementalClusterer(min_samples=2, recluster_every=4)
+        >>> clusterer.add([f'ccip/{i}.jpg' for i in range(1, 7)])  # -1 means buffered outliers
+        array([ 0,  0,  0,  1,  1, -1])
+        >>> clusterer.add(['ccip/7.jpg', 'ccip/8.jpg'])  # assigned to existing clusters
+        array([1, 0])
+        >>> clusterer.save('clusterer.npz')
+        >>>
+        >>> clusterer = CCIPIncrementalClusterer.load('clusterer.npz')
+        >>> clusterer.labels
+        array([ 0,  0,  0,  1,  1, -1,  1,  0])
+    """
+
+    def __init__(self, method: CCIPClusterMethodTyping = 'optics', eps: Optional[float] = None,
+                 min_samples: Optional[int] = None, threshold: Optional[float] = None,
+                 recluster_every: int = 256, size: int = 384, model: str = _DEFAULT_MODEL_NAMES):
+        if recluster_every < 1:
+            raise ValueError(f'Recluster interval should be no less than 1, but {recluster_every!r} found.')
+        self.method = method
+        self.eps = eps
+        self.min_samples = min_samples
+        self.threshold = threshold
+        self.recluster_every = recluster_every
+        self.size = size
+        self.model = model
+
+        # growable buffers, only the first ``len(self)`` rows are used
+        self._features: Optional[np.ndarray] = None
+        self._labels = np.zeros((0,), dtype=np.int64)
+        self._count = 0
+        self._ids: List[Any] = []
+        self._outliers: List[int] = []
+        # running sums of the clusters, the prototypes are merged from them in the same way as ccip_merge
+        self._unit_sums: Optional[np.ndarray] = None
+        self._length_sums = np.zeros((0,), dtype=np.float64)
+        self._sizes = np.zeros((0,), dtype=np.int64)
+        self._prototypes: Optional[np.ndarray] = None
+        self._new_outliers = 0
+
+    def __len__(self):
+        return self._count
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} samples: {len(self)!r}, clusters: {self.n_clusters!r}, ' \
+               f'outliers: {len(self._outliers)!r}>'
+
+    @property
+    def n_clusters(self) -> int:
+        """
+        Number of the clusters.
+        """
+        return 0 if self._prototypes is None else self._prototypes.shape[0]
+
+    @property
+    def labels(self) -> np.ndarray:
+        """
+        Cluster labels of all the added samples in the order of adding, ``-1`` means in the outlier pool.
+        """
+        return self._labels[:self._count].copy()
+
+    @property
+    def ids(self) -> List[Any]:
+        """
+        Ids of all the added samples in the order of adding.
+        """
+        return list(self._ids)
+
+    @property
+    def prototypes(self) -> np.ndarray:
+        """
+        Merged prototype features of the clusters, with shape ``(n_clusters, dim)``.
+        """
+        if self._prototypes is None:
+            return np.zeros((0, 0 if self._features is None else self._features.shape[1]), dtype=np.float32)
+        return self._prototypes.copy()
+
+    def _get_threshold(self) -> float:
+        return self.threshold if self.threshold is not None else ccip_default_threshold(self.model)
+
+    def _append(self, feats: np.ndarray):
+        count = self._count + feats.shape[0]
+        if self._features is None or count > self._features.shape[0]:
+            # capacity doubling, so the history is copied O(log N) times
+            capacity = max(count, 256 if self._features is None else self._features.shape[0] * 2)
+            features = np.zeros((capacity, feats.shape[1]), dtype=np.float32)
+            labels = np.full((capacity,), -1, dtype=np.int64)
+            if self._features is not None:
+                features[:self._count] = self._features[:self._count]
+                labels[:self._count] = self._labels[:self._count]
+            self._features, self._labels = features, labels
+        self._features[self._count:count] = feats
+        self._labels[self._count:count] = -1
+        self._count = count
+
+    def _add_clusters(self, n: int):
+        dim = self._features.shape[1]
+        if self._prototypes is None:
+            self._unit_sums = np.zeros((0, dim), dtype=np.float64)
+            self._prototypes = np.zeros((0, dim), dtype=np.float32)
+        self._unit_sums = np.concatenate([self._unit_sums, np.zeros((n, dim), dtype=np.float64)])
+        self._length_sums = np.concatenate([self._length_sums, np.zeros((n,), dtype=np.float64)])
+        self._sizes = np.concatenate([self._sizes, np.zeros((n,), dtype=np.int64)])
+        self._prototypes = np.concatenate([self._prototypes, np.zeros((n, dim), dtype=np.float32)])
+
+    def _assign(self, rows: np.ndarray, clusters: np.ndarray):
+        """
+        Assign the rows to the clusters, only the prototypes of the touched clusters are updated with the new rows.
+        """
+        if rows.shape[0] == 0:
+            return
+        self._labels[rows] = clusters
+        feats = self._features[rows].astype(np.float64)
+        lengths = np.linalg.norm(feats, axis=-1)
+        np.add.at(self._unit_sums, clusters, feats / lengths[:, None])
+        np.add.at(self._length_sums, clusters, lengths)
+        np.add.at(self._sizes, clusters, 1)
+
+        touched = np.unique(clusters)
+        unit_sums = self._unit_sums[touched]
+        self._prototypes[touched] = unit_sums / np.linalg.norm(unit_sums, axis=-1, keepdims=True) * \
+            (self._length_sums[touched] / self._sizes[touched])[:, None]
+
+    def add(self, images: Union[List[_FeatureOrImage], np.ndarray], ids: Optional[Iterable[Any]] = None,
+            batch_size: int = 32) -> np.ndarray:
+        """
+        Add samples into the clusterer.
+
+        :param images: Images or feature vectors, or a feature matrix.
+        :type images: Union[List[Union[ImageTyping, np.ndarray]], np.ndarray]
+        :param ids: Ids of the samples, which should be JSON serializable. Default is ``None`` which means
+            using the sequence numbers of adding.
+        :type ids: Optional[Iterable[Any]]
+        :param batch_size: Number of images in each batch of feature extraction. (default: ``32``)
+        :type batch_size: int
+        :return: Cluster labels of the added samples, after the clustering of outlier pool when triggered.
+        :rtype: np.ndarray
+        """
+        start = len(self)
+        ids = list(ids) if ids is not None else list(range(start, start + len(images)))
+        if len(ids) != len(images):
+            raise ValueError(f'{len(images)!r} ids expected, but {len(ids)!r} found.')
+        if len(images) == 0:
+            return np.zeros((0,), dtype=np.int64)
+
+        feats = _p_features(images, self.size, self.model, batch_size=batch_size)
+        labels = np.full((feats.shape[0],), -1, dtype=np.int64)
+        if self._prototypes is not None:
+            diffs, indices = ccip_cross_topk(feats, self._prototypes, top_k=1, size=self.size, model=self.model)
+            assigned = diffs[:, 0] <= self._get_threshold()
+            labels[assigned] = indices[assigned, 0]
+
+        self._append(feats)
+        self._ids.extend(ids)
+        rows = np.arange(start, len(self))
+        self._assign(rows[labels >= 0], labels[labels >= 0])
+        self._outliers.extend(rows[labels < 0].tolist())
+
+        self._new_outliers += int((labels < 0).sum())
+        if self._new_outliers >= self.recluster_every:
+            self.recluster()
+        return self._labels[start:len(self)].copy()
+
+    def recluster(self) -> int:
+        """
+        Cluster the outlier pool, and add the found clusters. It is called automatically when
+        ``recluster_every`` new outliers are buffered.
+
+        :return: Number of the new clusters.
+        :rtype: int
+        """
+        self._new_outliers = 0
+        pool = np.asarray(self._outliers, dtype=np.int64)
+        min_samples = self.min_samples or ccip_default_clustering_params(self.model, self.method)[1]
+        if pool.shape[0] < max(min_samples, 2):
+            return 0
+
+        pool_labels = np.asarray(ccip_clustering(
+            self._features[pool], method=self.method, eps=self.eps, min_samples=self.min_samples,
+            size=self.size, model=self.model,
+        ))
+        new_clusters = np.unique(pool_labels[pool_labels >= 0])
+        if new_clusters.shape[0] == 0:
+            return 0
+
+        mapping = np.full((int(new_clusters.max()) + 1,), -1, dtype=np.int64)
+        mapping[new_clusters] = self.n_clusters + np.arange(new_clusters.shape[0])
+        self._add_clusters(new_clusters.shape[0])
+        clustered = pool_labels >= 0
+        self._assign(pool[clustered], mapping[pool_labels[clustered]])
+        self._outliers = pool[~clustered].tolist()
+        return int(new_clusters.shape[0])
+
+    def _config(self) -> Dict[str, Any]:
+        return {
+            'method': self.method, 'eps': self.eps, 'min_samples': self.min_samples, 'threshold': self.threshold,
+            'recluster_every': self.recluster_every, 'size': self.size, 'model': self.model,
+        }
+
+    def save(self, file: str):
+        """
+        Save the state into a checkpoint file (``.npz``). The file is replaced atomically.
+
+        :param file: Path of the checkpoint file.
+        :type file: str
+        """
+        state = {
+            'version': _CHECKPOINT_VERSION,
+            'config': self._config(),
+            'ids': self._ids,
+            'new_outliers': self._new_outliers,
+        }
+        dim = 0 if self._features is None else self._features.shape[1]
+        if os.path.dirname(file):
+            os.makedirs(os.path.dirname(file), exist_ok=True)
+        tmp_file = f'{file}.tmp.npz'
+        np.savez(
+            tmp_file,
+            state=np.asarray(json.dumps(state)),
+            features=self._features[:len(self)] if self._features is not None
+            else np.zeros((0, dim), dtype=np.float32),
+            labels=self.labels,
+            prototypes=self.prototypes,
+        )
+        os.replace(tmp_file, file)
+
+    @classmethod
+    def load(cls, file: str) -> 'CCIPIncrementalClusterer':
+        """
+        Load the clusterer from a checkpoint file saved by :meth:`save`.
+
+        :param file: Path of the checkpoint file.
+        :type file: str
+        :return: The loaded clusterer.
+        :rtype: CCIPIncrementalClusterer
+        """
+        with np.load(file, allow_pickle=False) as npz:
+            state = json.loads(npz['state'].item())
+            clusterer = cls(**state['config'])
+            labels = npz['labels']
+            if labels.shape[0] > 0:
+                clusterer._append(npz['features'])
+                n_clusters = npz['prototypes'].shape[0]
+                if n_clusters > 0:
+                    clusterer._add_clusters(n_clusters)
+                rows = np.arange(labels.shape[0])
+                clusterer._assign(rows[labels >= 0], labels[labels >= 0])
+                clusterer._outliers = rows[labels < 0].tolist()
+        clusterer._ids = state['ids']
+        clusterer._new_outliers = state['new_outliers']
+        return clusterer
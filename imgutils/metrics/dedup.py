@@ -0,0 +1,508 @@
+"""
+Overview:
+    Near-duplicate detection for large image datasets.
+
+    The LPIPS difference (:func:`imgutils.metrics.lpips_difference`) is accurate, but too expensive to be
+    calculated for all the pairs of a large dataset. So the images are processed in the following steps:
+
+    1. A 64-bit perceptual hash (``phash`` or ``dhash``) is calculated from a small grayscale thumbnail of each image.
+    2. The hashes are split into bands, the pairs of images whose values of any band are within
+       ``max_distance // n_bands`` bits are found with sorted arrays (multi-index hashing), and only the pairs
+       within ``max_distance`` hamming distance are kept as candidates.
+    3. The candidates are verified with LPIPS, the features of the images are extracted and compared in batches.
+    4. The verified pairs are grouped into connected components, i.e. the duplicate groups.
+
+    :func:`find_near_duplicates` runs these steps on a list of images, and :class:`NearDuplicateIndex` persists the
+    hashes and verified pairs in a directory, so new images of the incremental runs are only compared with
+    the indexed ones.
+
+    .. note::
+        Two hashes within hamming distance ``max_distance`` always have a band within ``max_distance // n_bands``
+        bits, so all the pairs within ``max_distance`` are found (except in the oversized buckets, see
+        ``max_bucket_size``). When ``max_distance >= n_bands``, the neighbor values of each band are probed too,
+        and the number of probes grows quickly with ``max_distance // n_bands``, e.g. ``17`` per band for ``1``
+        bit and ``137`` for ``2`` bits with the default ``4`` bands of 16 bits.
+"""
+import itertools
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Literal, Callable, Tuple, Optional
+
+import numpy as np
+from PIL import Image
+from scipy import sparse
+from scipy.fft import dctn
+from scipy.sparse.csgraph import connected_components
+from tqdm.auto import tqdm
+
+from .lpips import lpips_extract_feature, _batch_lpips_difference
+from ..data import ImageTyping, MultiImagesTyping, load_image
+from ..utils.storage import save_json_atomic, append_truncated
+
+__all__ = [
+    'perceptual_hash',
+    'find_near_duplicates',
+    'NearDuplicateIndex',
+]
+
+HashMethodTyping = Literal['phash', 'dhash']
+
+_POPCOUNT = np.asarray([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def _hash_bits(image: Image.Image, method: HashMethodTyping = 'phash') -> np.ndarray:
+    if method == 'phash':
+        # low frequencies of DCT on a 32x32 thumbnail, compared with their median
+        data = np.asarray(image.resize((32, 32), resample=Image.LANCZOS), dtype=np.float64)
+        low = dctn(data, type=2, norm='ortho')[:8, :8]
+        return low > np.median(low)
+    elif method == 'dhash':
+        # gradients between horizontally adjacent pixels of a 9x8 thumbnail
+        data = np.asarray(image.resize((9, 8), resample=Image.LANCZOS), dtype=np.float64)
+        return data[:, 1:] > data[:, :-1]
+    else:
+        raise ValueError(f'Unknown hash method - {method!r}.')
+
+
+def perceptual_hash(image: ImageTyping, method: HashMethodTyping = 'phash') -> int:
+    """
+    Calculate the 64-bit perceptual hash of an image. Similar images have hashes with small hamming distance.
+
+    :param image: The image.
+    :type image: ImageTyping
+    :param method: Hash method, ``phash`` (DCT based, robust to resizing and compression) or
+        ``dhash`` (gradient based, faster). Default is ``phash``.
+    :type method: Literal['phash', 'dhash']
+    :return: The hash as an unsigned 64-bit integer.
+    :rtype: int
+
+    Examples::
+        >>> from PIL import Image
+        >>> from imgutils.metrics import perceptual_hash
+        >>>
+        >>> image = Image.open('lpips/1.jpg')
+        >>> h1 = perceptual_hash(image)
+        >>> h2 = perceptual_hash(image.resize((image.width // 2, image.height // 2)))
+        >>> bin(h1 ^ h2).count('1') <= 4  # hamming distance of resized image is small
+        True
+    """
+    bits = _hash_bits(load_image(image, mode='L'), method)
+    return int.from_bytes(np.packbits(bits.reshape(-1)).tobytes(), 'big')
+
+
+def _hamming(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    xor = np.ascontiguousarray(np.bitwise_xor(x, y), dtype=np.uint64)
+    return _POPCOUNT[xor.view(np.uint8).reshape(-1, 8)].sum(axis=-1, dtype=np.int64)
+
+
+def _hash_images(images: MultiImagesTyping, method: HashMethodTyping = 'phash', workers: int = 4,
+                 silent: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Hash the images in a thread pool, returns the hashes and whether each image is successfully hashed.
+    The broken images are logged and skipped.
+    """
+
+    def _hash(image):
+        try:
+            return perceptual_hash(image, method)
+        except (IOError, ValueError, SyntaxError) as err:  # broken images
+            logging.warning(f'Failed to hash image {image!r}, skipped - {err!r}')
+            return None
+
+    hashes = np.zeros((len(images),), dtype=np.uint64)
+    success = np.zeros((len(images),), dtype=bool)
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        results = pool.map(_hash, images)
+        for i, value in enumerate(tqdm(results, total=len(images), desc='Hash images', disable=silent)):
+            if value is not None:
+                hashes[i], success[i] = value, True
+    return hashes, success
+
+
+def _band_keys(hashes: np.ndarray, n_bands: int) -> np.ndarray:
+    bounds = np.linspace(0, 64, n_bands + 1).astype(np.int64)
+    keys = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        mask = np.uint64((1 << int(end - start)) - 1)
+        keys.append((hashes >> np.uint64(start)) & mask)
+    return np.stack(keys, axis=1)
+
+
+def _expand_ranges(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """
+    Concatenation of ``arange(start, start + count)`` of each range.
+    """
+    offsets = np.cumsum(counts) - counts
+    return np.repeat(starts - offsets, counts) + np.arange(int(counts.sum()))
+
+
+def _probe_masks(width: int, bits: int) -> np.ndarray:
+    """
+    Non-zero masks of a band with ``width`` bits, flipping no more than ``bits`` of them.
+    """
+    masks = [
+        sum(1 << i for i in flipped)
+        for n in range(1, min(bits, width) + 1)
+        for flipped in itertools.combinations(range(width), n)
+    ]
+    return np.asarray(masks, dtype=np.uint64)
+
+
+def _candidate_pairs(old_hashes: np.ndarray, new_hashes: np.ndarray, n_bands: int = 4, max_distance: int = 3,
+                     max_bucket_size: Optional[int] = 1024) -> np.ndarray:
+    """
+    Candidate pairs ``(i, j)`` with ``i < j`` among the new hashes, and between the old and new hashes.
+    The new hashes are indexed after the old ones. The pairs whose values of any band are within
+    ``max_distance // n_bands`` bits, and within ``max_distance`` hamming distance, are returned in sorted order.
+    In the buckets with more than ``max_bucket_size`` images, only the images adjacent in the order of full hashes
+    are paired, and the probed neighbor buckets with more images are skipped.
+    """
+    n_old, n_new = old_hashes.shape[0], new_hashes.shape[0]
+    if n_new == 0:
+        return np.zeros((0, 2), dtype=np.int64)
+    all_hashes = np.concatenate([old_hashes, new_hashes])
+    old_keys, new_keys = _band_keys(old_hashes, n_bands), _band_keys(new_hashes, n_bands)
+    bounds = np.linspace(0, 64, n_bands + 1).astype(np.int64)
+    pairs_x, pairs_y = [], []
+    for band in range(n_bands):
+        old_band, new_band = old_keys[:, band], new_keys[:, band]
+        old_order = np.argsort(old_band, kind='stable')
+        sorted_old = old_band[old_order]
+        left = np.searchsorted(sorted_old, new_band, side='left')
+        old_counts = np.searchsorted(sorted_old, new_band, side='right') - left
+
+        new_order = np.argsort(new_band, kind='stable')
+        sorted_new = new_band[new_order]
+        run_starts = np.flatnonzero(np.concatenate([[True], sorted_new[1:] != sorted_new[:-1]]))
+        run_lengths = np.diff(np.concatenate([run_starts, [n_new]]))
+        new_counts = np.empty((n_new,), dtype=np.int64)
+        new_counts[new_order] = np.repeat(run_lengths, run_lengths)
+        if max_bucket_size is not None:
+            oversized = old_counts + new_counts > max_bucket_size
+        else:
+            oversized = np.zeros((n_new,), dtype=bool)
+
+        # new vs old, with the sorted old keys
+        counts = np.where(oversized, 0, old_counts)
+        pairs_x.append(old_order[_expand_ranges(left, counts)])
+        pairs_y.append(np.repeat(np.arange(n_new), counts) + n_old)
+
+        # new vs new, each position is paired with the following ones of the same key
+        positions = np.arange(n_new)
+        counts = np.repeat(run_starts + run_lengths, run_lengths) - positions - 1
+        counts[oversized[new_order]] = 0
+        pairs_x.append(np.repeat(new_order, counts) + n_old)
+        pairs_y.append(new_order[_expand_ranges(positions + 1, counts)] + n_old)
+
+        if oversized.any():
+            # the members of oversized buckets are sorted by their full hashes, and only the adjacent ones
+            # are paired, so the (near-)identical images in them are still chained into groups
+            bucket_keys = np.unique(new_band[oversized])
+            logging.warning(f'{bucket_keys.shape[0]!r} buckets of band {band!r} have more than '
+                            f'{max_bucket_size!r} images, only the images with adjacent hashes are paired in them.')
+            old_members = np.flatnonzero(np.isin(old_band, bucket_keys))
+            new_members = np.flatnonzero(oversized)
+            members = np.concatenate([old_members, new_members + n_old])
+            member_keys = np.concatenate([old_band[old_members], new_band[new_members]])
+            order = np.lexsort((all_hashes[members], member_keys))
+            members, member_keys = members[order], member_keys[order]
+            adjacent = (member_keys[1:] == member_keys[:-1]) & ((members[1:] >= n_old) | (members[:-1] >= n_old))
+            pairs_x.append(members[:-1][adjacent])
+            pairs_y.append(members[1:][adjacent])
+
+        # neighbor values of the band, (i, j) and (j, i) are both found and deduplicated below
+        for mask in _probe_masks(int(bounds[band + 1] - bounds[band]), max_distance // n_bands):
+            probes = new_band ^ mask
+            for sorted_keys, order, offset in [(sorted_old, old_order, 0), (sorted_new, new_order, n_old)]:
+                left = np.searchsorted(sorted_keys, probes, side='left')
+                counts = np.searchsorted(sorted_keys, probes, side='right') - left
+                if max_bucket_size is not None:
+                    counts[counts > max_bucket_size] = 0
+                pairs_x.append(np.repeat(np.arange(n_new), counts) + n_old)
+                pairs_y.append(order[_expand_ranges(left, counts)] + offset)
+
+    x, y = np.concatenate(pairs_x).astype(np.int64), np.concatenate(pairs_y).astype(np.int64)
+    x, y = np.minimum(x, y), np.maximum(x, y)
+    unique_keys = np.unique(x * (n_old + n_new) + y)
+    x, y = unique_keys // (n_old + n_new), unique_keys % (n_old + n_new)
+    keep = _hamming(all_hashes[x], all_hashes[y]) <= max_distance
+    return np.stack([x[keep], y[keep]], axis=1)
+
+
+def _lpips_pair_differences(load: Callable[[int], Image.Image], pairs: np.ndarray, batch_size: int = 16,
+                            silent: bool = False) -> np.ndarray:
+    """
+    LPIPS differences of the pairs, the images are loaded by index with ``load``. The pairs are verified in
+    batches of ``batch_size``, only the images of the current batch are loaded and extracted.
+    """
+    diffs = np.zeros((pairs.shape[0],), dtype=np.float32)
+    with tqdm(total=pairs.shape[0], desc='Verify pairs', disable=silent) as pbar:
+        for start in range(0, pairs.shape[0], batch_size):
+            batch = pairs[start:start + batch_size]
+            indices, positions = np.unique(batch, return_inverse=True)
+            positions = positions.reshape(batch.shape)
+            features = lpips_extract_feature([load(int(i)) for i in indices])
+            diffs[start:start + batch.shape[0]] = _batch_lpips_difference(
+                tuple(feat[positions[:, 0]] for feat in features),
+                tuple(feat[positions[:, 1]] for feat in features),
+            ).reshape(batch.shape[0])
+            pbar.update(batch.shape[0])
+    return diffs
+
+
+def _groups(n: int, pairs: np.ndarray) -> List[List[int]]:
+    """
+    Connected components (with at least 2 items) of the duplicate pairs.
+    """
+    if pairs.shape[0] == 0:
+        return []
+    graph = sparse.coo_matrix(
+        (np.ones((pairs.shape[0],), dtype=np.int8), (pairs[:, 0], pairs[:, 1])),
+        shape=(n, n),
+    )
+    _, labels = connected_components(graph, directed=False)
+    order = np.argsort(labels, kind='stable')
+    groups = np.split(order, np.flatnonzero(np.diff(labels[order])) + 1)
+    return sorted([group.tolist() for group in groups if group.shape[0] > 1])
+
+
+def find_near_duplicates(images: MultiImagesTyping, method: HashMethodTyping = 'phash', max_distance: int = 3,
+                         n_bands: int = 4, lpips_threshold: float = 0.45, max_bucket_size: Optional[int] = 1024,
+                         batch_size: int = 16, workers: int = 4, silent: bool = False) -> List[List[int]]:
+    """
+    Find the groups of near-duplicate images.
+
+    :param images: The images.
+    :type images: MultiImagesTyping
+    :param method: Perceptual hash method, see :func:`perceptual_hash`. Default is ``phash``.
+    :type method: Literal['phash', 'dhash']
+    :param max_distance: Max hamming distance of the hashes of candidate pairs. Default is ``3``, i.e.
+        ``n_bands - 1``, for which only the exactly matched bands are looked up. Larger ones probe the neighbor
+        values of the bands, see the note of this module.
+    :type max_distance: int
+    :param n_bands: Number of bands the hashes are split into. Default is ``4``.
+    :type n_bands: int
+    :param lpips_threshold: Max LPIPS difference of duplicates. Default is ``0.45``,
+        the same as :func:`imgutils.metrics.lpips_clustering`.
+    :type lpips_threshold: float
+    :param max_bucket_size: In the buckets with more images, only the images adjacent in the order of hashes
+        are paired (with a warning logged), which avoids quadratic candidates of large duplicate clusters or
+        degenerated hashes (e.g. blank images), while the identical ones are still grouped.
+        ``None`` means no limit. Default is ``1024``.
+    :type max_bucket_size: Optional[int]
+    :param batch_size: Number of candidate pairs in each batch of LPIPS verification. Default is ``16``.
+    :type batch_size: int
+    :param workers: Number of threads hashing the images. Default is ``4``.
+    :type workers: int
+    :param silent: Do not show the progress bars. Default is ``False``.
+    :type silent: bool
+    :return: Groups of the indices of duplicate images, each group has at least 2 images.
+        The broken images are skipped.
+    :rtype: List[List[int]]
+
+    Examples::
+        >>> from imgutils.metrics import find_near_duplicates
+        >>>
+        >>> images = [f'lpips/{i}.jpg' for i in range(1, 10)]
+        >>> find_near_duplicates(images)
+        [[0, 1, 2], [3, 4]]
+    """
+    if batch_size < 1:
+        raise ValueError(f'Batch size should be no less than 1, but {batch_size!r} found.')
+    hashes, success = _hash_images(images, method, workers, silent)
+    rows = np.flatnonzero(success)
+    pairs = _candidate_pairs(np.zeros((0,), dtype=np.uint64), hashes[rows],
+                             n_bands, max_distance, max_bucket_size)
+    pairs = rows[pairs]
+    diffs = _lpips_pair_differences(lambda i: load_image(images[i], mode='RGB'), pairs, batch_size, silent)
+    return _groups(len(images), pairs[diffs <= lpips_threshold])
+
+
+_INDEX_VERSION = 1
+_META_FILE = 'meta.json'
+_HASHES_FILE = 'hashes.bin'
+_SOURCES_FILE = 'sources.jsonl'
+_PAIRS_FILE = 'pairs.bin'
+
+
+class NearDuplicateIndex:
+    """
+    Persistent near-duplicate index of image files, for incremental deduplication of large datasets.
+
+    The perceptual hashes and the source paths of images, and the verified duplicate pairs are stored
+    in append-only files of a directory. When new images are added, only the pairs between the new images
+    and the pairs between new and indexed images are checked. The images of verified candidates are
+    loaded again from their paths, so the image files should be kept.
+
+    :param directory: Directory of the index. An existing index is opened, otherwise a new one is created.
+    :type directory: str
+    :param method: Perceptual hash method, see :func:`perceptual_hash`. Default is ``phash``.
+    :type method: Literal['phash', 'dhash']
+    :param max_distance: Max hamming distance of the hashes of candidate pairs. Default is ``3``, i.e.
+        ``n_bands - 1``, for which only the exactly matched bands are looked up. Larger ones probe the neighbor
+        values of the bands, see the note of this module.
+    :type max_distance: int
+    :param n_bands: Number of bands the hashes are split into. Default is ``4``.
+    :type n_bands: int
+    :param lpips_threshold: Max LPIPS difference of duplicates. Default is ``0.45``.
+    :type lpips_threshold: float
+    :param max_bucket_size: In the buckets with more images, only the images adjacent in the order of hashes
+        are paired. ``None`` means no limit. Default is ``1024``.
+    :type max_bucket_size: Optional[int]
+
+    :raises ValueError: If the hash method or bands are not consistent with the existing index.
+
+    Examples::
+        >>> import glob
+        >>> from imgutils.metrics import NearDuplicateIndex
+        >>>
+        >>> index = NearDuplicateIndex('dedup_index')
+        >>> index.add(sorted(glob.glob('scrape_1/*.jpg')))  # number of new duplicate pairs
+        132
+        >>> index.add(sorted(glob.glob('scrape_2/*.jpg')))  # only compared with the new images
+        57
+        >>> index.groups()[0]
+        ['scrape_1/1001.jpg', 'scrape_1/1002.jpg', 'scrape_2/17.jpg']
+    """
+
+    def __init__(self, directory: str, method: HashMethodTyping = 'phash', max_distance: int = 3,
+                 n_bands: int = 4, lpips_threshold: float = 0.45, max_bucket_size: Optional[int] = 1024):
+        self.directory = directory
+        self.max_distance = max_distance
+        self.lpips_threshold = lpips_threshold
+        self.max_bucket_size = max_bucket_size
+        meta_file = os.path.join(directory, _META_FILE)
+        if os.path.exists(meta_file):
+            with open(meta_file, 'r') as f:
+                meta = json.load(f)
+            if (meta['method'], meta['n_bands']) != (method, n_bands):
+                raise ValueError(f'Hash method {meta["method"]!r} with {meta["n_bands"]!r} bands of existing index '
+                                 f'{directory!r} is not consistent with {method!r} with {n_bands!r} bands.')
+            self._meta = meta
+        else:
+            if method not in ('phash', 'dhash'):
+                raise ValueError(f'Unknown hash method - {method!r}.')
+            os.makedirs(directory, exist_ok=True)
+            self._meta = {'version': _INDEX_VERSION, 'method': method, 'n_bands': n_bands,
+                          'count': 0, 'pair_count': 0}
+            self._save_meta()
+
+        self._sources: List[str] = []
+        self._sources_size = 0
+        sources_file = self._path(_SOURCES_FILE)
+        if os.path.exists(sources_file):
+            with open(sources_file, 'rb') as f:
+                for line in f:
+                    if len(self._sources) >= self._meta['count']:
+                        break  # not committed by the last writing
+                    self._sources.append(json.loads(line))
+                    self._sources_size += len(line)
+        self._source_set = set(self._sources)
+
+    def __len__(self):
+        return self._meta['count']
+
+    def __contains__(self, file: str) -> bool:
+        return file in self._source_set
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} directory: {self.directory!r}, images: {len(self)!r}, ' \
+               f'duplicate pairs: {self._meta["pair_count"]!r}, method: {self.method!r}>'
+
+    @property
+    def method(self) -> str:
+        """
+        Perceptual hash method of the index.
+        """
+        return self._meta['method']
+
+    @property
+    def sources(self) -> List[str]:
+        """
+        Paths of the indexed images, in the order of adding.
+        """
+        return list(self._sources)
+
+    @property
+    def hashes(self) -> np.ndarray:
+        """
+        Perceptual hashes of the indexed images, as ``uint64`` array.
+        """
+        return np.fromfile(self._path(_HASHES_FILE), dtype=np.uint64, count=len(self)) \
+            if len(self) else np.zeros((0,), dtype=np.uint64)
+
+    @property
+    def pairs(self) -> np.ndarray:
+        """
+        Verified duplicate pairs of the indexed images, as indices with shape ``(K, 2)``.
+        """
+        count = self._meta['pair_count']
+        if count == 0:
+            return np.zeros((0, 2), dtype=np.int64)
+        return np.fromfile(self._path(_PAIRS_FILE), dtype=np.int64, count=count * 2).reshape(count, 2)
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+    def _save_meta(self):
+        save_json_atomic(self._path(_META_FILE), self._meta)
+
+    def add(self, files: List[str], batch_size: int = 16, workers: int = 4, silent: bool = False) -> int:
+        """
+        Add image files into the index, and find their duplicates among themselves and the indexed images.
+
+        The files already in the index and the broken images are skipped, so an interrupted run can be resumed
+        by adding the same files again. The images and pairs are committed together at the end, so for a very
+        large dataset, add the files in chunks to commit the progress.
+
+        :param files: Paths of the image files.
+        :type files: List[str]
+        :param batch_size: Number of candidate pairs in each batch of LPIPS verification. Default is ``16``.
+        :type batch_size: int
+        :param workers: Number of threads hashing the images. Default is ``4``.
+        :type workers: int
+        :param silent: Do not show the progress bars. Default is ``False``.
+        :type silent: bool
+        :return: Number of the new duplicate pairs.
+        :rtype: int
+        """
+        if batch_size < 1:
+            raise ValueError(f'Batch size should be no less than 1, but {batch_size!r} found.')
+        files = list(dict.fromkeys(file for file in files if file not in self._source_set))
+        if not files:
+            return 0
+
+        new_hashes, success = _hash_images(files, self.method, workers, silent)
+        files = [file for file, ok in zip(files, success.tolist()) if ok]
+        new_hashes = new_hashes[success]
+        sources = self._sources + files
+        pairs = _candidate_pairs(self.hashes, new_hashes, self._meta['n_bands'],
+                                 self.max_distance, self.max_bucket_size)
+        diffs = _lpips_pair_differences(lambda i: load_image(sources[i], mode='RGB'), pairs, batch_size, silent)
+        pairs = pairs[diffs <= self.lpips_threshold]
+
+        count, pair_count = len(self), self._meta['pair_count']
+        sources_data = b''.join(json.dumps(file).encode('utf-8') + b'\n' for file in files)
+        append_truncated(self._path(_HASHES_FILE), count * 8, new_hashes.astype(np.uint64).tobytes())
+        append_truncated(self._path(_SOURCES_FILE), self._sources_size, sources_data)
+        append_truncated(self._path(_PAIRS_FILE), pair_count * 16, pairs.astype(np.int64).tobytes())
+
+        # the meta file is the commit point
+        self._meta['count'] = count + len(files)
+        self._meta['pair_count'] = pair_count + pairs.shape[0]
+        self._save_meta()
+        self._sources.extend(files)
+        self._source_set.update(files)
+        self._sources_size += len(sources_data)
+        return int(pairs.shape[0])
+
+    def groups(self) -> List[List[str]]:
+        """
+        Groups of the duplicate images, each group has at least 2 images.
+
+        :return: Groups of image paths.
+        :rtype: List[List[str]]
+        """
+        return [[self._sources[i] for i in group] for group in _groups(len(self), self.pairs)]
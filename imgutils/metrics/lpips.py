@@ -26,6 +26,7 @@ from imgutils.utils import open_onnx_model
 __all__ = [
     'lpips_extract_feature',
     'lpips_difference',
+    'lpips_batch_differences',
     'lpips_clustering',
 ]
 
@@ -43,7 +44,7 @@ def _lpips_feature_model():
     return open_onnx_model(hf_hub_download(
         'deepghs/imgutils-models',
         'lpips/lpips_feature.onnx',
-    ))
+    ), batchable=True)
 
 
 def lpips_extract_feature(image: MultiImagesTyping) \
@@ -142,13 +143,78 @@ def lpips_difference(img1: AutoFeatTyping, img2: AutoFeatTyping) -> float:
     return _batch_lpips_difference(img1, img2).item()
 
 
-def lpips_clustering(images: MultiImagesTyping, threshold: float = 0.45) -> List[int]:
+def lpips_batch_differences(images: MultiImagesTyping, batch_size: int = 16, pair_batch_size: int = 64,
+                            silent: bool = True) -> np.ndarray:
+    """
+    Overview:
+        Calculate the LPIPS differences between each pair of images.
+
+        The features are extracted in batches of ``batch_size`` images, and the pairs are run on the difference
+        model in batches of ``pair_batch_size`` pairs, instead of one model run for each pair. Only the pairs
+        ``(i, j)`` with ``i < j`` are calculated, the matrix is filled symmetrically.
+
+    :param images: List of multiple images.
+    :param batch_size: Number of images in each batch of feature extraction. Default is ``16``.
+    :param pair_batch_size: Number of pairs in each batch of difference model. Default is ``64``.
+    :param silent: Do not show the progress bars. Default is ``True``.
+    :return: Float32 matrix of differences with shape ``(N, N)``, the diagonal is ``0``.
+
+    Example:
+        >>> from imgutils.metrics import lpips_batch_differences
+        >>>
+        >>> lpips_batch_differences(['lpips/1.jpg', 'lpips/2.jpg', 'lpips/4.jpg'])
+        array([[0.        , 0.16922694, 0.6897575 ],
+               [0.16922694, 0.        , 0.6823138 ],
+               [0.6897575 , 0.6823138 , 0.        ]], dtype=float32)
+
+    .. note::
+        The features of all the images are kept in memory (about 6.4MB for each image).
+    """
+    if batch_size < 1:
+        raise ValueError(f'Batch size should be no less than 1, but {batch_size!r} found.')
+    if pair_batch_size < 1:
+        raise ValueError(f'Pair batch size should be no less than 1, but {pair_batch_size!r} found.')
+    images = load_images(images, mode='RGB')
+    n = len(images)
+    result = np.zeros((n, n), dtype=np.float32)
+    if n < 2:
+        return result
+
+    features = None
+    with tqdm(total=n, leave=False, desc='Extract features', disable=silent) as progress:
+        for start in range(0, n, batch_size):
+            batch_feats = lpips_extract_feature(images[start:start + batch_size])
+            if features is None:  # preallocate the features of all the images
+                features = [np.empty((n, *feat.shape[1:]), dtype=feat.dtype) for feat in batch_feats]
+            for feat, batch_feat in zip(features, batch_feats):
+                feat[start:start + batch_feat.shape[0]] = batch_feat
+            progress.update(len(batch_feats[0]))
+
+    rows, cols = np.triu_indices(n, k=1)
+    with tqdm(total=rows.shape[0], leave=False, desc='Metrics', disable=silent) as progress:
+        for start in range(0, rows.shape[0], pair_batch_size):
+            xs, ys = rows[start:start + pair_batch_size], cols[start:start + pair_batch_size]
+            diffs = _batch_lpips_difference(
+                tuple(feat[xs] for feat in features),
+                tuple(feat[ys] for feat in features),
+            ).reshape(xs.shape[0])
+            result[xs, ys] = diffs
+            result[ys, xs] = diffs
+            progress.update(xs.shape[0])
+
+    return result
+
+
+def lpips_clustering(images: MultiImagesTyping, threshold: float = 0.45,
+                     batch_size: int = 16, pair_batch_size: int = 64) -> List[int]:
     """
     Overview:
         Clustering images with LPIPS metrics.
 
     :param images: List of multiple images.
     :param threshold: Threshold of clustering. Default value ``0.45`` is recommended.
+    :param batch_size: Number of images in each batch of feature extraction. Default is ``16``.
+    :param pair_batch_size: Number of pairs in each batch of difference model. Default is ``64``.
     :return: Clustering result with LPIPS, each integer represent one group, ``-1`` means this is a noise sample.
 
     Example:
@@ -165,23 +231,7 @@ def lpips_clustering(images: MultiImagesTyping, threshold: float = 0.45) -> List
         >>> lpips_clustering(images)
         [0, 0, 0, 1, 1, -1, -1, -1, -1]
     """
-    images = load_images(images, mode='RGB')
-    n = len(images)
-
-    feat_list = [lpips_extract_feature(image) for image in tqdm(images, leave=False, desc='Extract features')]
-    progress = tqdm(total=n * (n + 1) // 2, leave=False, desc='Metrics')
-
-    @lru_cache(maxsize=n * (n + 1) // 2)
-    def _cached_metric(x, y):
-        result = lpips_difference(feat_list[x], feat_list[y])
-        progress.update(1)
-        return result
-
-    def img_sim_metric(x, y):
-        x, y = int(min(x, y)), int(max(x, y))
-        return _cached_metric(x, y)
-
-    samples = np.array(range(n)).reshape(-1, 1)
-    clustering = DBSCAN(eps=threshold, min_samples=2, metric=img_sim_metric).fit(samples)
-    progress.close()
+    differences = lpips_batch_differences(images, batch_size, pair_batch_size, silent=False)
+    # differences are computed in advance, tiny negative ones are not accepted by precomputed metric
+    clustering = DBSCAN(eps=threshold, min_samples=2, metric='precomputed').fit(np.maximum(differences, 0.0))
     return clustering.labels_.tolist()
@@ -3,12 +3,12 @@ Overview:
     A tool for obscuring specified regions on an image.
 """
 from functools import lru_cache
-from typing import Tuple, Type, List, Optional
+from typing import Tuple, Type, List, Optional, Union
 
 from PIL import Image, ImageFilter
 
 from ..data import ImageTyping, load_image
-from ..detect import detect_censors
+from ..detect import detect_censors, Detections
 
 
 class BaseCensor:
@@ -262,7 +262,7 @@ def _get_censor_instance(name: str) -> BaseCensor:
 
 
 def censor_areas(image: ImageTyping, method: str,
-                 areas: List[Tuple[float, float, float, float]], **kwargs) -> Image.Image:
+                 areas: Union[List[Tuple[float, float, float, float]], Detections], **kwargs) -> Image.Image:
     """
     Applies censoring to specific areas of an image using the registered censor method.
 
@@ -273,8 +273,9 @@ def censor_areas(image: ImageTyping, method: str,
     :type method: str
 
     :param areas: A list of tuples representing the rectangular areas to be censored
-        in the format ``(x0, y0, x1, y1)``.
-    :type areas: List[Tuple[float, float, float, float]]
+        in the format ``(x0, y0, x1, y1)``. :class:`imgutils.detect.detections.Detections` object is also
+        supported, all of its boxes will be censored.
+    :type areas: Union[List[Tuple[float, float, float, float]], Detections]
 
     :param kwargs: Additional keyword arguments to be passed to the censor method.
 
@@ -310,6 +311,8 @@ def censor_areas(image: ImageTyping, method: str,
     """
     image = load_image(image, mode='RGB')
     c = _get_censor_instance(method)
+    if isinstance(areas, Detections):
+        areas = areas.boxes.tolist()
     for x0, y0, x1, y1 in areas:
         image = c.censor_area(image, (int(x0), int(y0), int(x1), int(y1)), **kwargs)
 
@@ -9,17 +9,18 @@ Overview:
         :align: center
 """
 import os.path
+import random
 from functools import lru_cache
-from typing import Optional, List
+from typing import Optional, List, Dict
 
-import pandas as pd
+import numpy as np
 from PIL import Image
 from filelock import FileLock
 from hfutils.index import hf_tar_file_download
 from huggingface_hub import hf_hub_download
 
 from ..data import load_image
-from ..utils import get_storage_dir
+from ..utils import get_storage_dir, load_csv_table
 
 __all__ = [
     'BackgroundImageSet',
@@ -34,20 +35,39 @@ _BG_REPO = 'deepghs/anime-bg'
 
 
 @lru_cache()
-def _global_df() -> pd.DataFrame:
+def _global_table() -> Dict[str, np.ndarray]:
     """
-    Load the global dataframe containing information about background images.
+    Load the global table containing information about background images.
 
-    :return: The global dataframe containing information about background images.
-    :rtype: pd.DataFrame
+    :return: The columns of the global table containing information about background images.
+    :rtype: Dict[str, np.ndarray]
     """
-    return pd.read_csv(hf_hub_download(
+    return load_csv_table(hf_hub_download(
         repo_id=_BG_REPO,
         repo_type='dataset',
         filename='images.csv'
     ))
 
 
+def _select_nearest(dist: np.ndarray, strict_level: float, min_selected: int) -> np.ndarray:
+    """
+    Select the items much closer than the average, or the ``min_selected`` nearest ones.
+
+    :return: Indices of the selected items, in the order of distance.
+    :rtype: np.ndarray
+    """
+    order = np.argsort(dist, kind='stable')
+    dist = dist[order]
+    if len(dist) > 1:
+        idx = dist < (dist.mean() - dist.std(ddof=1) * strict_level)
+    else:
+        idx = np.zeros_like(dist, dtype=bool)
+    idx[:max(min_selected, 1)] = True
+    if len(dist) > 0:
+        idx |= dist <= dist[idx].max()
+    return order[idx]
+
+
 @lru_cache()
 def _bg_root_dir() -> str:
     """
@@ -90,46 +110,45 @@ class BackgroundImageSet:
         :param min_resolution: The minimum resolution of background images to consider. (default: None)
         :type min_resolution: Optional[int]
         """
-        df = _global_df().copy()
+        table = _global_table()
+        widths, heights = table['width'], table['height']
+        idx = np.ones_like(widths, dtype=bool)
         if min_width:
-            df = df[df['width'] >= min_width]
+            idx &= widths >= min_width
         if min_height:
-            df = df[df['height'] >= min_height]
+            idx &= heights >= min_height
         if min_resolution:
-            df = df[(df['height'] * df['width']) >= min_resolution ** 2]
+            idx &= (heights * widths) >= min_resolution ** 2
+        selected = np.where(idx)[0]
+        widths, heights = widths[selected], heights[selected]
 
         if width and height:
             r1, r2 = width / height, height / width
-            df['dx'] = (df['width'] / df['height'] - r1).abs() + (df['height'] / df['width'] - r2).abs()
-            df = df.sort_values(['dx'], ascending=[True])
-            df['i'] = range(len(df))
-            idx = df['dx'] < (df['dx'].mean() - df['dx'].std() * strict_level)
-            idx = idx | (df['i'] < max(min_selected, 1))
-            idx = idx | (df['dx'] <= df[idx]['dx'].max())
-            df = df[idx]
+            dx = np.abs(widths / heights - r1) + np.abs(heights / widths - r2)
+            selected = selected[_select_nearest(dx, strict_level, min_selected)]
         elif width and not height:
-            df['dist'] = (df['width'] - width).abs()
-            df = df.sort_values(['dist'], ascending=[True])
-            df['i'] = range(len(df))
-            idx = df['dist'] < (df['dist'].mean() - df['dist'].std() * strict_level)
-            idx = idx | (df['i'] < max(min_selected, 1))
-            idx = idx | (df['dist'] <= df[idx]['dist'].max())
-            df = df[idx]
+            selected = selected[_select_nearest(np.abs(widths - width), strict_level, min_selected)]
         elif not width and height:
-            df['dist'] = (df['height'] - height).abs()
-            df = df.sort_values(['dist'], ascending=[True])
-            df['i'] = range(len(df))
-            idx = df['dist'] < (df['dist'].mean() - df['dist'].std() * strict_level)
-            idx = idx | (df['i'] < max(min_selected, 1))
-            idx = idx | (df['dist'] <= df[idx]['dist'].max())
-            df = df[idx]
+            selected = selected[_select_nearest(np.abs(heights - height), strict_level, min_selected)]
         else:
             pass
 
-        self.df = df
-        if len(self.df) == 0:
+        if len(selected) == 0:
             raise ValueError('No background images selected, please lower your settings.')
-        self._map = {item['filename']: item for item in self.df.to_dict('records')}
+        self._table = {name: column[selected] for name, column in table.items()}
+        self._filenames: List[str] = self._table['filename'].tolist()
+        self._map = {
+            item['filename']: item for item in
+            (dict(zip(self._table.keys(), values)) for values in zip(*(c.tolist() for c in self._table.values())))
+        }
+
+    @property
+    def df(self):
+        """
+        Selected background images as a ``pandas.DataFrame``, kept for compatibility.
+        """
+        import pandas as pd
+        return pd.DataFrame(self._table)
 
     def list_image_files(self) -> List[str]:
         """
@@ -138,7 +157,7 @@ class BackgroundImageSet:
         :return: A list of filenames of background images.
         :rtype: List[str]
         """
-        return self.df['filename'].tolist()
+        return list(self._filenames)
 
     def get_image_file(self, filename: str) -> str:
         """
@@ -165,7 +184,7 @@ class BackgroundImageSet:
         return load_image(self.get_image_file(filename), mode='RGB')
 
     def _random_filename(self):
-        return self.df['filename'].sample(n=1).tolist()[0]
+        return random.choice(self._filenames)
 
     def random_image_file(self) -> str:
         """
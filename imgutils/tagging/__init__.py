@@ -8,12 +8,15 @@ Overview:
         :align: center
 
 """
-from .blacklist import is_blacklisted, drop_blacklisted_tags
-from .character import is_basic_character_tag, drop_basic_character_tags
-from .deepdanbooru import get_deepdanbooru_tags
+from .blacklist import is_blacklisted, drop_blacklisted_tags, drop_blacklisted_tags_batch
+from .caption import caption_images
+from .character import is_basic_character_tag, drop_basic_character_tags, drop_basic_character_tags_batch
+from .deepdanbooru import get_deepdanbooru_tags, get_deepdanbooru_tag_vocabulary
 from .format import tags_to_text, add_underline, remove_underline
-from .match import tag_match_suffix, tag_match_prefix, tag_match_full
-from .mldanbooru import get_mldanbooru_tags
+from .inverted import TagInvertedIndex
+from .match import tag_match_suffix, tag_match_prefix, tag_match_full, TagMatcher
+from .mldanbooru import get_mldanbooru_tags, get_mldanbooru_tags_batch
 from .order import sort_tags
-from .overlap import drop_overlap_tags
-from .wd14 import get_wd14_tags
+from .overlap import drop_overlap_tags, drop_overlap_tags_batch
+from .vocab import TagVocabulary
+from .wd14 import get_wd14_tags, get_wd14_tags_batch, get_wd14_tag_vocabulary
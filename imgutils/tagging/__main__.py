@@ -0,0 +1,57 @@
+"""
+Command line tool for captioning datasets, see :func:`imgutils.tagging.caption_images`.
+
+Usage::
+
+    python -m imgutils.tagging dataset/ shard-000.tar --batch-size 32 --workers 8
+"""
+import argparse
+import logging
+from typing import Optional, List
+
+from .caption import caption_images
+from .wd14 import _DEFAULT_MODEL_NAME
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog='python -m imgutils.tagging',
+        description='Caption images in directories or tar shards with wd14 tagger.',
+    )
+    parser.add_argument('inputs', nargs='+', help='Directories, tar shards or image files.')
+    parser.add_argument('--model', dest='model_name', default=_DEFAULT_MODEL_NAME,
+                        help=f'Name of wd14 model. Default is {_DEFAULT_MODEL_NAME!r}.')
+    parser.add_argument('--general-threshold', type=float, default=0.35, help='Threshold of general tags.')
+    parser.add_argument('--character-threshold', type=float, default=0.85, help='Threshold of character tags.')
+    parser.add_argument('--batch-size', type=int, default=16, help='Number of images tagged at once.')
+    parser.add_argument('--workers', type=int, default=4, help='Number of threads decoding images.')
+    parser.add_argument('--jsonl', dest='jsonl_file', default=None,
+                        help='Append captions to this JSONL file instead of writing .txt files.')
+    parser.add_argument('--output-dir', default=None,
+                        help='Directory of .txt files. Default is next to the images.')
+    parser.add_argument('--keep-overlap', dest='drop_overlap', action='store_false',
+                        help='Keep overlapping tags.')
+    parser.add_argument('--drop-blacklisted', action='store_true', help='Drop blacklisted tags.')
+    parser.add_argument('--drop-basic-character', action='store_true', help='Drop basic character tags.')
+    parser.add_argument('--no-characters', dest='with_characters', action='store_false',
+                        help='Do not include character tags in captions.')
+    parser.add_argument('--sort', dest='sort_mode', choices=['original', 'shuffle', 'score'], default='score',
+                        help='Order of tags in captions.')
+    parser.add_argument('--use-spaces', action='store_true', help='Use spaces instead of underlines in captions.')
+    parser.add_argument('--no-escape', dest='use_escape', action='store_false',
+                        help='Do not escape brackets in captions.')
+    parser.add_argument('--overwrite', action='store_true', help='Caption the already captioned images again.')
+    parser.add_argument('--silent', action='store_true', help='Do not show progress bar.')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = _parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    stats = caption_images(**vars(args))
+    logging.info(f'{stats["captioned"]} images captioned, {stats["skipped"]} skipped, {stats["failed"]} failed, '
+                 f'{stats["seconds"]:.1f}s in total, {stats["images_per_second"]:.2f} images/s.')
+
+
+if __name__ == '__main__':
+    main()
@@ -3,11 +3,11 @@ Overview:
     Detect and drop some blacklisted tags, which are listed `here <https://huggingface.co/datasets/alea31415/tag_filtering/blob/main/blacklist_tags.txt>`_.
 """
 from functools import lru_cache
-from typing import Union, List, Mapping, Set, Optional, Tuple
+from typing import Union, List, Mapping, Optional, Tuple
 
 from huggingface_hub import hf_hub_download
 
-from .match import _words_to_matcher, _split_to_words
+from .match import TagMatcher
 
 
 @lru_cache()
@@ -26,23 +26,19 @@ def _load_online_blacklist() -> List[str]:
         return [line.strip() for line in f if line.strip()]
 
 
-@lru_cache()
-def _online_blacklist_set() -> Set[Tuple[str, ...]]:
+@lru_cache(maxsize=16)
+def _get_blacklist_matcher(use_presets: bool = True, custom_blacklist: Tuple[str, ...] = ()) -> TagMatcher:
     """
-    Get the online blacklist as a set.
-
-    :return: Set of blacklisted tags.
-    :rtype: Set[str]
+    Get the compiled matcher of the blacklist.
+
+    :param use_presets: Whether to use the online blacklist presets.
+    :type use_presets: bool
+    :param custom_blacklist: Custom blacklisted tags.
+    :type custom_blacklist: Tuple[str, ...]
+    :return: Compiled matcher of the blacklisted tags.
+    :rtype: TagMatcher
     """
-    set_ = set()
-    for tag in _load_online_blacklist():
-        set_ = set_ | _words_to_matcher(_split_to_words(tag))
-    return set_
-
-
-def _is_blacklisted(tag: str, blacklist_set: Set[Tuple[str, ...]]) -> bool:
-    _tag_matcher = _words_to_matcher(_split_to_words(tag))
-    return bool(set(_tag_matcher & blacklist_set))
+    return TagMatcher(words=[*(_load_online_blacklist() if use_presets else []), *custom_blacklist])
 
 
 def is_blacklisted(tag: str) -> bool:
@@ -66,7 +62,7 @@ def is_blacklisted(tag: str) -> bool:
         >>> is_blacklisted('red_hair')
         False
     """
-    return _is_blacklisted(tag, _online_blacklist_set())
+    return _get_blacklist_matcher(True, ()).match(tag)
 
 
 def drop_blacklisted_tags(tags: Union[List[str], Mapping[str, float]],
@@ -96,15 +92,35 @@ def drop_blacklisted_tags(tags: Union[List[str], Mapping[str, float]],
         >>> drop_blacklisted_tags(['solo', '1girl', 'cosplay', 'no_eyewear'])
         ['solo', '1girl']
     """
-    blacklist = set()
-    if use_presets:
-        blacklist = blacklist | _online_blacklist_set()
-    for tag in (custom_blacklist or []):
-        blacklist = blacklist | _words_to_matcher(_split_to_words(tag))
-
-    if isinstance(tags, dict):
-        return {tag: value for tag, value in tags.items() if not _is_blacklisted(tag, blacklist)}
-    elif isinstance(tags, list):
-        return [tag for tag in tags if not _is_blacklisted(tag, blacklist)]
-    else:
+    if not isinstance(tags, (dict, list)):
         raise TypeError(f"Unsupported types of tags, dict or list expected, but {tags!r} found.")
+    return _get_blacklist_matcher(bool(use_presets), tuple(custom_blacklist or ())).filter(tags)
+
+
+def drop_blacklisted_tags_batch(tags_list: List[Union[List[str], Mapping[str, float]]],
+                                use_presets: bool = True, custom_blacklist: Optional[List[str]] = None) \
+        -> List[Union[List[str], Mapping[str, float]]]:
+    """
+    Drop blacklisted tags from each of the given lists or mappings of tags.
+
+    :param tags_list: List of tag lists or mappings to be filtered.
+    :type tags_list: List[Union[List[str], Mapping[str, float]]]
+    :param use_presets: Whether to use the online blacklist presets, defaults to True.
+    :type use_presets: bool, optional
+    :param custom_blacklist: Custom blacklist to be used, defaults to None.
+    :type custom_blacklist: Optional[List[str]], optional
+    :return: List of filtered tags, in the same order and types as the given items.
+    :rtype: List[Union[List[str], Mapping[str, float]]]
+    :raises TypeError: If any of the items is neither a list nor a dictionary.
+
+    Examples::
+        >>> from imgutils.tagging import drop_blacklisted_tags_batch
+        >>>
+        >>> drop_blacklisted_tags_batch([
+        ...     ['solo', '1girl', 'cosplay'],
+        ...     {'solo': 1.0, 'no_eyewear': 0.6},
+        ... ])
+        [['solo', '1girl'], {'solo': 1.0}]
+    """
+    matcher = _get_blacklist_matcher(bool(use_presets), tuple(custom_blacklist or ()))
+    return [matcher.filter(tags) for tags in tags_list]
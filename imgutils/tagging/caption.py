@@ -0,0 +1,320 @@
+"""
+Overview:
+    Caption the images of whole datasets for training, e.g. LoRA dataset preparation.
+
+    The images in directories or tar shards are decoded in a thread pool, tagged in batches with
+    :func:`imgutils.tagging.get_wd14_tags_batch`, filtered with the tag filters of this module and
+    written as ``.txt`` caption files next to the images, or as lines of a JSONL file.
+
+    It can also be used as a command line tool, see ``python -m imgutils.tagging --help``.
+
+    .. code:: shell
+
+        python -m imgutils.tagging dataset/ --batch-size 32 --workers 8 --drop-blacklisted
+"""
+import io
+import json
+import logging
+import os
+import posixpath
+import tarfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Iterator, Tuple, Optional, Callable, Dict, Any, Literal
+
+from PIL import Image
+
+from .blacklist import drop_blacklisted_tags
+from .character import drop_basic_character_tags
+from .format import tags_to_text
+from .order import sort_tags
+from .wd14 import get_wd14_tags_batch, _DEFAULT_MODEL_NAME
+from ..utils import tqdm
+
+__all__ = [
+    'caption_images',
+]
+
+_IMAGE_EXTS = {ext for ext, format_ in Image.registered_extensions().items() if format_ in Image.OPEN}
+
+
+def _safe_member_path(name: str) -> Optional[str]:
+    """
+    Normalized relative path of a tar member, ``None`` if it is absolute or goes outside with ``..``.
+    """
+    path = posixpath.normpath(name.replace('\\', '/'))
+    if posixpath.isabs(path) or os.path.splitdrive(path)[0] or path == '..' or path.startswith('../'):
+        return None
+    return path
+
+
+def _is_image_file(filename: str) -> bool:
+    return os.path.splitext(filename)[1].lower() in _IMAGE_EXTS
+
+
+def _iter_sources(inputs: List[str], output_dir: Optional[str]) \
+        -> Iterator[Tuple[str, Optional[str], Callable[[], Image.Image]]]:
+    """
+    Iterate the images in the inputs, yields the key of image, the path of caption file and the loader of image.
+    """
+
+    def _file_loader(path):
+        def _load():
+            image = Image.open(path)
+            image.load()
+            return image
+
+        return _load
+
+    def _bytes_loader(data):
+        def _load():
+            image = Image.open(io.BytesIO(data))
+            image.load()
+            return image
+
+        return _load
+
+    def _unsafe_loader(name):
+        def _load():
+            raise ValueError(f'Unsafe path of tar member {name!r}, absolute or outside the shard.')
+
+        return _load
+
+    for input_ in inputs:
+        if os.path.isdir(input_):
+            for root, dirs, files in os.walk(input_):
+                dirs.sort()
+                for file in sorted(files):
+                    if _is_image_file(file):
+                        path = os.path.join(root, file)
+                        if output_dir:
+                            txt_file = os.path.join(output_dir, os.path.relpath(path, input_))
+                        else:
+                            txt_file = path
+                        yield path, os.path.splitext(txt_file)[0] + '.txt', _file_loader(path)
+
+        elif tarfile.is_tarfile(input_):
+            shard_name = os.path.splitext(os.path.basename(input_))[0]
+            shard_dir = os.path.join(output_dir or os.path.dirname(input_), shard_name)
+            with tarfile.open(input_, 'r') as tar:
+                for member in tar:
+                    if member.isfile() and _is_image_file(member.name):
+                        member_path = _safe_member_path(member.name)
+                        if member_path is None:  # never write outside the shard directory
+                            yield f'{input_}::{member.name}', None, _unsafe_loader(member.name)
+                            continue
+                        txt_file = os.path.join(shard_dir, os.path.splitext(member_path)[0] + '.txt')
+                        # members are read sequentially in this thread, only decoded in the workers
+                        data = tar.extractfile(member).read()
+                        yield f'{input_}::{member.name}', txt_file, _bytes_loader(data)
+
+        elif os.path.isfile(input_) and _is_image_file(input_):
+            path = input_
+            if output_dir:
+                txt_file = os.path.join(output_dir, os.path.basename(path))
+            else:
+                txt_file = path
+            yield path, os.path.splitext(txt_file)[0] + '.txt', _file_loader(path)
+
+        else:
+            raise FileNotFoundError(f'Input {input_!r} is not a directory, tar shard or image file.')
+
+
+def _chunks(iterator, size):
+    chunk = []
+    for item in iterator:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _safe_load(loader):
+    try:
+        return loader(), None
+    except Exception as err:
+        return None, err
+
+
+def caption_images(
+        inputs: List[str],
+        jsonl_file: Optional[str] = None,
+        output_dir: Optional[str] = None,
+        model_name: str = _DEFAULT_MODEL_NAME,
+        general_threshold: float = 0.35,
+        character_threshold: float = 0.85,
+        drop_overlap: bool = True,
+        drop_blacklisted: bool = False,
+        drop_basic_character: bool = False,
+        with_characters: bool = True,
+        sort_mode: Literal['original', 'shuffle', 'score'] = 'score',
+        use_spaces: bool = False,
+        use_escape: bool = True,
+        overwrite: bool = False,
+        batch_size: int = 16,
+        workers: int = 4,
+        silent: bool = False,
+) -> Dict[str, Any]:
+    """
+    Caption the images in directories or tar shards.
+
+    For each image, the tags are predicted with :func:`imgutils.tagging.get_wd14_tags_batch`, filtered
+    (overlapping tags, blacklisted tags and basic character tags, when enabled), sorted with
+    :func:`imgutils.tagging.sort_tags` and formatted with :func:`imgutils.tagging.tags_to_text`.
+    The character tags are put before the general tags.
+
+    :param inputs: Directories (searched recursively), tar shards or image files.
+    :type inputs: List[str]
+    :param jsonl_file: Write the captions as lines of this JSONL file (appended) instead of ``.txt`` files.
+        Each line contains ``file``, ``caption``, ``rating``, ``general`` and ``character``.
+        Default is ``None`` which means writing ``.txt`` files.
+    :type jsonl_file: Optional[str]
+    :param output_dir: Directory of the ``.txt`` files, with the same relative paths as the images.
+        Default is ``None`` which means next to the images. The captions of tar shards are written into a
+        directory named after the shard, next to the shard or in ``output_dir``.
+    :type output_dir: Optional[str]
+    :param model_name: Name of the wd14 model. Default is ``SwinV2_v3``.
+    :type model_name: str
+    :param general_threshold: Threshold of general tags. Default is ``0.35``.
+    :type general_threshold: float
+    :param character_threshold: Threshold of character tags. Default is ``0.85``.
+    :type character_threshold: float
+    :param drop_overlap: Drop overlapping tags. Default is ``True``.
+    :type drop_overlap: bool
+    :param drop_blacklisted: Drop blacklisted tags. Default is ``False``.
+    :type drop_blacklisted: bool
+    :param drop_basic_character: Drop basic character tags (e.g. hair color), usually used when training
+        character LoRA. Default is ``False``.
+    :type drop_basic_character: bool
+    :param with_characters: Include character tags in the captions. Default is ``True``.
+    :type with_characters: bool
+    :param sort_mode: Mode of :func:`imgutils.tagging.sort_tags`. Default is ``score``.
+    :type sort_mode: Literal['original', 'shuffle', 'score']
+    :param use_spaces: Use spaces instead of ``_`` in captions. Default is ``False``.
+    :type use_spaces: bool
+    :param use_escape: Escape the brackets in captions. Default is ``True``.
+    :type use_escape: bool
+    :param overwrite: Caption the images which are already captioned again. Default is ``False``,
+        which means resuming by skipping the images whose ``.txt`` file exists or which are in the JSONL file.
+    :type overwrite: bool
+    :param batch_size: Number of images tagged at once. Default is ``16``.
+    :type batch_size: int
+    :param workers: Number of threads decoding the images. Default is ``4``.
+    :type workers: int
+    :param silent: Do not show the progress bar. Default is ``False``.
+    :type silent: bool
+    :return: Statistics with ``captioned``, ``skipped`` and ``failed`` image counts, ``seconds`` spent
+        and ``images_per_second``.
+    :rtype: Dict[str, Any]
+
+    Examples::
+        >>> from imgutils.tagging import caption_images
+        >>>
+        >>> caption_images(['dataset/'], batch_size=32, workers=8, drop_blacklisted=True)
+        {'captioned': 1024, 'skipped': 0, 'failed': 0, 'seconds': 98.2, 'images_per_second': 10.4}
+    """
+    if batch_size < 1:
+        raise ValueError(f'Batch size should be no less than 1, but {batch_size!r} found.')
+
+    done_keys = set()
+    if jsonl_file and not overwrite and os.path.exists(jsonl_file):
+        valid_size = 0
+        with open(jsonl_file, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # last line truncated by an interrupted run
+                valid_size += len(line)
+                if line.strip():
+                    try:
+                        done_keys.add(json.loads(line)['file'])
+                    except (ValueError, KeyError, TypeError) as err:
+                        logging.warning(f'Invalid line in {jsonl_file!r}, skipped - {err!r}')
+        if valid_size < os.path.getsize(jsonl_file):
+            logging.warning(f'Truncated last line of {jsonl_file!r} dropped.')
+            with open(jsonl_file, 'r+b') as f:
+                f.truncate(valid_size)
+
+    stats = {'captioned': 0, 'skipped': 0, 'failed': 0}
+
+    def _pending():
+        for key, txt_file, loader in _iter_sources(inputs, output_dir):
+            if not overwrite and (key in done_keys if jsonl_file else
+                                  txt_file is not None and os.path.exists(txt_file)):
+                stats['skipped'] += 1
+                continue
+            yield key, txt_file, loader
+
+    def _caption(general: Dict[str, float], character: Dict[str, float]) -> str:
+        if drop_blacklisted:
+            general = drop_blacklisted_tags(general)
+        if drop_basic_character:
+            general = drop_basic_character_tags(general)
+        tags = {tag: general[tag] for tag in sort_tags(general, mode=sort_mode)}
+        if with_characters:
+            tags = {**character, **tags}
+        return tags_to_text(tags, use_spaces=use_spaces, use_escape=use_escape, score_descend=False)
+
+    jsonl_f = open(jsonl_file, 'a', encoding='utf-8') if jsonl_file else None
+    start_time = time.time()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool, \
+                tqdm(desc='Captioning', unit='img', silent=silent) as pbar:
+            chunks = _chunks(_pending(), batch_size)
+            next_chunk = next(chunks, None)
+            next_futures = [pool.submit(_safe_load, loader) for _, _, loader in next_chunk] if next_chunk else []
+            while next_chunk:
+                chunk, futures = next_chunk, next_futures
+                # decode the next batch while tagging this one
+                next_chunk = next(chunks, None)
+                next_futures = [pool.submit(_safe_load, loader) for _, _, loader in next_chunk] \
+                    if next_chunk else []
+
+                loaded = []
+                for (key, txt_file, _), future in zip(chunk, futures):
+                    image, err = future.result()
+                    if err is not None:
+                        logging.warning(f'Failed to load image {key!r}, skipped - {err!r}')
+                        stats['failed'] += 1
+                    else:
+                        loaded.append((key, txt_file, image))
+                if not loaded:
+                    continue
+
+                results = get_wd14_tags_batch(
+                    [image for _, _, image in loaded],
+                    model_name=model_name,
+                    general_threshold=general_threshold,
+                    character_threshold=character_threshold,
+                    drop_overlap=drop_overlap,
+                    batch_size=batch_size,
+                )
+                for (key, txt_file, _), (rating, general, character) in zip(loaded, results):
+                    caption = _caption(general, character)
+                    if jsonl_f:
+                        jsonl_f.write(json.dumps({
+                            'file': key, 'caption': caption,
+                            'rating': rating, 'general': general, 'character': character,
+                        }, ensure_ascii=False) + '\n')
+                    else:
+                        if os.path.dirname(txt_file):
+                            os.makedirs(os.path.dirname(txt_file), exist_ok=True)
+                        # partial files of interrupted runs should not be taken as done
+                        tmp_file = f'{txt_file}.tmp'
+                        with open(tmp_file, 'w', encoding='utf-8') as f:
+                            f.write(caption)
+                        os.replace(tmp_file, txt_file)
+                    stats['captioned'] += 1
+
+                if jsonl_f:
+                    jsonl_f.flush()
+                pbar.update(len(chunk))
+    finally:
+        if jsonl_f:
+            jsonl_f.close()
+
+    seconds = time.time() - start_time
+    stats['seconds'] = seconds
+    stats['images_per_second'] = stats['captioned'] / seconds if seconds > 0 else 0.0
+    return stats
@@ -2,9 +2,9 @@
 Overview:
     Detect and drop character-related basic tags.
 """
-from typing import Union, List, Mapping, Tuple, Dict, Set, Optional
+from typing import Union, List, Mapping, Optional, Iterable
 
-from .match import _split_to_words, _words_to_matcher
+from .match import TagMatcher
 
 CHAR_WHITELIST_SUFFIX = [
     'anal_hair',
@@ -83,147 +83,6 @@ CHAR_PREFIXES = [
     'hair over', 'hair between', 'facial',
 ]
 
-_WordTupleTyping = Tuple[str, ...]
-
-
-class _WordPool:
-    """
-    Helper class to manage  character tags.
-    """
-
-    def __init__(self, words: Optional[List[str]] = None):
-        """
-        Initialize a _WordPool instance.
-
-        :param words: A list of words to include, defaults to None
-        :type words: Optional[List[str]], optional
-        """
-        self._words: Dict[int, Set[_WordTupleTyping]] = {}
-        for word in (words or []):
-            self._append(word)
-
-    def _append(self, text: str):
-        """
-        Append a word to the pool.
-
-        :param text: The word to append
-        :type text: str
-        """
-        for item in _words_to_matcher(_split_to_words(text)):
-            if len(item) not in self._words:
-                self._words[len(item)] = set()
-            self._words[len(item)].add(item)
-
-    def __contains__(self, text: str):
-        """
-        Check if a given text equals to any word from the pool.
-
-        :param text: The text to check
-        :type text: str
-        :return: True if the text equals to a word, False otherwise
-        :rtype: bool
-        """
-        words = tuple(_split_to_words(text))
-        return len(words) in self._words and words in self._words[len(words)]
-
-
-class _SuffixPool:
-    """
-    Helper class to manage suffixes for character tags.
-    """
-
-    def __init__(self, suffixes: Optional[List[str]] = None):
-        """
-        Initialize a SuffixPool instance.
-
-        :param suffixes: A list of suffixes to include, defaults to None
-        :type suffixes: Optional[List[str]], optional
-        """
-        self._suffixes: Dict[int, Set[_WordTupleTyping]] = {}
-        for suffix in (suffixes or []):
-            self._append(suffix)
-
-    def _append(self, text: str):
-        """
-        Append a suffix to the pool.
-
-        :param text: The suffix to append
-        :type text: str
-        """
-        for item in _words_to_matcher(_split_to_words(text)):
-            if len(item) not in self._suffixes:
-                self._suffixes[len(item)] = set()
-            self._suffixes[len(item)].add(item)
-
-    def __contains__(self, text: str):
-        """
-        Check if a given text contains any suffix from the pool.
-
-        :param text: The text to check
-        :type text: str
-        :return: True if the text contains a suffix, False otherwise
-        :rtype: bool
-        """
-        words = _split_to_words(text)
-        for length, tpl_set in self._suffixes.items():
-            if length > len(words):
-                continue
-
-            seg = [] if length == 0 else words[-length:]
-            if _words_to_matcher(seg) & tpl_set:
-                return True
-
-        return False
-
-
-class _PrefixPool:
-    """
-    Helper class to manage prefixes for character tags.
-    """
-
-    def __init__(self, prefixes: Optional[List[str]] = None):
-        """
-        Initialize a PrefixPool instance.
-
-        :param prefixes: A list of prefixes to include, defaults to None
-        :type prefixes: Optional[List[str]], optional
-        """
-        self._prefixes: Dict[int, Set[_WordTupleTyping]] = {}
-        for prefix in (prefixes or []):
-            self._append(prefix)
-
-    def _append(self, text: str):
-        """
-        Append a prefix to the pool.
-
-        :param text: The prefix to append
-        :type text: str
-        """
-        for item in _words_to_matcher(_split_to_words(text), enable_forms=False):
-            if len(item) not in self._prefixes:
-                self._prefixes[len(item)] = set()
-            self._prefixes[len(item)].add(item)
-
-    def __contains__(self, text: str):
-        """
-        Check if a given text contains any prefix from the pool.
-
-        :param text: The text to check
-        :type text: str
-        :return: True if the text contains a prefix, False otherwise
-        :rtype: bool
-        """
-        words = _split_to_words(text)
-        for length, tpl_set in self._prefixes.items():
-            if length > len(words):
-                continue
-
-            seg = words[:length]
-            if _words_to_matcher(seg, enable_forms=False) & tpl_set:
-                return True
-
-        return False
-
 
 class CharacterTagPool:
     """
@@ -243,22 +102,30 @@ class CharacterTagPool:
 
         :param whitelist_suffixes: A list of whitelisted suffixes, defaults to None
         :type whitelist_suffixes: Optional[List[str]], optional
+        :param whitelist_prefixes: A list of whitelisted prefixes, defaults to None
+        :type whitelist_prefixes: Optional[List[str]], optional
+        :param whitelist_words: A list of whitelisted words, defaults to None
+        :type whitelist_words: Optional[List[str]], optional
         :param suffixes: A list of suffixes to consider, defaults to None
         :type suffixes: Optional[List[str]], optional
         :param prefixes: A list of prefixes to consider, defaults to None
         :type prefixes: Optional[List[str]], optional
         """
-        self._whitelist_suffix = _SuffixPool(whitelist_suffixes or CHAR_WHITELIST_SUFFIX)
-        self._whitelist_prefix = _PrefixPool(whitelist_prefixes or CHAR_WHITELIST_PREFIX)
-        self._whitelist_words = _WordPool(whitelist_words or CHAR_WHITELIST_WORD)
-        self._suffixes = _SuffixPool(suffixes or CHAR_SUFFIXES)
-        self._prefixes = _PrefixPool(prefixes or CHAR_PREFIXES)
+        self._whitelist = TagMatcher(
+            words=whitelist_words or CHAR_WHITELIST_WORD,
+            prefixes=whitelist_prefixes or CHAR_WHITELIST_PREFIX,
+            suffixes=whitelist_suffixes or CHAR_WHITELIST_SUFFIX,
+        )
+        self._common = TagMatcher(
+            prefixes=prefixes or CHAR_PREFIXES,
+            suffixes=suffixes or CHAR_SUFFIXES,
+        )
 
     def _is_in_whitelist(self, tag: str) -> bool:
-        return (tag in self._whitelist_words) or (tag in self._whitelist_suffix) or (tag in self._whitelist_prefix)
+        return self._whitelist.match(tag)
 
     def _is_in_common(self, tag: str) -> bool:
-        return (tag in self._suffixes) or (tag in self._prefixes)
+        return self._common.match(tag)
 
     def is_basic_character_tag(self, tag: str) -> bool:
         """
@@ -291,6 +158,29 @@ class CharacterTagPool:
         else:
             raise TypeError(f"Unsupported types of tags, dict or list expected, but {tags!r} found.")
 
+    def drop_basic_character_tags_batch(self, tags_list: List[Union[List[str], Mapping[str, float]]]) \
+            -> List[Union[List[str], Mapping[str, float]]]:
+        """
+        Drop basic character tags from each of the given lists or mappings of tags.
+
+        :param tags_list: The tags to process
+        :type tags_list: List[Union[List[str], Mapping[str, float]]]
+        :return: List of processed tags with basic character tags removed
+        :rtype: List[Union[List[str], Mapping[str, float]]]
+        """
+        return [self.drop_basic_character_tags(tags) for tags in tags_list]
+
+    def precompute(self, tags: Iterable[str]):
+        """
+        Compute and cache the results of the given tags in advance, e.g. the whole vocabulary of a tagger.
+
+        :param tags: The tags to compute
+        :type tags: Iterable[str]
+        """
+        tags = list(tags)
+        self._whitelist.precompute(tags)
+        self._common.precompute(tags)
+
 
 _DEFAULT_CHARACTER_POOL = CharacterTagPool()
 
@@ -350,3 +240,26 @@ def drop_basic_character_tags(tags: Union[List[str], Mapping[str, float]]) -> Un
         ['1girl', 'solo', 'chair', 'hear']
     """
     return _DEFAULT_CHARACTER_POOL.drop_basic_character_tags(tags)
+
+
+def drop_basic_character_tags_batch(tags_list: List[Union[List[str], Mapping[str, float]]]) \
+        -> List[Union[List[str], Mapping[str, float]]]:
+    """
+    Drop basic character tags from each of the given lists or mappings of tags.
+
+    :param tags_list: List of tag lists or mappings to be filtered.
+    :type tags_list: List[Union[List[str], Mapping[str, float]]]
+    :return: List of filtered tags, in the same order and types as the given items.
+    :rtype: List[Union[List[str], Mapping[str, float]]]
+    :raises TypeError: If any of the items is neither a list nor a dictionary.
+
+    Examples::
+        >>> from imgutils.tagging import drop_basic_character_tags_batch
+        >>>
+        >>> drop_basic_character_tags_batch([
+        ...     ['1girl', 'solo', 'red_hair', 'cat ears'],
+        ...     {'chair': 0.86, 'blue_eyes': 0.72},
+        ... ])
+        [['1girl', 'solo'], {'chair': 0.86}]
+    """
+    return _DEFAULT_CHARACTER_POOL.drop_basic_character_tags_batch(tags_list)
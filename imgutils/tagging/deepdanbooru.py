@@ -12,29 +12,48 @@ from functools import lru_cache
 from typing import Tuple, List
 
 import numpy as np
-import pandas as pd
 from PIL import Image
 from huggingface_hub import hf_hub_download
 
-from .overlap import drop_overlap_tags
+from .vocab import TagVocabulary
 from ..data import ImageTyping, load_image
-from ..utils import open_onnx_model
+from ..utils import open_onnx_model, load_csv_table
 
 
 @lru_cache()
 def _get_deepdanbooru_labels():
-    csv_file = hf_hub_download('deepghs/imgutils-models', 'deepdanbooru/deepdanbooru_tags.csv')
-    df = pd.read_csv(csv_file)
-
-    tag_names = df["name"].tolist()
-    tag_real_names = df['real_name'].tolist()
-    rating_indexes = list(np.where(df["category"] == 9)[0])
-    general_indexes = list(np.where(df["category"] == 0)[0])
-    character_indexes = list(np.where(df["category"] == 4)[0])
+    table = load_csv_table(hf_hub_download('deepghs/imgutils-models', 'deepdanbooru/deepdanbooru_tags.csv'))
+
+    tag_names = table["name"].tolist()
+    tag_real_names = table['real_name'].tolist()
+    rating_indexes = list(np.where(table["category"] == 9)[0])
+    general_indexes = list(np.where(table["category"] == 0)[0])
+    character_indexes = list(np.where(table["category"] == 4)[0])
     return tag_names, tag_real_names, \
         rating_indexes, general_indexes, character_indexes
 
 
+@lru_cache()
+def get_deepdanbooru_tag_vocabulary(use_real_name: bool = False) -> TagVocabulary:
+    """
+    Get the tag vocabulary of the deepdanbooru tagger, whose masks are aligned with the label index of the model.
+
+    :param use_real_name: Use real name on danbooru, the same as :func:`get_deepdanbooru_tags`.
+    :type use_real_name: bool
+    :return: The tag vocabulary, cached.
+    :rtype: TagVocabulary
+
+    Examples::
+        >>> from imgutils.tagging import get_deepdanbooru_tag_vocabulary
+        >>>
+        >>> vocab = get_deepdanbooru_tag_vocabulary()
+        >>> vocab.basic_character_mask  # aligned with the label index
+        array([False, False, False, ..., False, False, False])
+    """
+    tag_names, tag_real_names, _, _, _ = _get_deepdanbooru_labels()
+    return TagVocabulary(tag_real_names if use_real_name else tag_names)
+
+
 @lru_cache()
 def _get_deepdanbooru_model():
     return open_onnx_model(hf_hub_download(
@@ -120,11 +139,12 @@ def get_deepdanbooru_tags(image: ImageTyping, use_real_name: bool = False,
     rating = dict(ratings_names)
 
     # Then we have general tags: pick anywhere prediction confidence > threshold
-    general_names = [labels[i] for i in general_indexes]
-    general_res = [x for x in general_names if x[1] > general_threshold]
-    general_res = dict(general_res)
+    general_selected = np.zeros((len(labels),), dtype=bool)
+    general_selected[general_indexes] = probs[0][general_indexes] > general_threshold
     if drop_overlap:
-        general_res = drop_overlap_tags(general_res)
+        vocab = get_deepdanbooru_tag_vocabulary(use_real_name)
+        general_selected &= ~vocab.overlap_mask(general_selected)
+    general_res = dict(labels[i] for i in general_indexes if general_selected[i])
 
     # Everything else is characters: pick anywhere prediction confidence > threshold
     character_names = [labels[i] for i in character_indexes]
@@ -0,0 +1,326 @@
+"""
+Overview:
+    Inverted index of tags for dataset-level querying, e.g. finding the images with ``1girl`` and ``long_hair``
+    but not ``monochrome`` whose scores are higher than ``0.5``.
+
+    The index is built from the tagging results (e.g. of :func:`imgutils.tagging.get_wd14_tags`), and saved in
+    a directory as flat numpy arrays: for each tag, the sorted numbers of the images and their scores quantized
+    to one byte. So each (image, tag) pair takes 5 bytes on disk, and the arrays are memory-mapped when loaded.
+    The queries are evaluated by intersecting the sorted arrays, starting from the rarest tag.
+"""
+import json
+import os
+from typing import List, Mapping, Iterable, Tuple, Dict, Any, Optional, Union
+
+import numpy as np
+
+from .format import add_underline
+
+__all__ = [
+    'TagInvertedIndex',
+]
+
+_INDEX_VERSION = 1
+_META_FILE = 'meta.json'
+_TAGS_FILE = 'tags.json'
+_IMAGE_IDS_FILE = 'image_ids.jsonl'
+_OFFSETS_FILE = 'offsets.npy'
+_POSTINGS_FILE = 'postings.npy'
+_SCORES_FILE = 'scores.npy'
+
+
+def _quantize(scores: np.ndarray) -> np.ndarray:
+    return np.clip(np.round(np.asarray(scores, dtype=np.float64) * 255), 0, 255).astype(np.uint8)
+
+
+def _in_sorted(values: np.ndarray, sorted_array: np.ndarray) -> np.ndarray:
+    """
+    Boolean mask of the values which are in the sorted array, with binary searches.
+    """
+    if sorted_array.shape[0] == 0:
+        return np.zeros(values.shape, dtype=bool)
+    pos = np.searchsorted(sorted_array, values)
+    return sorted_array[np.minimum(pos, sorted_array.shape[0] - 1)] == values
+
+
+def _save_array(file: str, array: np.ndarray):
+    tmp_file = f'{file}.tmp.npy'
+    np.save(tmp_file, array)
+    os.replace(tmp_file, file)
+
+
+class TagInvertedIndex:
+    """
+    Inverted index of tags, loaded from a directory built by :meth:`build`.
+
+    The tag names are normalized with :func:`imgutils.tagging.add_underline`, so ``long hair`` and
+    ``long_hair`` are the same tag in both building and querying.
+
+    :param directory: Directory of the index.
+    :type directory: str
+
+    Examples::
+        >>> from imgutils.tagging import get_wd14_tags, TagInvertedIndex, tags_to_text
+        >>>
+        >>> files = ['1.jpg', '2.jpg', '3.jpg']
+        >>> TagInvertedIndex.build('tag_index', ((file, get_wd14_tags(file, fmt='tag')) for file in files))
+        >>>
+        >>> index = TagInvertedIndex('tag_index')
+        >>> index.query(all_of=['1girl', 'long_hair'], none_of=['monochrome'], threshold=0.5)
+        ['1.jpg', '3.jpg']
+        >>> index.query(all_of={'1girl': 0.9}, any_of=['smile', 'open_mouth'])
+        ['3.jpg']
+        >>> index.count('long_hair')
+        2
+        >>> tags_to_text(index.get_tags('1.jpg'))  # work with the formatters
+        '1girl, solo, long_hair, ...'
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, _META_FILE), 'r') as f:
+            self._meta = json.load(f)
+        with open(os.path.join(directory, _TAGS_FILE), 'r') as f:
+            self._tags: List[str] = json.load(f)
+        self._tag_ids = {tag: i for i, tag in enumerate(self._tags)}
+        with open(os.path.join(directory, _IMAGE_IDS_FILE), 'r') as f:
+            self._image_ids: List[Any] = [json.loads(line) for line in f]
+        self._image_numbers = {image_id: i for i, image_id in enumerate(self._image_ids)}
+
+        self._offsets = np.load(os.path.join(directory, _OFFSETS_FILE))
+        self._postings = np.load(os.path.join(directory, _POSTINGS_FILE), mmap_mode='r')
+        self._scores = np.load(os.path.join(directory, _SCORES_FILE), mmap_mode='r')
+
+    @classmethod
+    def build(cls, directory: str, items: Iterable[Tuple[Any, Mapping[str, float]]],
+              chunk_size: int = 65536) -> 'TagInvertedIndex':
+        """
+        Build an inverted index from the tagging results, and save it to the directory.
+
+        :param directory: Directory to save the index, existing index in it will be overwritten.
+        :type directory: str
+        :param items: Iterable of ``(image_id, tags)`` tuples, the ``image_id`` should be a unique ``str``
+            or ``int`` (e.g. the file path), and the ``tags`` is a mapping of tags and their scores
+            (e.g. the result of :func:`imgutils.tagging.get_wd14_tags` with ``fmt='tag'``).
+        :type items: Iterable[Tuple[Any, Mapping[str, float]]]
+        :param chunk_size: Number of (image, tag) pairs buffered before converted into arrays. Default is ``65536``.
+        :type chunk_size: int
+        :return: The built index.
+        :rtype: TagInvertedIndex
+        :raises ValueError: If the image ids are duplicated.
+
+        .. note::
+            The scores are quantized into ``round(score * 255)``, so the precision of the scores in the index is
+            about ``0.002``.
+        """
+        os.makedirs(directory, exist_ok=True)
+        tag_ids: Dict[str, int] = {}
+        image_ids, image_id_set = [], set()
+        tag_chunks, image_chunks, score_chunks = [], [], []
+        tag_buffer, image_buffer, score_buffer = [], [], []
+
+        def _flush():
+            if tag_buffer:
+                tag_chunks.append(np.asarray(tag_buffer, dtype=np.int32))
+                image_chunks.append(np.asarray(image_buffer, dtype=np.uint32))
+                score_chunks.append(_quantize(score_buffer))
+                tag_buffer.clear()
+                image_buffer.clear()
+                score_buffer.clear()
+
+        tmp_ids_file = os.path.join(directory, f'{_IMAGE_IDS_FILE}.tmp')
+        with open(tmp_ids_file, 'w') as ids_f:
+            for image_id, tags in items:
+                if image_id in image_id_set:
+                    raise ValueError(f'Duplicated image id - {image_id!r}.')
+                image_id_set.add(image_id)
+                number = len(image_ids)
+                image_ids.append(image_id)
+                ids_f.write(json.dumps(image_id) + '\n')
+
+                normalized: Dict[str, float] = {}
+                for tag, score in tags.items():
+                    tag = add_underline(tag)
+                    normalized[tag] = max(score, normalized.get(tag, score))
+                for tag, score in normalized.items():
+                    tag_id = tag_ids.setdefault(tag, len(tag_ids))
+                    tag_buffer.append(tag_id)
+                    image_buffer.append(number)
+                    score_buffer.append(score)
+                if len(tag_buffer) >= chunk_size:
+                    _flush()
+            _flush()
+
+        if tag_chunks:
+            tag_col = np.concatenate(tag_chunks)
+            image_col = np.concatenate(image_chunks)
+            score_col = np.concatenate(score_chunks)
+        else:
+            tag_col = np.zeros((0,), dtype=np.int32)
+            image_col = np.zeros((0,), dtype=np.uint32)
+            score_col = np.zeros((0,), dtype=np.uint8)
+        # images are added in order, so a stable sort by tag keeps the postings of each tag sorted
+        order = np.argsort(tag_col, kind='stable')
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(tag_col, minlength=len(tag_ids)))]).astype(np.int64)
+
+        _save_array(os.path.join(directory, _POSTINGS_FILE), image_col[order])
+        _save_array(os.path.join(directory, _SCORES_FILE), score_col[order])
+        _save_array(os.path.join(directory, _OFFSETS_FILE), offsets)
+        os.replace(tmp_ids_file, os.path.join(directory, _IMAGE_IDS_FILE))
+        with open(os.path.join(directory, _TAGS_FILE), 'w') as f:
+            json.dump(list(tag_ids.keys()), f)
+        with open(os.path.join(directory, _META_FILE), 'w') as f:
+            json.dump({'version': _INDEX_VERSION, 'images': len(image_ids), 'tags': len(tag_ids),
+                       'postings': int(tag_col.shape[0])}, f)
+
+        return cls(directory)
+
+    def __len__(self):
+        return len(self._image_ids)
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} directory: {self.directory!r}, images: {len(self)!r}, ' \
+               f'tags: {len(self._tags)!r}>'
+
+    @property
+    def tags(self) -> List[str]:
+        """
+        All the tags in the index.
+        """
+        return list(self._tags)
+
+    @property
+    def image_ids(self) -> List[Any]:
+        """
+        All the image ids in the index, in the order of building.
+        """
+        return list(self._image_ids)
+
+    def _posting(self, tag: str, threshold: float = 0.0) -> np.ndarray:
+        """
+        Sorted image numbers of the tag with score higher than the threshold.
+        """
+        tag_id = self._tag_ids.get(add_underline(tag))
+        if tag_id is None:
+            return np.zeros((0,), dtype=np.uint32)
+        begin, end = self._offsets[tag_id], self._offsets[tag_id + 1]
+        images = self._postings[begin:end]
+        if threshold > 0.0:
+            images = images[self._scores[begin:end] > threshold * 255]
+        return np.asarray(images)
+
+    def count(self, tag: str, threshold: float = 0.0) -> int:
+        """
+        Count the images with the given tag.
+
+        :param tag: The tag.
+        :type tag: str
+        :param threshold: Only count the images whose score of this tag is higher than it. Default is ``0.0``.
+        :type threshold: float
+        :return: Number of images.
+        :rtype: int
+        """
+        return int(self._posting(tag, threshold).shape[0])
+
+    def tag_counts(self) -> Dict[str, int]:
+        """
+        Number of images of all the tags, in descending order of count.
+
+        :return: A dict of tags and their counts.
+        :rtype: Dict[str, int]
+        """
+        counts = np.diff(self._offsets)
+        order = np.argsort(-counts, kind='stable')
+        return {self._tags[i]: int(counts[i]) for i in order.tolist()}
+
+    def query_numbers(self, all_of: Optional[Union[List[str], Mapping[str, float]]] = None,
+                      any_of: Optional[Union[List[str], Mapping[str, float]]] = None,
+                      none_of: Optional[Union[List[str], Mapping[str, float]]] = None,
+                      threshold: float = 0.0) -> np.ndarray:
+        """
+        The same as :meth:`query`, but returns the sorted numbers of the images (positions in :attr:`image_ids`).
+        """
+
+        def _thresholds(tags) -> List[Tuple[str, float]]:
+            if tags is None:
+                return []
+            elif isinstance(tags, Mapping):
+                return list(tags.items())
+            else:
+                return [(tag, threshold) for tag in tags]
+
+        result = None
+        # intersect from the rarest tag, so the arrays to check keep small
+        postings = sorted((self._posting(tag, t) for tag, t in _thresholds(all_of)), key=len)
+        for posting in postings:
+            result = posting if result is None else result[_in_sorted(result, posting)]
+            if result.shape[0] == 0:
+                return result
+
+        any_postings = [self._posting(tag, t) for tag, t in _thresholds(any_of)]
+        if any_postings:
+            union = np.unique(np.concatenate(any_postings))
+            result = union if result is None else result[_in_sorted(result, union)]
+        if result is None:
+            result = np.arange(len(self), dtype=np.uint32)
+
+        for tag, t in _thresholds(none_of):
+            if result.shape[0] == 0:
+                break
+            result = result[~_in_sorted(result, self._posting(tag, t))]
+
+        return result
+
+    def query(self, all_of: Optional[Union[List[str], Mapping[str, float]]] = None,
+              any_of: Optional[Union[List[str], Mapping[str, float]]] = None,
+              none_of: Optional[Union[List[str], Mapping[str, float]]] = None,
+              threshold: float = 0.0) -> List[Any]:
+        """
+        Query the images with boolean conditions of tags.
+
+        A tag is considered present on an image when its score is higher than the threshold.
+
+        :param all_of: Tags which should all be present. Can be a list of tags, or a mapping of tags to their
+            own thresholds. Default is ``None`` which means no limitation.
+        :type all_of: Optional[Union[List[str], Mapping[str, float]]]
+        :param any_of: Tags at least one of which should be present, in the same format as ``all_of``.
+            Default is ``None`` which means no limitation.
+        :type any_of: Optional[Union[List[str], Mapping[str, float]]]
+        :param none_of: Tags which should not be present, in the same format as ``all_of``.
+            Default is ``None`` which means no limitation.
+        :type none_of: Optional[Union[List[str], Mapping[str, float]]]
+        :param threshold: Default threshold of the tags given as lists. Default is ``0.0``.
+        :type threshold: float
+        :return: Ids of the matched images, in the order of building.
+        :rtype: List[Any]
+        """
+        numbers = self.query_numbers(all_of=all_of, any_of=any_of, none_of=none_of, threshold=threshold)
+        return [self._image_ids[i] for i in numbers.tolist()]
+
+    def get_tags(self, image_id, threshold: float = 0.0) -> Dict[str, float]:
+        """
+        Get the tags of an image, which can be used with :func:`imgutils.tagging.tags_to_text`
+        and :func:`imgutils.tagging.sort_tags`.
+
+        :param image_id: Id of the image.
+        :param threshold: Only return the tags with score higher than it. Default is ``0.0``.
+        :type threshold: float
+        :return: A dict of tags and their (quantized) scores, in descending order of score.
+        :rtype: Dict[str, float]
+        :raises KeyError: If the image id is not found.
+
+        .. note::
+            This scans the postings of all the tags, it is designed for inspecting some images,
+            not for exporting the whole dataset.
+        """
+        number = self._image_numbers[image_id]
+        tags = []
+        for tag_id, tag in enumerate(self._tags):
+            begin, end = int(self._offsets[tag_id]), int(self._offsets[tag_id + 1])
+            pos = begin + int(np.searchsorted(self._postings[begin:end], number))
+            if pos < end and self._postings[pos] == number:
+                score = float(self._scores[pos]) / 255
+                if score > threshold:
+                    tags.append((tag, score))
+        tags.sort(key=lambda x: -x[1])
+        return dict(tags)
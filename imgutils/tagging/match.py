@@ -1,6 +1,7 @@
 import re
+from collections import OrderedDict
 from functools import lru_cache
-from typing import List, Set, Tuple
+from typing import List, Set, Tuple, Optional, Iterable, Dict, Union, Mapping
 
 from hbutils.string import singular_form, plural_form
 
@@ -122,3 +123,179 @@ def tag_match_full(t1: str, t2: str) -> bool:
     _t1_words = _split_to_words(t1)
     _t2_words = _split_to_words(t2)
     return bool(_words_to_matcher(_t1_words) & _words_to_matcher(_t2_words))
+
+
+_TERMINAL = None
+
+
+def _word_forms(word: str) -> Tuple[str, ...]:
+    """
+    Get the word itself, its singular form and its plural form, without duplicates.
+
+    :param word: The input word.
+    :type word: str
+    :return: Tuple of the forms.
+    :rtype: Tuple[str, ...]
+    """
+    return tuple(dict.fromkeys((word, _cached_singular_form(word), _cache_plural_form(word))))
+
+
+def _trie_insert(trie: dict, words: Iterable[str]):
+    node = trie
+    for word in words:
+        node = node.setdefault(word, {})
+    node[_TERMINAL] = True
+
+
+def _trie_walk(node: dict, words: Iterable[str]) -> bool:
+    """
+    Walk the trie along the words, return ``True`` once a terminal node is reached.
+    """
+    if _TERMINAL in node:
+        return True
+    for word in words:
+        node = node.get(word)
+        if node is None:
+            return False
+        if _TERMINAL in node:
+            return True
+    return False
+
+
+class TagMatcher:
+    """
+    Compiled matcher of tags, checking if a tag fully matches any of the given words,
+    starts with any of the given prefixes or ends with any of the given suffixes.
+
+    The patterns are compiled into token tries only once, so a tag is checked with
+    one walk over its words instead of comparing with each pattern. The semantics are
+    the same as :func:`tag_match_full`, :func:`tag_match_prefix` and :func:`tag_match_suffix`,
+    i.e. spans and underlines do not matter, the last word of words and suffixes can be in
+    singular or plural form, while prefixes are matched exactly.
+
+    The results of the tags from :meth:`precompute` (e.g. the fixed vocabulary of a tagger) are kept, so checking
+    them is only a dict lookup. The results of other tags are kept in a LRU cache of at most ``cache_size`` tags,
+    so the memory is bounded in long-running services.
+
+    :param words: Words (or phrases) to be fully matched, defaults to None.
+    :type words: Optional[List[str]]
+    :param prefixes: Prefixes to match, defaults to None.
+    :type prefixes: Optional[List[str]]
+    :param suffixes: Suffixes to match, defaults to None.
+    :type suffixes: Optional[List[str]]
+    :param cache_size: Max number of cached results of the tags not precomputed, defaults to 4096.
+    :type cache_size: int
+
+    Examples::
+        >>> from imgutils.tagging import TagMatcher
+        >>>
+        >>> matcher = TagMatcher(words=['cosplay'], prefixes=['holding'], suffixes=['cat ear'])
+        >>> matcher.match('cosplay')
+        True
+        >>> matcher.match('holding_sword')
+        True
+        >>> matcher.match('red_cat_ears')  # plural form of the last word
+        True
+        >>> 'chair' in matcher
+        False
+        >>> matcher.filter(['1girl', 'holding sword', 'cat_ears', 'smile'])
+        ['1girl', 'smile']
+    """
+
+    def __init__(self, words: Optional[List[str]] = None, prefixes: Optional[List[str]] = None,
+                 suffixes: Optional[List[str]] = None, cache_size: int = 4096):
+        self._words: Set[Tuple[str, ...]] = set()
+        for word in (words or []):
+            self._words |= _words_to_matcher(_split_to_words(word))
+
+        self._prefix_trie = {}
+        for prefix in (prefixes or []):
+            _trie_insert(self._prefix_trie, _split_to_words(prefix))
+
+        # suffixes are stored in reversed order, the first token (last word) in all its forms
+        self._suffix_trie = {}
+        for suffix in (suffixes or []):
+            for item in _words_to_matcher(_split_to_words(suffix)):
+                _trie_insert(self._suffix_trie, reversed(item))
+
+        self._precomputed: Dict[str, bool] = {}
+        self._results: 'OrderedDict[str, bool]' = OrderedDict()
+        self._cache_size = cache_size
+
+    def _match_words(self, words: List[str]) -> bool:
+        if not words:
+            return () in self._words or _TERMINAL in self._prefix_trie or _TERMINAL in self._suffix_trie
+
+        if self._words:
+            head = tuple(words[:-1])
+            if any((*head, form) in self._words for form in _word_forms(words[-1])):
+                return True
+
+        if self._prefix_trie and _trie_walk(self._prefix_trie, words):
+            return True
+
+        if self._suffix_trie:
+            if _TERMINAL in self._suffix_trie:
+                return True
+            rest = words[-2::-1]
+            for form in _word_forms(words[-1]):
+                node = self._suffix_trie.get(form)
+                if node is not None and _trie_walk(node, rest):
+                    return True
+
+        return False
+
+    def match(self, tag: str) -> bool:
+        """
+        Check if the given tag matches any of the words, prefixes or suffixes.
+
+        :param tag: The tag to check.
+        :type tag: str
+        :return: True if matched, False otherwise.
+        :rtype: bool
+        """
+        result = self._precomputed.get(tag)
+        if result is not None:
+            return result
+
+        result = self._results.get(tag)
+        if result is not None:
+            self._results.move_to_end(tag)
+        else:
+            result = self._match_words(_split_to_words(tag))
+            self._results[tag] = result
+            if len(self._results) > self._cache_size:
+                self._results.popitem(last=False)
+        return result
+
+    def __contains__(self, tag: str) -> bool:
+        return self.match(tag)
+
+    def precompute(self, tags: Iterable[str]):
+        """
+        Compute and cache the results of the given tags in advance, e.g. the whole vocabulary of a tagger.
+
+        :param tags: The tags to compute.
+        :type tags: Iterable[str]
+        """
+        for tag in tags:
+            if tag not in self._precomputed:
+                result = self._results.pop(tag, None)
+                self._precomputed[tag] = result if result is not None else self._match_words(_split_to_words(tag))
+
+    def filter(self, tags: Union[List[str], Mapping[str, float]]) -> Union[List[str], Mapping[str, float]]:
+        """
+        Drop the matched tags from a list or mapping of tags.
+
+        :param tags: The tags to process.
+        :type tags: Union[List[str], Mapping[str, float]]
+        :return: Processed tags with the matched tags removed.
+        :rtype: Union[List[str], Mapping[str, float]]
+        :raises TypeError: If the input tags are neither a list nor a dictionary.
+        """
+        if isinstance(tags, dict):
+            return {tag: value for tag, value in tags.items() if not self.match(tag)}
+        elif isinstance(tags, list):
+            return [tag for tag in tags if not self.match(tag)]
+        else:
+            raise TypeError(f"Unsupported types of tags, dict or list expected, but {tags!r} found.")
@@ -4,16 +4,16 @@ Overview:
     `7eu7d7/ML-Danbooru <https://github.com/7eu7d7/ML-Danbooru>`_ .
 """
 from functools import lru_cache
-from typing import Tuple, List
+import math
+from typing import Tuple, List, Dict
 
 import numpy as np
-import pandas as pd
 from PIL import Image
 from huggingface_hub import hf_hub_download
 
 from .overlap import drop_overlap_tags
 from ..data import load_image, ImageTyping
-from ..utils import open_onnx_model
+from ..utils import open_onnx_model, load_csv_table
 
 
 @lru_cache()
@@ -49,12 +49,55 @@ def _to_tensor(image: Image.Image):
     return img.astype(np.float32) / 255
 
 
+def _bucket_shapes(size: int, align: int = 4, bucket_count: int = 9, max_ratio: float = 2.0) \
+        -> List[Tuple[int, int]]:
+    """
+    Get the aligned ``(width, height)`` shapes of the aspect ratio buckets.
+
+    The bucket ratios are evenly spaced in log scale between ``1 / max_ratio`` and ``max_ratio``,
+    and the shorter edge of each bucket is ``size``, the same as :func:`_resize_align` with ``keep_ratio``.
+    """
+    if bucket_count < 1:
+        raise ValueError(f'Bucket count should be no less than 1, but {bucket_count!r} found.')
+    if max_ratio < 1.0:
+        raise ValueError(f'Max ratio should be no less than 1.0, but {max_ratio!r} found.')
+
+    shapes = []
+    for log_ratio in np.linspace(-math.log(max_ratio), math.log(max_ratio), bucket_count) \
+            if bucket_count > 1 else [0.0]:
+        ratio = math.exp(log_ratio)
+        if ratio >= 1.0:
+            width, height = int(size * ratio), size
+        else:
+            width, height = size, int(size / ratio)
+        shapes.append(((width // align) * align, (height // align) * align))
+    return shapes
+
+
+def _resize_into_bucket(image: Image.Image, shape: Tuple[int, int]) -> Image.Image:
+    """
+    Resize the image to fit into the bucket shape keeping its ratio, and pad the rest with white.
+    """
+    width, height = shape
+    scale = min(width / image.width, height / image.height)
+    target_size = (
+        min(max(int(round(image.width * scale)), 1), width),
+        min(max(int(round(image.height * scale)), 1), height),
+    )
+    image = image.resize(target_size, resample=Image.BILINEAR)
+    if target_size == shape:
+        return image
+
+    canvas = Image.new('RGB', shape, (255, 255, 255))
+    canvas.paste(image, ((width - target_size[0]) // 2, (height - target_size[1]) // 2))
+    return canvas
+
+
 @lru_cache()
 def _get_mldanbooru_labels(use_real_name: bool = False) -> Tuple[List[str], List[int], List[int]]:
-    path = hf_hub_download('deepghs/imgutils-models', 'mldanbooru/mldanbooru_tags.csv')
-    df = pd.read_csv(path)
+    table = load_csv_table(hf_hub_download('deepghs/imgutils-models', 'mldanbooru/mldanbooru_tags.csv'))
 
-    return df["name"].tolist() if not use_real_name else df['real_name'].tolist()
+    return table["name"].tolist() if not use_real_name else table['real_name'].tolist()
 
 
 def get_mldanbooru_tags(image: ImageTyping, use_real_name: bool = False,
@@ -103,11 +146,86 @@ def get_mldanbooru_tags(image: ImageTyping, use_real_name: bool = False,
     model = _open_mldanbooru_model()
     native_output, = model.run(['output'], {'input': real_input})
 
-    output = (1 / (1 + np.exp(-native_output))).reshape(-1)
+    return _postprocess(native_output.reshape(-1), use_real_name, threshold, drop_overlap)
+
+
+def _postprocess(native_output: np.ndarray, use_real_name: bool = False,
+                 threshold: float = 0.7, drop_overlap: bool = False) -> Dict[str, float]:
+    output = 1 / (1 + np.exp(-native_output))
     tags = _get_mldanbooru_labels(use_real_name)
-    pairs = sorted([(tags[i], ratio) for i, ratio in enumerate(output)], key=lambda x: (-x[1], x[0]))
+    pairs = sorted([(tags[i], output[i]) for i in np.nonzero(output >= threshold)[0]], key=lambda x: (-x[1], x[0]))
 
-    general_tags = {tag: float(ratio) for tag, ratio in pairs if ratio >= threshold}
+    general_tags = {tag: float(ratio) for tag, ratio in pairs}
     if drop_overlap:
         general_tags = drop_overlap_tags(general_tags)
     return general_tags
+
+
+def get_mldanbooru_tags_batch(images: List[ImageTyping], use_real_name: bool = False,
+                              threshold: float = 0.7, size: int = 448, keep_ratio: bool = False,
+                              drop_overlap: bool = False, batch_size: int = 16,
+                              bucket_count: int = 9, max_ratio: float = 2.0) -> List[Dict[str, float]]:
+    """
+    Overview:
+        Tagging images with ML-Danbooru in batches.
+
+        When ``keep_ratio`` is enabled, the images are assigned to a small set of aspect ratio buckets
+        (the one with the closest ratio), resized to fit into the bucket shape and padded with white,
+        then each bucket is run in batches. More buckets means less padding but smaller batches.
+
+    :param images: Images to tagging.
+    :param use_real_name: Use real name on danbooru, the same as :func:`get_mldanbooru_tags`.
+    :param threshold: Threshold for tags, default is ``0.7``.
+    :param size: Size of the shorter edge when passing the resized images into model, default is ``448``.
+    :param keep_ratio: Keep the ratio between height and width (approximately, by bucket) when passing the images
+        into model, default is ``False``. When it is ``False``, the result is the same as :func:`get_mldanbooru_tags`.
+    :param drop_overlap: Drop overlap tags or not, default is ``False``.
+    :param batch_size: Maximum number of images in one model run, default is ``16``.
+    :param bucket_count: Number of aspect ratio buckets, default is ``9``.
+    :param max_ratio: Maximum aspect ratio (long edge to short edge) of the buckets, default is ``2.0``.
+        Images with more extreme ratios are padded into the widest or tallest bucket.
+    :return: List of tag dicts, one for each image.
+
+    Example:
+        >>> from imgutils.tagging import get_mldanbooru_tags_batch
+        >>>
+        >>> results = get_mldanbooru_tags_batch(['skadi.jpg', 'hutao.jpg'], keep_ratio=True)
+        >>> [tags['1girl'] > 0.99 for tags in results]
+        [True, True]
+    """
+    if batch_size < 1:
+        raise ValueError(f'Batch size should be no less than 1, but {batch_size!r} found.')
+    if keep_ratio:
+        shapes = _bucket_shapes(size, bucket_count=bucket_count, max_ratio=max_ratio)
+        log_ratios = np.log([width / height for width, height in shapes])
+    else:
+        shapes, log_ratios = None, None
+
+    images = list(images)
+    model = _open_mldanbooru_model()
+    results: List[Dict[str, float]] = [None] * len(images)
+    buckets: Dict[int, List[Tuple[int, np.ndarray]]] = {}
+
+    def _flush(bucket_id):
+        items = buckets.pop(bucket_id)
+        input_ = np.stack([tensor for _, tensor in items])
+        native_output, = model.run(['output'], {'input': input_})
+        for (index, _), row in zip(items, native_output.reshape(len(items), -1)):
+            results[index] = _postprocess(row, use_real_name, threshold, drop_overlap)
+
+    for i, image in enumerate(images):
+        image = load_image(image, mode='RGB')
+        if keep_ratio:
+            bucket_id = int(np.abs(log_ratios - math.log(image.width / image.height)).argmin())
+            tensor = _to_tensor(_resize_into_bucket(image, shapes[bucket_id]))
+        else:
+            bucket_id = 0
+            tensor = _to_tensor(_resize_align(image, size, keep_ratio=False))
+
+        buckets.setdefault(bucket_id, []).append((i, tensor))
+        if len(buckets[bucket_id]) >= batch_size:
+            _flush(bucket_id)
+
+    for bucket_id in list(buckets.keys()):
+        _flush(bucket_id)
+    return results
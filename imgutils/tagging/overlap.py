@@ -1,7 +1,6 @@
-import copy
 import json
 from functools import lru_cache
-from typing import Mapping, List, Union
+from typing import Mapping, List, Union, Dict, FrozenSet
 
 from huggingface_hub import hf_hub_download
 
@@ -27,16 +26,72 @@ def _get_overlap_tags() -> Mapping[str, List[str]]:
     return data
 
 
+@lru_cache()
+def _get_overlap_index() -> Dict[str, FrozenSet[str]]:
+    """
+    Compile the overlap tag information into an index for fast lookup.
+
+    :return: A dictionary where keys are tags and values are sets of their overlapping tags.
+    :rtype: Dict[str, FrozenSet[str]]
+    """
+    return {tag: frozenset(values) for tag, values in _get_overlap_tags().items() if values}
+
+
+def _is_substring_of_others(tags: List[str]) -> List[bool]:
+    """
+    Check if each tag is a substring of any other (different) tag in the list.
+
+    The tags are joined in the descending order of length, so the longer tags (the only possible superstrings
+    of a tag) form a prefix of the joined string, and each tag is checked with only one search over that prefix.
+
+    :param tags: A list of tags.
+    :type tags: List[str]
+    :return: A list of flags, ``True`` means the tag is contained by another tag.
+    :rtype: List[bool]
+    """
+    unique_tags = sorted(set(tags), key=len, reverse=True)
+    joined = '\0'.join(unique_tags)
+    ends, offset = {}, 0
+    for tag in unique_tags:
+        if len(tag) not in ends:
+            ends[len(tag)] = max(offset - 1, 0)
+        offset += len(tag) + 1
+
+    flags = {tag: joined.find(tag, 0, ends[len(tag)]) >= 0 for tag in unique_tags}
+    return [flags[tag] for tag in tags]
+
+
+def _drop_overlap_tag_list(tags: List[str]) -> List[str]:
+    overlap_index = _get_overlap_index()
+    tags_underscore = [tag.replace(' ', '_') for tag in tags]
+    tags_underscore_set = set(tags_underscore)
+    is_substring = _is_substring_of_others(tags)
+
+    result_tags = []
+    for tag, tag_, substring in zip(tags, tags_underscore, is_substring):
+        # Case 1: If the tag is a key and some of the associated values are in tags
+        overlap_values = overlap_index.get(tag_)
+        if overlap_values is not None and not overlap_values.isdisjoint(tags_underscore_set):
+            continue
+        # Case 2: If the tag is a substring of another tag
+        if substring:
+            continue
+        result_tags.append(tag)
+
+    return result_tags
+
+
 def drop_overlap_tags(tags: Union[List[str], Mapping[str, float]]) -> Union[List[str], Mapping[str, float]]:
     """
     Drop overlapping tags from the given list of tags.
 
     This function removes tags that have overlaps with other tags based on precomputed overlap information.
 
-    :param tags: A list of tags.
-    :type tags: List[str]
-    :return: A list of tags without overlaps.
-    :rtype: List[str]
+    :param tags: A list of tags, or a dict of tags and their scores.
+    :type tags: Union[List[str], Mapping[str, float]]
+    :return: A list of tags without overlaps, or a dict when a dict is given.
+    :rtype: Union[List[str], Mapping[str, float]]
+    :raises TypeError: If the tags are neither a list nor a dict.
 
     Examples::
         >>> from imgutils.tagging import drop_overlap_tags
@@ -67,37 +122,36 @@ def drop_overlap_tags(tags: Union[List[str], Mapping[str, float]]) -> Union[List
             'medium_breasts': 0.47744464927382957
         }
     """
-    overlap_tags_dict = _get_overlap_tags()
-    result_tags = []
-    _origin_tags = copy.deepcopy(tags)
-    if isinstance(tags, dict):
-        tags = list(tags.keys())
-    tags_underscore = [tag.replace(' ', '_') for tag in tags]
+    if isinstance(tags, list):
+        return _drop_overlap_tag_list(tags)
+    elif isinstance(tags, dict):
+        _rtags_set = set(_drop_overlap_tag_list(list(tags.keys())))
+        return {key: value for key, value in tags.items() if key in _rtags_set}
+    else:
+        raise TypeError(f'Unknown tags type - {tags!r}.')
 
-    tags: List[str]
-    tags_underscore: List[str]
-    for tag, tag_ in zip(tags, tags_underscore):
-        to_remove = False
 
-        # Case 1: If the tag is a key and some of the associated values are in tags
-        if tag_ in overlap_tags_dict:
-            overlap_values = set(val for val in overlap_tags_dict[tag_])
-            if overlap_values.intersection(set(tags_underscore)):
-                to_remove = True
-
-        # Checking superword condition separately
-        for tag_another in tags:
-            if tag in tag_another and tag != tag_another:
-                to_remove = True
-                break
-
-        if not to_remove:
-            result_tags.append(tag)
-
-    if isinstance(_origin_tags, list):
-        return result_tags
-    elif isinstance(_origin_tags, dict):
-        _rtags_set = set(result_tags)
-        return {key: value for key, value in _origin_tags.items() if key in _rtags_set}
-    else:
-        raise TypeError(f'Unknown tags type - {_origin_tags!r}.')  # pragma: no cover
+def drop_overlap_tags_batch(tags_list: List[Union[List[str], Mapping[str, float]]]) \
+        -> List[Union[List[str], Mapping[str, float]]]:
+    """
+    Drop overlapping tags from each of the given tag lists.
+
+    This is the same as calling :func:`drop_overlap_tags` on each item, the overlap index is
+    loaded only once for all the items.
+
+    :param tags_list: A list of tag lists or dicts of tags and their scores.
+    :type tags_list: List[Union[List[str], Mapping[str, float]]]
+    :return: A list of results, in the same order and types as the given items.
+    :rtype: List[Union[List[str], Mapping[str, float]]]
+    :raises TypeError: If any of the items is neither a list nor a dict.
+
+    Examples::
+        >>> from imgutils.tagging import drop_overlap_tags_batch
+        >>>
+        >>> drop_overlap_tags_batch([
+        ...     ['1girl', 'solo', 'long_hair', 'very_long_hair'],
+        ...     {'breasts': 0.32, 'medium_breasts': 0.48, 'smile': 0.91},
+        ... ])
+        [['1girl', 'solo', 'very_long_hair'], {'medium_breasts': 0.48, 'smile': 0.91}]
+    """
+    return [drop_overlap_tags(tags) for tags in tags_list]
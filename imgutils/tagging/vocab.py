@@ -0,0 +1,191 @@
+"""
+Overview:
+    Per-vocabulary classification tables of tags, aligned with the label index of the taggers.
+
+    The vocabularies of the taggers are fixed, so whether each tag is blacklisted, is a basic character tag,
+    or overlaps another tag only needs to be computed once. :class:`TagVocabulary` holds these results as
+    boolean masks and a sparse overlap matrix, so the filtering of a ``[B, num_tags]`` score matrix becomes
+    array masking before any tag strings are produced.
+"""
+from functools import cached_property
+from typing import List, Tuple, Dict
+
+import numpy as np
+from scipy import sparse
+
+from .blacklist import _get_blacklist_matcher
+from .character import _DEFAULT_CHARACTER_POOL
+from .overlap import _get_overlap_index
+
+__all__ = [
+    'TagVocabulary',
+]
+
+
+def _substring_pairs(names: List[str]) -> List[Tuple[int, int]]:
+    """
+    Find all the pairs of ``(i, j)`` that ``names[i]`` is a substring of a different tag ``names[j]``.
+
+    The unique names are joined in the descending order of length, so for each name only the prefix of
+    longer names is searched, and each containing name is located with one ``str.find`` call.
+    """
+    positions: Dict[str, List[int]] = {}
+    for i, name in enumerate(names):
+        positions.setdefault(name, []).append(i)
+
+    unique_names = sorted(positions.keys(), key=len, reverse=True)
+    starts, ends, offset = [], {}, 0
+    for name in unique_names:
+        if len(name) not in ends:
+            ends[len(name)] = max(offset - 1, 0)
+        starts.append(offset)
+        offset += len(name) + 1
+    joined = '\0'.join(unique_names)
+    starts = np.asarray(starts, dtype=np.int64)
+
+    pairs = []
+    for name in unique_names:
+        if not name:
+            continue
+        end, pos = ends[len(name)], 0
+        while True:
+            pos = joined.find(name, pos, end)
+            if pos < 0:
+                break
+            k = int(np.searchsorted(starts, pos, side='right')) - 1
+            for i in positions[name]:
+                for j in positions[unique_names[k]]:
+                    pairs.append((i, j))
+            pos = int(starts[k + 1]) if k + 1 < len(starts) else end  # skip to the next name
+    return pairs
+
+
+class TagVocabulary:
+    """
+    Classification tables of a fixed tag vocabulary, e.g. the labels of a tagger.
+
+    All the masks are aligned with the given names, and computed lazily on the first access.
+
+    :param names: Tag names in the order of the label index.
+    :type names: List[str]
+
+    Examples::
+        >>> import numpy as np
+        >>> from imgutils.tagging import TagVocabulary
+        >>>
+        >>> vocab = TagVocabulary(['1girl', 'long_hair', 'very_long_hair', 'red_hair', 'cosplay'])
+        >>> vocab.blacklist_mask
+        array([False, False, False, False,  True])
+        >>> vocab.basic_character_mask
+        array([False,  True,  True,  True, False])
+        >>> selected = np.array([[True, True, True, False, True]])  # a [B, num_tags] selection
+        >>> vocab.overlap_mask(selected)  # long_hair is covered by very_long_hair
+        array([[False,  True, False, False, False]])
+        >>> vocab.filter_mask(selected, drop_blacklisted=True)
+        array([[ True, False,  True, False, False]])
+    """
+
+    def __init__(self, names: List[str]):
+        self.names = np.asarray(list(names), dtype=object)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} tags: {len(self)}>'
+
+    @cached_property
+    def blacklist_mask(self) -> np.ndarray:
+        """
+        Boolean mask of the tags in the online blacklist (see :func:`imgutils.tagging.is_blacklisted`).
+        """
+        matcher = _get_blacklist_matcher(True, ())
+        return np.asarray([matcher.match(name) for name in self.names.tolist()], dtype=bool)
+
+    @cached_property
+    def basic_character_mask(self) -> np.ndarray:
+        """
+        Boolean mask of the basic character tags (see :func:`imgutils.tagging.is_basic_character_tag`).
+        """
+        pool = _DEFAULT_CHARACTER_POOL
+        return np.asarray([pool.is_basic_character_tag(name) for name in self.names.tolist()], dtype=bool)
+
+    @cached_property
+    def overlap_pairs(self) -> np.ndarray:
+        """
+        Pairs of ``(child, parent)`` indexes, the child tag is dropped by :func:`imgutils.tagging.drop_overlap_tags`
+        when the parent tag is present. It is an int64 array with shape ``(K, 2)``, sorted by child.
+        """
+        names = self.names.tolist()
+        overlap_index = _get_overlap_index()
+        underscore_positions: Dict[str, List[int]] = {}
+        for i, name in enumerate(names):
+            underscore_positions.setdefault(name.replace(' ', '_'), []).append(i)
+
+        pairs = set(_substring_pairs(names))
+        for i, name in enumerate(names):
+            for value in overlap_index.get(name.replace(' ', '_'), ()):
+                for j in underscore_positions.get(value, ()):
+                    pairs.add((i, j))
+
+        if pairs:
+            return np.asarray(sorted(pairs), dtype=np.int64)
+        else:
+            return np.zeros((0, 2), dtype=np.int64)
+
+    @cached_property
+    def _overlap_matrix(self) -> sparse.csr_matrix:
+        pairs = self.overlap_pairs
+        return sparse.csr_matrix(
+            (np.ones((pairs.shape[0],), dtype=np.int32), (pairs[:, 0], pairs[:, 1])),
+            shape=(len(self), len(self)),
+        )
+
+    def overlap_mask(self, selected: np.ndarray) -> np.ndarray:
+        """
+        Get the selected tags which should be dropped because of overlapping, the same as
+        :func:`imgutils.tagging.drop_overlap_tags` on the selected tags of each row.
+
+        :param selected: Boolean selection with shape ``(num_tags,)`` or ``(B, num_tags)``.
+        :type selected: np.ndarray
+        :return: Boolean mask of the dropped tags, with the same shape as ``selected``.
+        :rtype: np.ndarray
+        """
+        selected = np.asarray(selected, dtype=bool)
+        matrix = np.atleast_2d(selected)
+        if matrix.shape[-1] != len(self):
+            raise ValueError(f'Selection of {len(self)!r} tags expected, but shape {selected.shape!r} found.')
+
+        # number of selected parents of each tag, with shape (num_tags, B)
+        parent_counts = self._overlap_matrix @ matrix.T.astype(np.int32)
+        dropped = (np.asarray(parent_counts).T > 0) & matrix
+        return dropped.reshape(selected.shape)
+
+    def filter_mask(self, selected: np.ndarray, drop_overlap: bool = True,
+                    drop_blacklisted: bool = False, drop_basic_character: bool = False) -> np.ndarray:
+        """
+        Filter the selected tags with masks.
+
+        The blacklisted and basic character tags are dropped first, then the overlapping tags are
+        dropped among the remaining ones.
+
+        :param selected: Boolean selection with shape ``(num_tags,)`` or ``(B, num_tags)``,
+            e.g. ``scores > threshold``.
+        :type selected: np.ndarray
+        :param drop_overlap: Drop overlapping tags, default is ``True``.
+        :type drop_overlap: bool
+        :param drop_blacklisted: Drop blacklisted tags, default is ``False``.
+        :type drop_blacklisted: bool
+        :param drop_basic_character: Drop basic character tags, default is ``False``.
+        :type drop_basic_character: bool
+        :return: Boolean mask of the kept tags, with the same shape as ``selected``.
+        :rtype: np.ndarray
+        """
+        selected = np.asarray(selected, dtype=bool)
+        if drop_blacklisted:
+            selected = selected & ~self.blacklist_mask
+        if drop_basic_character:
+            selected = selected & ~self.basic_character_mask
+        if drop_overlap:
+            selected = selected & ~self.overlap_mask(selected)
+        return selected
@@ -4,19 +4,18 @@ Overview:
     `SmilingWolf/wd-v1-4-tags <https://huggingface.co/spaces/SmilingWolf/wd-v1-4-tags>`_ .
 """
 from functools import lru_cache
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Any
 
 import numpy as np
 import onnxruntime
-import pandas as pd
 from PIL import Image
 from hbutils.testing.requires.version import VersionInfo
 from huggingface_hub import hf_hub_download
 
 from .format import remove_underline
-from .overlap import drop_overlap_tags
+from .vocab import TagVocabulary
 from ..data import load_image, ImageTyping, has_alpha_channel
-from ..utils import open_onnx_model, vreplace
+from ..utils import open_onnx_model, vreplace, load_csv_table
 
 SWIN_MODEL_REPO = "SmilingWolf/wd-v1-4-swinv2-tagger-v2"
 CONV_MODEL_REPO = "SmilingWolf/wd-v1-4-convnext-tagger-v2"
@@ -72,7 +71,7 @@ def _get_wd14_model(model_name):
     return open_onnx_model(hf_hub_download(
         repo_id='deepghs/wd14_tagger_with_embeddings',
         filename=f'{MODEL_NAMES[model_name]}/model.onnx',
-    ))
+    ), batchable=True)
 
 
 @lru_cache()
@@ -87,30 +86,83 @@ def _get_wd14_labels(model_name, no_underline: bool = False) -> Tuple[List[str],
     :return: A tuple containing the list of tag names, and lists of indexes for rating, general, and character categories.
     :rtype: Tuple[List[str], List[int], List[int], List[int]]
     """
-    path = hf_hub_download(MODEL_NAMES[model_name], LABEL_FILENAME)
-    df = pd.read_csv(path)
-    name_series = df["name"]
-    if no_underline:
-        name_series = name_series.map(remove_underline)
-    tag_names = name_series.tolist()
+    table = load_csv_table(
+        hf_hub_download(MODEL_NAMES[model_name], LABEL_FILENAME),
+        derived_columns={'name_no_underline': ('name', remove_underline)},
+    )
+    tag_names = table['name_no_underline' if no_underline else 'name'].tolist()
 
-    rating_indexes = list(np.where(df["category"] == 9)[0])
-    general_indexes = list(np.where(df["category"] == 0)[0])
-    character_indexes = list(np.where(df["category"] == 4)[0])
+    rating_indexes = list(np.where(table["category"] == 9)[0])
+    general_indexes = list(np.where(table["category"] == 0)[0])
+    character_indexes = list(np.where(table["category"] == 4)[0])
     return tag_names, rating_indexes, general_indexes, character_indexes
 
 
-def _mcut_threshold(probs) -> float:
+@lru_cache()
+def _get_wd14_label_arrays(model_name, no_underline: bool = False) \
+        -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Get labels for the WD14 model as numpy arrays, for vectorized extraction of the tags.
+
+    :param model_name: The name of the model.
+    :type model_name: str
+    :param no_underline: If True, replaces underscores in tag names with spaces.
+    :type no_underline: bool
+    :return: A tuple containing the object array of tag names, and int64 index arrays for rating, general,
+        and character categories.
+    :rtype: Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+    """
+    tag_names, rating_indexes, general_indexes, character_indexes = _get_wd14_labels(model_name, no_underline)
+    return (
+        np.asarray(tag_names, dtype=object),
+        np.asarray(rating_indexes, dtype=np.int64),
+        np.asarray(general_indexes, dtype=np.int64),
+        np.asarray(character_indexes, dtype=np.int64),
+    )
+
+
+@lru_cache()
+def get_wd14_tag_vocabulary(model_name: str = _DEFAULT_MODEL_NAME, no_underline: bool = False) -> TagVocabulary:
+    """
+    Get the tag vocabulary of the wd14 tagger, whose masks are aligned with the columns of the ``prediction``
+    returned by :func:`get_wd14_tags`.
+
+    :param model_name: The name of the model.
+    :type model_name: str
+    :param no_underline: If True, replaces underscores in tag names with spaces.
+    :type no_underline: bool
+    :return: The tag vocabulary, cached for each model.
+    :rtype: TagVocabulary
+
+    Examples::
+        >>> from imgutils.tagging import get_wd14_tags, get_wd14_tag_vocabulary
+        >>>
+        >>> vocab = get_wd14_tag_vocabulary()
+        >>> prediction = get_wd14_tags('skadi.jpg', fmt='prediction')
+        >>> keep = vocab.filter_mask(prediction > 0.35, drop_blacklisted=True)  # filter on the score vector
+        >>> keep.shape == prediction.shape
+        True
+        >>> tags = vocab.names[keep].tolist()
+    """
+    tag_names, _, _, _ = _get_wd14_labels(model_name, no_underline)
+    return TagVocabulary(tag_names)
+
+
+def _mcut_threshold(probs):
     """
     Maximum Cut Thresholding (MCut)
     Largeron, C., Moulin, C., & Gery, M. (2012). MCut: A Thresholding Strategy
      for Multi-label Classification. In 11th International Symposium, IDA 2012
      (pp. 172-183).
+
+    For a 2-dim array, the thresholds are calculated for each row.
     """
-    sorted_probs = probs[probs.argsort()[::-1]]
-    difs = sorted_probs[:-1] - sorted_probs[1:]
-    t = difs.argmax()
-    thresh = (sorted_probs[t] + sorted_probs[t + 1]) / 2
+    probs = np.asarray(probs)
+    sorted_probs = -np.sort(-probs, axis=-1)
+    difs = sorted_probs[..., :-1] - sorted_probs[..., 1:]
+    t = difs.argmax(axis=-1)[..., None]
+    thresh = (np.take_along_axis(sorted_probs, t, axis=-1) +
+              np.take_along_axis(sorted_probs, t + 1, axis=-1))[..., 0] / 2
     return thresh
 
 
@@ -208,45 +260,189 @@ def get_wd14_tags(
         >>> chars
         {'hu_tao_(genshin_impact)': 0.9262397289276123, 'boo_tao_(genshin_impact)': 0.942080020904541}
     """
-    tag_names, rating_indexes, general_indexes, character_indexes = _get_wd14_labels(model_name, no_underline)
+    return get_wd14_tags_batch(
+        images=[image],
+        model_name=model_name,
+        general_threshold=general_threshold,
+        general_mcut_enabled=general_mcut_enabled,
+        character_threshold=character_threshold,
+        character_mcut_enabled=character_mcut_enabled,
+        no_underline=no_underline,
+        drop_overlap=drop_overlap,
+        fmt=fmt,
+    )[0]
+
+
+def _wd14_batch_run(images: List[ImageTyping], model_name: str, batch_size: int = 16) \
+        -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Run the WD14 tagger on a list of images in batches.
+
+    When the batch dimension of the model is fixed, the chunks are zero-padded to fit that size.
+
+    :param images: The input images.
+    :type images: List[ImageTyping]
+    :param model_name: The name of the model to use.
+    :type model_name: str
+    :param batch_size: Maximum number of images in one model run.
+    :type batch_size: int
+    :return: A tuple of prediction matrix with shape ``(B, num_tags)`` and contiguous float32 embedding matrix
+        with shape ``(B, D)``.
+    :rtype: Tuple[np.ndarray, np.ndarray]
+    """
+    if batch_size < 1:
+        raise ValueError(f'Batch size should be no less than 1, but {batch_size!r} found.')
+
     model = _get_wd14_model(model_name)
-    _, target_size, _, _ = model.get_inputs()[0].shape
-    image = _prepare_image_for_tagging(image, target_size)
+    fixed_batch, target_size, _, _ = model.get_inputs()[0].shape
+    if isinstance(fixed_batch, int) and fixed_batch > 0:
+        batch_size = fixed_batch
+    else:
+        fixed_batch = None
 
     input_name = model.get_inputs()[0].name
     assert len(model.get_outputs()) == 2
     label_name = model.get_outputs()[0].name
     emb_name = model.get_outputs()[1].name
-    preds, embeddings = model.run([label_name, emb_name], {input_name: image})
-    labels = list(zip(tag_names, preds[0].astype(float)))
 
-    rating = {labels[i][0]: labels[i][1].item() for i in rating_indexes}
+    images = list(images)
+    preds_list, embeddings_list = [], []
+    for i in range(0, len(images), batch_size):
+        input_ = np.concatenate([
+            _prepare_image_for_tagging(image, target_size)
+            for image in images[i:i + batch_size]
+        ])
+        n = input_.shape[0]
+        if fixed_batch is not None and n < fixed_batch:
+            input_ = np.concatenate([input_, np.zeros((fixed_batch - n, *input_.shape[1:]), dtype=input_.dtype)])
+        preds, embeddings = model.run([label_name, emb_name], {input_name: input_})
+        preds_list.append(preds[:n])
+        embeddings_list.append(embeddings[:n])
+
+    if preds_list:
+        preds = np.concatenate(preds_list).astype(np.float32)
+        embeddings = np.ascontiguousarray(np.concatenate(embeddings_list), dtype=np.float32)
+    else:
+        preds = np.zeros((0, model.get_outputs()[0].shape[-1]), dtype=np.float32)
+        embeddings = np.zeros((0, model.get_outputs()[1].shape[-1]), dtype=np.float32)
+    return preds, embeddings
+
+
+def _extract_tags(names: np.ndarray, probs: np.ndarray, selected: np.ndarray) -> List[Dict[str, float]]:
+    """
+    Extract the selected tags of each row, only the surviving tags are turned into dicts.
 
-    general_names = [labels[i] for i in general_indexes]
-    if general_mcut_enabled:
-        general_probs = np.array([x[1] for x in general_names])
-        general_threshold = _mcut_threshold(general_probs)
+    :param names: Tag names with shape ``(T,)``.
+    :param probs: Probabilities with shape ``(B, T)``.
+    :param selected: Boolean selection with shape ``(B, T)``.
+    :return: List of dicts of tags and their probabilities, one for each row.
+    """
+    rows, cols = np.nonzero(selected)
+    ends = np.cumsum(np.bincount(rows, minlength=probs.shape[0])).tolist()
+    begins = [0, *ends[:-1]]
+    values = probs[rows, cols].tolist()
+    tag_names = names[cols].tolist()
+    return [dict(zip(tag_names[begin:end], values[begin:end])) for begin, end in zip(begins, ends)]
 
-    general_res = {x: v.item() for x, v in general_names if v > general_threshold}
-    if drop_overlap:
-        general_res = drop_overlap_tags(general_res)
 
-    character_names = [labels[i] for i in character_indexes]
+def get_wd14_tags_batch(
+        images: List[ImageTyping],
+        model_name: str = _DEFAULT_MODEL_NAME,
+        general_threshold: float = 0.35,
+        general_mcut_enabled: bool = False,
+        character_threshold: float = 0.85,
+        character_mcut_enabled: bool = False,
+        no_underline: bool = False,
+        drop_overlap: bool = False,
+        fmt=('rating', 'general', 'character'),
+        batch_size: int = 16,
+) -> List[Any]:
+    """
+    Overview:
+        Get tags for a list of images with wd14 taggers, in batches.
+
+        The thresholds are applied to the whole prediction matrix of the batch at once, and only the
+        surviving tags are turned into dicts, so the result is the same as calling :func:`get_wd14_tags`
+        on each image.
+
+    :param images: The input images.
+    :type images: List[ImageTyping]
+    :param model_name: The name of the model to use.
+    :type model_name: str
+    :param general_threshold: The threshold for general tags.
+    :type general_threshold: float
+    :param general_mcut_enabled: If True, applies MCut thresholding to general tags.
+    :type general_mcut_enabled: bool
+    :param character_threshold: The threshold for character tags.
+    :type character_threshold: float
+    :param character_mcut_enabled: If True, applies MCut thresholding to character tags.
+    :type character_mcut_enabled: bool
+    :param no_underline: If True, replaces underscores in tag names with spaces.
+    :type no_underline: bool
+    :param drop_overlap: If True, drops overlapping tags.
+    :type drop_overlap: bool
+    :param fmt: Return format of each image, the same as :func:`get_wd14_tags`.
+    :type fmt: Any
+    :param batch_size: Maximum number of images in one model run. Default is ``16``.
+    :type batch_size: int
+    :return: A list of results in the format of ``fmt``, one for each image.
+    :rtype: List[Any]
+
+    .. note::
+        The ``embedding`` and ``prediction`` items of the images are rows of one contiguous float32 matrix,
+        so ``np.stack`` of the embeddings is cheap when building an index.
+
+    Example:
+        >>> from imgutils.tagging import get_wd14_tags_batch
+        >>>
+        >>> results = get_wd14_tags_batch(['skadi.jpg', 'hutao.jpg'], fmt=('general', 'embedding'))
+        >>> [sorted(general.keys())[:3] for general, _ in results]
+        [['1girl', 'alternate_costume', 'artist_name'], ['1girl', ':p', 'ahoge']]
+        >>> results[0][1].dtype
+        dtype('float32')
+    """
+    names, rating_indexes, general_indexes, character_indexes = \
+        _get_wd14_label_arrays(model_name, no_underline)
+    preds, embeddings = _wd14_batch_run(images, model_name, batch_size)
+    count = preds.shape[0]
+    preds64 = preds.astype(np.float64)
+
+    rating_names = names[rating_indexes].tolist()
+    ratings = [dict(zip(rating_names, row)) for row in preds64[:, rating_indexes].tolist()]
+
+    general_probs = preds64[:, general_indexes]
+    if general_mcut_enabled:
+        general_thresholds = _mcut_threshold(general_probs)
+    else:
+        general_thresholds = np.full((count,), general_threshold, dtype=np.float64)
+    general_selected = general_probs > general_thresholds[:, None]
+    if drop_overlap:
+        # overlapping tags are masked out on the prediction matrix, before the dicts are built
+        selected = np.zeros(preds.shape, dtype=bool)
+        selected[:, general_indexes] = general_selected
+        vocab = get_wd14_tag_vocabulary(model_name, no_underline)
+        general_selected &= ~vocab.overlap_mask(selected)[:, general_indexes]
+    generals = _extract_tags(names[general_indexes], general_probs, general_selected)
+
+    character_probs = preds64[:, character_indexes]
     if character_mcut_enabled:
-        character_probs = np.array([x[1] for x in character_names])
-        character_threshold = _mcut_threshold(character_probs)
-        character_threshold = max(0.15, character_threshold)
-
-    character_res = {x: v.item() for x, v in character_names if v > character_threshold}
-
-    return vreplace(
-        fmt,
-        {
-            'rating': rating,
-            'general': general_res,
-            'character': character_res,
-            'tag': {**general_res, **character_res},
-            'embedding': embeddings[0].astype(np.float32),
-            'prediction': preds[0].astype(np.float32),
-        }
-    )
+        character_thresholds = np.maximum(0.15, _mcut_threshold(character_probs))
+    else:
+        character_thresholds = np.full((count,), character_threshold, dtype=np.float64)
+    characters = _extract_tags(names[character_indexes], character_probs,
+                               character_probs > character_thresholds[:, None])
+
+    return [
+        vreplace(
+            fmt,
+            {
+                'rating': ratings[i],
+                'general': generals[i],
+                'character': characters[i],
+                'tag': {**generals[i], **characters[i]},
+                'embedding': embeddings[i],
+                'prediction': preds[i],
+            }
+        )
+        for i in range(count)
+    ]
@@ -3,7 +3,10 @@ Overview:
     Generic utilities for :mod:`imgutils`.
 """
 from .area import *
+from .batching import *
+from .embedding import *
 from .format import *
 from .onnxruntime import *
 from .storage import *
+from .table import *
 from .tqdm_ import *
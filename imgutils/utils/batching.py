@@ -0,0 +1,356 @@
+"""
+Overview:
+    Dynamic micro-batching for ONNX runtime sessions.
+
+    When many threads (or coroutines) call the same model with one image each, the runtime never sees
+    a real batch. :class:`MicroBatchSession` wraps an ``InferenceSession``, collects the concurrent
+    single-sample calls which share the same model inputs shape for a short while, runs them as one
+    batched ``run`` call and hands each caller its own slice of the result.
+
+    Micro-batching is off by default. Use :func:`enable_micro_batching` **before the models are loaded**
+    to make :func:`imgutils.utils.open_onnx_model` return batching sessions for the models opened with
+    ``batchable=True``, so the high-level functions such as :func:`imgutils.generic.classify_predict_score`,
+    :func:`imgutils.tagging.get_wd14_tags` and :func:`imgutils.detect.detect_faces` are batched transparently
+    when called concurrently. Only the models whose outputs are computed per sample are batchable, pairwise
+    models (e.g. the CCIP metric model and the LPIPS difference model, whose outputs mix the samples)
+    are never wrapped.
+"""
+import asyncio
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from typing import Optional, List, Dict, Tuple, Any
+
+import numpy as np
+
+__all__ = [
+    'MicroBatchSession',
+    'enable_micro_batching',
+    'disable_micro_batching',
+    'is_micro_batching_enabled',
+]
+
+
+class _BatchRequest:
+    __slots__ = ['feed', 'size', 'future', 'timestamp']
+
+    def __init__(self, feed: Dict[str, np.ndarray], size: int):
+        self.feed = feed
+        self.size = size
+        self.future = Future()
+        self.timestamp = time.monotonic()
+
+
+def _is_fixed_batch(session) -> bool:
+    """
+    Check if the batch dimension of the given session is fixed (e.g. models exported with batch size 1),
+    in which case the requests can not be merged.
+    """
+    for input_ in session.get_inputs():
+        shape = input_.shape
+        if not shape or isinstance(shape[0], int):
+            return True
+    return False
+
+
+class MicroBatchSession:
+    """
+    ONNX runtime session wrapper which merges concurrent calls into batches.
+
+    Calls of :meth:`run` with the same output names and the same input shapes (except the batch dimension)
+    and dtypes are queued together. A batch is sent to the wrapped session once it reaches ``max_batch_size``
+    samples or its oldest request waited for ``max_latency`` seconds, and the outputs are split back along
+    the batch dimension for each caller.
+
+    All the other attributes (e.g. ``get_inputs``, ``get_outputs``) are forwarded to the wrapped session,
+    so it can be used as a drop-in replacement of ``InferenceSession``.
+
+    :param session: The session to wrap, usually an ``onnxruntime.InferenceSession``.
+    :param max_batch_size: Maximum number of samples in one batch. Default is ``16``.
+    :type max_batch_size: int
+    :param max_latency: Maximum seconds a request waits for other requests before its batch is run.
+        Default is ``0.005``.
+    :type max_latency: float
+
+    .. note::
+        Models with fixed batch dimension, calls with ``run_options`` and requests larger than ``max_batch_size``
+        are run directly in the calling thread without queueing.
+
+    Examples::
+        >>> from concurrent.futures import ThreadPoolExecutor
+        >>> from imgutils.utils import open_onnx_model, MicroBatchSession
+        >>>
+        >>> session = MicroBatchSession(open_onnx_model('model.onnx'), max_batch_size=8, max_latency=0.01)
+        >>> with ThreadPoolExecutor(16) as pool:
+        ...     results = list(pool.map(lambda x: session.run(['output'], {'input': x}), inputs))
+        >>> session.batch_size_histogram  # 16 single-sample calls, served in 2 batches
+        {8: 2}
+    """
+
+    def __init__(self, session, max_batch_size: int = 16, max_latency: float = 0.005):
+        if max_batch_size < 1:
+            raise ValueError(f'Max batch size should be no less than 1, but {max_batch_size!r} found.')
+        if max_latency < 0:
+            raise ValueError(f'Max latency should be non-negative, but {max_latency!r} found.')
+
+        self.session = session
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self._passthrough = _is_fixed_batch(session)
+
+        self._cond = threading.Condition()
+        self._queues: Dict[Any, List[_BatchRequest]] = {}
+        self._queue_depth = 0
+        self._closed = False
+        self._worker: Optional[threading.Thread] = None
+        self._batch_size_hist = Counter()
+        self._queue_depth_hist = Counter()
+
+    def __getattr__(self, item):
+        # only called when the attribute is not found on the wrapper itself
+        return getattr(self.__dict__['session'], item)
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} max_batch_size: {self.max_batch_size!r}, ' \
+               f'max_latency: {self.max_latency!r}, session: {self.session!r}>'
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Number of samples currently waiting in the queues.
+        """
+        with self._cond:
+            return self._queue_depth
+
+    @property
+    def batch_size_histogram(self) -> Dict[int, int]:
+        """
+        Histogram of the executed batches, mapping batch size (in samples) to the number of batches.
+        """
+        with self._cond:
+            return dict(sorted(self._batch_size_hist.items()))
+
+    @property
+    def queue_depth_histogram(self) -> Dict[int, int]:
+        """
+        Histogram of the queue depth (in samples, including the batch to run) sampled when each batch is dispatched.
+        """
+        with self._cond:
+            return dict(sorted(self._queue_depth_hist.items()))
+
+    def reset_stats(self):
+        """
+        Clear the batch size and queue depth histograms.
+        """
+        with self._cond:
+            self._batch_size_hist.clear()
+            self._queue_depth_hist.clear()
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._worker_loop, name=f'micro-batch-{id(self):x}', daemon=True)
+            self._worker.start()
+
+    def submit(self, output_names: Optional[List[str]], input_feed: Dict[str, np.ndarray]) -> Future:
+        """
+        Submit a request and return its future without blocking.
+
+        :param output_names: Names of the outputs, ``None`` means all the outputs.
+        :type output_names: Optional[List[str]]
+        :param input_feed: Inputs of the model, the first dimension of each array is the batch dimension.
+        :type input_feed: Dict[str, np.ndarray]
+        :return: A ``concurrent.futures.Future`` resolved with the list of outputs, just like the return value
+            of ``InferenceSession.run``.
+        :rtype: concurrent.futures.Future
+        """
+        input_feed = {name: np.asarray(value) for name, value in input_feed.items()}
+        sizes = {value.shape[0] if value.ndim > 0 else None for value in input_feed.values()}
+        size = sizes.pop() if len(sizes) == 1 else None
+        if self._passthrough or size is None or size > self.max_batch_size:
+            future = Future()
+            try:
+                future.set_result(self.session.run(output_names, input_feed))
+            except BaseException as err:
+                future.set_exception(err)
+            return future
+
+        key = (
+            tuple(output_names) if output_names is not None else None,
+            tuple(sorted((name, value.shape[1:], value.dtype.str) for name, value in input_feed.items())),
+        )
+        request = _BatchRequest(input_feed, size)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('Micro-batch session already closed.')
+            self._queues.setdefault(key, []).append(request)
+            self._queue_depth += size
+            self._ensure_worker()
+            self._cond.notify_all()
+        return request.future
+
+    def run(self, output_names: Optional[List[str]], input_feed: Dict[str, np.ndarray], run_options=None):
+        """
+        Run the model, blocking until the batch containing this request is finished.
+
+        :param output_names: Names of the outputs, ``None`` means all the outputs.
+        :type output_names: Optional[List[str]]
+        :param input_feed: Inputs of the model.
+        :type input_feed: Dict[str, np.ndarray]
+        :param run_options: Run options of onnxruntime. Requests with run options are not batched.
+        :return: List of outputs.
+        :rtype: List[np.ndarray]
+        """
+        if run_options is not None:
+            return self.session.run(output_names, input_feed, run_options)
+        return self.submit(output_names, input_feed).result()
+
+    async def run_async(self, output_names: Optional[List[str]], input_feed: Dict[str, np.ndarray]):
+        """
+        Asyncio version of :meth:`run`, the event loop is not blocked while waiting for the batch.
+
+        :param output_names: Names of the outputs, ``None`` means all the outputs.
+        :type output_names: Optional[List[str]]
+        :param input_feed: Inputs of the model.
+        :type input_feed: Dict[str, np.ndarray]
+        :return: List of outputs.
+        :rtype: List[np.ndarray]
+        """
+        return await asyncio.wrap_future(self.submit(output_names, input_feed))
+
+    def _next_batch(self) -> Optional[Tuple[Any, List[_BatchRequest]]]:
+        with self._cond:
+            while True:
+                while not self._queues and not self._closed:
+                    self._cond.wait()
+                if not self._queues:
+                    return None
+
+                # serve the queue with the oldest request first
+                key = min(self._queues, key=lambda k: self._queues[k][0].timestamp)
+                queue = self._queues[key]
+                deadline = queue[0].timestamp + self.max_latency
+                now = time.monotonic()
+                if sum(r.size for r in queue) >= self.max_batch_size or now >= deadline or self._closed:
+                    break
+                self._cond.wait(deadline - now)
+
+            depth = self._queue_depth
+            requests, total = [], 0
+            while queue and total + queue[0].size <= self.max_batch_size:
+                request = queue.pop(0)
+                requests.append(request)
+                total += request.size
+            if not queue:
+                del self._queues[key]
+
+            self._queue_depth -= total
+            self._batch_size_hist[total] += 1
+            self._queue_depth_hist[depth] += 1
+            return key, requests
+
+    def _run_batch(self, output_names, requests: List[_BatchRequest]):
+        if len(requests) == 1:
+            return [self.session.run(output_names, requests[0].feed)]
+
+        feed = {
+            name: np.concatenate([r.feed[name] for r in requests], axis=0)
+            for name in requests[0].feed.keys()
+        }
+        outputs = self.session.run(output_names, feed)
+        total = sum(r.size for r in requests)
+        if any(np.ndim(output) == 0 or np.shape(output)[0] != total or total in np.shape(output)[1:]
+               for output in outputs):
+            # outputs not aligned with batch dimension, or maybe pairwise ones mixing the samples, cannot be split
+            return [self.session.run(output_names, r.feed) for r in requests]
+
+        offsets = np.cumsum([0] + [r.size for r in requests])
+        return [
+            [output[begin:end] for output in outputs]
+            for begin, end in zip(offsets[:-1], offsets[1:])
+        ]
+
+    def _worker_loop(self):
+        while True:
+            item = self._next_batch()
+            if item is None:
+                break
+
+            (output_names, _), requests = item
+            output_names = list(output_names) if output_names is not None else None
+            try:
+                results = self._run_batch(output_names, requests)
+            except BaseException as err:
+                for request in requests:
+                    request.future.set_exception(err)
+            else:
+                for request, result in zip(requests, results):
+                    request.future.set_result(result)
+
+    def close(self):
+        """
+        Stop the background worker after the queued requests are finished.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            worker = self._worker
+        if worker is not None and worker is not threading.current_thread():
+            worker.join()
+
+
+_MICRO_BATCHING: Optional[Dict[str, Any]] = None
+
+
+def enable_micro_batching(max_batch_size: int = 16, max_latency: float = 0.005):
+    """
+    Make :func:`imgutils.utils.open_onnx_model` return :class:`MicroBatchSession` objects.
+
+    :param max_batch_size: Maximum number of samples in one batch. Default is ``16``.
+    :type max_batch_size: int
+    :param max_latency: Maximum seconds a request waits for other requests. Default is ``0.005``.
+    :type max_latency: float
+
+    .. note::
+        Only the models loaded after this call are affected, the models opened before are cached inside
+        the modules. So call it at the start of your service.
+
+    .. note::
+        Only the per-sample models opened with ``batchable=True`` in :func:`imgutils.utils.open_onnx_model`
+        (e.g. the classification, tagging, detection and feature extraction models) are wrapped.
+
+    Examples::
+        >>> from imgutils.utils import enable_micro_batching
+        >>> enable_micro_batching(max_batch_size=32, max_latency=0.01)
+    """
+    global _MICRO_BATCHING
+    if max_batch_size < 1:
+        raise ValueError(f'Max batch size should be no less than 1, but {max_batch_size!r} found.')
+    if max_latency < 0:
+        raise ValueError(f'Max latency should be non-negative, but {max_latency!r} found.')
+    _MICRO_BATCHING = {'max_batch_size': max_batch_size, 'max_latency': max_latency}
+
+
+def disable_micro_batching():
+    """
+    Stop wrapping newly opened models with :class:`MicroBatchSession`.
+    """
+    global _MICRO_BATCHING
+    _MICRO_BATCHING = None
+
+
+def is_micro_batching_enabled() -> bool:
+    """
+    Check if micro-batching is enabled for newly opened models.
+
+    :return: Enabled or not.
+    :rtype: bool
+    """
+    return _MICRO_BATCHING is not None
+
+
+def _wrap_session(session):
+    if _MICRO_BATCHING is None:
+        return session
+    else:
+        return MicroBatchSession(session, **_MICRO_BATCHING)
@@ -0,0 +1,465 @@
+"""
+Overview:
+    Embedding similarity index, for reverse image search and style search on the embeddings
+    (e.g. the ``embedding`` of :func:`imgutils.tagging.get_wd14_tags`) without an external vector database.
+
+    :class:`EmbeddingIndex` stores the L2-normalized embeddings in an append-only memory-mapped file,
+    with the ids persisted alongside. The search is exact cosine similarity computed with BLAS in chunks by default.
+    For tens of millions of vectors, an IVF (inverted file) index with optional product quantization
+    can be trained, so only a few lists of the nearest centroids are scanned for each query.
+"""
+import json
+import os
+from typing import List, Optional, Union, Tuple, Any, Iterable
+
+import numpy as np
+from scipy import sparse
+
+from .storage import save_json_atomic, append_truncated
+
+__all__ = [
+    'EmbeddingIndex',
+]
+
+_INDEX_VERSION = 1
+_META_FILE = 'meta.json'
+_VECTORS_FILE = 'vectors.bin'
+_IDS_FILE = 'ids.jsonl'
+_IVF_FILES = {'ivf': 'ivf.npz', 'lists': 'ivf_lists.bin', 'codes': 'pq_codes.bin'}
+_DTYPES = {'float16': np.float16, 'float32': np.float32}
+
+
+def _l2_normalize(data: np.ndarray) -> np.ndarray:
+    data = np.asarray(data, dtype=np.float32)
+    norms = np.linalg.norm(data, axis=-1, keepdims=True)
+    return data / np.maximum(norms, 1e-12)
+
+
+def _topk(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k of each row in descending order, returns the column indices and the scores.
+    """
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.zeros((scores.shape[0], 0), dtype=np.int64), np.zeros((scores.shape[0], 0), dtype=scores.dtype)
+    if k < scores.shape[1]:
+        idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        idx = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+    part = np.take_along_axis(scores, idx, axis=1)
+    order = np.argsort(-part, axis=1, kind='stable')
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(part, order, axis=1)
+
+
+def _nearest_centroids(data: np.ndarray, centroids: np.ndarray, n: int = 1,
+                       chunk_size: Optional[int] = None) -> np.ndarray:
+    """
+    Indices of the ``n`` nearest centroids (in euclidean distance) of each row, with shape ``(N, n)``.
+    The rows are scored in chunks, by default sized to keep each score matrix within ``2 ** 24`` elements.
+    """
+    if chunk_size is None:
+        chunk_size = max(1, min(65536, (1 << 24) // max(centroids.shape[0], 1)))
+    half_norms = (centroids.astype(np.float32) ** 2).sum(axis=1) / 2
+    retval = []
+    for i in range(0, data.shape[0], chunk_size):
+        # argmin |x - c|^2 == argmax (x . c - |c|^2 / 2)
+        scores = np.asarray(data[i:i + chunk_size], dtype=np.float32) @ centroids.T - half_norms
+        retval.append(_topk(scores, n)[0])
+    if retval:
+        return np.concatenate(retval)
+    else:
+        return np.zeros((0, n), dtype=np.int64)
+
+
+def _kmeans(data: np.ndarray, k: int, iterations: int = 20, seed: int = 0) -> np.ndarray:
+    """
+    Lloyd's k-means, returns float32 centroids with shape ``(k, dim)``.
+    """
+    data = np.asarray(data, dtype=np.float32)
+    if data.shape[0] < k:
+        raise ValueError(f'At least {k!r} vectors required for training, but {data.shape[0]!r} found.')
+    rs = np.random.RandomState(seed)
+    centroids = data[rs.choice(data.shape[0], k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _nearest_centroids(data, centroids)[:, 0]
+        onehot = sparse.csr_matrix(
+            (np.ones_like(labels, dtype=np.float32), (labels, np.arange(data.shape[0]))),
+            shape=(k, data.shape[0]),
+        )
+        counts = np.bincount(labels, minlength=k)
+        sums = np.asarray(onehot @ data)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        if empty.any():  # re-seed the empty clusters with random vectors
+            centroids[empty] = data[rs.choice(data.shape[0], int(empty.sum()), replace=False)]
+    return centroids
+
+
+class EmbeddingIndex:
+    """
+    Append-only embedding index stored in a directory, with cosine similarity search.
+
+    The embeddings are L2-normalized and stored as ``float16`` or ``float32`` in a memory-mapped file,
+    so the index does not need to fit in memory. Each embedding has an id (``str`` or ``int``) which is
+    persisted in the same directory, and returned by the searches.
+
+    :param directory: Directory of the index. An existing index is opened, otherwise a new one is created.
+    :type directory: str
+    :param dim: Dimension of the embeddings, required when creating a new index.
+    :type dim: Optional[int]
+    :param dtype: Storage dtype of a new index, ``float16`` or ``float32``. Default is ``float16``.
+    :type dtype: str
+
+    :raises ValueError: If the dimension is not given for a new index, or not consistent with the existing index.
+
+    Examples::
+        >>> from imgutils.tagging import get_wd14_tags_batch
+        >>> from imgutils.utils import EmbeddingIndex
+        >>>
+        >>> files = ['1.jpg', '2.jpg', '3.jpg']
+        >>> embeddings = [emb for (emb,) in get_wd14_tags_batch(files, fmt=('embedding',))]
+        >>> index = EmbeddingIndex('my_index', dim=embeddings[0].shape[0])
+        >>> index.add(embeddings, ids=files)
+        >>> len(index)
+        3
+        >>> index.search(embeddings[1], top_k=2)  # list of (id, cosine similarity)
+        [('2.jpg', 1.0), ('3.jpg', 0.83...)]
+        >>>
+        >>> # for tens of millions of vectors, train IVF with product quantization
+        >>> index.train_ivf(n_lists=4096, pq_m=64)
+        >>> index.search(query, top_k=10, n_probe=16)
+    """
+
+    def __init__(self, directory: str, dim: Optional[int] = None, dtype: str = 'float16'):
+        self.directory = directory
+        meta_file = os.path.join(directory, _META_FILE)
+        if os.path.exists(meta_file):
+            with open(meta_file, 'r') as f:
+                meta = json.load(f)
+            if dim is not None and dim != meta['dim']:
+                raise ValueError(f'Dimension {meta["dim"]!r} of existing index {directory!r} '
+                                 f'is not consistent with {dim!r}.')
+            self._meta = meta
+        else:
+            if dim is None:
+                raise ValueError(f'Dimension should be given when creating new index in {directory!r}.')
+            if dtype not in _DTYPES:
+                raise ValueError(f'Dtype should be one of {list(_DTYPES)!r}, but {dtype!r} found.')
+            os.makedirs(directory, exist_ok=True)
+            self._meta = {'version': _INDEX_VERSION, 'dim': int(dim), 'dtype': dtype, 'count': 0, 'ivf': None}
+            self._save_meta()
+
+        self._ids: List[Any] = []
+        self._ids_size = 0
+        ids_file = os.path.join(directory, _IDS_FILE)
+        if os.path.exists(ids_file):
+            with open(ids_file, 'rb') as f:
+                for line in f:
+                    if len(self._ids) >= self._meta['count']:
+                        break  # not committed by the last writing
+                    self._ids.append(json.loads(line))
+                    self._ids_size += len(line)
+        self._id_to_row = {id_: i for i, id_ in enumerate(self._ids)}
+
+        self._ivf = None
+        if self._meta['ivf']:
+            with np.load(self._ivf_file('ivf')) as npz:
+                self._ivf = {key: npz[key] for key in npz.files}
+        self._vectors_mm = None
+        self._lists_cache = None
+
+    def __len__(self):
+        return self._meta['count']
+
+    def __contains__(self, id_) -> bool:
+        return id_ in self._id_to_row
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} directory: {self.directory!r}, count: {len(self)!r}, ' \
+               f'dim: {self.dim!r}, dtype: {self.dtype}, ivf: {self.is_ivf_trained!r}>'
+
+    @property
+    def dim(self) -> int:
+        """
+        Dimension of the embeddings.
+        """
+        return self._meta['dim']
+
+    @property
+    def dtype(self) -> str:
+        """
+        Storage dtype of the embeddings.
+        """
+        return self._meta['dtype']
+
+    @property
+    def ids(self) -> List[Any]:
+        """
+        Ids of the embeddings, in the order of adding.
+        """
+        return list(self._ids)
+
+    @property
+    def is_ivf_trained(self) -> bool:
+        """
+        Whether the IVF index is trained, see :meth:`train_ivf`.
+        """
+        return self._ivf is not None
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+    def _ivf_file(self, key: str) -> str:
+        return self._path(self._meta['ivf'].get('files', _IVF_FILES)[key])
+
+    def _save_meta(self):
+        save_json_atomic(self._path(_META_FILE), self._meta)
+
+    def _row_bytes(self) -> int:
+        return self.dim * np.dtype(_DTYPES[self.dtype]).itemsize
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """
+        Read-only memory-mapped matrix of the stored (normalized) embeddings, with shape ``(count, dim)``.
+        """
+        if len(self) == 0:
+            return np.zeros((0, self.dim), dtype=_DTYPES[self.dtype])
+        if self._vectors_mm is None or self._vectors_mm.shape[0] != len(self):
+            self._vectors_mm = np.memmap(self._path(_VECTORS_FILE), dtype=_DTYPES[self.dtype],
+                                         mode='r', shape=(len(self), self.dim))
+        return self._vectors_mm
+
+    def _ivf_lists(self) -> np.ndarray:
+        return np.fromfile(self._ivf_file('lists'), dtype=np.int32, count=len(self))
+
+    def _pq_codes(self) -> np.ndarray:
+        m = self._ivf['pq_codebooks'].shape[0]
+        return np.memmap(self._ivf_file('codes'), dtype=np.uint8, mode='r', shape=(len(self), m))
+
+    def _inverted_lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        # rows sorted by list, and the offsets of each list
+        if self._lists_cache is None or self._lists_cache[0] != len(self):
+            lists = self._ivf_lists()
+            order = np.argsort(lists, kind='stable')
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(lists, minlength=self._ivf['centroids'].shape[0]))])
+            self._lists_cache = (len(self), order, offsets)
+        return self._lists_cache[1], self._lists_cache[2]
+
+    def _encode_ivf(self, vectors: np.ndarray, ivf: Optional[dict] = None) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        ivf = ivf if ivf is not None else self._ivf
+        centroids = ivf['centroids']
+        lists = _nearest_centroids(vectors, centroids)[:, 0].astype(np.int32)
+        codes = None
+        if 'pq_codebooks' in ivf:
+            codebooks = ivf['pq_codebooks']
+            m, _, dsub = codebooks.shape
+            residuals = (vectors - centroids[lists]).reshape(vectors.shape[0], m, dsub)
+            codes = np.stack([
+                _nearest_centroids(residuals[:, j], codebooks[j])[:, 0] for j in range(m)
+            ], axis=1).astype(np.uint8)
+        return lists, codes
+
+    def add(self, embeddings: Union[np.ndarray, List[np.ndarray]], ids: Optional[Iterable[Any]] = None):
+        """
+        Append embeddings to the index.
+
+        :param embeddings: Embeddings with shape ``(N, dim)``, or a single embedding with shape ``(dim,)``.
+        :type embeddings: Union[np.ndarray, List[np.ndarray]]
+        :param ids: Ids of the embeddings, ``str`` or ``int``. Default is ``None`` which means using the
+            row numbers in the index as ids.
+        :type ids: Optional[Iterable[Any]]
+        :raises ValueError: If the shape of embeddings is incorrect, or ids are duplicated.
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if embeddings.ndim == 1:
+            embeddings = embeddings[None, :]
+        if embeddings.ndim != 2 or embeddings.shape[1] != self.dim:
+            raise ValueError(f'Embeddings with shape (N, {self.dim!r}) expected, but {embeddings.shape!r} found.')
+        count = len(self)
+        ids = list(ids) if ids is not None else list(range(count, count + embeddings.shape[0]))
+        if len(ids) != embeddings.shape[0]:
+            raise ValueError(f'{embeddings.shape[0]!r} ids expected, but {len(ids)!r} found.')
+        if len(set(ids)) != len(ids) or any(id_ in self._id_to_row for id_ in ids):
+            raise ValueError('Ids should be unique in the index.')
+        if not ids:
+            return
+
+        vectors = _l2_normalize(embeddings)
+        ids_data = b''.join(json.dumps(id_).encode('utf-8') + b'\n' for id_ in ids)
+        append_truncated(self._path(_VECTORS_FILE), count * self._row_bytes(),
+                         vectors.astype(_DTYPES[self.dtype]).tobytes())
+        append_truncated(self._path(_IDS_FILE), self._ids_size, ids_data)
+        if self._ivf is not None:
+            lists, codes = self._encode_ivf(vectors)
+            append_truncated(self._ivf_file('lists'), count * 4, lists.tobytes())
+            if codes is not None:
+                append_truncated(self._ivf_file('codes'), count * codes.shape[1], codes.tobytes())
+
+        # the meta file is the commit point
+        self._meta['count'] = count + len(ids)
+        self._save_meta()
+        for i, id_ in enumerate(ids):
+            self._id_to_row[id_] = count + i
+        self._ids.extend(ids)
+        self._ids_size += len(ids_data)
+
+    def get(self, id_) -> np.ndarray:
+        """
+        Get the stored (normalized) embedding by id.
+
+        :param id_: Id of the embedding.
+        :return: The float32 embedding.
+        :rtype: np.ndarray
+        :raises KeyError: If the id is not found.
+        """
+        return np.asarray(self.vectors[self._id_to_row[id_]], dtype=np.float32)
+
+    def train_ivf(self, n_lists: int = 1024, pq_m: Optional[int] = None, sample_size: Optional[int] = 262144,
+                  iterations: int = 20, seed: int = 0):
+        """
+        Train the IVF index on the stored embeddings, the embeddings added later are also indexed.
+
+        :param n_lists: Number of inverted lists (k-means centroids). Default is ``1024``.
+        :type n_lists: int
+        :param pq_m: Number of sub-vectors of product quantization, the dimension should be divisible by it.
+            Each embedding is encoded into ``pq_m`` bytes. Default is ``None`` which means no quantization,
+            the candidates are scored with the stored embeddings.
+        :type pq_m: Optional[int]
+        :param sample_size: Number of embeddings sampled for training, ``None`` means all. Default is ``262144``.
+        :type sample_size: Optional[int]
+        :param iterations: Iterations of k-means. Default is ``20``.
+        :type iterations: int
+        :param seed: Random seed. Default is ``0``.
+        :type seed: int
+        :raises ValueError: If there are not enough embeddings, or the dimension is not divisible by ``pq_m``.
+        """
+        if pq_m is not None and self.dim % pq_m != 0:
+            raise ValueError(f'Dimension {self.dim!r} is not divisible by pq_m {pq_m!r}.')
+        if len(self) < n_lists:
+            raise ValueError(f'At least {n_lists!r} embeddings required for training, but {len(self)!r} found.')
+
+        rs = np.random.RandomState(seed)
+        if sample_size is not None and len(self) > sample_size:
+            rows = np.sort(rs.choice(len(self), sample_size, replace=False))
+        else:
+            rows = np.arange(len(self))
+        samples = np.asarray(self.vectors[rows], dtype=np.float32)
+
+        centroids = _kmeans(samples, n_lists, iterations=iterations, seed=seed)
+        ivf = {'centroids': centroids}
+        if pq_m is not None:
+            if samples.shape[0] < 256:
+                raise ValueError(f'At least 256 embeddings required for quantization, but {len(self)!r} found.')
+            residuals = samples - centroids[_nearest_centroids(samples, centroids)[:, 0]]
+            dsub = self.dim // pq_m
+            ivf['pq_codebooks'] = np.stack([
+                _kmeans(residuals[:, j * dsub:(j + 1) * dsub], 256, iterations=iterations, seed=seed + j)
+                for j in range(pq_m)
+            ])
+
+        # the new files are only used after the meta file referring to them is committed
+        generation = self._meta.get('ivf_generation', 0) + 1
+        files = {}
+        for key, filename in _IVF_FILES.items():
+            stem, ext = os.path.splitext(filename)
+            files[key] = f'{stem}-{generation}{ext}'
+        chunk_size = 65536
+        with open(self._path(files['lists']), 'wb') as lists_file, \
+                open(self._path(files['codes']), 'wb') as codes_file:
+            for i in range(0, len(self), chunk_size):
+                lists, codes = self._encode_ivf(np.asarray(self.vectors[i:i + chunk_size], dtype=np.float32), ivf)
+                lists_file.write(lists.tobytes())
+                if codes is not None:
+                    codes_file.write(codes.tobytes())
+        np.savez(self._path(files['ivf']), **ivf)
+
+        old_files = [self._ivf_file(key) for key in _IVF_FILES] if self._meta['ivf'] else []
+        self._meta['ivf'] = {'n_lists': n_lists, 'pq_m': pq_m, 'files': files}
+        self._meta['ivf_generation'] = generation
+        self._save_meta()
+        self._ivf = ivf
+        self._lists_cache = None
+        for file in old_files:
+            if os.path.exists(file):
+                os.remove(file)
+
+    def _search_exact(self, queries: np.ndarray, top_k: int, chunk_size: int) -> Tuple[np.ndarray, np.ndarray]:
+        best_rows = np.zeros((queries.shape[0], 0), dtype=np.int64)
+        best_scores = np.zeros((queries.shape[0], 0), dtype=np.float32)
+        vectors = self.vectors
+        for i in range(0, len(self), chunk_size):
+            scores = queries @ np.asarray(vectors[i:i + chunk_size], dtype=np.float32).T
+            rows = np.broadcast_to(np.arange(i, i + scores.shape[1]), scores.shape)
+            idx, best_scores = _topk(np.concatenate([best_scores, scores], axis=1), top_k)
+            best_rows = np.take_along_axis(np.concatenate([best_rows, rows], axis=1), idx, axis=1)
+        return best_rows, best_scores
+
+    def _search_ivf(self, query: np.ndarray, top_k: int, n_probe: int, rerank: bool) -> Tuple[np.ndarray, np.ndarray]:
+        centroids = self._ivf['centroids']
+        order, offsets = self._inverted_lists()
+        probes = _nearest_centroids(query[None, :], centroids, n=n_probe)[0]
+        rows = np.concatenate([order[offsets[p]:offsets[p + 1]] for p in probes])
+        row_lists = np.repeat(probes, offsets[probes + 1] - offsets[probes])
+        row_order = np.argsort(rows, kind='stable')  # sequential access of the memory-mapped files
+        rows, row_lists = rows[row_order], row_lists[row_order]
+
+        if 'pq_codebooks' in self._ivf:
+            codebooks = self._ivf['pq_codebooks']
+            m, _, dsub = codebooks.shape
+            # asymmetric distance: q . x ~= q . c + sum_j q_j . codebook_j[code_j]
+            table = np.einsum('md,mkd->mk', query.reshape(m, dsub), codebooks)
+            codes = np.asarray(self._pq_codes()[rows])
+            scores = (centroids @ query)[row_lists] + table[np.arange(m), codes].sum(axis=1)
+            if rerank:
+                idx, _ = _topk(scores[None, :], max(top_k * 8, 64))
+                rows = np.sort(rows[idx[0]])
+                scores = np.asarray(self.vectors[rows], dtype=np.float32) @ query
+        else:
+            scores = np.asarray(self.vectors[rows], dtype=np.float32) @ query
+
+        idx, scores = _topk(scores[None, :].astype(np.float32), top_k)
+        return rows[idx[0]], scores[0]
+
+    def search(self, queries: Union[np.ndarray, List[np.ndarray]], top_k: int = 10,
+               n_probe: int = 8, rerank: bool = True, chunk_size: int = 65536) \
+            -> Union[List[Tuple[Any, float]], List[List[Tuple[Any, float]]]]:
+        """
+        Search the most similar embeddings of the queries, in cosine similarity.
+
+        When IVF is trained (see :meth:`train_ivf`), only the ``n_probe`` lists nearest to each query are scanned,
+        otherwise all the embeddings are compared exactly, chunk by chunk with matrix multiplication.
+
+        :param queries: Query embeddings with shape ``(B, dim)``, or a single one with shape ``(dim,)``.
+        :type queries: Union[np.ndarray, List[np.ndarray]]
+        :param top_k: Number of results of each query. Default is ``10``.
+        :type top_k: int
+        :param n_probe: Number of inverted lists to scan, only used when IVF is trained. Default is ``8``.
+        :type n_probe: int
+        :param rerank: Re-score the best ``max(8 * top_k, 64)`` candidates of quantization with the
+            stored embeddings, only used with product quantization. Default is ``True``.
+        :type rerank: bool
+        :param chunk_size: Number of embeddings multiplied at once in exact search. Default is ``65536``.
+        :type chunk_size: int
+        :return: List of ``(id, similarity)`` tuples in descending order of similarity, or a list of them
+            for each query when the queries are 2-dimensional.
+        :rtype: Union[List[Tuple[Any, float]], List[List[Tuple[Any, float]]]]
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        single = queries.ndim == 1
+        queries = np.atleast_2d(queries)
+        if queries.ndim != 2 or queries.shape[1] != self.dim:
+            raise ValueError(f'Queries with shape (B, {self.dim!r}) expected, but {queries.shape!r} found.')
+        queries = _l2_normalize(queries)
+
+        if self._ivf is None:
+            results = zip(*self._search_exact(queries, top_k, chunk_size))
+        else:
+            n_probe = min(n_probe, self._ivf['centroids'].shape[0])
+            results = [self._search_ivf(query, top_k, n_probe, rerank) for query in queries]
+
+        retval = [
+            [(self._ids[row], score) for row, score in zip(rows.tolist(), scores.tolist())]
+            for rows, scores in results
+        ]
+        return retval[0] if single else retval
@@ -9,6 +9,8 @@ from typing import Optional
 
 from hbutils.system import pip_install
 
+from .batching import _wrap_session
+
 __all__ = [
     'get_onnx_provider', 'open_onnx_model'
 ]
@@ -77,7 +79,7 @@ def _open_onnx_model(ckpt: str, provider: str, use_cpu: bool = True) -> Inferenc
     return InferenceSession(ckpt, options, providers=providers)
 
 
-def open_onnx_model(ckpt: str, mode: str = None) -> InferenceSession:
+def open_onnx_model(ckpt: str, mode: str = None, batchable: bool = False) -> InferenceSession:
     """
     Overview:
         Open an ONNX model and load its ONNX runtime.
@@ -85,6 +87,8 @@ def open_onnx_model(ckpt: str, mode: str = None) -> InferenceSession:
     :param ckpt: ONNX model file.
     :param mode: Provider of the ONNX. Default is ``None`` which means the provider will be auto-detected,
         see :func:`get_onnx_provider` for more details.
+    :param batchable: Whether the outputs of the model are computed per sample along the first dimension,
+        so the concurrent calls can be merged by micro-batching. Default is ``False``.
     :return: A loaded ONNX runtime object.
 
     .. note::
@@ -92,5 +96,10 @@ def open_onnx_model(ckpt: str, mode: str = None) -> InferenceSession:
         This means you can decide which ONNX runtime to use by setting the environment variable. For example,
         on Linux, executing ``export ONNX_MODE=cpu`` will ignore any existing CUDA and force the model inference
         to run on CPU.
+
+    .. note::
+        When micro-batching is enabled with :func:`imgutils.utils.enable_micro_batching`, the session of
+        a batchable model will be wrapped as :class:`imgutils.utils.MicroBatchSession`.
     """
-    return _open_onnx_model(ckpt, get_onnx_provider(mode or os.environ.get('ONNX_MODE', None)))
+    session = _open_onnx_model(ckpt, get_onnx_provider(mode or os.environ.get('ONNX_MODE', None)))
+    return _wrap_session(session) if batchable else session
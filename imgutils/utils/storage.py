@@ -1,8 +1,11 @@
+import json
 import os
 from functools import lru_cache
 
 __all__ = [
     'get_storage_dir',
+    'save_json_atomic',
+    'append_truncated',
 ]
 
 
@@ -18,3 +21,39 @@ def get_storage_dir():
         os.environ.get('IU_HOME') or os.path.expanduser(os.path.join('~', '.cache', 'dghs-imgutils')))
     os.makedirs(dir_, exist_ok=True)
     return dir_
+
+
+def save_json_atomic(file: str, data) -> None:
+    """
+    Save the data as a JSON file atomically, the file is either the old one or the new one when interrupted.
+
+    It is used as the commit point of the file-based stores, e.g. :class:`imgutils.utils.EmbeddingIndex`,
+    the data files are written before the meta file, and only the committed parts of them are read.
+
+    :param file: Path of the JSON file.
+    :type file: str
+    :param data: Data to save.
+    """
+    tmp_file = f'{file}.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_file, file)
+
+
+def append_truncated(file: str, expected_size: int, data: bytes) -> None:
+    """
+    Append the data to the file, after truncating it to the committed size.
+
+    The data appended by an interrupted writing, which is not committed with :func:`save_json_atomic`,
+    is dropped before appending.
+
+    :param file: Path of the file, created when not exists.
+    :type file: str
+    :param expected_size: Committed size of the file in bytes.
+    :type expected_size: int
+    :param data: Data to append.
+    :type data: bytes
+    """
+    with open(file, 'ab') as f:
+        f.truncate(expected_size)
+        f.write(data)
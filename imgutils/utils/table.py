@@ -0,0 +1,112 @@
+"""
+Overview:
+    Compiled cache of CSV tables (e.g. tag lists of the taggers).
+
+    Parsing CSV files with pandas on the first use of each model is slow and requires a heavyweight dependency.
+    :func:`load_csv_table` parses the CSV file only once, compiles the columns into numpy arrays (including
+    the derived columns such as tag names without underlines), and saves them as ``.npz`` file in the
+    storage directory (see :func:`imgutils.utils.get_storage_dir`). Later loads only read the compiled file.
+"""
+import csv
+import hashlib
+import os
+from typing import Dict, Mapping, Tuple, Callable, Optional, List
+
+import numpy as np
+
+from .storage import get_storage_dir
+
+__all__ = [
+    'load_csv_table',
+]
+
+_TABLE_FORMAT_VERSION = 1
+
+DerivedColumnsTyping = Mapping[str, Tuple[str, Callable[[str], str]]]
+
+
+def _parse_column(values: List[str]) -> np.ndarray:
+    """
+    Parse the string values of a column into int64, float64 or unicode array, like the type inference of pandas.
+    """
+    try:
+        return np.asarray([int(v) for v in values], dtype=np.int64)
+    except ValueError:
+        pass
+    try:
+        return np.asarray([float(v) if v else np.nan for v in values], dtype=np.float64)
+    except ValueError:
+        pass
+    return np.asarray(values, dtype=np.str_)
+
+
+def _compile_csv(csv_file: str, derived_columns: Optional[DerivedColumnsTyping] = None) -> Dict[str, np.ndarray]:
+    with open(csv_file, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = list(reader)
+
+    table = {}
+    for i, name in enumerate(header):
+        table[name] = _parse_column([row[i] if i < len(row) else '' for row in rows])
+    for name, (source, func) in (derived_columns or {}).items():
+        table[name] = np.asarray([func(v) for v in table[source].tolist()], dtype=np.str_)
+    return table
+
+
+def _table_cache_file(csv_file: str, derived_columns: Optional[DerivedColumnsTyping] = None) -> str:
+    stat = os.stat(csv_file)
+    key = repr((
+        _TABLE_FORMAT_VERSION,
+        os.path.abspath(csv_file), stat.st_size, stat.st_mtime_ns,
+        sorted((name, source, f'{func.__module__}.{func.__qualname__}')
+               for name, (source, func) in (derived_columns or {}).items()),
+    ))
+    digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+    return os.path.join(get_storage_dir(), 'tables', f'{digest}.npz')
+
+
+def load_csv_table(csv_file: str, derived_columns: Optional[DerivedColumnsTyping] = None) -> Dict[str, np.ndarray]:
+    """
+    Load a CSV table as numpy arrays, with compiled cache.
+
+    The columns are parsed as ``int64`` when all the values are integers, or ``float64`` when all the values are
+    numbers (empty values are ``nan``), otherwise unicode strings.
+
+    :param csv_file: Path of the CSV file.
+    :type csv_file: str
+    :param derived_columns: Extra string columns to precompute, mapping from the new column name to a tuple
+        of the source column name and the function applied to each value. Default is ``None``.
+    :type derived_columns: Optional[Mapping[str, Tuple[str, Callable[[str], str]]]]
+    :return: A dict of column names and their values.
+    :rtype: Dict[str, np.ndarray]
+
+    .. note::
+        The compiled file is keyed by the path, size and modification time of the CSV file and the derived columns,
+        so the cache is refreshed when the CSV file is changed.
+
+    Examples::
+        >>> from imgutils.utils import load_csv_table
+        >>> from imgutils.tagging import remove_underline
+        >>>
+        >>> table = load_csv_table('selected_tags.csv', derived_columns={'name_nu': ('name', remove_underline)})
+        >>> table['name'][:3].tolist()
+        ['general', 'sensitive', 'questionable']
+        >>> table['category'].dtype
+        dtype('int64')
+    """
+    cache_file = _table_cache_file(csv_file, derived_columns)
+    if os.path.exists(cache_file):
+        try:
+            with np.load(cache_file, allow_pickle=False) as npz:
+                return {name: npz[f'arr_{i}'] for i, name in enumerate(npz['columns'].tolist())}
+        except (OSError, ValueError, EOFError):  # pragma: no cover
+            pass  # broken cache file, compile again
+
+    table = _compile_csv(csv_file, derived_columns)
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    tmp_file = f'{cache_file}.{os.getpid()}.tmp.npz'
+    # column names are stored separately, so that any name (e.g. ``file``) is supported
+    np.savez(tmp_file, *table.values(), columns=np.asarray(list(table.keys()), dtype=np.str_))
+    os.replace(tmp_file, cache_file)
+    return table
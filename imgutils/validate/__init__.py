@@ -14,6 +14,7 @@ from .portrait import *
 from .rating import *
 from .real import *
 from .safe import *
+from .suite import *
 from .style_age import *
 from .teen import *
 from .truncate import *
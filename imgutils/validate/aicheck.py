@@ -15,12 +15,17 @@ Overview:
     The models are hosted on
     `huggingface - deepghs/anime_ai_check <https://huggingface.co/deepghs/anime_ai_check>`_.
 """
+from typing import List
+
 from ..data import ImageTyping
-from ..generic import classify_predict, classify_predict_score
+from ..generic import classify_predict, classify_predict_score, classify_predict_batch, \
+    classify_predict_score_batch
 
 __all__ = [
     'get_ai_created_score',
     'is_ai_created',
+    'get_ai_created_score_batch',
+    'is_ai_created_batch',
 ]
 
 _DEFAULT_MODEL_NAME = 'mobilenetv3_sce_dist'
@@ -112,3 +117,39 @@ def is_ai_created(image: ImageTyping, model_name: str = _DEFAULT_MODEL_NAME, thr
     """
     type_, _ = classify_predict(image, _REPO_ID, model_name)
     return type_ == 'ai'
+
+
+def get_ai_created_score_batch(images: List[ImageTyping], model_name: str = _DEFAULT_MODEL_NAME,
+                               batch_size: int = 16) -> List[float]:
+    """
+    Overview:
+        Batch version of :func:`get_ai_created_score`, the images are predicted in batches.
+
+    :param images: List of images to predict.
+    :param model_name: Name of the model. Default is ``mobilenetv3_sce_dist``.
+        If you need better accuracy, use ``caformer_s36_plus_sce``.
+        All the available values are listed on the benchmark graph.
+    :param batch_size: Maximum number of images in one model run, default is ``16``.
+    :return: A list of scores, one for each image.
+    """
+    scores, labels = classify_predict_score_batch(images, _REPO_ID, model_name, batch_size=batch_size)
+    return scores[:, labels.index('ai')].tolist()
+
+
+def is_ai_created_batch(images: List[ImageTyping], model_name: str = _DEFAULT_MODEL_NAME, threshold: float = 0.5,
+                        batch_size: int = 16) -> List[bool]:
+    """
+    Overview:
+        Batch version of :func:`is_ai_created`, the images are predicted in batches.
+
+    :param images: List of images to predict.
+    :param model_name: Name of the model. Default is ``mobilenetv3_sce_dist``.
+        If you need better accuracy, use ``caformer_s36_plus_sce``.
+        All the available values are listed on the benchmark graph.
+    :param threshold: Threshold of the score. When the score is no less than ``threshold``, this image
+        will be predicted as ``AI-created``. Default is ``0.5``.
+    :param batch_size: Maximum number of images in one model run, default is ``16``.
+    :return: A list of boolean results, one for each image.
+    """
+    return [type_ == 'ai' for type_, _ in
+            classify_predict_batch(images, _REPO_ID, model_name, batch_size=batch_size)]
@@ -28,14 +28,17 @@ Overview:
         If you are looking for a classification model that judges the proportion of the head in an image,
         please use the :func:`imgutils.validate.anime_portrait` function.
 """
-from typing import Tuple, Dict
+from typing import Tuple, Dict, List
 
 from ..data import ImageTyping
-from ..generic import classify_predict_score, classify_predict
+from ..generic import classify_predict, classify_predict_score, classify_predict_batch, \
+    classify_predict_score_batch
 
 __all__ = [
     'anime_bangumi_char_score',
     'anime_bangumi_char',
+    'anime_bangumi_char_score_batch',
+    'anime_bangumi_char_batch',
 ]
 
 _DEFAULT_MODEL_NAME = 'mobilenetv3_v0_dist'
@@ -140,3 +143,30 @@ def anime_bangumi_char(image: ImageTyping, model_name: str = _DEFAULT_MODEL_NAME
         ('face', 0.9999388456344604)
     """
     return classify_predict(image, _REPO_ID, model_name)
+
+
+def anime_bangumi_char_score_batch(images: List[ImageTyping], model_name: str = _DEFAULT_MODEL_NAME,
+                                   batch_size: int = 16) -> List[Dict[str, float]]:
+    """
+    Batch version of :func:`anime_bangumi_char_score`, the images are predicted in batches.
+
+    :param images: List of images to predict.
+    :param model_name: The model name. Default is 'mobilenetv3_v0_dist'.
+    :param batch_size: Maximum number of images in one model run, default is ``16``.
+    :return: A list of dictionaries with type scores, one for each image.
+    """
+    scores, labels = classify_predict_score_batch(images, _REPO_ID, model_name, batch_size=batch_size)
+    return [dict(zip(labels, row)) for row in scores.tolist()]
+
+
+def anime_bangumi_char_batch(images: List[ImageTyping], model_name: str = _DEFAULT_MODEL_NAME,
+                             batch_size: int = 16) -> List[Tuple[str, float]]:
+    """
+    Batch version of :func:`anime_bangumi_char`, the images are predicted in batches.
+
+    :param images: List of images to predict.
+    :param model_name: The model name. Default is 'mobilenetv3_v0_dist'.
+    :param batch_size: Maximum number of images in one model run, default is ``16``.
+    :return: A list of tuples with the predicted class and its score, one for each image.
+    """
+    return classify_predict_batch(images, _REPO_ID, model_name, batch_size=batch_size)
@@ -18,14 +18,17 @@ Overview:
     .. note::
         In older versions of models, there are 4 classes, which means ``not_painting`` do not exist.
 """
-from typing import Tuple, Dict
+from typing import Tuple, Dict, List
 
 from ..data import ImageTyping
-from ..generic import classify_predict, classify_predict_score
+from ..generic import classify_predict, classify_predict_score, classify_predict_batch, \
+    classify_predict_score_batch
 
 __all__ = [
     'anime_classify_score',
     'anime_classify',
+    'anime_classify_score_batch',
+    'anime_classify_batch',
 ]
 
 _DEFAULT_MODEL_NAME = 'mobilenetv3_v1.3_dist'
@@ -124,3 +127,34 @@ def anime_classify(image: ImageTyping, model_name: str = _DEFAULT_MODEL_NAME) ->
         ('not_painting', 0.9938107132911682)
     """
     return classify_predict(image, _REPO_ID, model_name)
+
+
+def anime_classify_score_batch(images: List[ImageTyping], model_name: str = _DEFAULT_MODEL_NAME,
+                               batch_size: int = 16) -> List[Dict[str, float]]:
+    """
+    Overview:
+        Batch version of :func:`anime_classify_score`, the images are predicted in batches.
+
+    :param images: List of images to predict.
+    :param model_name: Model to use. Default is ``mobilenetv3_v1.3_dist``. All available models are listed
+        on the benchmark plot above. If you need better accuracy, just set this to ``caformer_s36_v1.3_focal``.
+    :param batch_size: Maximum number of images in one model run, default is ``16``.
+    :return: A list of dictionaries with class scores, one for each image.
+    """
+    scores, labels = classify_predict_score_batch(images, _REPO_ID, model_name, batch_size=batch_size)
+    return [dict(zip(labels, row)) for row in scores.tolist()]
+
+
+def anime_classify_batch(images: List[ImageTyping], model_name: str = _DEFAULT_MODEL_NAME,
+                         batch_size: int = 16) -> List[Tuple[str, float]]:
+    """
+    Overview:
+        Batch version of :func:`anime_classify`, the images are predicted in batches.
+
+    :param images: List of images to predict.
+    :param model_name: Model to use. Default is ``mobilenetv3_v1.3_dist``. All available models are listed
+        on the benchmark plot above. If you need better accuracy, just set this to ``caformer_s36_v1.3_focal``.
+    :param batch_size: Maximum number of images in one model run, default is ``16``.
+    :return: A list of tuples with the predicted class and its score, one for each image.
+    """
+    return classify_predict_batch(images, _REPO_ID, model_name, batch_size=batch_size)
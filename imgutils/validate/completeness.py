@@ -15,14 +15,17 @@ Overview:
     The models are hosted on
     `huggingface - deepghs/anime_completeness <https://huggingface.co/deepghs/anime_completeness>`_.
 """
-from typing import Tuple, Dict
+from typing import Tuple, Dict, List
 
 from ..data import ImageTyping
-from ..generic import classify_predict, classify_predict_score
+from ..generic import classify_predict, classify_predict_score, classify_predict_batch, \
+    classify_predict_score_batch
 
 __all__ = [
     'anime_completeness_score',
     'anime_completeness',
+    'anime_completeness_score_batch',
+    'anime_completeness_batch',
 ]
 
 _DEFAULT_MODEL_NAME = 'mobilenetv3_v2.2_dist'
@@ -99,3 +102,30 @@ def anime_completeness(image: ImageTyping, model_name: str = _DEFAULT_MODEL_NAME
         ('polished', 0.9831690788269043)
     """
     return classify_predict(image, _REPO_ID, model_name)
+
+
+def anime_completeness_score_batch(images: List[ImageTyping], model_name: str = _DEFAULT_MODEL_NAME,
+                                   batch_size: int = 16) -> List[Dict[str, float]]:
+    """
+    Batch version of :func:`anime_completeness_score`, the images are predicted in batches.
+
+    :param images: List of images to predict.
+    :param model_name: The model name. Default is 'mobilenetv3_v2.2_dist'.
+    :param batch_size: Maximum number of images in one model run, default is ``16``.
+    :return: A list of dictionaries with type scores, one for each image.
+    """
+    scores, labels = classify_predict_score_batch(images, _REPO_ID, model_name, batch_size=batch_size)
+    return [dict(zip(labels, row)) for row in scores.tolist()]
+
+
+def anime_completeness_batch(images: List[ImageTyping], model_name: str = _DEFAULT_MODEL_NAME,
+                             batch_size: int = 16) -> List[Tuple[str, float]]:
+    """
+    Batch version of :func:`anime_completeness`, the images are predicted in batches.
+
+    :param images: List of images to predict.
+    :param model_name: The model name. Default is 'mobilenetv3_v2.2_dist'.
+    :param batch_size: Maximum number of images in one model run, default is ``16``.
+    :return: A list of tuples with the predicted class and its score, one for each image.
+    """
+    return classify_predict_batch(images, _REPO_ID, model_name, batch_size=batch_size)
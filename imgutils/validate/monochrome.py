@@ -15,12 +15,17 @@ Overview:
 
     The models are hosted on `huggingface - deepghs/monochrome_detect <https://huggingface.co/deepghs/monochrome_detect>`_.
 """
+from typing import List
+
 from ..data import ImageTyping
-from ..generic import classify_predict_score, classify_predict
+from ..generic import classify_predict, classify_predict_score, classify_predict_batch, \
+    classify_predict_score_batch
 
 __all__ = [
     'get_monochrome_score',
     'is_monochrome',
+    'get_monochrome_score_batch',
+    'is_monochrome_batch',
 ]
 
 _DEFAULT_MODEL_NAME = 'mobilenetv3_large_100_dist_safe2'
@@ -111,3 +116,37 @@ def is_monochrome(image: ImageTyping, threshold: float = 0.5,
     """
     type_, _ = classify_predict(image, _REPO_ID, model_name)
     return type_ == 'monochrome'
+
+
+def get_monochrome_score_batch(images: List[ImageTyping], model_name: str = _DEFAULT_MODEL_NAME,
+                               batch_size: int = 16) -> List[float]:
+    """
+    Overview:
+        Batch version of :func:`get_monochrome_score`, the images are predicted in batches.
+
+    :param images: List of images to predict.
+    :param model_name: The model used for inference. The default value is ``mobilenetv3_dist``,
+        which offers high runtime performance. If you need better accuracy, just use ``caformer_s36``.
+    :param batch_size: Maximum number of images in one model run, default is ``16``.
+    :return: A list of scores, one for each image.
+    """
+    scores, labels = classify_predict_score_batch(images, _REPO_ID, model_name, batch_size=batch_size)
+    return scores[:, labels.index('monochrome')].tolist()
+
+
+def is_monochrome_batch(images: List[ImageTyping], threshold: float = 0.5, model_name: str = _DEFAULT_MODEL_NAME,
+                        batch_size: int = 16) -> List[bool]:
+    """
+    Overview:
+        Batch version of :func:`is_monochrome`, the images are predicted in batches.
+
+    :param images: List of images to predict.
+    :param threshold: Threshold value during prediction. If the score is higher than the threshold,
+        the image will be classified as monochrome.
+    :param model_name: The model used for inference. The default value is ``mobilenetv3_dist``,
+        which offers high runtime performance. If you need better accuracy, just use ``caformer_s36``.
+    :param batch_size: Maximum number of images in one model run, default is ``16``.
+    :return: A list of boolean results, one for each image.
+    """
+    return [type_ == 'monochrome' for type_, _ in
+            classify_predict_batch(images, _REPO_ID, model_name, batch_size=batch_size)]
@@ -17,7 +17,7 @@ Overview:
         :align: center
 """
 from functools import lru_cache
-from typing import Mapping, Tuple
+from typing import Mapping, Tuple, List, Optional
 
 import numpy as np
 from PIL import Image
@@ -29,6 +29,8 @@ from ..utils import open_onnx_model
 __all__ = [
     'nsfw_pred_score',
     'nsfw_pred',
+    'nsfw_pred_score_batch',
+    'nsfw_pred_batch',
 ]
 
 _MODELS = [
@@ -60,11 +62,12 @@ def _open_nsfw_model(model: str = _DEFAULT_MODEL_NAME):
     ))
 
 
-def _image_preprocess(image, size: int = 224) -> np.ndarray:
+def _image_preprocess(image, size: int = 224, resample: int = Image.NEAREST,
+                      out: Optional[np.ndarray] = None) -> np.ndarray:
     """
     Preprocesses the image for NSFW prediction.
 
-    The function loads the image, resizes it to the specified ``size``, and converts it to a numpy array.
+    The function loads the image, resizes it to the specified ``size``, and converts it to a float32 numpy array.
     The pixel values are normalized to the range :math:`\left[0, 1\right]`.
 
     :param image: The image to preprocess.
@@ -73,16 +76,63 @@ def _image_preprocess(image, size: int = 224) -> np.ndarray:
     :param size: The size to resize the image to. (default: ``224``)
     :type size: int
 
-    :return: The preprocessed image as a numpy array.
+    :param resample: The resampling filter used for resizing. (default: ``Image.NEAREST``)
+    :type resample: int
+
+    :param out: Optional float32 array with shape ``(size, size, 3)`` to write the result into.
+    :type out: np.ndarray
+
+    :return: The preprocessed image as a numpy array in HWC format.
     :rtype: np.ndarray
     """
-    image = load_image(image, mode='RGB').resize((size, size), Image.NEAREST)
-    return (np.array(image) / 255.0)[None, ...]
+    image = load_image(image, mode='RGB').resize((size, size), resample=resample)
+    if out is None:
+        out = np.empty((size, size, 3), dtype=np.float32)
+    np.multiply(np.asarray(image), np.float32(1.0 / 255.0), out=out)
+    return out
 
 
 _LABELS = ['drawings', 'hentai', 'neutral', 'porn', 'sexy']
 
 
+def _raw_scores_batch(images: List[ImageTyping], model_name: str = _DEFAULT_MODEL_NAME,
+                      batch_size: int = 32, resample: int = Image.NEAREST) -> np.ndarray:
+    """
+    Computes the raw prediction scores for the NSFW categories of multiple images.
+
+    The images are preprocessed into a preallocated float32 NHWC batch, which is reused for all the chunks.
+
+    :param images: The images to compute scores for.
+    :type images: List[ImageTyping]
+
+    :param model_name: The name of the NSFW model to use. (default: ``nsfwjs``)
+    :type model_name: str
+
+    :param batch_size: Maximum number of images in one model run. (default: ``32``)
+    :type batch_size: int
+
+    :param resample: The resampling filter used for resizing. (default: ``Image.NEAREST``)
+    :type resample: int
+
+    :return: The raw prediction scores with shape ``(N, 5)``.
+    :rtype: np.ndarray
+    """
+    if batch_size < 1:
+        raise ValueError(f'Batch size should be no less than 1, but {batch_size!r} found.')
+
+    images = list(images)
+    size = _MODEL_TO_SIZE[model_name]
+    buffer = np.empty((min(batch_size, len(images)), size, size, 3), dtype=np.float32)
+    scores = np.empty((len(images), len(_LABELS)), dtype=np.float32)
+    for i in range(0, len(images), batch_size):
+        chunk = images[i:i + batch_size]
+        for j, image in enumerate(chunk):
+            _image_preprocess(image, size, resample=resample, out=buffer[j])
+        output_, = _open_nsfw_model(model_name).run(['dense_3'], {'input_1': buffer[:len(chunk)]})
+        scores[i:i + len(chunk)] = output_
+    return scores
+
+
 def _raw_scores(image: ImageTyping, model_name: str = _DEFAULT_MODEL_NAME) -> np.ndarray:
     """
     Computes the raw prediction scores for the NSFW categories.
@@ -99,9 +149,7 @@ def _raw_scores(image: ImageTyping, model_name: str = _DEFAULT_MODEL_NAME) -> np
     :return: The raw prediction scores as a numpy array.
     :rtype: np.ndarray
     """
-    input_ = _image_preprocess(image, _MODEL_TO_SIZE[model_name]).astype(np.float32)
-    output_, = _open_nsfw_model(model_name).run(['dense_3'], {'input_1': input_})
-    return output_[0]
+    return _raw_scores_batch([image], model_name)[0]
 
 
 def nsfw_pred_score(image: ImageTyping, model_name: str = _DEFAULT_MODEL_NAME) -> Mapping[str, float]:
@@ -231,3 +279,60 @@ def nsfw_pred(image: ImageTyping, model_name: str = _DEFAULT_MODEL_NAME) -> Tupl
     scores = _raw_scores(image, model_name)
     maxid = np.argmax(scores)
     return _LABELS[maxid], scores[maxid].item()
+
+
+def nsfw_pred_score_batch(images: List[ImageTyping], model_name: str = _DEFAULT_MODEL_NAME,
+                          batch_size: int = 32, resample: int = Image.NEAREST) -> List[Mapping[str, float]]:
+    """
+    Computes the NSFW prediction scores for multiple images in batches.
+
+    :param images: The images to compute prediction scores for.
+    :type images: List[ImageTyping]
+
+    :param model_name: The name of the NSFW model to use. (default: ``nsfwjs``)
+    :type model_name: str
+
+    :param batch_size: Maximum number of images in one model run. (default: ``32``)
+    :type batch_size: int
+
+    :param resample: The resampling filter used for resizing the images, such as ``Image.BILINEAR``.
+        (default: ``Image.NEAREST``, which is the same as :func:`nsfw_pred_score`)
+    :type resample: int
+
+    :return: A list of mappings of labels to scores, one for each image.
+    :rtype: List[Mapping[str, float]]
+
+    Examples::
+        >>> from imgutils.validate import nsfw_pred_score_batch
+        >>>
+        >>> scores = nsfw_pred_score_batch(['nsfw/drawings/1.jpg', 'nsfw/neutral/9.jpg'])
+        >>> [max(s, key=s.get) for s in scores]
+        ['drawings', 'neutral']
+    """
+    scores = _raw_scores_batch(images, model_name, batch_size, resample)
+    return [dict(zip(_LABELS, row)) for row in scores.tolist()]
+
+
+def nsfw_pred_batch(images: List[ImageTyping], model_name: str = _DEFAULT_MODEL_NAME,
+                    batch_size: int = 32, resample: int = Image.NEAREST) -> List[Tuple[str, float]]:
+    """
+    Performs NSFW prediction on multiple images in batches.
+
+    :param images: The images to perform NSFW prediction on.
+    :type images: List[ImageTyping]
+
+    :param model_name: The name of the NSFW model to use. (default: ``nsfwjs``)
+    :type model_name: str
+
+    :param batch_size: Maximum number of images in one model run. (default: ``32``)
+    :type batch_size: int
+
+    :param resample: The resampling filter used for resizing the images. (default: ``Image.NEAREST``)
+    :type resample: int
+
+    :return: A list of the predicted NSFW category labels and their prediction scores, one for each image.
+    :rtype: List[Tuple[str, float]]
+    """
+    scores = _raw_scores_batch(images, model_name, batch_size, resample)
+    maxids = np.argmax(scores, axis=-1)
+    return [(_LABELS[maxid], row[maxid].item()) for maxid, row in zip(maxids.tolist(), scores)]
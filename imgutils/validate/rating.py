@@ -27,14 +27,17 @@ Overview:
         it is recommended to consider using object detection-based methods**,
         such as using :func:`imgutils.detect.censor.detect_censors` to detect sensitive regions as the basis for judgment.
 """
-from typing import Tuple, Dict
+from typing import Tuple, Dict, List
 
 from ..data import ImageTyping
-from ..generic import classify_predict, classify_predict_score
+from ..generic import classify_predict, classify_predict_score, classify_predict_batch, \
+    classify_predict_score_batch
 
 __all__ = [
     'anime_rating_score',
     'anime_rating',
+    'anime_rating_score_batch',
+    'anime_rating_batch',
 ]
 
 _DEFAULT_MODEL_NAME = 'mobilenetv3_v1_pruned_ls0.1'
@@ -121,3 +124,34 @@ def anime_rating(image: ImageTyping, model_name: str = _DEFAULT_MODEL_NAME) -> T
         ('r18', 0.9994290471076965)
     """
     return classify_predict(image, _REPO_ID, model_name)
+
+
+def anime_rating_score_batch(images: List[ImageTyping], model_name: str = _DEFAULT_MODEL_NAME,
+                             batch_size: int = 16) -> List[Dict[str, float]]:
+    """
+    Overview:
+        Batch version of :func:`anime_rating_score`, the images are predicted in batches.
+
+    :param images: List of images to predict.
+    :param model_name: Model to use. Default is ``mobilenetv3_sce_dist``. All available models are listed
+        on the benchmark plot above. If you need better accuracy, just set this to ``caformer_s36_plus``.
+    :param batch_size: Maximum number of images in one model run, default is ``16``.
+    :return: A list of dictionaries with rating scores, one for each image.
+    """
+    scores, labels = classify_predict_score_batch(images, _REPO_ID, model_name, batch_size=batch_size)
+    return [dict(zip(labels, row)) for row in scores.tolist()]
+
+
+def anime_rating_batch(images: List[ImageTyping], model_name: str = _DEFAULT_MODEL_NAME,
+                       batch_size: int = 16) -> List[Tuple[str, float]]:
+    """
+    Overview:
+        Batch version of :func:`anime_rating`, the images are predicted in batches.
+
+    :param images: List of images to predict.
+    :param model_name: Model to use. Default is ``mobilenetv3_sce_dist``. All available models are listed
+        on the benchmark plot above. If you need better accuracy, just set this to ``caformer_s36_plus``.
+    :param batch_size: Maximum number of images in one model run, default is ``16``.
+    :return: A list of tuples with the predicted class and its score, one for each image.
+    """
+    return classify_predict_batch(images, _REPO_ID, model_name, batch_size=batch_size)
@@ -15,14 +15,17 @@ Overview:
     The models are hosted on
     `huggingface - deepghs/anime_real_cls <https://huggingface.co/deepghs/anime_real_cls>`_.
 """
-from typing import Tuple, Dict
+from typing import Tuple, Dict, List
 
 from ..data import ImageTyping
-from ..generic import classify_predict, classify_predict_score
+from ..generic import classify_predict, classify_predict_score, classify_predict_batch, \
+    classify_predict_score_batch
 
 __all__ = [
     'anime_real_score',
     'anime_real',
+    'anime_real_score_batch',
+    'anime_real_batch',
 ]
 
 _DEFAULT_MODEL_NAME = 'mobilenetv3_v1.2_dist'
@@ -127,3 +130,30 @@ def anime_real(image: ImageTyping, model_name: str = _DEFAULT_MODEL_NAME) -> Tup
         ('real', 0.9999845027923584)
     """
     return classify_predict(image, _REPO_ID, model_name)
+
+
+def anime_real_score_batch(images: List[ImageTyping], model_name: str = _DEFAULT_MODEL_NAME,
+                           batch_size: int = 16) -> List[Dict[str, float]]:
+    """
+    Batch version of :func:`anime_real_score`, the images are predicted in batches.
+
+    :param images: List of images to predict.
+    :param model_name: The model name. Default is 'mobilenetv3_v1.2_dist'.
+    :param batch_size: Maximum number of images in one model run, default is ``16``.
+    :return: A list of dictionaries with type scores, one for each image.
+    """
+    scores, labels = classify_predict_score_batch(images, _REPO_ID, model_name, batch_size=batch_size)
+    return [dict(zip(labels, row)) for row in scores.tolist()]
+
+
+def anime_real_batch(images: List[ImageTyping], model_name: str = _DEFAULT_MODEL_NAME,
+                     batch_size: int = 16) -> List[Tuple[str, float]]:
+    """
+    Batch version of :func:`anime_real`, the images are predicted in batches.
+
+    :param images: List of images to predict.
+    :param model_name: The model name. Default is 'mobilenetv3_v1.2_dist'.
+    :param batch_size: Maximum number of images in one model run, default is ``16``.
+    :return: A list of tuples with the predicted class and its score, one for each image.
+    """
+    return classify_predict_batch(images, _REPO_ID, model_name, batch_size=batch_size)
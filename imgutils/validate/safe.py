@@ -12,7 +12,7 @@ Overview:
 import math
 import random
 from functools import lru_cache
-from typing import Mapping, Tuple
+from typing import Mapping, Tuple, List, Optional
 
 import numpy as np
 from PIL import Image
@@ -24,6 +24,8 @@ from ..utils import open_onnx_model
 __all__ = [
     'safe_check_score',
     'safe_check',
+    'safe_check_score_batch',
+    'safe_check_batch',
 ]
 
 DEFAULT_MODEL = 'mobilenet.xs.v2'
@@ -73,35 +75,87 @@ def _img_encode(image, size=(384, 384), normalize=(0.5, 0.5)):
     return data.astype(np.float32)
 
 
-def _raw_predict(images, model_name=DEFAULT_MODEL):
-    items = []
-    for image in images:
-        items.append(_img_encode(image.convert('RGB')))
-    input_ = np.stack(items)
-    output, = _open_model(model_name).run(['output'], {'input': input_})
-    return output.mean(axis=0)
+_LABELS = ['polluted', 'safe']
+_TILE_SIZE = 384
 
 
-_LABELS = ['polluted', 'safe']
+def _tile_positions(length: int, stride: int) -> List[int]:
+    if length <= _TILE_SIZE:
+        return [0]
+    positions = list(range(0, length - _TILE_SIZE + 1, stride))
+    if positions[-1] != length - _TILE_SIZE:
+        positions.append(length - _TILE_SIZE)
+    return positions
 
 
-def _pred(image, model_name=DEFAULT_MODEL, max_batch_size=8):
-    area = image.width * image.height
-    batch_size = int(max(min(math.ceil(area / (384 * 384)) + 1, max_batch_size), 1))
-    blocks = []
-    for _ in range(batch_size):
-        x0 = random.randint(0, max(0, image.width - 384))
-        y0 = random.randint(0, max(0, image.height - 384))
-        x1 = min(x0 + 384, image.width)
-        y1 = min(y0 + 384, image.height)
-        blocks.append(image.crop((x0, y0, x1, y1)))
+def _tile_boxes(width: int, height: int, max_batch_size: int = 8, stride: Optional[int] = None, seed: int = 0) \
+        -> List[Tuple[int, int, int, int]]:
+    """
+    Get the crop boxes of an image for safe check.
+
+    The image is covered with a grid of 384x384 tiles placed every ``stride`` pixels (the last tile of each
+    row and column is aligned to the image border). When there are more tiles than the crop count,
+    which is ``ceil(area / 384^2) + 1`` limited by ``max_batch_size``, the tiles are sampled with a random
+    generator seeded by ``seed``, so the result is always the same for the same image size.
+
+    :param width: Width of the image.
+    :param height: Height of the image.
+    :param max_batch_size: Maximum number of crops.
+    :param stride: Step of the grid in pixels, default is ``None`` which means 384 (no overlap).
+    :param seed: Seed for sampling the tiles.
+    :return: List of crop boxes in ``(x0, y0, x1, y1)`` format, in row-major order.
+    """
+    stride = stride or _TILE_SIZE
+    if stride < 1:
+        raise ValueError(f'Stride should be a positive integer, but {stride!r} found.')
+
+    count = int(max(min(math.ceil(width * height / (_TILE_SIZE * _TILE_SIZE)) + 1, max_batch_size), 1))
+    boxes = [
+        (x0, y0, min(x0 + _TILE_SIZE, width), min(y0 + _TILE_SIZE, height))
+        for y0 in _tile_positions(height, stride)
+        for x0 in _tile_positions(width, stride)
+    ]
+    if len(boxes) > count:
+        indices = sorted(random.Random(seed).sample(range(len(boxes)), count))
+        boxes = [boxes[i] for i in indices]
+    return boxes
+
+
+def _pred_batch(images: List[Image.Image], model_name: str = DEFAULT_MODEL, max_batch_size: int = 8,
+                stride: Optional[int] = None, seed: int = 0, batch_size: int = 32) -> np.ndarray:
+    """
+    Predict the safe check scores of images, crops of all the images are packed into shared model runs.
 
-    scores = _raw_predict(blocks, model_name)
+    :return: Scores with shape ``(N, 2)``, which are the mean scores of each image's crops.
+    """
+    if batch_size < 1:
+        raise ValueError(f'Batch size should be no less than 1, but {batch_size!r} found.')
+
+    owners, inputs = [], []
+    for i, image in enumerate(images):
+        image = image.convert('RGB')
+        for box in _tile_boxes(image.width, image.height, max_batch_size, stride, seed):
+            owners.append(i)
+            inputs.append(_img_encode(image.crop(box)))
+
+    scores = np.zeros((len(images), len(_LABELS)), dtype=np.float32)
+    if inputs:
+        outputs = []
+        for i in range(0, len(inputs), batch_size):
+            output, = _open_model(model_name).run(['output'], {'input': np.stack(inputs[i:i + batch_size])})
+            outputs.append(output)
+        owners = np.asarray(owners)
+        np.add.at(scores, owners, np.concatenate(outputs))
+        scores /= np.bincount(owners, minlength=len(images))[:, None]
     return scores
 
 
-def safe_check_score(image: ImageTyping, model_name: str = DEFAULT_MODEL, max_batch_size: int = 8) \
-        -> Mapping[str, float]:
+def _pred(image, model_name=DEFAULT_MODEL, max_batch_size=8, stride=None, seed=0):
+    return _pred_batch([image], model_name, max_batch_size, stride, seed)[0]
+
+
+def safe_check_score(image: ImageTyping, model_name: str = DEFAULT_MODEL, max_batch_size: int = 8,
+                     stride: Optional[int] = None, seed: int = 0) -> Mapping[str, float]:
     """
     Check the safety score of an image.
 
@@ -109,18 +163,23 @@ def safe_check_score(image: ImageTyping, model_name: str = DEFAULT_MODEL, max_ba
     :type image: ImageTyping
     :param model_name: The name of the safety model.
     :type model_name: str
-    :param max_batch_size: The maximum batch size for prediction.
+    :param max_batch_size: The maximum number of 384x384 crops used for prediction.
     :type max_batch_size: int
+    :param stride: Step in pixels of the crop grid, default is ``None`` which means 384 (no overlap).
+    :type stride: Optional[int]
+    :param seed: Seed for sampling the crops when there are more grid tiles than ``max_batch_size``.
+        The same image always gets the same score with the same seed.
+    :type seed: int
     :return: A mapping of safety labels and their corresponding scores.
     :rtype: Mapping[str, float]
     """
     image = load_image(image)
-    _pred_result = _pred(image, model_name, max_batch_size)
-    return dict(zip(['polluted', 'safe'], map(lambda x: x.item(), _pred_result)))
+    _pred_result = _pred(image, model_name, max_batch_size, stride, seed)
+    return dict(zip(_LABELS, map(lambda x: x.item(), _pred_result)))
 
 
-def safe_check(image: ImageTyping, model_name: str = DEFAULT_MODEL, max_batch_size: int = 8) \
-        -> Tuple[str, float]:
+def safe_check(image: ImageTyping, model_name: str = DEFAULT_MODEL, max_batch_size: int = 8,
+               stride: Optional[int] = None, seed: int = 0) -> Tuple[str, float]:
     """
     Check the safety label and score of an image.
 
@@ -128,12 +187,78 @@ def safe_check(image: ImageTyping, model_name: str = DEFAULT_MODEL, max_batch_si
     :type image: ImageTyping
     :param model_name: The name of the safety model.
     :type model_name: str
-    :param max_batch_size: The maximum batch size for prediction.
+    :param max_batch_size: The maximum number of 384x384 crops used for prediction.
     :type max_batch_size: int
+    :param stride: Step in pixels of the crop grid, default is ``None`` which means 384 (no overlap).
+    :type stride: Optional[int]
+    :param seed: Seed for sampling the crops when there are more grid tiles than ``max_batch_size``.
+    :type seed: int
     :return: A tuple containing the safety label and score.
     :rtype: Tuple[str, float]
     """
     image = load_image(image)
-    _pred_result = _pred(image, model_name, max_batch_size)
+    _pred_result = _pred(image, model_name, max_batch_size, stride, seed)
     id_ = _pred_result.argmax().item()
     return _LABELS[id_], _pred_result[id_].item()
+
+
+def safe_check_score_batch(images: List[ImageTyping], model_name: str = DEFAULT_MODEL, max_batch_size: int = 8,
+                           stride: Optional[int] = None, seed: int = 0, batch_size: int = 32) \
+        -> List[Mapping[str, float]]:
+    """
+    Check the safety scores of multiple images.
+
+    The crops of all the images are packed together into the model runs, and the scores are averaged
+    for each image, so small images with only one or two crops do not waste the batches.
+
+    :param images: The images to check.
+    :type images: List[ImageTyping]
+    :param model_name: The name of the safety model.
+    :type model_name: str
+    :param max_batch_size: The maximum number of 384x384 crops of each image.
+    :type max_batch_size: int
+    :param stride: Step in pixels of the crop grid, default is ``None`` which means 384 (no overlap).
+    :type stride: Optional[int]
+    :param seed: Seed for sampling the crops.
+    :type seed: int
+    :param batch_size: Maximum number of crops in one model run, default is ``32``.
+    :type batch_size: int
+    :return: A list of mappings of safety labels and their scores, one for each image.
+    :rtype: List[Mapping[str, float]]
+
+    Examples::
+        >>> from imgutils.validate import safe_check_score_batch, safe_check_score
+        >>>
+        >>> scores = safe_check_score_batch(['1.webp', '2.webp', '3.webp'])
+        >>> scores[0] == safe_check_score('1.webp')
+        True
+    """
+    images = [load_image(image) for image in images]
+    scores = _pred_batch(images, model_name, max_batch_size, stride, seed, batch_size)
+    return [dict(zip(_LABELS, row)) for row in scores.tolist()]
+
+
+def safe_check_batch(images: List[ImageTyping], model_name: str = DEFAULT_MODEL, max_batch_size: int = 8,
+                     stride: Optional[int] = None, seed: int = 0, batch_size: int = 32) -> List[Tuple[str, float]]:
+    """
+    Check the safety labels and scores of multiple images.
+
+    :param images: The images to check.
+    :type images: List[ImageTyping]
+    :param model_name: The name of the safety model.
+    :type model_name: str
+    :param max_batch_size: The maximum number of 384x384 crops of each image.
+    :type max_batch_size: int
+    :param stride: Step in pixels of the crop grid, default is ``None`` which means 384 (no overlap).
+    :type stride: Optional[int]
+    :param seed: Seed for sampling the crops.
+    :type seed: int
+    :param batch_size: Maximum number of crops in one model run, default is ``32``.
+    :type batch_size: int
+    :return: A list of tuples containing the safety label and score, one for each image.
+    :rtype: List[Tuple[str, float]]
+    """
+    images = [load_image(image) for image in images]
+    scores = _pred_batch(images, model_name, max_batch_size, stride, seed, batch_size)
+    ids = scores.argmax(axis=-1)
+    return [(_LABELS[id_], row[id_].item()) for id_, row in zip(ids.tolist(), scores)]
@@ -16,14 +16,17 @@ Overview:
     The models are hosted on
     `huggingface - deepghs/anime_style_ages <https://huggingface.co/deepghs/anime_style_ages>`_.
 """
-from typing import Tuple, Dict
+from typing import Tuple, Dict, List
 
 from ..data import ImageTyping
-from ..generic import classify_predict, classify_predict_score
+from ..generic import classify_predict, classify_predict_score, classify_predict_batch, \
+    classify_predict_score_batch
 
 __all__ = [
     'anime_style_age_score',
     'anime_style_age',
+    'anime_style_age_score_batch',
+    'anime_style_age_batch',
 ]
 
 _DEFAULT_MODEL_NAME = 'mobilenetv3_v0_dist'
@@ -92,3 +95,30 @@ def anime_style_age(image: ImageTyping, model_name: str = _DEFAULT_MODEL_NAME) -
         ('2020s', 0.9996393918991089)
     """
     return classify_predict(image, _REPO_ID, model_name)
+
+
+def anime_style_age_score_batch(images: List[ImageTyping], model_name: str = _DEFAULT_MODEL_NAME,
+                                batch_size: int = 16) -> List[Dict[str, float]]:
+    """
+    Batch version of :func:`anime_style_age_score`, the images are predicted in batches.
+
+    :param images: List of images to predict.
+    :param model_name: The model name. Default is 'mobilenetv3_v0_dist'.
+    :param batch_size: Maximum number of images in one model run, default is ``16``.
+    :return: A list of dictionaries with type scores, one for each image.
+    """
+    scores, labels = classify_predict_score_batch(images, _REPO_ID, model_name, batch_size=batch_size)
+    return [dict(zip(labels, row)) for row in scores.tolist()]
+
+
+def anime_style_age_batch(images: List[ImageTyping], model_name: str = _DEFAULT_MODEL_NAME,
+                          batch_size: int = 16) -> List[Tuple[str, float]]:
+    """
+    Batch version of :func:`anime_style_age`, the images are predicted in batches.
+
+    :param images: List of images to predict.
+    :param model_name: The model name. Default is 'mobilenetv3_v0_dist'.
+    :param batch_size: Maximum number of images in one model run, default is ``16``.
+    :return: A list of tuples with the predicted class and its score, one for each image.
+    """
+    return classify_predict_batch(images, _REPO_ID, model_name, batch_size=batch_size)
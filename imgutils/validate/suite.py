@@ -0,0 +1,223 @@
+"""
+Overview:
+    Run multiple classification-based validators on the same images in one pass.
+
+    Calling the validators one by one (e.g. :func:`anime_rating_score`, :func:`get_monochrome_score`, ...)
+    loads and resizes the same image again for each of them. :class:`ValidatorSuite` loads each image only once,
+    encodes it once for each distinct input size of the models, and runs the models concurrently in a thread pool.
+
+    The available validator names are listed in :data:`VALIDATOR_NAMES`.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Union, Tuple, Mapping
+
+import numpy as np
+
+from . import aicheck, bangumi_char, classify, completeness, dbrating, monochrome, portrait, rating, real, \
+    style_age, teen
+from ..data import ImageTyping, load_image
+from ..generic.classify import _img_encode, _open_models_for_repo_id, ClassifyModel
+
+__all__ = [
+    'VALIDATOR_NAMES',
+    'ValidatorSuite',
+]
+
+_VALIDATORS = {
+    'rating': (rating._REPO_ID, rating._DEFAULT_MODEL_NAME),
+    'dbrating': (dbrating._REPO_ID, dbrating._DEFAULT_MODEL_NAME),
+    'monochrome': (monochrome._REPO_ID, monochrome._DEFAULT_MODEL_NAME),
+    'portrait': (portrait._REPO_ID, portrait._DEFAULT_MODEL_NAME),
+    'completeness': (completeness._REPO_ID, completeness._DEFAULT_MODEL_NAME),
+    'style_age': (style_age._REPO_ID, style_age._DEFAULT_MODEL_NAME),
+    'aicheck': (aicheck._REPO_ID, aicheck._DEFAULT_MODEL_NAME),
+    'real': (real._REPO_ID, real._DEFAULT_MODEL_NAME),
+    'teen': (teen._REPO_ID, teen._DEFAULT_MODEL_NAME),
+    'classify': (classify._REPO_ID, classify._DEFAULT_MODEL_NAME),
+    'bangumi_char': (bangumi_char._REPO_ID, bangumi_char._DEFAULT_MODEL_NAME),
+}
+
+#: Names of the validators supported by :class:`ValidatorSuite`.
+VALIDATOR_NAMES = list(_VALIDATORS.keys())
+
+ValidatorsTyping = Union[List[str], Mapping[str, Union[None, str, Tuple[str, str]]]]
+
+
+class ValidatorSuite:
+    """
+    A set of classification validators sharing the image decoding and preprocessing.
+
+    :param validators: The validators to run. Can be a list of names in :data:`VALIDATOR_NAMES`,
+        or a mapping from names to the model names (``None`` means the default model of that validator).
+        A mapping value can also be a tuple of ``(repo_id, model_name)`` for any other
+        :class:`imgutils.generic.ClassifyModel` repository, with a custom name as the key.
+        Default is ``None`` which means all the validators in :data:`VALIDATOR_NAMES` with their default models.
+    :param max_workers: Maximum number of threads running the models, default is the number of validators.
+    :type max_workers: Optional[int]
+
+    :raises ValueError: If unknown validator name is given.
+
+    Examples::
+        >>> from imgutils.validate import ValidatorSuite
+        >>>
+        >>> suite = ValidatorSuite(['rating', 'monochrome', 'aicheck'])
+        >>> result = suite.predict('rating/safe/1.jpg')
+        >>> list(result.keys())
+        ['rating', 'monochrome', 'aicheck']
+        >>> result['rating'] == anime_rating_score('rating/safe/1.jpg')  # class scores of each validator
+        True
+        >>> result['monochrome']['monochrome'] == get_monochrome_score('rating/safe/1.jpg')  # float of positive class
+        True
+        >>>
+        >>> suite = ValidatorSuite({'rating': 'caformer_s36_plus', 'monochrome': None})
+        >>> results = suite.predict_batch(['1.jpg', '2.jpg', '3.jpg'], batch_size=8)
+        >>> len(results)
+        3
+        >>> suite.close()
+    """
+
+    def __init__(self, validators: Optional[ValidatorsTyping] = None, max_workers: Optional[int] = None):
+        if validators is None:
+            validators = VALIDATOR_NAMES
+        if not isinstance(validators, Mapping):
+            validators = {name: None for name in validators}
+
+        self._items: Dict[str, Tuple[str, str]] = {}
+        for name, value in validators.items():
+            if isinstance(value, tuple):
+                repo_id, model_name = value
+            elif name in _VALIDATORS:
+                repo_id, default_model_name = _VALIDATORS[name]
+                model_name = value or default_model_name
+            else:
+                raise ValueError(f'Unknown validator {name!r}, '
+                                 f'one of {VALIDATOR_NAMES!r} or a (repo_id, model_name) tuple expected.')
+            self._items[name] = (repo_id, model_name)
+        if not self._items:
+            raise ValueError('No validators given.')
+
+        self._max_workers = max_workers or len(self._items)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._specs: Optional[Dict[str, Tuple[int, int]]] = None
+
+    @property
+    def names(self) -> List[str]:
+        """
+        Names of the validators in this suite.
+        """
+        return list(self._items.keys())
+
+    def _model(self, name: str) -> Tuple[ClassifyModel, str]:
+        repo_id, model_name = self._items[name]
+        return _open_models_for_repo_id(repo_id), model_name
+
+    def _prepare(self) -> Dict[str, Tuple[int, int]]:
+        # models are opened here in one thread, the worker threads only run them
+        if self._specs is None:
+            specs = {}
+            for name in self._items:
+                model, model_name = self._model(name)
+                model._open_label(model_name)
+                specs[name] = model._get_input_size(model_name)
+            self._specs = specs
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers)
+        return self._specs
+
+    def _run(self, encoded: Dict[Tuple[int, int], np.ndarray]) -> Dict[str, Tuple[np.ndarray, List[str]]]:
+        specs = self._prepare()
+
+        def _run_one(name):
+            model, model_name = self._model(name)
+            return model._run_batch(encoded[specs[name]], model_name), model._open_label(model_name)
+
+        futures = {name: self._executor.submit(_run_one, name) for name in self._items}
+        return {name: future.result() for name, future in futures.items()}
+
+    def _encode(self, images: List[ImageTyping]) -> Dict[Tuple[int, int], np.ndarray]:
+        specs = self._prepare()
+        images = [load_image(image, force_background='white', mode='RGB') for image in images]
+        return {
+            size: np.stack([_img_encode(image, size=size) for image in images])
+            for size in sorted(set(specs.values()))
+        }
+
+    def predict_score_batch(self, images: List[ImageTyping], batch_size: int = 16) \
+            -> Dict[str, Tuple[np.ndarray, List[str]]]:
+        """
+        Predict the scores of all the validators on a list of images.
+
+        :param images: The images to predict.
+        :type images: List[ImageTyping]
+        :param batch_size: Number of images decoded and sent to the models at once, default is ``16``.
+        :type batch_size: int
+        :return: A dict mapping each validator name to a tuple of its float32 score matrix
+            with shape ``(N, classes)`` and its label list.
+        :rtype: Dict[str, Tuple[np.ndarray, List[str]]]
+        """
+        if batch_size < 1:
+            raise ValueError(f'Batch size should be no less than 1, but {batch_size!r} found.')
+
+        images = list(images)
+        chunks = []
+        for i in range(0, len(images), batch_size):
+            chunks.append(self._run(self._encode(images[i:i + batch_size])))
+
+        retval = {}
+        for name in self._items:
+            model, model_name = self._model(name)
+            labels = list(model._open_label(model_name))
+            if chunks:
+                scores = np.concatenate([chunk[name][0] for chunk in chunks])
+            else:
+                scores = np.zeros((0, len(labels)), dtype=np.float32)
+            retval[name] = (scores, labels)
+        return retval
+
+    def predict_batch(self, images: List[ImageTyping], batch_size: int = 16) -> List[Dict[str, Dict[str, float]]]:
+        """
+        Predict the scores of all the validators on a list of images.
+
+        :param images: The images to predict.
+        :type images: List[ImageTyping]
+        :param batch_size: Number of images decoded and sent to the models at once, default is ``16``.
+        :type batch_size: int
+        :return: A list of results, one for each image, in the same format as :meth:`predict`.
+        :rtype: List[Dict[str, Dict[str, float]]]
+        """
+        images = list(images)
+        scores = self.predict_score_batch(images, batch_size=batch_size)
+        return [
+            {name: dict(zip(labels, matrix[i].tolist())) for name, (matrix, labels) in scores.items()}
+            for i in range(len(images))
+        ]
+
+    def predict(self, image: ImageTyping) -> Dict[str, Dict[str, float]]:
+        """
+        Predict the scores of all the validators on one image.
+
+        :param image: The image to predict.
+        :type image: ImageTyping
+        :return: A dict mapping each validator name to the dict of its class scores, e.g. the result of
+            :func:`anime_rating_score`. For the validators whose ``*_score`` functions return the float score of
+            the positive class, it is one of the items, e.g. ``result['monochrome']['monochrome']`` is the
+            result of :func:`get_monochrome_score`, and ``result['aicheck']['ai']`` is the result of
+            :func:`get_ai_created_score`.
+        :rtype: Dict[str, Dict[str, float]]
+        """
+        return self.predict_batch([image])[0]
+
+    def close(self):
+        """
+        Shut down the thread pool of this suite. The models are still cached and can be released
+        with :meth:`imgutils.generic.ClassifyModel.clear`.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
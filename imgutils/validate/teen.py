@@ -15,14 +15,17 @@ Overview:
     The models are hosted on
     `huggingface - deepghs/anime_teen <https://huggingface.co/deepghs/anime_teen>`_.
 """
-from typing import Tuple, Dict
+from typing import Tuple, Dict, List
 
 from ..data import ImageTyping
-from ..generic import classify_predict, classify_predict_score
+from ..generic import classify_predict, classify_predict_score, classify_predict_batch, \
+    classify_predict_score_batch
 
 __all__ = [
     'anime_teen_score',
     'anime_teen',
+    'anime_teen_score_batch',
+    'anime_teen_batch',
 ]
 
 _DEFAULT_MODEL_NAME = 'mobilenetv3_v0_dist'
@@ -97,3 +100,34 @@ def anime_teen(image: ImageTyping, model_name: str = _DEFAULT_MODEL_NAME) -> Tup
         ('non_teen', 0.9997410178184509)
     """
     return classify_predict(image, _REPO_ID, model_name)
+
+
+def anime_teen_score_batch(images: List[ImageTyping], model_name: str = _DEFAULT_MODEL_NAME,
+                           batch_size: int = 16) -> List[Dict[str, float]]:
+    """
+    Overview:
+        Batch version of :func:`anime_teen_score`, the images are predicted in batches.
+
+    :param images: List of images to predict.
+    :param model_name: Model to use. Default is ``mobilenetv3_v0_dist``. All available models are listed
+        on the benchmark plot above. If you need better accuracy, just set this to ``caformer_s36_v0``.
+    :param batch_size: Maximum number of images in one model run, default is ``16``.
+    :return: A list of dictionaries with class scores, one for each image.
+    """
+    scores, labels = classify_predict_score_batch(images, _REPO_ID, model_name, batch_size=batch_size)
+    return [dict(zip(labels, row)) for row in scores.tolist()]
+
+
+def anime_teen_batch(images: List[ImageTyping], model_name: str = _DEFAULT_MODEL_NAME,
+                     batch_size: int = 16) -> List[Tuple[str, float]]:
+    """
+    Overview:
+        Batch version of :func:`anime_teen`, the images are predicted in batches.
+
+    :param images: List of images to predict.
+    :param model_name: Model to use. Default is ``mobilenetv3_v0_dist``. All available models are listed
+        on the benchmark plot above. If you need better accuracy, just set this to ``caformer_s36_v0``.
+    :param batch_size: Maximum number of images in one model run, default is ``16``.
+    :return: A list of tuples with the predicted class and its score, one for each image.
+    """
+    return classify_predict_batch(images, _REPO_ID, model_name, batch_size=batch_size)
@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+from imgutils.detect import Detections
+
+
+@pytest.fixture()
+def face_detection():
+    return [
+        ((967, 143, 1084, 261), 'face', 0.851),
+        ((246, 208, 331, 287), 'face', 0.81),
+    ]
+
+
+@pytest.fixture()
+def censor_detection():
+    return [
+        ((365, 264, 399, 289), 'nipple_f', 0.7473511695861816),
+        ((224, 260, 252, 285), 'nipple_f', 0.6830288171768188),
+        ((206, 523, 240, 608), 'pussy', 0.6799028515815735),
+    ]
+
+
+@pytest.mark.unittest
+class TestDetectDetections:
+    def test_from_list(self, censor_detection):
+        d = Detections.from_list(censor_detection)
+        assert len(d) == 3
+        assert d.labels == ('nipple_f', 'pussy')
+        assert d.boxes.dtype == np.float32
+        assert d.boxes.shape == (3, 4)
+        assert d.label_ids.dtype == np.int16
+        assert d.label_ids.tolist() == [0, 0, 1]
+        assert d.scores.dtype == np.float32
+        assert d.image_ids.tolist() == [0, 0, 0]
+        assert d.label_names.tolist() == ['nipple_f', 'nipple_f', 'pussy']
+        assert not hasattr(d, '__dict__')
+
+        values = d.to_list(int_boxes=True)
+        assert [bbox for bbox, _, _ in values] == [bbox for bbox, _, _ in censor_detection]
+        assert [label for _, label, _ in values] == [label for _, label, _ in censor_detection]
+        assert [score for _, _, score in values] == pytest.approx([score for _, _, score in censor_detection])
+
+        assert d[2] == ((206.0, 523.0, 240.0, 608.0), 'pussy', pytest.approx(0.6799028515815735))
+        assert len(d[1:]) == 2
+        assert len(list(d)) == 3
+
+    def test_from_list_invalid(self, censor_detection):
+        with pytest.raises(ValueError):
+            Detections.from_list(censor_detection, labels=['nipple_f'])
+        with pytest.raises(ValueError):
+            Detections(np.zeros((2, 4)), np.zeros((3,)), np.zeros((2,)), labels=['a'])
+        with pytest.raises(ValueError):
+            Detections(np.zeros((2, 4)), np.array([0, 1]), np.zeros((2,)), labels=['a'])
+
+    def test_empty(self):
+        d = Detections.from_list([])
+        assert len(d) == 0
+        assert d.to_list() == []
+        assert d == Detections.empty()
+
+    def test_concat(self, face_detection, censor_detection):
+        d1 = Detections.from_list(face_detection)
+        d2 = Detections.from_list(censor_detection)
+        d = Detections.concat([d1, d2, Detections.empty()])
+        assert len(d) == 5
+        assert d.labels == ('face', 'nipple_f', 'pussy')
+        assert d.image_ids.tolist() == [0, 0, 1, 1, 1]
+        assert d.image_count == 2
+        assert d.select_image(1).remap_labels(d2.labels).to_list() == d2.to_list()
+        assert d.select_image(0).to_list(int_boxes=True)[0][:2] == face_detection[0][:2]
+
+        d = Detections.concat([d1, d2], image_ids=[10, 20])
+        assert d.image_ids.tolist() == [10, 10, 20, 20, 20]
+        assert len(d.select_image(20)) == 3
+
+        dd = Detections.concat([d, Detections.from_list(face_detection, image_id=30)])
+        assert dd.image_ids.tolist() == [10, 10, 20, 20, 20, 30, 30]
+
+        dd = Detections.concat([Detections.from_list(face_detection, image_id=i) for i in range(3)])
+        assert dd.image_ids.tolist() == [0, 0, 1, 1, 2, 2]
+
+        # multi-image item mixed with single-image items, the ids overlap
+        with pytest.raises(ValueError):
+            Detections.concat([Detections.concat([d1, d2]), d1])
+        dd = Detections.concat([Detections.concat([d1, d2]), Detections.from_list(face_detection, image_id=2)])
+        assert dd.image_ids.tolist() == [0, 0, 1, 1, 1, 2, 2]
+
+        with pytest.raises(ValueError):
+            Detections.concat([d1, d2], image_ids=[1])
+        assert Detections.concat([]) == Detections.empty()
+
+    def test_filter(self, censor_detection):
+        d = Detections.from_list(censor_detection)
+        assert d.filter(min_score=0.7).label_names.tolist() == ['nipple_f']
+        assert d.filter(labels=['pussy']).label_names.tolist() == ['pussy']
+        with pytest.raises(ValueError):
+            d.remap_labels(['nipple_f'])
+
+    def test_npz(self, face_detection, censor_detection, tmp_path):
+        d = Detections.concat([Detections.from_list(face_detection), Detections.from_list(censor_detection)])
+        file = str(tmp_path / 'detections.npz')
+        d.save_npz(file)
+        assert Detections.load_npz(file) == d
+
+    def test_parquet(self, face_detection, censor_detection, tmp_path):
+        pytest.importorskip('pyarrow')
+        d = Detections.concat([Detections.from_list(face_detection), Detections.from_list(censor_detection)])
+        file = str(tmp_path / 'detections.parquet')
+        d.save_parquet(file)
+        assert Detections.load_parquet(file) == d
@@ -0,0 +1,91 @@
+import pytest
+
+from imgutils.detect import Detections
+from imgutils.detect.evaluate import DetectionEvaluator, evaluate_detections
+
+
+@pytest.fixture()
+def ground_truths():
+    return [
+        [((0, 0, 10, 10), 'face', 1.0), ((20, 20, 40, 40), 'face', 1.0), ((50, 50, 60, 60), 'hand', 1.0)],
+        [((5, 5, 15, 15), 'face', 1.0)],
+        [],
+    ]
+
+
+@pytest.fixture()
+def predictions():
+    return [
+        [
+            ((0, 0, 10, 10), 'face', 0.9),  # tp
+            ((21, 21, 40, 40), 'face', 0.8),  # tp under 0.5, iou=0.9025
+            ((0, 0, 10, 10), 'face', 0.7),  # duplicated, fp
+            ((70, 70, 80, 80), 'hand', 0.6),  # fp
+        ],
+        [((5, 5, 15, 15), 'face', 0.5)],  # tp
+        [((1, 1, 5, 5), 'face', 0.95)],  # fp, on image without objects
+    ]
+
+
+@pytest.mark.unittest
+class TestDetectEvaluate:
+    def test_evaluate_detections(self, predictions, ground_truths):
+        result = evaluate_detections(predictions, ground_truths, iou_thresholds=[0.5, 0.95])
+        assert result['image_count'] == 3
+        assert result['iou_thresholds'] == [0.5, 0.95]
+
+        face = result['labels']['face']
+        assert face['gt_count'] == 3
+        assert face['pred_count'] == 5
+        assert face['precision'][0.5] == pytest.approx(3 / 5)
+        assert face['recall'][0.5] == pytest.approx(1.0)
+        assert face['precision'][0.95] == pytest.approx(2 / 5)
+        assert face['recall'][0.95] == pytest.approx(2 / 3)
+        # sorted: fp(0.95), tp(0.9), tp(0.8), fp(0.7), tp(0.5)
+        assert face['ap'][0.5] == pytest.approx((67 * (2 / 3) + 34 * 0.6) / 101)
+
+        hand = result['labels']['hand']
+        assert hand['ap'][0.5] == pytest.approx(0.0)
+        assert hand['precision'][0.5] == pytest.approx(0.0)
+        assert hand['recall'][0.5] == pytest.approx(0.0)
+
+        assert result['mAP50'] == pytest.approx((face['ap'][0.5] + hand['ap'][0.5]) / 2)
+        assert result['mAP@0.95'] == pytest.approx((face['ap'][0.95] + hand['ap'][0.95]) / 2)
+        assert result['mAP'] == pytest.approx((result['mAP@0.50'] + result['mAP@0.95']) / 2)
+        assert 'mAP50-95' not in result
+
+    def test_evaluate_perfect(self, ground_truths):
+        result = evaluate_detections(ground_truths, ground_truths)
+        assert result['mAP50'] == pytest.approx(1.0)
+        assert result['mAP50-95'] == pytest.approx(1.0)
+        assert result['mAP'] == pytest.approx(1.0)
+
+        result = evaluate_detections(ground_truths, ground_truths, interpolation='continuous')
+        assert result['mAP'] == pytest.approx(1.0)
+
+    def test_evaluate_score_threshold(self, predictions, ground_truths):
+        result = evaluate_detections(predictions, ground_truths, iou_thresholds=[0.5], score_threshold=0.75)
+        face = result['labels']['face']
+        assert face['precision'][0.5] == pytest.approx(2 / 3)
+        assert face['recall'][0.5] == pytest.approx(2 / 3)
+
+    def test_evaluator_streaming(self, predictions, ground_truths):
+        evaluator = DetectionEvaluator(iou_thresholds=[0.5], labels=['face', 'hand', 'eye'])
+        for pred, gt in zip(predictions, ground_truths):
+            evaluator.add(Detections.from_list(pred), Detections.from_list(gt))
+        result = evaluator.compute()
+        expected = evaluate_detections(predictions, ground_truths, iou_thresholds=[0.5])
+        assert result['labels']['face'] == expected['labels']['face']
+        assert result['labels']['eye']['ap'][0.5] is None
+        assert result['mAP50'] == pytest.approx(expected['mAP50'])
+
+        evaluator.reset()
+        assert evaluator.image_count == 0
+
+    def test_evaluate_invalid(self, predictions, ground_truths):
+        with pytest.raises(ValueError):
+            evaluate_detections(predictions, ground_truths[:2])
+        with pytest.raises(ValueError):
+            DetectionEvaluator(iou_thresholds=[])
+        with pytest.raises(ValueError):
+            evaluate_detections(predictions, ground_truths, interpolation='unknown')
@@ -1,8 +1,8 @@
 import pytest
 from PIL import Image
 
-from imgutils.detect import detect_with_nudenet
-from imgutils.detect.nudenet import _open_nudenet_nms, _open_nudenet_yolo
+from imgutils.detect import detect_with_nudenet, detect_with_nudenet_batch
+from imgutils.detect.nudenet import _open_nudenet_yolo
 from ..testings import get_testfile
 
 
@@ -12,7 +12,6 @@ def _release_model_after_run():
         yield
     finally:
         _open_nudenet_yolo.cache_clear()
-        _open_nudenet_nms.cache_clear()
 
 
 @pytest.fixture()
@@ -83,3 +82,16 @@ class TestDetectNudeNet:
             assert actual_box == pytest.approx(expected_box)
         assert [score for _, _, score in detection] == \
                pytest.approx([score for _, _, score in nude_girl_detection], abs=1e-4)
+
+    def test_detect_with_nudenet_batch(self, nude_girl_file, nude_girl_image, nude_girl_detection):
+        results = detect_with_nudenet_batch([nude_girl_file, get_testfile('png_full.png'), nude_girl_image],
+                                            batch_size=2)
+        assert len(results) == 3
+        for detection in [results[0], results[2]]:
+            assert [label for _, label, _ in detection] == \
+                   [label for _, label, _ in nude_girl_detection]
+            for (actual_box, _, _), (expected_box, _, _) in zip(detection, nude_girl_detection):
+                assert actual_box == pytest.approx(expected_box, abs=1e-2)
+            assert [score for _, _, score in detection] == \
+                   pytest.approx([score for _, _, score in nude_girl_detection], abs=1e-4)
+        assert results[1] == detect_with_nudenet(get_testfile('png_full.png'))
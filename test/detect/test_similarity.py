@@ -1,6 +1,7 @@
+import numpy as np
 import pytest
 
-from imgutils.detect.similarity import calculate_iou, bboxes_similarity, detection_similarity
+from imgutils.detect.similarity import calculate_iou, bboxes_iou_matrix, bboxes_similarity, detection_similarity
 
 
 @pytest.fixture
@@ -28,6 +29,16 @@ class TestBBoxFunctions:
         box2 = (5, 5, 15, 15)
         assert calculate_iou(box1, box2) == pytest.approx(25.0 / 175)
 
+    def test_bboxes_iou_matrix(self, sample_bboxes):
+        other = [(1, 1, 3, 3), (4, 4, 6, 6), (0, 0, 10, 10), (8, 3, 14, 20)]
+        matrix = bboxes_iou_matrix(sample_bboxes, other)
+        assert matrix.shape == (3, 4)
+        assert matrix == pytest.approx(np.array([
+            [calculate_iou(box1, box2) for box2 in other]
+            for box1 in sample_bboxes
+        ]))
+        assert bboxes_iou_matrix([], other).shape == (0, 4)
+
     def test_bboxes_similarity_max(self, sample_bboxes):
         result = bboxes_similarity(sample_bboxes, sample_bboxes, mode='max')
         assert isinstance(result, float)
@@ -128,3 +139,9 @@ class TestBBoxFunctions:
     def test_detection_similarity(self, detect1, detect2, mode, expected):
         similarity = detection_similarity(detect1, detect2, mode)
         assert pytest.approx(similarity, 0.0001) == expected
+
+    def test_detection_similarity_columnar(self, sample_detections):
+        from imgutils.detect import Detections
+        columnar = Detections.from_list(sample_detections)
+        assert detection_similarity(columnar, sample_detections, mode='raw') == pytest.approx([1.0, 1.0, 1.0])
+        assert detection_similarity(columnar, columnar) == pytest.approx(1.0)
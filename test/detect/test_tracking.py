@@ -0,0 +1,101 @@
+import pytest
+from PIL import Image, ImageDraw
+
+from imgutils.detect.tracking import DetectionTracker, track_detections
+
+
+def _make_frame(x: int, y: int, background: str = 'white', size: int = 40):
+    image = Image.new('RGB', (320, 240), background)
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((x, y, x + size, y + size), fill='red')
+    draw.ellipse((x + 10, y + 10, x + 30, y + 30), fill='blue')
+    return image
+
+
+class _FakeDetector:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, image: Image.Image):
+        self.calls += 1
+        # locate the red square
+        pixels = image.load()
+        xs, ys = [], []
+        for yy in range(0, image.height, 2):
+            for xx in range(0, image.width, 2):
+                if pixels[xx, yy] == (255, 0, 0):
+                    xs.append(xx)
+                    ys.append(yy)
+        if not xs:
+            return []
+        return [((min(xs), min(ys), max(xs) + 1, max(ys) + 1), 'face', 0.9)]
+
+
+@pytest.fixture()
+def moving_frames():
+    return [_make_frame(20 + 2 * i, 50 + i) for i in range(24)]
+
+
+@pytest.mark.unittest
+class TestDetectTracking:
+    def test_tracker_skip_detections(self, moving_frames):
+        detector = _FakeDetector()
+        tracker = DetectionTracker(detector, keyframe_interval=6)
+        results = [tracker.update(frame) for frame in moving_frames]
+
+        assert detector.calls == tracker.detect_count
+        assert detector.calls <= 5
+        assert all(len(r) == 1 for r in results)
+        assert {track_id for r in results for track_id, _, _, _ in r} == {0}
+        for i, r in enumerate(results):
+            _, (x0, y0, x1, y1), label, score = r[0]
+            assert label == 'face'
+            assert score == pytest.approx(0.9)
+            assert x0 == pytest.approx(20 + 2 * i, abs=6)
+            assert y0 == pytest.approx(50 + i, abs=6)
+
+    def test_tracker_every_frame(self, moving_frames):
+        detector = _FakeDetector()
+        results = list(track_detections(moving_frames[:5], detector, keyframe_interval=1))
+        assert detector.calls == 5
+        assert [[track_id for track_id, _, _, _ in r] for r in results] == [[0]] * 5
+
+    def test_tracker_scene_change(self, moving_frames):
+        detector = _FakeDetector()
+        tracker = DetectionTracker(detector, keyframe_interval=100)
+        frames = moving_frames[:3] + [_make_frame(200, 150, background='black')] + \
+                 [_make_frame(202, 151, background='black')]
+        results = [tracker.update(frame) for frame in frames]
+        assert [tracker_result[0][0] for tracker_result in results] == [0, 0, 0, 1, 1]
+        assert detector.calls == 2
+
+    def test_tracker_track_lost(self, moving_frames):
+        detector = _FakeDetector()
+        tracker = DetectionTracker(detector, keyframe_interval=100)
+        tracker.update(moving_frames[0])
+        tracker.update(moving_frames[1])
+        assert detector.calls == 1
+
+        # the object jumps away, content inside the predicted box changes
+        result = tracker.update(_make_frame(200, 150))
+        assert detector.calls == 2
+        assert tracker.last_is_keyframe
+        assert len(result) == 1
+        track_id, (x0, y0, _, _), _, _ = result[0]
+        assert track_id == 1
+        assert (x0, y0) == (200, 150)
+
+    def test_tracker_empty(self):
+        detector = _FakeDetector()
+        tracker = DetectionTracker(detector, keyframe_interval=3)
+        frames = [Image.new('RGB', (100, 100), 'white')] * 6
+        assert [tracker.update(frame) for frame in frames] == [[]] * 6
+        assert detector.calls == 2
+
+        tracker.reset()
+        assert tracker.frame_count == 0
+        assert tracker.detect_count == 0
+
+    def test_tracker_invalid_interval(self):
+        with pytest.raises(ValueError):
+            DetectionTracker(_FakeDetector(), keyframe_interval=0)
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from imgutils.generic import ClassifyModel
+from imgutils.utils import open_onnx_model
+
+
+def _make_model(path, batch, size=32):
+    onnx = pytest.importorskip('onnx')
+    from onnx import helper, TensorProto
+
+    nodes = [
+        helper.make_node('ReduceMean', ['input'], ['mean'], axes=[2, 3], keepdims=0),
+        helper.make_node('Softmax', ['mean'], ['output'], axis=-1),
+    ]
+    graph = helper.make_graph(
+        nodes, 'tiny_classify',
+        [helper.make_tensor_value_info('input', TensorProto.FLOAT, [batch, 3, size, size])],
+        [helper.make_tensor_value_info('output', TensorProto.FLOAT, [batch, 3])],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 13)])
+    model.ir_version = 8
+    onnx.save(model, path)
+    return path
+
+
+def _local_model(tmp_path, batch):
+    model = ClassifyModel('local/tiny_classify')
+    model._model_names = ['tiny']
+    model._models['tiny'] = open_onnx_model(_make_model(str(tmp_path / 'model.onnx'), batch), mode='cpu')
+    model._labels['tiny'] = ['red', 'green', 'blue']
+    return model
+
+
+@pytest.fixture()
+def images():
+    return [
+        Image.new('RGB', (40, 30), color)
+        for color in [(255, 0, 0), (0, 255, 0), (0, 0, 255), (200, 100, 50), (10, 20, 250)]
+    ]
+
+
+@pytest.mark.unittest
+class TestGenericClassify:
+    @pytest.mark.parametrize('batch', ['N', 1])
+    def test_predict_batch(self, tmp_path, images, batch):
+        model = _local_model(tmp_path, batch)
+        scores, labels = model.predict_score_batch(images, 'tiny', batch_size=2)
+        assert labels == ['red', 'green', 'blue']
+        assert scores.dtype == np.float32
+        assert scores.shape == (5, 3)
+        for image, row in zip(images, scores):
+            expected = model.predict_score(image, 'tiny')
+            assert row.tolist() == pytest.approx([expected[label] for label in labels], abs=1e-6)
+
+        predictions = model.predict_batch(images, 'tiny', batch_size=4)
+        assert [label for label, _ in predictions] == ['red', 'green', 'blue', 'red', 'blue']
+        for image, (label, score) in zip(images, predictions):
+            expected_label, expected_score = model.predict(image, 'tiny')
+            assert label == expected_label
+            assert score == pytest.approx(expected_score, abs=1e-6)
+
+    def test_predict_batch_empty(self, tmp_path):
+        model = _local_model(tmp_path, 'N')
+        scores, labels = model.predict_score_batch([], 'tiny')
+        assert scores.shape == (0, 3)
+        assert model.predict_batch([], 'tiny') == []
+        with pytest.raises(ValueError):
+            model.predict_score_batch([], 'tiny', batch_size=0)
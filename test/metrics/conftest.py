@@ -0,0 +1,31 @@
+import glob
+import os.path
+from typing import List, Tuple
+
+import numpy as np
+import pytest
+from natsort import natsorted
+
+from imgutils.metrics import ccip_batch_extract_features
+from test.testings import get_testfile
+
+
+def _all_images_and_cids() -> Tuple[List[str], List[int]]:
+    files = natsorted(glob.glob(get_testfile('dataset', 'images_test_v1', '*', '*.jpg')))[::2][:12]
+    cids = [int(os.path.basename(os.path.dirname(file))) for file in files]
+    return files, cids
+
+
+@pytest.fixture()
+def images_12() -> List[str]:
+    return _all_images_and_cids()[0]
+
+
+@pytest.fixture()
+def images_cids() -> List[int]:
+    return _all_images_and_cids()[1]
+
+
+@pytest.fixture()
+def feats_and_cids(images_12, images_cids):
+    return ccip_batch_extract_features(images_12), np.array(images_cids)
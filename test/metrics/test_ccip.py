@@ -1,35 +1,17 @@
-import glob
 import json
 import os.path
 from functools import lru_cache
-from typing import List, Tuple, Dict, Iterator
+from typing import List, Dict, Iterator
 
 import numpy as np
 import pytest
 from hbutils.testing import disable_output
 from huggingface_hub import HfFileSystem, HfApi
-from natsort import natsorted
 from sklearn.metrics import adjusted_rand_score
 
 from imgutils.metrics import ccip_difference, ccip_default_threshold, ccip_extract_feature, ccip_same, ccip_batch_same, \
-    ccip_clustering, ccip_merge, ccip_batch_differences
-from test.testings import get_testfile
-
-
-def _all_images_and_cids() -> Tuple[List[str], List[int]]:
-    files = natsorted(glob.glob(get_testfile('dataset', 'images_test_v1', '*', '*.jpg')))[::2][:12]
-    cids = [int(os.path.basename(os.path.dirname(file))) for file in files]
-    return files, cids
-
-
-@pytest.fixture()
-def images_12() -> List[str]:
-    return _all_images_and_cids()[0]
-
-
-@pytest.fixture()
-def images_cids() -> List[int]:
-    return _all_images_and_cids()[1]
+    ccip_clustering, ccip_merge, ccip_batch_differences, ccip_batch_extract_features, ccip_cross_differences, \
+    ccip_cross_topk, ccip_stream_extract_features
 
 
 @pytest.fixture()
@@ -187,6 +169,57 @@ class TestMetricCCIP:
 
         assert (matrix != cmatrix).sum() < 5
 
+    def test_ccip_stream_extract_features(self, images_12, images_cids, tmp_path):
+        expected = ccip_batch_extract_features(images_12)
+        with disable_output():
+            feats = ccip_stream_extract_features(images_12, batch_size=5)
+        np.testing.assert_allclose(feats, expected, atol=1e-4)
+
+        npy_file = str(tmp_path / 'feats.npy')
+        with disable_output():
+            ccip_stream_extract_features(images_12, batch_size=4, workers=0, output=npy_file)
+        feats = np.load(npy_file, mmap_mode='r')
+        np.testing.assert_allclose(feats, expected, atol=1e-4)
+        with disable_output():
+            assert adjusted_rand_score(ccip_clustering(feats, min_samples=2), images_cids) >= 0.98
+        assert ccip_merge(feats).shape == (expected.shape[1],)
+
+        output = np.zeros_like(expected)
+        with disable_output():
+            assert ccip_stream_extract_features(images_12, output=output) is output
+        np.testing.assert_allclose(output, expected, atol=1e-4)
+
+        with pytest.raises(ValueError):
+            ccip_stream_extract_features(images_12, output=np.zeros((3, expected.shape[1]), dtype=np.float32))
+
+    def test_ccip_cross_differences(self, images_12):
+        feats = ccip_batch_extract_features(images_12)
+        expected = ccip_batch_differences(feats)[:3, 3:]
+        np.testing.assert_allclose(ccip_cross_differences(images_12[:3], feats[3:]), expected, atol=1e-5)
+        np.testing.assert_allclose(ccip_cross_differences(feats[:3], list(feats[3:]), chunk_size=2),
+                                   expected, atol=1e-5)
+
+        with pytest.raises(ValueError):
+            _ = ccip_cross_differences(feats[:3], feats[3:], chunk_size=0)
+
+    def test_ccip_cross_topk(self, images_12):
+        feats = ccip_batch_extract_features(images_12)
+        expected = ccip_batch_differences(feats)[:3, 3:]
+        diffs, indices = ccip_cross_topk(feats[:3], feats[3:], top_k=4, chunk_size=2)
+        assert diffs.shape == (3, 4)
+        np.testing.assert_array_equal(indices, np.argsort(expected, axis=-1)[:, :4])
+        np.testing.assert_allclose(diffs, np.sort(expected, axis=-1)[:, :4], atol=1e-5)
+
+        diffs, indices = ccip_cross_topk(feats[:3], feats[3:5], top_k=4)
+        assert diffs.shape == (3, 2)
+
+        with pytest.raises(ValueError):
+            _ = ccip_cross_topk(feats[:3], feats[3:], top_k=0)
+
+    def test_ccip_batch_same_chunks(self, images_12):
+        feats = ccip_batch_extract_features(images_12)
+        np.testing.assert_array_equal(ccip_batch_same(feats, chunk_size=5), ccip_batch_same(images_12))
+
     def test_ccip_cluster(self, images_12, images_cids):
         with disable_output():
             assert adjusted_rand_score(
@@ -209,6 +242,21 @@ class TestMetricCCIP:
         with pytest.raises(KeyError):
             _ = ccip_clustering(images_12, min_samples=2, method='what_the_fxxk')
 
+    def test_ccip_cluster_blocks(self, images_12, images_cids):
+        feats = ccip_batch_extract_features(images_12)
+        with disable_output():
+            assert ccip_clustering(feats, min_samples=2, block_size=5) == \
+                   ccip_clustering(list(feats), min_samples=2)
+
+        with disable_output():
+            assert adjusted_rand_score(
+                ccip_clustering(images_12, min_samples=2, method='dbscan', batch_size=4, block_size=5),
+                images_cids,
+            ) >= 0.98
+
+        with pytest.raises(ValueError):
+            _ = ccip_clustering(feats, min_samples=2, block_size=0)
+
     @pytest.mark.parametrize(['tag'], [
         (tag,) for tag in MERGE_TAGS
     ])
@@ -0,0 +1,77 @@
+import os
+
+import numpy as np
+import pytest
+
+from imgutils.metrics import CCIPGallery, ccip_merge
+
+
+@pytest.mark.unittest
+class TestMetricCCIPGallery:
+    def test_gallery(self, feats_and_cids, tmp_path):
+        feats, cids = feats_and_cids
+        directory = str(tmp_path / 'gallery')
+        gallery = CCIPGallery(directory)
+        for cid in sorted(set(cids.tolist())):
+            gallery.add(f'c{cid}', feats[cids == cid][1:])
+        assert len(gallery) == len(set(cids.tolist()))
+
+        for cid in sorted(set(cids.tolist())):
+            query = feats[cids == cid][0]
+            result = gallery.identify(query)
+            assert result and result[0][0] == f'c{cid}'
+            result = gallery.identify(query, use_prototypes=False, chunk_size=2)
+            assert result and result[0][0] == f'c{cid}'
+
+        reopened = CCIPGallery(directory)
+        assert reopened.characters == gallery.characters
+        name = reopened.characters[0]
+        np.testing.assert_allclose(reopened.prototype(name), ccip_merge(reopened.features(name)), atol=1e-5)
+
+    def test_gallery_remove(self, feats_and_cids, tmp_path):
+        feats, cids = feats_and_cids
+        directory = str(tmp_path / 'gallery')
+        gallery = CCIPGallery(directory)
+        gallery.add('a', feats[cids == cids[0]])
+        gallery.add('b', feats[cids != cids[0]][:2])
+        gallery.add('b', list(feats[cids != cids[0]][2:3]))
+        assert gallery.features('b').shape[0] == 3
+
+        gallery.remove('a')
+        assert 'a' not in gallery
+        assert gallery.identify(feats[cids == cids[0]][0]) == []
+
+        gallery.compact()
+        reopened = CCIPGallery(directory)
+        assert reopened.characters == ['b']
+        np.testing.assert_allclose(reopened.features('b'), feats[cids != cids[0]][:3])
+
+        with pytest.raises(KeyError):
+            reopened.remove('a')
+        with pytest.raises(ValueError):
+            CCIPGallery(directory, model='ccip-caformer-5_fp32')
+
+    def test_gallery_interrupted(self, tmp_path, monkeypatch):
+        feats = np.random.default_rng(0).normal(size=(8, 768)).astype(np.float32)
+        directory = str(tmp_path / 'gallery')
+        gallery = CCIPGallery(directory)
+        gallery.add('a', feats[:4])
+
+        def _interrupted(file, data):
+            raise OSError('Interrupted.')
+
+        with monkeypatch.context() as m:
+            m.setattr('imgutils.metrics.ccip_gallery.save_json_atomic', _interrupted)
+            with pytest.raises(OSError):
+                gallery.add('a', feats[4:])
+
+        reopened = CCIPGallery(directory)
+        np.testing.assert_allclose(reopened.features('a'), feats[:4])
+        np.testing.assert_allclose(reopened.prototype('a'), ccip_merge(feats[:4]), atol=1e-5)
+
+        reopened.add('b', feats[4:])
+        reopened.remove('a')
+        reopened.compact()
+        reopened = CCIPGallery(directory)
+        np.testing.assert_allclose(reopened.prototype('b'), ccip_merge(feats[4:]), atol=1e-5)
+        assert len(os.listdir(directory)) == 4
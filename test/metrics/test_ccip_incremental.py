@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from hbutils.testing import disable_output
+from sklearn.metrics import adjusted_rand_score
+
+from imgutils.metrics import CCIPIncrementalClusterer
+
+
+@pytest.mark.unittest
+class TestMetricCCIPIncremental:
+    def test_incremental(self, feats_and_cids):
+        feats, cids = feats_and_cids
+        clusterer = CCIPIncrementalClusterer(method='dbscan', min_samples=2, recluster_every=4)
+        order = np.random.RandomState(0).permutation(len(cids))
+        with disable_output():
+            for i in range(0, len(order), 3):
+                labels = clusterer.add(feats[order[i:i + 3]], ids=order[i:i + 3].tolist())
+                assert labels.shape == (len(order[i:i + 3]),)
+            clusterer.recluster()
+
+        assert len(clusterer) == len(cids)
+        assert clusterer.prototypes.shape == (clusterer.n_clusters, feats.shape[1])
+        labels = np.zeros_like(cids)
+        labels[np.array(clusterer.ids)] = clusterer.labels
+        assert adjusted_rand_score(labels, cids) >= 0.9
+
+    def test_checkpoint(self, feats_and_cids, tmp_path):
+        feats, cids = feats_and_cids
+        clusterer = CCIPIncrementalClusterer(method='dbscan', min_samples=2, recluster_every=6)
+        with disable_output():
+            clusterer.add(feats[:8], ids=[f'img_{i}' for i in range(8)])
+
+        file = str(tmp_path / 'checkpoint.npz')
+        clusterer.save(file)
+        loaded = CCIPIncrementalClusterer.load(file)
+        assert loaded.ids == clusterer.ids
+        np.testing.assert_array_equal(loaded.labels, clusterer.labels)
+        np.testing.assert_allclose(loaded.prototypes, clusterer.prototypes)
+
+        with disable_output():
+            np.testing.assert_array_equal(loaded.add(feats[8:]), clusterer.add(feats[8:]))
+
+    def test_invalid(self, feats_and_cids):
+        feats, _ = feats_and_cids
+        with pytest.raises(ValueError):
+            _ = CCIPIncrementalClusterer(recluster_every=0)
+        with pytest.raises(ValueError):
+            CCIPIncrementalClusterer().add(feats[:3], ids=['a'])
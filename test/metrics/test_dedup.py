@@ -0,0 +1,104 @@
+import itertools
+import os.path
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from imgutils.metrics import perceptual_hash, find_near_duplicates, NearDuplicateIndex
+from imgutils.metrics.dedup import _candidate_pairs, _band_keys, _groups
+from ..testings import get_testfile
+
+
+@pytest.fixture()
+def resized_files(tmp_path):
+    files = []
+    for i, name in enumerate(['6124220.jpg', '6125785.jpg', '6125901.jpg', 'complex_sex.jpg']):
+        image = Image.open(get_testfile(name)).convert('RGB')
+        for scale in [1, 2, 3]:
+            file = str(tmp_path / f'{i}_{scale}.png')
+            image.resize((image.width // scale, image.height // scale)).save(file)
+            files.append(file)
+    return files
+
+
+def _hamming(x, y):
+    return bin(x ^ y).count('1')
+
+
+@pytest.mark.unittest
+class TestMetricsDedup:
+    @pytest.mark.parametrize('method', ['phash', 'dhash'])
+    def test_perceptual_hash(self, method):
+        image = Image.open(get_testfile('6125785.jpg'))
+        h1 = perceptual_hash(image, method)
+        assert 0 <= h1 < 2 ** 64
+        assert _hamming(h1, perceptual_hash(image.resize((image.width // 2, image.height // 2)), method)) <= 4
+        assert _hamming(h1, perceptual_hash(get_testfile('6125901.jpg'), method)) > 10
+
+    def test_perceptual_hash_invalid(self):
+        with pytest.raises(ValueError):
+            perceptual_hash(get_testfile('6125785.jpg'), 'ahash')
+
+    def test_candidate_pairs(self):
+        rng = np.random.default_rng(0)
+        bases = rng.integers(0, 2 ** 63, size=5, dtype=np.uint64)
+        hashes = []
+        for _ in range(60):
+            h = int(bases[rng.integers(0, 5)])
+            for bit in rng.choice(64, size=rng.integers(0, 12), replace=False):
+                h ^= 1 << int(bit)
+            hashes.append(h)
+        hashes = np.asarray(hashes, dtype=np.uint64)
+
+        n_old, n_bands, max_distance = 25, 4, 10
+        pairs = _candidate_pairs(hashes[:n_old], hashes[n_old:], n_bands, max_distance, max_bucket_size=None)
+        expected = [
+            (i, j) for i, j in itertools.combinations(range(hashes.shape[0]), 2)
+            if j >= n_old and _hamming(int(hashes[i]), int(hashes[j])) <= max_distance
+        ]
+        assert [tuple(pair) for pair in pairs.tolist()] == expected
+
+        pairs = _candidate_pairs(hashes[:n_old], hashes[n_old:], n_bands, n_bands - 1, max_bucket_size=None)
+        keys = _band_keys(hashes, n_bands)
+        expected = [
+            (i, j) for i, j in itertools.combinations(range(hashes.shape[0]), 2)
+            if j >= n_old and (keys[i] == keys[j]).any()
+               and _hamming(int(hashes[i]), int(hashes[j])) <= n_bands - 1
+        ]
+        assert [tuple(pair) for pair in pairs.tolist()] == expected
+
+    def test_candidate_pairs_oversized_bucket(self):
+        hashes = np.full((1100,), 0x1234567890abcdef, dtype=np.uint64)
+        pairs = _candidate_pairs(np.zeros((0,), dtype=np.uint64), hashes, max_bucket_size=1024)
+        assert pairs.shape[0] < 1100 * 4
+        assert _groups(1100, pairs) == [list(range(1100))]
+
+        pairs = np.concatenate([
+            _candidate_pairs(np.zeros((0,), dtype=np.uint64), hashes[:600], max_bucket_size=1024),
+            _candidate_pairs(hashes[:600], hashes[600:], max_bucket_size=1024),
+        ])
+        assert _groups(1100, pairs) == [list(range(1100))]
+
+    def test_find_near_duplicates(self, resized_files):
+        assert find_near_duplicates(resized_files, silent=True) == [
+            [0, 1, 2], [3, 4, 5], [6, 7, 8], [9, 10, 11],
+        ]
+
+    def test_near_duplicate_index(self, resized_files, tmp_path):
+        directory = str(tmp_path / 'index')
+        index = NearDuplicateIndex(directory)
+        index.add(resized_files[::2], silent=True)
+        index.add(resized_files[1::2] + [get_testfile('2216614_truncated.jpg')], silent=True)
+        assert len(index) == len(resized_files)
+        groups = sorted(sorted(os.path.basename(file) for file in group) for group in index.groups())
+        assert groups == [[f'{i}_{scale}.png' for scale in [1, 2, 3]] for i in range(4)]
+
+        index = NearDuplicateIndex(directory)
+        assert len(index) == len(resized_files)
+        assert resized_files[0] in index
+        assert index.add(resized_files, silent=True) == 0
+        assert len(index.groups()) == 4
+
+        with pytest.raises(ValueError):
+            NearDuplicateIndex(directory, method='dhash')
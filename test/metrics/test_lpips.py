@@ -2,13 +2,14 @@ import glob
 import os.path
 import random
 
+import numpy as np
 import pytest
 from PIL import Image
 from hbutils.random import keep_global_state, global_seed
 from hbutils.testing import tmatrix, disable_output
 from sklearn.metrics import adjusted_rand_score
 
-from imgutils.metrics import lpips_difference, lpips_clustering
+from imgutils.metrics import lpips_difference, lpips_clustering, lpips_batch_differences
 from ..testings import get_testfile
 
 
@@ -56,6 +57,19 @@ class TestClusteringLpips:
         else:
             assert lpips_difference(i1, i2) >= 0.55
 
+    def test_lpips_batch_differences(self):
+        files = [get_testfile(f) for f in ['6124220.jpg', '6125785.png', '6125901.jpg']]
+        matrix = lpips_batch_differences(files, batch_size=2, pair_batch_size=2)
+        assert matrix.shape == (3, 3)
+        np.testing.assert_allclose(matrix, matrix.T)
+        np.testing.assert_allclose(np.diag(matrix), 0.0)
+        for i in range(3):
+            for j in range(i + 1, 3):
+                assert matrix[i, j] == pytest.approx(lpips_difference(files[i], files[j]), abs=1e-4)
+
+        with pytest.raises(ValueError):
+            _ = lpips_batch_differences(files, batch_size=0)
+
     @pytest.mark.parametrize(*tmatrix({
         'seed': [0, 1, 2, 3, 4],
     }))
@@ -62,6 +62,15 @@ class TestOperateCensor:
             throw_exception=False
         ) < 1e-2
 
+    def test_censor_color_columnar(self, genshin_post, gp_areas, image_diff):
+        from imgutils.detect import Detections
+        detections = Detections.from_list([(area, 'face', 0.5) for area in gp_areas])
+        assert image_diff(
+            censor_areas(genshin_post, 'color', detections, color='red').convert('RGB'),
+            Image.open(get_testfile('genshin_post_color_red.jpg')).convert('RGB'),
+            throw_exception=False
+        ) < 1e-2
+
     @pytest.mark.parametrize(['radius'], [(4,), (8,), (12,)])
     def test_censor_blur(self, genshin_post, gp_areas, radius, image_diff):
         assert image_diff(
@@ -1,6 +1,6 @@
 import pytest
 
-from imgutils.tagging import is_blacklisted, drop_blacklisted_tags
+from imgutils.tagging import is_blacklisted, drop_blacklisted_tags, drop_blacklisted_tags_batch
 
 
 @pytest.mark.unittest
@@ -58,3 +58,13 @@ class TestTaggingBlacklist:
             drop_blacklisted_tags(123)
         with pytest.raises(TypeError):
             drop_blacklisted_tags(None)
+
+    def test_drop_blacklisted_tags_batch(self, complex_dict_tags, complex_list_tags):
+        assert drop_blacklisted_tags_batch([complex_dict_tags, complex_list_tags, []]) == [
+            drop_blacklisted_tags(complex_dict_tags),
+            drop_blacklisted_tags(complex_list_tags),
+            [],
+        ]
+        assert drop_blacklisted_tags_batch(
+            [['solo', 'large_breasts', 'cosplay']], use_presets=False, custom_blacklist=['large breast'],
+        ) == [['solo', 'cosplay']]
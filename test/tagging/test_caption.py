@@ -0,0 +1,148 @@
+import json
+import os
+import shutil
+import tarfile
+
+import pytest
+
+from imgutils.tagging import caption_images
+from imgutils.tagging.caption import _iter_sources
+from imgutils.tagging.wd14 import _get_wd14_model
+from test.testings import get_testfile
+
+
+@pytest.fixture(autouse=True, scope='module')
+def _release_model_after_run():
+    try:
+        yield
+    finally:
+        _get_wd14_model.cache_clear()
+
+
+@pytest.fixture()
+def image_dir(tmp_path):
+    directory = tmp_path / 'dataset'
+    os.makedirs(directory / 'sub')
+    shutil.copyfile(get_testfile('6124220.jpg'), directory / '6124220.jpg')
+    shutil.copyfile(get_testfile('6125785.jpg'), directory / 'sub' / '6125785.jpg')
+    with open(directory / 'readme.md', 'w') as f:
+        f.write('not an image')
+    return str(directory)
+
+
+@pytest.fixture()
+def image_tar(tmp_path):
+    tar_file = tmp_path / 'shard-000.tar'
+    with tarfile.open(tar_file, 'w') as tar:
+        tar.add(get_testfile('6124220.jpg'), arcname='a/6124220.jpg')
+        tar.add(get_testfile('6125785.jpg'), arcname='6125785.jpg')
+    return str(tar_file)
+
+
+@pytest.mark.unittest
+class TestTaggingCaption:
+    def test_iter_sources_dir(self, image_dir):
+        items = list(_iter_sources([image_dir], None))
+        assert [(key, txt_file) for key, txt_file, _ in items] == [
+            (os.path.join(image_dir, '6124220.jpg'), os.path.join(image_dir, '6124220.txt')),
+            (os.path.join(image_dir, 'sub', '6125785.jpg'), os.path.join(image_dir, 'sub', '6125785.txt')),
+        ]
+        assert items[0][2]().size == (874, 806)
+
+        items = list(_iter_sources([image_dir], 'captions'))
+        assert [txt_file for _, txt_file, _ in items] == [
+            os.path.join('captions', '6124220.txt'),
+            os.path.join('captions', 'sub', '6125785.txt'),
+        ]
+
+    def test_iter_sources_tar(self, image_tar, tmp_path):
+        items = list(_iter_sources([image_tar], None))
+        assert [(key, txt_file) for key, txt_file, _ in items] == [
+            (f'{image_tar}::a/6124220.jpg', os.path.join(tmp_path, 'shard-000', 'a', '6124220.txt')),
+            (f'{image_tar}::6125785.jpg', os.path.join(tmp_path, 'shard-000', '6125785.txt')),
+        ]
+        assert items[0][2]().size == (874, 806)
+
+    def test_iter_sources_invalid(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            list(_iter_sources([str(tmp_path / 'not_exist')], None))
+
+    def test_caption_images_resume(self, image_dir):
+        for file in ['6124220.txt', os.path.join('sub', '6125785.txt')]:
+            with open(os.path.join(image_dir, file), 'w') as f:
+                f.write('1girl')
+
+        stats = caption_images([image_dir], silent=True)
+        assert stats['captioned'] == 0
+        assert stats['skipped'] == 2
+        assert stats['failed'] == 0
+
+    def test_caption_images_resume_truncated_jsonl(self, image_tar, tmp_path):
+        jsonl_file = str(tmp_path / 'captions.jsonl')
+        lines = [
+            json.dumps({'file': f'{image_tar}::a/6124220.jpg', 'caption': '1girl'}) + '\n',
+            'not a json line\n',
+            json.dumps({'file': f'{image_tar}::6125785.jpg', 'caption': '1girl'}) + '\n',
+        ]
+        with open(jsonl_file, 'w') as f:
+            f.writelines(lines)
+            f.write('{"file": "interrupted')
+
+        stats = caption_images([image_tar], jsonl_file=jsonl_file, silent=True)
+        assert stats['captioned'] == 0
+        assert stats['skipped'] == 2
+        with open(jsonl_file, 'r') as f:
+            assert f.read() == ''.join(lines)
+
+    def test_caption_images_unsafe_tar(self, tmp_path):
+        tar_file = str(tmp_path / 'shards' / 'shard-000.tar')
+        os.makedirs(os.path.dirname(tar_file))
+        with tarfile.open(tar_file, 'w') as tar:
+            tar.add(get_testfile('6124220.jpg'), arcname='../../escaped.jpg')
+            info = tar.gettarinfo(get_testfile('6124220.jpg'), arcname='absolute.jpg')
+            info.name = '/tmp/absolute.jpg'
+            with open(get_testfile('6124220.jpg'), 'rb') as f:
+                tar.addfile(info, f)
+        items = list(_iter_sources([tar_file], None))
+        assert [txt_file for _, txt_file, _ in items] == [None, None]
+        with pytest.raises(ValueError):
+            items[0][2]()
+
+        stats = caption_images([tar_file], silent=True)
+        assert stats['captioned'] == 0
+        assert stats['failed'] == 2
+        assert not os.path.exists(tmp_path / 'escaped.txt')
+
+    def test_caption_images_invalid(self, image_dir):
+        with pytest.raises(ValueError):
+            caption_images([image_dir], batch_size=0)
+
+    def test_caption_images_txt(self, image_dir):
+        stats = caption_images([image_dir], batch_size=1, workers=2, silent=True)
+        assert stats['captioned'] == 2
+        assert stats['skipped'] == 0
+
+        with open(os.path.join(image_dir, '6124220.txt'), 'r') as f:
+            assert 'cat_girl' in f.read().split(', ')
+        with open(os.path.join(image_dir, 'sub', '6125785.txt'), 'r') as f:
+            assert '1girl' in f.read().split(', ')
+
+        stats = caption_images([image_dir], silent=True)
+        assert stats['captioned'] == 0
+        assert stats['skipped'] == 2
+
+    def test_caption_images_jsonl(self, image_tar, tmp_path):
+        jsonl_file = str(tmp_path / 'captions.jsonl')
+        stats = caption_images([image_tar], jsonl_file=jsonl_file, use_spaces=True, silent=True)
+        assert stats['captioned'] == 2
+
+        with open(jsonl_file, 'r') as f:
+            records = [json.loads(line) for line in f]
+        assert [item['file'] for item in records] == [f'{image_tar}::a/6124220.jpg', f'{image_tar}::6125785.jpg']
+        assert 'cat girl' in records[0]['caption'].split(', ')
+        assert records[0]['general']['cat_girl'] >= 0.8
+        assert not os.path.exists(tmp_path / 'shard-000')
+
+        stats = caption_images([image_tar], jsonl_file=jsonl_file, silent=True)
+        assert stats['captioned'] == 0
+        assert stats['skipped'] == 2
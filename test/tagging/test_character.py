@@ -1,6 +1,7 @@
 import pytest
 
-from imgutils.tagging import is_basic_character_tag, drop_basic_character_tags
+from imgutils.tagging import is_basic_character_tag, drop_basic_character_tags, drop_basic_character_tags_batch
+from imgutils.tagging.character import CharacterTagPool
 
 
 @pytest.mark.unittest
@@ -48,3 +49,17 @@ class TestTaggingCharacter:
             drop_basic_character_tags(122)
         with pytest.raises(TypeError):
             drop_basic_character_tags(None)
+
+    def test_drop_basic_character_tags_batch(self, complex_dict_tags, complex_list_tags):
+        assert drop_basic_character_tags_batch([complex_dict_tags, complex_list_tags, []]) == [
+            drop_basic_character_tags(complex_dict_tags),
+            drop_basic_character_tags(complex_list_tags),
+            [],
+        ]
+        with pytest.raises(TypeError):
+            drop_basic_character_tags_batch([[], None])
+
+    def test_character_tag_pool_precompute(self, complex_list_tags):
+        pool = CharacterTagPool()
+        pool.precompute(complex_list_tags)
+        assert pool.drop_basic_character_tags(complex_list_tags) == drop_basic_character_tags(complex_list_tags)
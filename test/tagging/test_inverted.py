@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from imgutils.tagging import TagInvertedIndex, tags_to_text
+
+
+@pytest.fixture()
+def items():
+    return [
+        ('1.jpg', {'1girl': 0.99, 'long_hair': 0.9, 'smile': 0.3, 'monochrome': 0.1}),
+        ('2.jpg', {'1girl': 0.95, 'long hair': 0.8, 'monochrome': 0.7}),
+        ('3.jpg', {'1boy': 0.97, 'short_hair': 0.85, 'smile': 0.6}),
+        ('4.jpg', {'1girl': 0.6, 'long_hair': 0.55, 'open_mouth': 0.8}),
+        ('5.jpg', {}),
+    ]
+
+
+@pytest.fixture()
+def index(tmp_path, items):
+    return TagInvertedIndex.build(str(tmp_path / 'tag_index'), items, chunk_size=3)
+
+
+@pytest.mark.unittest
+class TestTaggingInverted:
+    def test_build(self, index, tmp_path):
+        assert len(index) == 5
+        assert index.image_ids == ['1.jpg', '2.jpg', '3.jpg', '4.jpg', '5.jpg']
+        assert sorted(index.tags) == ['1boy', '1girl', 'long_hair', 'monochrome', 'open_mouth', 'short_hair', 'smile']
+        assert index.tag_counts()['1girl'] == 3
+        assert list(index.tag_counts().keys())[0] == '1girl'
+
+        reopened = TagInvertedIndex(str(tmp_path / 'tag_index'))
+        assert reopened.query(all_of=['long_hair']) == ['1.jpg', '2.jpg', '4.jpg']
+
+    def test_query(self, index):
+        assert index.query(all_of=['1girl', 'long_hair']) == ['1.jpg', '2.jpg', '4.jpg']
+        assert index.query(all_of=['1girl', 'long hair'], none_of=['monochrome'], threshold=0.5) == ['1.jpg', '4.jpg']
+        assert index.query(all_of=['1girl', 'long_hair'], none_of=['monochrome']) == ['4.jpg']
+        assert index.query(all_of={'1girl': 0.9}) == ['1.jpg', '2.jpg']
+        assert index.query(any_of=['smile', 'open_mouth'], threshold=0.5) == ['3.jpg', '4.jpg']
+        assert index.query(all_of=['1girl'], any_of={'smile': 0.2, 'open_mouth': 0.9}) == ['1.jpg']
+        assert index.query(none_of=['1girl', '1boy']) == ['5.jpg']
+        assert index.query() == index.image_ids
+        assert index.query(all_of=[]) == index.image_ids
+        assert index.query(all_of=['not_a_tag']) == []
+        assert index.query(all_of=['1girl', 'not_a_tag']) == []
+        assert index.query(any_of=['not_a_tag']) == []
+        np.testing.assert_array_equal(index.query_numbers(all_of=['smile']), [0, 2])
+
+    def test_count(self, index):
+        assert index.count('long_hair') == 3
+        assert index.count('long hair', threshold=0.85) == 1
+        assert index.count('not_a_tag') == 0
+
+    def test_get_tags(self, index):
+        tags = index.get_tags('1.jpg')
+        assert list(tags.keys()) == ['1girl', 'long_hair', 'smile', 'monochrome']
+        assert tags == pytest.approx({'1girl': 0.99, 'long_hair': 0.9, 'smile': 0.3, 'monochrome': 0.1}, abs=2e-3)
+        assert tags_to_text(index.get_tags('1.jpg', threshold=0.5)) == '1girl, long_hair'
+        assert index.get_tags('5.jpg') == {}
+        with pytest.raises(KeyError):
+            index.get_tags('not_found.jpg')
+
+    def test_build_invalid(self, tmp_path):
+        with pytest.raises(ValueError):
+            TagInvertedIndex.build(str(tmp_path / 'tag_index'), [('1.jpg', {}), ('1.jpg', {})])
+
+    def test_build_empty(self, tmp_path):
+        index = TagInvertedIndex.build(str(tmp_path / 'tag_index'), [])
+        assert len(index) == 0
+        assert index.query(all_of=['1girl']) == []
+        assert index.query() == []
@@ -1,6 +1,6 @@
 import pytest
 
-from imgutils.tagging.match import tag_match_suffix, tag_match_prefix, tag_match_full
+from imgutils.tagging.match import tag_match_suffix, tag_match_prefix, tag_match_full, TagMatcher
 
 
 @pytest.mark.unittest
@@ -38,3 +38,43 @@ class TestTaggingMatch:
         assert not tag_match_full('ear', '')
         assert not tag_match_full('cat ears', '')
         assert not tag_match_full('cat_ear', '')
+
+    def test_tag_matcher(self):
+        matcher = TagMatcher(words=['cosplay', 'no eyewear'], prefixes=['holding', 'hand on'], suffixes=['cat ear'])
+        assert matcher.match('cosplay')
+        assert matcher.match('no_eyewear')
+        assert 'cosplays' in matcher
+        assert matcher.match('holding')
+        assert matcher.match('holding_sword')
+        assert matcher.match('hand_on_hip')
+        assert not matcher.match('hands_on_hip')
+        assert matcher.match('cat ears')
+        assert matcher.match('red_cat_ear')
+        assert not matcher.match('red cats ear')
+        assert not matcher.match('cat')
+        assert not matcher.match('')
+        assert not matcher.match('no_eyewear_at_all')
+
+        matcher.precompute(['1girl', 'solo', 'cat_ears'])
+        assert matcher.filter(['1girl', 'holding sword', 'cat_ears', 'smile']) == ['1girl', 'smile']
+        assert matcher.filter({'1girl': 0.9, 'cosplay': 0.5}) == {'1girl': 0.9}
+        with pytest.raises(TypeError):
+            matcher.filter(None)
+
+    def test_tag_matcher_cache(self):
+        matcher = TagMatcher(words=['cosplay'], suffixes=['cat ear'], cache_size=4)
+        matcher.precompute(['1girl', 'cosplay'])
+        for i in range(10):
+            assert not matcher.match(f'tag_{i}')
+        assert len(matcher._results) == 4
+        assert matcher._precomputed == {'1girl': False, 'cosplay': True}
+        assert matcher.match('red_cat_ears')
+        assert matcher.match('cosplay')
+
+    def test_tag_matcher_empty(self):
+        assert not TagMatcher().match('cat ears')
+        assert not TagMatcher().match('')
+        assert TagMatcher(suffixes=['']).match('cat ears')
+        assert TagMatcher(prefixes=['']).match('')
+        assert TagMatcher(words=['']).match('')
+        assert not TagMatcher(words=['']).match('cat')
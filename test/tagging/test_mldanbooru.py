@@ -1,7 +1,8 @@
 import pytest
+from PIL import Image
 
-from imgutils.tagging import get_mldanbooru_tags
-from imgutils.tagging.mldanbooru import _open_mldanbooru_model
+from imgutils.tagging import get_mldanbooru_tags, get_mldanbooru_tags_batch
+from imgutils.tagging.mldanbooru import _open_mldanbooru_model, _bucket_shapes, _resize_into_bucket
 from test.testings import get_testfile
 
 
@@ -61,3 +62,29 @@ class TestTaggingMldanbooru:
             'breasts_apart': 0.7527053356170654, 'slit_pupils': 0.7464284300804138, 'barefoot': 0.7429600358009338,
             'bed_sheet': 0.7186222672462463, 'fang': 0.7162103652954102, 'clitoris': 0.7013473510742188
         }, abs=1e-3)
+
+    def test_get_mldanbooru_tags_batch(self):
+        files = [get_testfile('6124220.jpg'), get_testfile('6125785.jpg'), get_testfile('nude_girl.png')]
+        results = get_mldanbooru_tags_batch(files, batch_size=2)
+        for file, tags in zip(files, results):
+            assert tags == pytest.approx(get_mldanbooru_tags(file), abs=1e-3)
+
+        results = get_mldanbooru_tags_batch(files, keep_ratio=True, batch_size=2, bucket_count=5)
+        assert results[0]['cat'] >= 0.8
+        assert results[1]['1girl'] >= 0.95
+        assert results[2]['1girl'] >= 0.95
+        assert get_mldanbooru_tags_batch([]) == []
+
+    def test_bucket_shapes(self):
+        shapes = _bucket_shapes(448, bucket_count=5, max_ratio=2.0)
+        assert shapes == [(448, 896), (448, 632), (448, 448), (632, 448), (896, 448)]
+        assert _bucket_shapes(448, bucket_count=1) == [(448, 448)]
+        for width, height in _bucket_shapes(449, bucket_count=8, max_ratio=3.0):
+            assert width % 4 == 0 and height % 4 == 0
+        with pytest.raises(ValueError):
+            _bucket_shapes(448, bucket_count=0)
+
+        image = _resize_into_bucket(Image.new('RGB', (1000, 400), 'red'), (896, 448))
+        assert image.size == (896, 448)
+        assert image.getpixel((448, 0)) == (255, 255, 255)
+        assert image.getpixel((448, 224)) == (255, 0, 0)
@@ -1,6 +1,7 @@
 import pytest
 
-from imgutils.tagging import drop_overlap_tags
+from imgutils.tagging import drop_overlap_tags, drop_overlap_tags_batch
+from imgutils.tagging.overlap import _is_substring_of_others
 
 
 @pytest.mark.unittest
@@ -28,3 +29,22 @@ class TestTaggingOverlap:
             drop_overlap_tags(1)
         with pytest.raises(TypeError):
             drop_overlap_tags(None)
+
+    def test_drop_overlap_tags_batch(self, complex_dict_tags):
+        assert drop_overlap_tags_batch([
+            ['1girl', 'solo', 'long_hair', 'very_long_hair', 'red_hair'],
+            complex_dict_tags,
+            [],
+        ]) == [
+                   ['1girl', 'solo', 'very_long_hair', 'red_hair'],
+                   drop_overlap_tags(complex_dict_tags),
+                   [],
+               ]
+        with pytest.raises(TypeError):
+            drop_overlap_tags_batch([['1girl'], None])
+
+    def test_is_substring_of_others(self):
+        assert _is_substring_of_others([]) == []
+        assert _is_substring_of_others(['hair', 'long_hair', 'hair', 'very_long_hair', 'red']) == \
+               [True, True, True, False, False]
+        assert _is_substring_of_others(['ab', 'ba', 'aba', 'b']) == [True, True, False, True]
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from imgutils.tagging import TagVocabulary, drop_overlap_tags, drop_blacklisted_tags, drop_basic_character_tags
+from imgutils.tagging.vocab import _substring_pairs
+
+
+@pytest.fixture()
+def vocab(complex_list_tags):
+    return TagVocabulary([*complex_list_tags, 'cosplay', 'medium_breasts'])
+
+
+@pytest.mark.unittest
+class TestTaggingVocab:
+    def test_substring_pairs(self):
+        assert sorted(_substring_pairs(['hair', 'long_hair', 'very_long_hair', 'red', 'hair'])) == [
+            (0, 1), (0, 2), (1, 2), (4, 1), (4, 2),
+        ]
+        assert _substring_pairs([]) == []
+        assert _substring_pairs(['ab', 'ba']) == []
+
+    def test_basic_character_mask(self, vocab):
+        names = vocab.names.tolist()
+        assert vocab.basic_character_mask.shape == (len(names),)
+        assert [name for name, flag in zip(names, vocab.basic_character_mask) if not flag] == \
+               drop_basic_character_tags(names)
+
+    def test_blacklist_mask(self, vocab):
+        names = vocab.names.tolist()
+        assert [name for name, flag in zip(names, vocab.blacklist_mask) if not flag] == drop_blacklisted_tags(names)
+
+    def test_overlap_mask(self, vocab):
+        names = vocab.names.tolist()
+        rs = np.random.RandomState(0)
+        selected = rs.rand(20, len(names)) < 0.5
+        selected[0] = True
+        dropped = vocab.overlap_mask(selected)
+        assert dropped.shape == selected.shape
+        for row, drop in zip(selected, dropped):
+            tags = [name for name, flag in zip(names, row) if flag]
+            assert [name for name, flag, d in zip(names, row, drop) if flag and not d] == drop_overlap_tags(tags)
+
+        np.testing.assert_array_equal(vocab.overlap_mask(selected[0]), dropped[0])
+        with pytest.raises(ValueError):
+            vocab.overlap_mask(selected[:, :3])
+
+    def test_filter_mask(self, vocab):
+        names = vocab.names.tolist()
+        selected = np.ones((len(names),), dtype=bool)
+        keep = vocab.filter_mask(selected, drop_blacklisted=True, drop_basic_character=True)
+        expected = drop_overlap_tags(drop_basic_character_tags(drop_blacklisted_tags(names)))
+        assert vocab.names[keep].tolist() == expected
+        assert vocab.filter_mask(selected, drop_overlap=False).all()
@@ -1,7 +1,8 @@
+import numpy as np
 import pytest
 
-from imgutils.tagging import get_wd14_tags
-from imgutils.tagging.wd14 import _get_wd14_model
+from imgutils.tagging import get_wd14_tags, get_wd14_tags_batch
+from imgutils.tagging.wd14 import _get_wd14_model, _mcut_threshold
 from test.testings import get_testfile
 
 
@@ -159,3 +160,28 @@ class TestTaggingWd14:
             'tube_top': 0.9783295392990112, 'bead_bracelet': 0.3510066270828247, 'red_bandeau': 0.8741766214370728
         }, abs=2e-2)
         assert chars == pytest.approx({'nian_(arknights)': 0.9968841671943665}, abs=2e-2)
+
+    def test_get_wd14_tags_batch(self):
+        files = [get_testfile('6124220.jpg'), get_testfile('6125785.jpg'), get_testfile('nude_girl.png')]
+        fmt = ('rating', 'general', 'character', 'embedding')
+        results = get_wd14_tags_batch(files, fmt=fmt, batch_size=2)
+        assert len(results) == 3
+        for file, (rating, general, character, embedding) in zip(files, results):
+            e_rating, e_general, e_character, e_embedding = get_wd14_tags(file, fmt=fmt)
+            assert rating == pytest.approx(e_rating, abs=1e-3)
+            assert set(general.keys()) == set(e_general.keys())
+            assert character == pytest.approx(e_character, abs=1e-3)
+            assert embedding.dtype == np.float32
+            np.testing.assert_allclose(embedding, e_embedding, atol=1e-3)
+
+        results = get_wd14_tags_batch(files, fmt='character', character_mcut_enabled=True, no_underline=True)
+        assert 'surtr (arknights)' in results[2]
+        assert get_wd14_tags_batch([]) == []
+
+    def test_mcut_threshold(self):
+        probs = np.array([
+            [0.9, 0.85, 0.2, 0.1],
+            [0.5, 0.45, 0.4, 0.01],
+        ])
+        assert _mcut_threshold(probs[0]) == pytest.approx(0.525)
+        np.testing.assert_allclose(_mcut_threshold(probs), [0.525, 0.205])
@@ -0,0 +1,139 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from imgutils.utils import MicroBatchSession, enable_micro_batching, disable_micro_batching, \
+    is_micro_batching_enabled
+
+
+class _FakeArg:
+    def __init__(self, name, shape):
+        self.name = name
+        self.shape = shape
+
+
+class _FakeSession:
+    def __init__(self, batch_dim='batch'):
+        self.batch_dim = batch_dim
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def get_inputs(self):
+        return [_FakeArg('input', [self.batch_dim, 3])]
+
+    def get_outputs(self):
+        return [_FakeArg('output', [self.batch_dim, 3]), _FakeArg('sum', [self.batch_dim])]
+
+    def run(self, output_names, input_feed, run_options=None):
+        x = input_feed['input']
+        with self.lock:
+            self.calls.append(x.shape[0])
+        if np.any(x < 0):
+            raise ValueError('negative input')
+        outputs = {'output': x * 2, 'sum': x.sum(axis=1)}
+        return [outputs[name] for name in (output_names or ['output', 'sum'])]
+
+
+class _FakePairwiseSession(_FakeSession):
+    def run(self, output_names, input_feed, run_options=None):
+        x = input_feed['input']
+        with self.lock:
+            self.calls.append(x.shape[0])
+        return [np.abs(x[:, None, 0] - x[None, :, 0])]
+
+
+@pytest.mark.unittest
+class TestUtilsBatching:
+    def test_threads(self):
+        fake = _FakeSession()
+        session = MicroBatchSession(fake, max_batch_size=8, max_latency=0.2)
+        inputs = [np.full((1, 3), i, dtype=np.float32) for i in range(16)]
+        barrier = threading.Barrier(16)
+
+        def _call(x):
+            barrier.wait()
+            return session.run(['output', 'sum'], {'input': x})
+
+        with ThreadPoolExecutor(16) as pool:
+            results = list(pool.map(_call, inputs))
+        session.close()
+
+        for x, (output, sum_) in zip(inputs, results):
+            np.testing.assert_allclose(output, x * 2)
+            np.testing.assert_allclose(sum_, x.sum(axis=1))
+        assert sum(fake.calls) == 16
+        assert len(fake.calls) < 16
+        assert max(fake.calls) <= 8
+        hist = session.batch_size_histogram
+        assert sum(size * count for size, count in hist.items()) == 16
+        assert session.queue_depth == 0
+        assert sum(session.queue_depth_histogram.values()) == len(fake.calls)
+
+        session.reset_stats()
+        assert session.batch_size_histogram == {}
+
+    def test_asyncio(self):
+        fake = _FakeSession()
+        session = MicroBatchSession(fake, max_batch_size=4, max_latency=0.2)
+
+        async def _main():
+            return await asyncio.gather(*[
+                session.run_async(['sum'], {'input': np.full((1, 3), i, dtype=np.float32)})
+                for i in range(4)
+            ])
+
+        results = asyncio.run(_main())
+        session.close()
+        assert [r[0].tolist() for r in results] == [[0.0], [3.0], [6.0], [9.0]]
+        assert fake.calls == [4]
+
+    def test_error_and_passthrough(self):
+        fake = _FakeSession()
+        session = MicroBatchSession(fake, max_batch_size=4, max_latency=0.0)
+        with pytest.raises(ValueError):
+            session.run(None, {'input': -np.ones((1, 3), dtype=np.float32)})
+
+        # larger than max batch size, run directly
+        output, _ = session.run(None, {'input': np.ones((6, 3), dtype=np.float32)})
+        assert output.shape == (6, 3)
+        assert fake.calls[-1] == 6
+        session.close()
+
+        fixed = _FakeSession(batch_dim=1)
+        session = MicroBatchSession(fixed)
+        assert session.get_inputs()[0].shape == [1, 3]
+        output, = session.run(['output'], {'input': np.ones((1, 3), dtype=np.float32)})
+        assert output.tolist() == [[2.0, 2.0, 2.0]]
+        assert session.batch_size_histogram == {}
+
+        with pytest.raises(ValueError):
+            MicroBatchSession(fake, max_batch_size=0)
+
+    def test_pairwise_not_merged(self):
+        fake = _FakePairwiseSession()
+        session = MicroBatchSession(fake, max_batch_size=8, max_latency=0.2)
+        inputs = [np.arange(2 * i, 2 * i + 2, dtype=np.float32)[:, None].repeat(3, axis=1) for i in range(2)]
+        barrier = threading.Barrier(2)
+
+        def _call(x):
+            barrier.wait()
+            return session.run(['output'], {'input': x})[0]
+
+        with ThreadPoolExecutor(2) as pool:
+            results = list(pool.map(_call, inputs))
+        session.close()
+        for x, output in zip(inputs, results):
+            assert output.shape == (2, 2)
+            np.testing.assert_allclose(output, np.abs(x[:, None, 0] - x[None, :, 0]))
+
+    def test_enable(self):
+        assert not is_micro_batching_enabled()
+        try:
+            enable_micro_batching(max_batch_size=4)
+            assert is_micro_batching_enabled()
+        finally:
+            disable_micro_batching()
+        assert not is_micro_batching_enabled()
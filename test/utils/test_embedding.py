@@ -0,0 +1,137 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from imgutils.utils import EmbeddingIndex
+
+
+@pytest.fixture()
+def embeddings():
+    rs = np.random.RandomState(0)
+    centers = rs.randn(32, 16)
+    return (centers[rs.randint(0, 32, 3000)] + 0.2 * rs.randn(3000, 16)).astype(np.float32)
+
+
+def _recall(results, expected):
+    return np.mean([
+        len({id_ for id_, _ in r} & {id_ for id_, _ in e}) / len(e)
+        for r, e in zip(results, expected)
+    ])
+
+
+@pytest.mark.unittest
+class TestUtilsEmbedding:
+    def test_exact_search(self, tmp_path, embeddings):
+        index = EmbeddingIndex(str(tmp_path / 'index'), dim=16, dtype='float32')
+        index.add(embeddings[:1000], ids=[f'img_{i}' for i in range(1000)])
+        index.add(embeddings[1000:1010])
+        assert len(index) == 1010
+        assert 'img_3' in index
+        assert index.ids[-1] == 1009
+
+        queries = embeddings[[3, 500, 1005]]
+        normalized = embeddings[:1010] / np.linalg.norm(embeddings[:1010], axis=1, keepdims=True)
+        sims = (queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ normalized.T
+        results = index.search(queries, top_k=5, chunk_size=128)
+        for result, row in zip(results, sims):
+            expected = np.argsort(-row)[:5]
+            assert [index.ids[i] for i in expected] == [id_ for id_, _ in result]
+            np.testing.assert_allclose([score for _, score in result], row[expected], atol=1e-5)
+
+        assert index.search(queries[0], top_k=1) == [('img_3', pytest.approx(1.0))]
+        np.testing.assert_allclose(index.get('img_3'), normalized[3], atol=1e-6)
+        assert index.search(queries, top_k=2000)[0].__len__() == 1010
+
+    def test_persistence(self, tmp_path, embeddings):
+        directory = str(tmp_path / 'index')
+        index = EmbeddingIndex(directory, dim=16)
+        index.add(embeddings[:100], ids=[f'img_{i}' for i in range(100)])
+        assert index.dtype == 'float16'
+
+        reopened = EmbeddingIndex(directory)
+        assert len(reopened) == 100
+        assert reopened.dim == 16
+        assert reopened.ids == index.ids
+        assert reopened.search(embeddings[7], top_k=1)[0][0] == 'img_7'
+
+        # data of an interrupted writing is dropped
+        with open(os.path.join(directory, 'ids.jsonl'), 'ab') as f:
+            f.write(json.dumps('broken').encode() + b'\n')
+        reopened = EmbeddingIndex(directory)
+        assert 'broken' not in reopened
+        reopened.add(embeddings[100:102], ids=['a', 'b'])
+        assert EmbeddingIndex(directory).ids[-3:] == ['img_99', 'a', 'b']
+
+    def test_invalid(self, tmp_path, embeddings):
+        with pytest.raises(ValueError):
+            EmbeddingIndex(str(tmp_path / 'no_dim'))
+        with pytest.raises(ValueError):
+            EmbeddingIndex(str(tmp_path / 'bad_dtype'), dim=16, dtype='int8')
+
+        index = EmbeddingIndex(str(tmp_path / 'index'), dim=16)
+        index.add(embeddings[:2], ids=['a', 'b'])
+        with pytest.raises(ValueError):
+            EmbeddingIndex(str(tmp_path / 'index'), dim=8)
+        with pytest.raises(ValueError):
+            index.add(embeddings[:1], ids=['a'])
+        with pytest.raises(ValueError):
+            index.add(embeddings[:2], ids=['c', 'c'])
+        with pytest.raises(ValueError):
+            index.add(embeddings[:2, :8])
+        with pytest.raises(ValueError):
+            index.search(embeddings[:2, :8])
+        with pytest.raises(ValueError):
+            index.train_ivf(n_lists=16)
+        with pytest.raises(ValueError):
+            index.train_ivf(n_lists=1, pq_m=5)
+        with pytest.raises(KeyError):
+            index.get('not_found')
+
+    def test_ivf(self, tmp_path, embeddings):
+        directory = str(tmp_path / 'index')
+        index = EmbeddingIndex(directory, dim=16, dtype='float32')
+        index.add(embeddings[:2500])
+        expected = index.search(embeddings[2500:2550], top_k=10)
+
+        index.train_ivf(n_lists=32, iterations=10)
+        assert index.is_ivf_trained
+        assert _recall(index.search(embeddings[2500:2550], top_k=10, n_probe=4), expected) >= 0.9
+        assert _recall(index.search(embeddings[2500:2550], top_k=10, n_probe=32), expected) == pytest.approx(1.0)
+
+        index.add(embeddings[2500:], ids=[f'new_{i}' for i in range(500)])
+        reopened = EmbeddingIndex(directory)
+        assert reopened.is_ivf_trained
+        assert reopened.search(embeddings[2600], top_k=1, n_probe=4)[0][0] == 'new_100'
+
+    def test_ivf_pq(self, tmp_path, embeddings):
+        index = EmbeddingIndex(str(tmp_path / 'index'), dim=16)
+        index.add(embeddings)
+        expected = index.search(embeddings[:50], top_k=10)
+
+        index.train_ivf(n_lists=16, pq_m=4, iterations=5)
+        assert _recall(index.search(embeddings[:50], top_k=10, n_probe=4), expected) >= 0.6
+        top1 = [result[0][0] for result in index.search(embeddings[:50], top_k=1, n_probe=4)]
+        assert np.mean(np.array(top1) == np.arange(50)) >= 0.9
+        assert len(index.search(embeddings[0], top_k=10, rerank=False)) == 10
+
+    def test_ivf_retrain_interrupted(self, tmp_path, embeddings, monkeypatch):
+        directory = str(tmp_path / 'index')
+        index = EmbeddingIndex(directory, dim=16)
+        index.add(embeddings)
+        index.train_ivf(n_lists=16, pq_m=4, iterations=5)
+        expected = index.search(embeddings[:20], top_k=5, n_probe=4)
+
+        def _interrupted(file, data):
+            raise OSError('Interrupted.')
+
+        with monkeypatch.context() as m:
+            m.setattr('imgutils.utils.embedding.save_json_atomic', _interrupted)
+            with pytest.raises(OSError):
+                index.train_ivf(n_lists=32, iterations=5)
+
+        reopened = EmbeddingIndex(directory)
+        assert reopened.search(embeddings[:20], top_k=5, n_probe=4) == expected
+        reopened.train_ivf(n_lists=32, iterations=5)
+        assert len(os.listdir(directory)) == 6
@@ -0,0 +1,25 @@
+import json
+import os
+
+import pytest
+
+from imgutils.utils import save_json_atomic, append_truncated
+
+
+@pytest.mark.unittest
+class TestUtilsStorage:
+    def test_save_json_atomic(self, tmp_path):
+        file = str(tmp_path / 'meta.json')
+        save_json_atomic(file, {'count': 1})
+        save_json_atomic(file, {'count': 2})
+        with open(file, 'r') as f:
+            assert json.load(f) == {'count': 2}
+        assert os.listdir(str(tmp_path)) == ['meta.json']
+
+    def test_append_truncated(self, tmp_path):
+        file = str(tmp_path / 'data.bin')
+        append_truncated(file, 0, b'abc')
+        append_truncated(file, 3, b'def')
+        append_truncated(file, 3, b'gh')  # the uncommitted 'def' is dropped
+        with open(file, 'rb') as f:
+            assert f.read() == b'abcgh'
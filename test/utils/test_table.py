@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+import pytest
+
+from imgutils.tagging import remove_underline
+from imgutils.utils import load_csv_table, get_storage_dir
+
+
+@pytest.fixture()
+def csv_file(tmp_path):
+    file = str(tmp_path / 'tags.csv')
+    with open(file, 'w', encoding='utf-8') as f:
+        f.write('tag_id,name,category,count,file\n'
+                '1,long_hair,0,100.5,a.png\n'
+                '2,"hatsune_miku",4,,b.png\n'
+                '3,"a,b",9,3,c.png\n')
+    return file
+
+
+@pytest.mark.unittest
+class TestUtilsTable:
+    def test_load_csv_table(self, csv_file):
+        table = load_csv_table(csv_file)
+        assert list(table.keys()) == ['tag_id', 'name', 'category', 'count', 'file']
+        assert table['tag_id'].dtype == np.int64
+        assert table['category'].tolist() == [0, 4, 9]
+        assert table['name'].tolist() == ['long_hair', 'hatsune_miku', 'a,b']
+        assert table['count'].dtype == np.float64
+        assert table['count'][0] == pytest.approx(100.5)
+        assert np.isnan(table['count'][1])
+        assert table['file'].tolist() == ['a.png', 'b.png', 'c.png']
+
+    def test_load_csv_table_cached(self, csv_file):
+        derived = {'name_no_underline': ('name', remove_underline)}
+        table = load_csv_table(csv_file, derived_columns=derived)
+        assert table['name_no_underline'].tolist() == ['long hair', 'hatsune miku', 'a,b']
+        cache_files = os.listdir(os.path.join(get_storage_dir(), 'tables'))
+
+        table2 = load_csv_table(csv_file, derived_columns=derived)
+        assert os.listdir(os.path.join(get_storage_dir(), 'tables')) == cache_files
+        assert list(table2.keys()) == list(table.keys())
+        for name in table:
+            np.testing.assert_array_equal(table2[name], table[name])
+            assert table2[name].dtype == table[name].dtype
+
+    def test_load_csv_table_changed(self, csv_file):
+        assert load_csv_table(csv_file)['tag_id'].tolist() == [1, 2, 3]
+        with open(csv_file, 'a', encoding='utf-8') as f:
+            f.write('4,smile,0,7,d.png\n')
+        os.utime(csv_file, ns=(0, 1))
+        assert load_csv_table(csv_file)['tag_id'].tolist() == [1, 2, 3, 4]
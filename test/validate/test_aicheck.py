@@ -4,7 +4,8 @@ import os.path
 import pytest
 
 from imgutils.generic.classify import _open_models_for_repo_id
-from imgutils.validate.aicheck import is_ai_created, get_ai_created_score, _REPO_ID
+from imgutils.validate.aicheck import is_ai_created, get_ai_created_score, _REPO_ID, \
+    is_ai_created_batch, get_ai_created_score_batch
 from test.testings import get_testfile
 
 _ROOT_DIR = get_testfile('anime_aicheck')
@@ -41,3 +42,10 @@ class TestValidateAicheck:
             assert score >= 0.5, f'Label: {label!r}, score: {score!r}'
         else:
             assert score < 0.5, f'Label: {label!r}, score: {score!r}'
+
+    def test_ai_created_batch(self):
+        image_files = [get_testfile('anime_aicheck', image) for image, _ in _EXAMPLE_FILES]
+        labels = [label == 'ai' for _, label in _EXAMPLE_FILES]
+        assert is_ai_created_batch(image_files, batch_size=4) == labels
+        scores = get_ai_created_score_batch(image_files, batch_size=4)
+        assert [score >= 0.5 for score in scores] == labels
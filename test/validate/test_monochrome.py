@@ -4,7 +4,8 @@ import pytest
 from hbutils.testing import tmatrix
 
 from imgutils.generic.classify import _open_models_for_repo_id
-from imgutils.validate.monochrome import get_monochrome_score, is_monochrome, _REPO_ID
+from imgutils.validate.monochrome import get_monochrome_score, is_monochrome, _REPO_ID, \
+    get_monochrome_score_batch, is_monochrome_batch
 
 _MODEL_NAMES = _open_models_for_repo_id(_REPO_ID).model_names
 
@@ -49,3 +50,13 @@ class TestValidateMonochrome:
         else:
             assert get_monochrome_score(filename, model_name=model_name) <= 0.5
             assert not is_monochrome(filename, model_name=model_name)
+
+    @pytest.mark.parametrize(['model_name'], [(name,) for name in _MODEL_NAMES])
+    def test_monochrome_batch(self, model_name: str):
+        samples = get_samples()
+        filenames = [os.path.join('test', 'testfile', 'dataset', 'monochrome_danbooru', type_, file)
+                     for type_, file in samples]
+        expected = [type_ == 'monochrome' for type_, _ in samples]
+        assert is_monochrome_batch(filenames, model_name=model_name, batch_size=5) == expected
+        scores = get_monochrome_score_batch(filenames, model_name=model_name, batch_size=5)
+        assert [score >= 0.5 for score in scores] == expected
@@ -1,10 +1,12 @@
 import glob
 import os.path
 
+import numpy as np
 import pytest
+from PIL import Image
 
-from imgutils.validate import nsfw_pred
-from imgutils.validate.nsfw import _open_nsfw_model, nsfw_pred_score
+from imgutils.validate import nsfw_pred, nsfw_pred_batch, nsfw_pred_score_batch
+from imgutils.validate.nsfw import _open_nsfw_model, nsfw_pred_score, _image_preprocess
 from test.testings import get_testfile
 
 _ROOT_DIR = get_testfile('nsfw')
@@ -35,3 +37,28 @@ class TestValidateNSFW:
         image_file = get_testfile('nsfw', image)
         scores = nsfw_pred_score(image_file)
         assert scores[label] > 0.5
+
+    def test_nsfw_pred_batch(self):
+        image_files = [get_testfile('nsfw', image) for image, _ in _EXAMPLE_FILES]
+        labels = [label for _, label in _EXAMPLE_FILES]
+        assert [tag for tag, _ in nsfw_pred_batch(image_files, batch_size=6)] == labels
+
+        scores = nsfw_pred_score_batch(image_files, batch_size=6)
+        for image_file, score in zip(image_files, scores):
+            assert score == pytest.approx(nsfw_pred_score(image_file), abs=1e-5)
+
+        scores = nsfw_pred_score_batch(image_files, batch_size=6, resample=Image.BILINEAR)
+        for score, label in zip(scores, labels):
+            assert score[label] > 0.5
+
+    def test_image_preprocess(self):
+        image = Image.new('RGB', (300, 200), (255, 128, 0))
+        data = _image_preprocess(image, 224)
+        assert data.dtype == np.float32
+        assert data.shape == (224, 224, 3)
+        np.testing.assert_allclose(data[0, 0], [1.0, 128 / 255, 0.0], rtol=1e-6)
+
+        out = np.zeros((2, 299, 299, 3), dtype=np.float32)
+        _image_preprocess(image, 299, resample=Image.BILINEAR, out=out[1])
+        np.testing.assert_allclose(out[1, 0, 0], [1.0, 128 / 255, 0.0], rtol=1e-6)
+        assert np.all(out[0] == 0.0)
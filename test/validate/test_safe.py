@@ -3,8 +3,8 @@ import os.path
 
 import pytest
 
-from imgutils.validate import safe_check, safe_check_score
-from imgutils.validate.safe import _open_model
+from imgutils.validate import safe_check, safe_check_score, safe_check_batch, safe_check_score_batch
+from imgutils.validate.safe import _open_model, _tile_boxes
 from test.testings import get_testfile
 
 _ROOT_DIR = get_testfile('safe_check')
@@ -35,3 +35,40 @@ class TestValidateSafe:
         image_file = get_testfile('safe_check', image)
         scores = safe_check_score(image_file)
         assert scores[label] > 0.5
+
+    def test_safe_check_batch(self):
+        image_files = [get_testfile('safe_check', image) for image, _ in _EXAMPLE_FILES]
+        labels = [label for _, label in _EXAMPLE_FILES]
+        assert [tag for tag, _ in safe_check_batch(image_files, batch_size=5)] == labels
+
+        scores = safe_check_score_batch(image_files, batch_size=5)
+        for image_file, score in zip(image_files, scores):
+            assert score == pytest.approx(safe_check_score(image_file), abs=1e-5)
+
+    def test_safe_check_deterministic(self):
+        image_file = get_testfile('safe_check', *_EXAMPLE_FILES[0][0].split(os.sep))
+        assert safe_check_score(image_file) == safe_check_score(image_file)
+
+    def test_tile_boxes(self):
+        assert _tile_boxes(300, 200) == [(0, 0, 300, 200)]
+        # 6 grid tiles, 4 sampled (ceil(area / 384^2) + 1)
+        grid = {
+            (0, 0, 384, 384), (384, 0, 768, 384), (616, 0, 1000, 384),
+            (0, 16, 384, 400), (384, 16, 768, 400), (616, 16, 1000, 400),
+        }
+        boxes = _tile_boxes(1000, 400, max_batch_size=8)
+        assert len(boxes) == 4
+        assert set(boxes) < grid
+        assert set(_tile_boxes(1000, 400, max_batch_size=8, stride=384)) == set(boxes)
+
+        boxes = _tile_boxes(3000, 2000, max_batch_size=8, seed=0)
+        assert len(boxes) == 8
+        assert boxes == _tile_boxes(3000, 2000, max_batch_size=8, seed=0)
+        assert boxes != _tile_boxes(3000, 2000, max_batch_size=8, seed=1)
+        for x0, y0, x1, y1 in boxes:
+            assert (x1 - x0, y1 - y0) == (384, 384)
+            assert 0 <= x0 and x1 <= 3000 and 0 <= y0 and y1 <= 2000
+
+        assert len(_tile_boxes(1000, 800, max_batch_size=100, stride=192)) == 7
+        with pytest.raises(ValueError):
+            _tile_boxes(1000, 800, stride=-1)
@@ -0,0 +1,68 @@
+import pytest
+from PIL import Image
+
+from imgutils.generic.classify import _open_models_for_repo_id
+from imgutils.utils import open_onnx_model
+from imgutils.validate import ValidatorSuite, VALIDATOR_NAMES
+from test.generic.test_classify import _make_model
+
+_LOCAL_REPO_ID = 'local/tiny_classify_suite'
+
+
+@pytest.fixture()
+def local_models(tmp_path):
+    model = _open_models_for_repo_id(_LOCAL_REPO_ID)
+    model._model_names = ['tiny', 'tiny_fixed', 'tiny_64']
+    for name, batch, size in [('tiny', 'N', 32), ('tiny_fixed', 1, 32), ('tiny_64', 'N', 64)]:
+        file = _make_model(str(tmp_path / f'{name}.onnx'), batch, size)
+        model._models[name] = open_onnx_model(file, mode='cpu')
+        model._labels[name] = ['red', 'green', 'blue']
+    try:
+        yield model
+    finally:
+        model.clear()
+        model._model_names = None
+
+
+@pytest.fixture()
+def images():
+    return [
+        Image.new('RGB', (40, 30), color)
+        for color in [(255, 0, 0), (0, 255, 0), (0, 0, 255), (200, 100, 50), (10, 20, 250)]
+    ]
+
+
+@pytest.mark.unittest
+class TestValidateSuite:
+    def test_suite(self, local_models, images):
+        with ValidatorSuite({
+            'a': (_LOCAL_REPO_ID, 'tiny'),
+            'b': (_LOCAL_REPO_ID, 'tiny_fixed'),
+            'c': (_LOCAL_REPO_ID, 'tiny_64'),
+        }) as suite:
+            assert suite.names == ['a', 'b', 'c']
+            results = suite.predict_batch(images, batch_size=2)
+            assert len(results) == len(images)
+            for image, result in zip(images, results):
+                for name, model_name in [('a', 'tiny'), ('b', 'tiny_fixed'), ('c', 'tiny_64')]:
+                    expected = local_models.predict_score(image, model_name)
+                    assert result[name] == pytest.approx(expected, abs=1e-6)
+
+            single = suite.predict(images[0])
+            assert single['a'] == pytest.approx(results[0]['a'], abs=1e-6)
+
+            scores = suite.predict_score_batch(images, batch_size=3)
+            matrix, labels = scores['c']
+            assert matrix.shape == (5, 3)
+            assert labels == ['red', 'green', 'blue']
+
+            scores = suite.predict_score_batch([])
+            assert scores['a'][0].shape == (0, 3)
+            assert suite.predict_batch([]) == []
+
+    def test_suite_invalid(self):
+        assert 'rating' in VALIDATOR_NAMES
+        with pytest.raises(ValueError):
+            ValidatorSuite(['not_a_validator'])
+        with pytest.raises(ValueError):
+            ValidatorSuite([])
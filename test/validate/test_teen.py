@@ -4,7 +4,7 @@ import os.path
 import pytest
 
 from imgutils.generic.classify import _open_models_for_repo_id
-from imgutils.validate import anime_teen
+from imgutils.validate import anime_teen, anime_teen_batch, anime_teen_score_batch
 from imgutils.validate.teen import anime_teen_score, _REPO_ID
 from test.testings import get_testfile
 
@@ -36,3 +36,13 @@ class TestValidateTeen:
         image_file = get_testfile('anime_teen', image)
         scores = anime_teen_score(image_file)
         assert scores[label] > 0.5
+
+    def test_anime_teen_batch(self):
+        image_files = [get_testfile('anime_teen', image) for image, _ in _EXAMPLE_FILES]
+        labels = [label for _, label in _EXAMPLE_FILES]
+        assert [tag for tag, _ in anime_teen_batch(image_files, batch_size=4)] == labels
+
+        scores = anime_teen_score_batch(image_files, batch_size=4)
+        assert len(scores) == len(labels)
+        for score, label in zip(scores, labels):
+            assert score[label] > 0.5